@@ -0,0 +1,43 @@
+"""Synthetic Listen and Semantics data for the benchmarks.
+
+The recordings are written with :mod:`kinnd.datasets`, once per set of parameters, to
+``$KINND_BENCH_DIR`` (defaults to ``kinnd-bench`` in the temporary directory), so that
+the benchmarks run offline and the generation is not timed.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def get_fixture_dir(*parts: str) -> Path:
+    """Get the directory of a fixture, created if it does not exist."""
+    root = os.environ.get("KINND_BENCH_DIR")
+    root = Path(tempfile.gettempdir()) / "kinnd-bench" if root is None else Path(root)
+    directory = root.joinpath(*parts)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def make_listen_tree(n_subjects: int) -> Path:
+    """Create the tree of empty MFF bundles of a Listen cohort."""
+    root = get_fixture_dir("listen-tree", str(n_subjects))
+    for k in range(n_subjects):
+        subject = root / f"{2001 + k}" / "EEG"
+        for task in ("phonemes", "semantics", "resting"):
+            (subject / f"LISTEN_{2001 + k}_{task}_20230501.mff").mkdir(
+                parents=True, exist_ok=True
+            )
+    return root
+
+
+def make_semantics_tree(n_subjects: int) -> Path:
+    """Create the flat directory of empty EEGLAB files of a Semantics cohort."""
+    root = get_fixture_dir("semantics-tree", str(n_subjects))
+    for k in range(n_subjects):
+        for condition in ("SnMa", "SnMi"):
+            (root / f"{k + 1}s17{condition}.set").touch()
+            (root / f"{k + 1}s17{condition}.fdt").touch()
+    return root
@@ -0,0 +1,61 @@
+"""Benchmarks of the construction of the cohort evoked dataset."""
+
+from __future__ import annotations
+
+import shutil
+
+from ._fixtures import get_fixture_dir
+
+
+class BuildEvokedDataset:
+    """Build the evoked dataset of a cohort of increasing size from scratch."""
+
+    params = [1, 4, 8]
+    param_names = ["n_subjects"]
+    timeout = 600
+
+    def setup_cache(self):
+        from kinnd.datasets import write_cleaned_listen
+
+        listen_fpath = get_fixture_dir("listen-derivatives")
+        for k in range(max(self.params)):
+            try:
+                write_cleaned_listen(listen_fpath, str(2001 + k), duration=60, seed=k)
+            except FileExistsError:  # written by a previous run
+                pass
+        return str(listen_fpath)
+
+    def setup(self, listen_fpath, n_subjects):
+        import mne
+
+        from kinnd.utils.logs import set_log_level
+
+        mne.set_log_level("ERROR")
+        set_log_level("ERROR")
+        self.subjects = [str(2001 + k) for k in range(n_subjects)]
+        self.fname = get_fixture_dir("evoked") / f"phonemes_{n_subjects}.zarr"
+        shutil.rmtree(self.fname, ignore_errors=True)
+
+    def teardown(self, listen_fpath, n_subjects):
+        shutil.rmtree(self.fname, ignore_errors=True)
+
+    def _build(self, listen_fpath):
+        from kinnd.studies.listen import build_evoked_dataset
+
+        build_evoked_dataset(
+            self.fname, self.subjects, listen_fpath=listen_fpath, n_jobs=1
+        )
+
+    def time_build(self, listen_fpath, n_subjects):
+        self._build(listen_fpath)
+
+
+class UpdateEvokedDataset(BuildEvokedDataset):
+    """Update an evoked dataset in which every subject is up to date."""
+
+    def setup(self, listen_fpath, n_subjects):
+        super().setup(listen_fpath, n_subjects)
+        self._build(listen_fpath)
+
+    def time_build(self, listen_fpath, n_subjects):
+        self._build(listen_fpath)
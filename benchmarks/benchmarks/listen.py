@@ -0,0 +1,91 @@
+"""Benchmarks of the readers of the Listen study."""
+
+from __future__ import annotations
+
+from ._fixtures import get_fixture_dir
+
+
+class ReadRawListen:
+    """Read a phonemes MFF recording of increasing duration."""
+
+    params = [10, 60, 300]
+    param_names = ["duration"]
+    timeout = 300
+
+    def setup_cache(self):
+        from kinnd.datasets import write_mff_listen
+
+        root = get_fixture_dir("listen-mff")
+        for duration in self.params:
+            fname = root / f"LISTEN_2001_phonemes_{duration}s.mff"
+            if not fname.exists():
+                write_mff_listen(fname, duration=duration, seed=0)
+        return str(root)
+
+    def time_read_raw_listen(self, root, duration):
+        from kinnd.studies.listen.io import read_raw_listen
+
+        read_raw_listen(
+            f"{root}/LISTEN_2001_phonemes_{duration}s.mff",
+            event_mapping={"stm+": "tone"},
+        )
+
+    def peakmem_read_raw_listen(self, root, duration):
+        from kinnd.studies.listen.io import read_raw_listen
+
+        read_raw_listen(
+            f"{root}/LISTEN_2001_phonemes_{duration}s.mff",
+            event_mapping={"stm+": "tone"},
+        )
+
+
+class ListenEvents:
+    """Parse the ECI event track of a run, and map its CEL codes."""
+
+    params = [100, 1000, 10000]
+    param_names = ["n_trials"]
+
+    def setup(self, n_trials):
+        from kinnd.datasets import write_mff_listen
+
+        # a phonemes trial lasts about 0.63 s, the signal is sampled at 10 Hz to keep
+        # the bundle small
+        fname = get_fixture_dir("listen-events") / f"LISTEN_2001_{n_trials}.mff"
+        if not fname.exists():
+            write_mff_listen(fname, duration=0.63 * n_trials + 2, sfreq=10, seed=0)
+        self.fname = fname / "Events_ECI TCP-IP 55513.xml"
+        self.events = self._parse()
+
+    def _parse(self):
+        import mffpy
+
+        return mffpy.XML.from_file(str(self.fname)).get_content()["event"]
+
+    def time_parse_events(self, n_trials):
+        self._parse()
+
+    def time_get_cel_map(self, n_trials):
+        from kinnd.studies.listen.io import get_cel_map
+
+        get_cel_map(self.events)
+
+
+class AlignDinOnsets:
+    """Align the stimuli of a phonemes run to their DIN events."""
+
+    params = [1000, 10000, 100000]
+    param_names = ["n_trials"]
+
+    def setup(self, n_trials):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        stimuli = np.cumsum(rng.uniform(0.6, 0.66, n_trials))
+        dins = stimuli + rng.uniform(0.01, 0.02, n_trials)
+        self.onsets = np.concatenate([stimuli, dins])
+        self.codes = np.array(["stm+"] * n_trials + ["DIN8"] * n_trials, dtype=object)
+
+    def time_align_din_onsets(self, n_trials):
+        from kinnd.studies.listen.io import align_din_onsets
+
+        align_din_onsets(self.onsets, self.codes, {"stm+": "DIN8"})
@@ -0,0 +1,49 @@
+"""Benchmarks of the logging utilities, called in the hot loops."""
+
+from __future__ import annotations
+
+import warnings
+
+
+class Warn:
+    """Emit warnings, which traverse the stack to find the caller."""
+
+    params = [1, 100]
+    param_names = ["n_warnings"]
+
+    def setup(self, n_warnings):
+        from kinnd.utils.logs import logger
+
+        self._level = logger.level
+        logger.setLevel("WARNING")
+        self._filters = warnings.catch_warnings()
+        self._filters.__enter__()
+        warnings.simplefilter("ignore")
+
+    def teardown(self, n_warnings):
+        from kinnd.utils.logs import logger
+
+        self._filters.__exit__(None, None, None)
+        logger.setLevel(self._level)
+
+    def time_warn(self, n_warnings):
+        from kinnd.utils.logs import warn
+
+        for k in range(n_warnings):
+            warn(f"Synthetic warning {k}.")
+
+    def time_warn_filtered(self, n_warnings):
+        from kinnd.utils.logs import logger, warn
+
+        logger.setLevel("ERROR")
+        for k in range(n_warnings):
+            warn(f"Synthetic warning {k}.")
+        logger.setLevel("WARNING")
+
+
+def time_import_kinnd():
+    """Import kinnd in a fresh interpreter."""
+    import subprocess
+    import sys
+
+    subprocess.run([sys.executable, "-c", "import kinnd"], check=True)
@@ -0,0 +1,35 @@
+"""Benchmarks of the discovery of the recordings on large directory trees."""
+
+from __future__ import annotations
+
+from ._fixtures import make_listen_tree, make_semantics_tree
+
+
+class ListenFpaths:
+    """Find the MFF bundles of a Listen cohort of increasing size."""
+
+    params = [10, 100, 1000]
+    param_names = ["n_subjects"]
+
+    def setup(self, n_subjects):
+        self.root = make_listen_tree(n_subjects)
+
+    def time_get_listen_fpaths(self, n_subjects):
+        from kinnd.utils.paths import get_listen_fpaths
+
+        get_listen_fpaths(self.root)
+
+
+class SemanticsFpaths:
+    """Find the EEGLAB files of a Semantics cohort of increasing size."""
+
+    params = [10, 100, 1000]
+    param_names = ["n_subjects"]
+
+    def setup(self, n_subjects):
+        self.root = make_semantics_tree(n_subjects)
+
+    def time_get_semantics_fpaths(self, n_subjects):
+        from kinnd.utils.paths import get_semantics_fpaths
+
+        get_semantics_fpaths(self.root)
@@ -0,0 +1,38 @@
+"""Benchmarks of the readers of the Semantics study."""
+
+from __future__ import annotations
+
+from ._fixtures import get_fixture_dir
+
+
+class ReadEpochsSemantics:
+    """Read, combine and clean the match and mismatch epochs of a subject."""
+
+    params = [50, 200, 800]
+    param_names = ["n_epochs"]
+    timeout = 300
+
+    def setup_cache(self):
+        from kinnd.datasets import make_semantics_dataset
+        from kinnd.studies.semantics import get_semantics_fpaths
+
+        fpaths = dict()
+        for n_epochs in self.params:
+            directory = make_semantics_dataset(
+                get_fixture_dir("semantics-set", str(n_epochs)),
+                1,
+                n_epochs=n_epochs,
+                seed=0,
+            )
+            fpaths[n_epochs] = get_semantics_fpaths(directory)
+        return fpaths
+
+    def time_read_epochs_semantics(self, fpaths, n_epochs):
+        from kinnd.studies.semantics import read_epochs_semantics
+
+        read_epochs_semantics(fpaths[n_epochs], "sub-01", verbose="ERROR")
+
+    def peakmem_read_epochs_semantics(self, fpaths, n_epochs):
+        from kinnd.studies.semantics import read_epochs_semantics
+
+        read_epochs_semantics(fpaths[n_epochs], "sub-01", verbose="ERROR")
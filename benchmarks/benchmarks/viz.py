@@ -0,0 +1,35 @@
+"""Benchmarks of the topographic maps."""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class PlotTopomap:
+    """Plot the topographic map of an increasing number of channels."""
+
+    params = [32, 64, 129]
+    param_names = ["n_channels"]
+
+    def setup(self, n_channels):
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import mne
+
+        montage = mne.channels.make_standard_montage("GSN-HydroCel-129")
+        ch_names = montage.ch_names[:: len(montage.ch_names) // n_channels][:n_channels]
+        self.info = mne.create_info(ch_names, 250.0, "eeg")
+        self.info.set_montage(montage)
+        rng = np.random.default_rng(0)
+        self.data = dict(zip(ch_names, rng.standard_normal(n_channels)))
+
+    def teardown(self, n_channels):
+        import matplotlib.pyplot as plt
+
+        plt.close("all")
+
+    def time_plot_topomap(self, n_channels):
+        from kinnd.viz import plot_topomap
+
+        plot_topomap(self.data, self.info)
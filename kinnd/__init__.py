@@ -1,7 +1,24 @@
-from . import utils
 from ._version import __version__
-from .utils.config import sys_info
-from .utils.logs import add_file_handler, set_log_level
-from . import studies
-from . import viz
-from .utils import paths
\ No newline at end of file
+from .utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=[
+        "datasets",
+        "io",
+        "cache",
+        "preprocessing",
+        "qc",
+        "spectral",
+        "stats",
+        "studies",
+        "utils",
+        "viz",
+    ],
+    submod_attrs={
+        "utils": ["paths"],
+        "utils.bench": ["bench"],
+        "utils.config": ["sys_info"],
+        "utils.logs": ["add_file_handler", "set_log_level"],
+    },
+)
@@ -0,0 +1,9 @@
+"""Cache module."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["memo"],
+    submod_attrs={"memo": ["clear_cache", "hash_object", "memoize"]},
+)
@@ -0,0 +1,431 @@
+"""Memoization of computations on disk, keyed by the content of their inputs.
+
+The breaks, filtered epochs, evoked responses or spectra of a recording are computed
+again by every analysis which needs them, although neither the recording nor the
+parameters changed. A memoized function hashes its inputs, i.e. the buffers of the
+arrays and MNE objects, their measurement information and annotations, the size and
+modification time of the files and the other parameters, and returns the result
+stored on disk under that key if it exists. The results are stored in the kinnd cache
+directory, in FIF, NPY or zarr files depending on their type, with a size budget and
+least-recently-used eviction, see :class:`~kinnd.utils._lru.DiskLRU`.
+"""
+
+from __future__ import annotations
+
+import inspect
+import os
+import pickle
+import shutil
+import zipfile
+from functools import wraps
+from hashlib import sha1
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .._version import __version__
+from ..utils._checks import check_type, ensure_int
+from ..utils._imports import import_optional_dependency
+from ..utils._lru import DiskLRU
+from ..utils.logs import logger, warn
+from ..utils.paths import get_cache_dir
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Optional
+
+
+# bump to invalidate the entries written by a previous version of this module
+_CACHE_VERSION = "1"
+_MAX_DISK_SIZE = 2**30  # bytes, per function
+# name of the variable of an unnamed DataArray stored as a Dataset
+_DATAARRAY_NAME = "__xarray_dataarray_variable__"
+
+
+def memoize(
+    func: Optional[Callable] = None,
+    *,
+    ignore: tuple[str, ...] = (),
+    paths: tuple[str, ...] = (),
+    max_size: int = _MAX_DISK_SIZE,
+) -> Callable:
+    """Memoize a function on disk.
+
+    The key of a call is the hash of the version of kinnd, the source code of the
+    function and its arguments, see :func:`hash_object`. The result of a call whose
+    key is already stored is read from disk instead of being computed again. Can be
+    used with or without arguments, i.e. as ``@memoize`` or as
+    ``@memoize(ignore=("n_jobs",))``.
+
+    Parameters
+    ----------
+    func : callable | None
+        The function to memoize.
+    ignore : tuple of str
+        The names of the arguments which do not change the result, e.g. ``"n_jobs"``
+        or ``"verbose"``, and are left out of the key.
+    paths : tuple of str
+        The names of the arguments which are paths to files, as :class:`str` or
+        path-like, or lists of those. They are hashed from the size and modification
+        time of their files, as :class:`~pathlib.Path` arguments.
+    max_size : int
+        The size budget of the results of the function, in bytes. The least recently
+        used results are evicted once it is exceeded.
+
+    Returns
+    -------
+    func : callable
+        The memoized function. Its cache is returned by ``func.get_cache()``, and is
+        cleared with ``func.clear()``.
+
+    Notes
+    -----
+    The results are stored in the ``memoize`` folder of the kinnd cache directory
+    (``KINND_CACHE_DIR``, defaults to ``~/.cache/kinnd``), as FIF files for MNE
+    objects, NPY files for arrays, zipped zarr stores for xarray objects and pickle
+    files otherwise. The evoked responses are stored in single precision, the only
+    precision of the evoked FIF files.
+
+    Preloaded data are hashed from their buffer, and data which are not preloaded
+    from the size and modification time of their files. Epochs which are not
+    preloaded are hashed from their raw data or their file, and their selection,
+    decimation and rejection parameters. A file passed as a :class:`~pathlib.Path` is
+    hashed from its path, size and modification time. A string is hashed from its
+    value only, thus a file passed as a string and written again returns the stale
+    result, unless the argument is listed in ``paths``.
+    """
+    check_type(ignore, (tuple, list), "ignore")
+    check_type(paths, (tuple, list), "paths")
+    max_size = ensure_int(max_size, "max_size")
+    if max_size < 0:
+        raise ValueError("Argument 'max_size' must be positive.")
+
+    def decorator(func: Callable) -> Callable:
+        check_type(func, ("callable",), "func")
+        name = f"{func.__module__}.{func.__qualname__}"
+        signature = inspect.signature(func)
+        for names, kind in ((ignore, "to ignore"), (paths, "of paths")):
+            unknown = set(names) - set(signature.parameters)
+            if len(unknown) != 0:
+                raise ValueError(
+                    f"The arguments {sorted(unknown)} {kind} are not arguments of "
+                    f"{name}."
+                )
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):  # e.g. defined in an interactive session
+            source = ""
+        prefix = hash_object((_CACHE_VERSION, __version__, name, source))
+        folder = name.replace("<", "").replace(">", "")
+
+        def get_cache() -> DiskLRU:
+            # resolved on call, to follow changes of KINND_CACHE_DIR after import
+            return DiskLRU(get_cache_dir() / "memoize" / folder, max_size)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {
+                key: value
+                for key, value in bound.arguments.items()
+                if key not in ignore
+            }
+            for key in paths:
+                if key in arguments:
+                    arguments[key] = _as_path(arguments[key])
+            key = hash_object((prefix, arguments))
+            cache = get_cache()
+            for suffix, (_, read) in _FORMATS.items():
+                fname = cache.get(key, suffix)
+                if fname is None:
+                    continue
+                try:
+                    result = read(fname)
+                except Exception as error:
+                    warn(f"Discarding the corrupted cache entry {fname.name}: {error}")
+                    fname.unlink(missing_ok=True)
+                    break
+                logger.debug("Reading the result of %s from %s.", name, fname.name)
+                return result
+            result = func(*args, **kwargs)
+            suffix = _get_suffix(result)
+            cache.put(key, suffix, lambda fname: _FORMATS[suffix][0](result, fname))
+            return result
+
+        wrapper.get_cache = get_cache
+        wrapper.clear = lambda: get_cache().clear()
+        return wrapper
+
+    return decorator if func is None else decorator(func)
+
+
+def clear_cache() -> None:
+    """Remove the results of every memoized function from the disk."""
+    shutil.rmtree(get_cache_dir() / "memoize", ignore_errors=True)
+
+
+def hash_object(obj: Any) -> str:
+    """Hash an object from its content.
+
+    Parameters
+    ----------
+    obj : object
+        The object: ``None``, a boolean, a number, a string, bytes, a path, a NumPy
+        array, an MNE raw, epochs, evoked, info or annotations object, or a list,
+        tuple, set or dict of those.
+
+    Returns
+    -------
+    key : str
+        The hexadecimal SHA-1 digest of the object, stable across processes and
+        sessions.
+    """
+    hasher = sha1()
+    _update(hasher, obj)
+    return hasher.hexdigest()
+
+
+def _update(hasher, obj: Any) -> None:
+    """Update a hash with the content of an object, tagged with its type."""
+    from mne import Annotations, Evoked, Info
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+    from mne.utils import object_hash
+
+    hasher.update(f"<{type(obj).__name__}>".encode())
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, np.generic)):
+        hasher.update(repr(obj).encode())
+    elif isinstance(obj, bytes):
+        hasher.update(obj)
+    elif isinstance(obj, Path):
+        _update_file(hasher, obj)
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            _update(hasher, obj.tolist())
+        else:
+            hasher.update(f"{obj.dtype.str}{obj.shape}".encode())
+            hasher.update(memoryview(np.ascontiguousarray(obj)).cast("B"))
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _update(hasher, item)
+            hasher.update(b"\x00")
+    elif isinstance(obj, (set, frozenset)):
+        for digest in sorted(hash_object(item) for item in obj):
+            hasher.update(digest.encode())
+    elif isinstance(obj, dict):
+        for digest in sorted(hash_object(item) for item in obj.items()):
+            hasher.update(digest.encode())
+    elif isinstance(obj, Info):
+        hasher.update(str(object_hash(obj)).encode())
+    elif isinstance(obj, Annotations):
+        _update(
+            hasher,
+            (
+                obj.onset,
+                obj.duration,
+                obj.description.tolist(),
+                [list(ch_names) for ch_names in obj.ch_names],
+                None if obj.orig_time is None else obj.orig_time.isoformat(),
+            ),
+        )
+    elif isinstance(obj, BaseRaw):
+        _update(hasher, (obj.info, obj.annotations, obj.first_samp, obj.last_samp))
+        if obj.preload:
+            _update(hasher, obj._data)
+        else:
+            for fname in obj.filenames:
+                _update_file(hasher, Path(fname))
+    elif isinstance(obj, BaseEpochs):
+        _update(
+            hasher,
+            (obj.info, obj.events, obj.event_id, obj.tmin, obj.tmax, obj.baseline),
+        )
+        if obj.preload:
+            _update(hasher, obj._data)
+        else:
+            _update_epochs_source(hasher, obj)
+    elif isinstance(obj, Evoked):
+        _update(hasher, (obj.info, obj.data, obj.tmin, obj.nave, obj.comment))
+    else:
+        raise TypeError(
+            f"Objects of type {type(obj).__name__} can not be hashed from their "
+            "content, thus the arguments of a memoized function can not be of this "
+            "type."
+        )
+
+
+def _update_epochs_source(hasher, epochs) -> None:
+    """Update a hash with the source of epochs which are not preloaded.
+
+    The epochs are read on demand from raw data, e.g. :class:`mne.Epochs`, or from a
+    FIF file, e.g. :func:`mne.read_epochs` with ``preload=False``, and hashed from
+    this source and the state applied to the epochs when they are read.
+    """
+    from mne.io import BaseRaw
+
+    if isinstance(epochs._raw, BaseRaw):
+        _update(hasher, epochs._raw)
+    elif epochs.filename is not None:
+        _update_file(hasher, Path(epochs.filename))
+    else:
+        raise TypeError(
+            "Epochs which are not preloaded can only be hashed from their raw data or "
+            "their file."
+        )
+    _update(
+        hasher,
+        (
+            epochs.selection,
+            epochs.picks,
+            epochs._decim,
+            epochs._offset,
+            epochs.detrend,
+            epochs.reject,
+            epochs.flat,
+            epochs.reject_tmin,
+            epochs.reject_tmax,
+            getattr(epochs, "reject_by_annotation", None),  # not set by read_epochs
+            epochs._do_baseline,
+            epochs._do_delayed_proj,
+        ),
+    )
+
+
+def _as_path(value: Any) -> Any:
+    """Convert a path-like argument, or a list of those, to :class:`~pathlib.Path`."""
+    if isinstance(value, (str, os.PathLike)):
+        return Path(value)
+    if isinstance(value, (list, tuple)):
+        return [_as_path(item) for item in value]
+    return value
+
+
+def _update_file(hasher, fname: Path) -> None:
+    """Update a hash with a path, and the size and modification time of its file."""
+    fname = fname.expanduser().resolve()
+    hasher.update(str(fname).encode())
+    if fname.is_file():
+        stat = fname.stat()
+        hasher.update(f"{stat.st_size}-{stat.st_mtime_ns}".encode())
+
+
+def _get_suffix(result: Any) -> str:
+    """Get the suffix of the file format of a result."""
+    from mne import Annotations, Evoked
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+
+    xr = import_optional_dependency("xarray", raise_error=False)
+    if isinstance(result, BaseRaw):
+        return "_raw.fif"
+    if isinstance(result, BaseEpochs):
+        return "-epo.fif"
+    if isinstance(result, Evoked):
+        return "-ave.fif"
+    if isinstance(result, Annotations):
+        return "-annot.fif"
+    if isinstance(result, np.ndarray) and not result.dtype.hasobject:
+        return ".npy"
+    if xr is not None and isinstance(result, (xr.Dataset, xr.DataArray)):
+        return ".zarr.zip"
+    return ".pkl"
+
+
+def _write_fif(result, fname: Path) -> None:
+    """Write an MNE object, in double precision if the format supports it."""
+    from mne import Evoked
+
+    kwargs = dict() if isinstance(result, Evoked) else dict(fmt="double")
+    result.save(fname, overwrite=True, verbose=False, **kwargs)
+
+
+def _write_zarr(result, fname: Path) -> None:
+    """Write an xarray object to a zipped zarr store."""
+    xr = import_optional_dependency("xarray")
+    if isinstance(result, xr.DataArray):
+        ds = result.to_dataset(name=result.name or _DATAARRAY_NAME)
+        ds = ds.assign_attrs(__memoize_kind__="dataarray")
+    else:
+        ds = result.assign_attrs(__memoize_kind__="dataset")
+    # written to a directory first, since a zip store can not overwrite the metadata
+    with TemporaryDirectory(prefix=".tmp-", dir=fname.parent) as tmp:
+        ds.to_zarr(tmp, mode="w", consolidated=False)
+        with zipfile.ZipFile(fname, "w") as archive:  # the chunks are compressed
+            for file in sorted(Path(tmp).rglob("*")):
+                if file.is_file():
+                    archive.write(file, file.relative_to(tmp).as_posix())
+
+
+def _read_zarr(fname: Path):
+    """Read an xarray object from a zipped zarr store, into memory."""
+    from zarr.storage import ZipStore
+
+    xr = import_optional_dependency("xarray")
+    store = ZipStore(fname, mode="r")
+    try:
+        ds = xr.open_zarr(store, consolidated=False).load()
+    finally:
+        store.close()
+    if ds.attrs.pop("__memoize_kind__") == "dataset":
+        return ds
+    (name,) = ds.data_vars
+    return ds[name].rename(None if name == _DATAARRAY_NAME else name)
+
+
+def _write_pickle(result, fname: Path) -> None:
+    """Write an object with pickle."""
+    with open(fname, "wb") as fid:
+        pickle.dump(result, fid, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_pickle(fname: Path):
+    """Read an object with pickle."""
+    with open(fname, "rb") as fid:
+        return pickle.load(fid)
+
+
+def _read_raw(fname: Path):
+    """Read raw data, into memory."""
+    from mne.io import read_raw_fif
+
+    return read_raw_fif(fname, preload=True, verbose=False)
+
+
+def _read_epochs(fname: Path):
+    """Read epochs, into memory."""
+    from mne import read_epochs
+
+    return read_epochs(fname, preload=True, verbose=False)
+
+
+def _read_evoked(fname: Path):
+    """Read an evoked response."""
+    from mne import read_evokeds
+
+    return read_evokeds(fname, condition=0, verbose=False)
+
+
+def _write_annotations(result, fname: Path) -> None:
+    """Write annotations."""
+    result.save(fname, overwrite=True, verbose=False)
+
+
+def _read_annotations(fname: Path):
+    """Read annotations."""
+    from mne import read_annotations
+
+    return read_annotations(fname)
+
+
+# writer and reader of each file format, by suffix
+_FORMATS = {
+    "_raw.fif": (_write_fif, _read_raw),
+    "-epo.fif": (_write_fif, _read_epochs),
+    "-ave.fif": (_write_fif, _read_evoked),
+    "-annot.fif": (_write_annotations, _read_annotations),
+    ".npy": (lambda result, fname: np.save(fname, result), np.load),
+    ".zarr.zip": (_write_zarr, _read_zarr),
+    ".pkl": (_write_pickle, _read_pickle),
+}
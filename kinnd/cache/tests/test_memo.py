@@ -0,0 +1,271 @@
+import os
+from functools import wraps
+
+import mne
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from .. import memo
+from ..memo import clear_cache, hash_object, memoize
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    """Isolate the memoized results of each test."""
+    monkeypatch.setenv("KINND_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture(scope="module")
+def raw():
+    """Create a preloaded raw recording."""
+    rng = np.random.default_rng(0)
+    info = mne.create_info(4, 100.0, "eeg")
+    raw = mne.io.RawArray(1e-5 * rng.standard_normal((4, 1000)), info, verbose=False)
+    raw.set_annotations(mne.Annotations([1.0, 5.0], 0.5, "tone"))
+    return raw
+
+
+def _counted(func):
+    """Count the calls to a function, in its 'calls' attribute."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        wrapper.calls += 1
+        return func(*args, **kwargs)
+
+    wrapper.calls = 0
+    return wrapper
+
+
+def test_hash_object(raw, tmp_path):
+    """Test the hash of objects from their content."""
+    assert hash_object([1, "a", None]) == hash_object([1, "a", None])
+    assert hash_object([1, "a"]) != hash_object(["1", "a"])
+    assert hash_object((1, 2)) != hash_object([1, 2])
+    assert hash_object({"a": 1, "b": 2}) == hash_object({"b": 2, "a": 1})
+    assert hash_object({1, 2}) == hash_object({2, 1})
+    data = np.arange(6.0)
+    assert hash_object(data) == hash_object(data.copy())
+    assert hash_object(data) != hash_object(data.reshape(2, 3))
+    assert hash_object(data) != hash_object(data.astype(np.float32))
+    assert hash_object(data[::2]) == hash_object(data[::2].copy())
+    # MNE objects
+    assert hash_object(raw) == hash_object(raw.copy())
+    assert hash_object(raw) != hash_object(raw.copy().crop(0, 5))
+    other = raw.copy()
+    other.annotations.description[0] = "other"
+    assert hash_object(raw) != hash_object(other)
+    other = raw.copy()
+    other.info["bads"] = ["0"]
+    assert hash_object(raw) != hash_object(other)
+    other = raw.copy()
+    other._data[0, 0] += 1e-9
+    assert hash_object(raw) != hash_object(other)
+    evoked = mne.EpochsArray(raw.get_data()[np.newaxis], raw.info).average()
+    assert hash_object(evoked) == hash_object(evoked.copy())
+    # files, from their modification time
+    fname = tmp_path / "a.txt"
+    fname.write_text("a")
+    digest = hash_object(fname)
+    assert hash_object(fname) == digest
+    os.utime(fname, ns=(0, 0))
+    assert hash_object(fname) != digest
+    with pytest.raises(TypeError, match="can not be hashed"):
+        hash_object(object())
+
+
+def test_hash_lazy_epochs(raw, tmp_path):
+    """Test the hash of epochs which are not preloaded."""
+    events = mne.make_fixed_length_events(raw, duration=1.0)
+    kwargs = dict(tmin=0, tmax=0.5, baseline=None, preload=False, verbose=False)
+    epochs = mne.Epochs(raw, events, **kwargs)
+    digest = hash_object(epochs)
+    assert hash_object(mne.Epochs(raw, events, **kwargs)) == digest
+    assert hash_object(epochs.copy().load_data()) != digest
+    assert hash_object(epochs[1:]) != digest
+    assert hash_object(mne.Epochs(raw, events, picks=[0, 1], **kwargs)) != digest
+    with pytest.warns(RuntimeWarning, match="aliasing"):
+        decimated = mne.Epochs(raw, events, decim=2, **kwargs)
+    assert hash_object(decimated) != digest
+    assert hash_object(mne.Epochs(raw, events, reject=dict(eeg=1), **kwargs)) != digest
+    assert hash_object(mne.Epochs(raw.copy().crop(0, 9), events, **kwargs)) != digest
+    # read from a file
+    fname = tmp_path / "test-epo.fif"
+    epochs.save(fname, verbose=False)
+    epochs = mne.read_epochs(fname, preload=False, verbose=False)
+    digest = hash_object(epochs)
+    assert hash_object(mne.read_epochs(fname, preload=False, verbose=False)) == digest
+    assert hash_object(epochs[1:]) != digest
+    os.utime(fname, ns=(0, 0))
+    assert hash_object(epochs) != digest
+
+    @memoize
+    @_counted
+    def average(epochs):
+        return epochs.average()
+
+    evoked = average(epochs)
+    assert_allclose(average(epochs).data, evoked.data, rtol=1e-6)
+    assert average.__wrapped__.calls == 1
+
+
+def test_memoize():
+    """Test the memoization of a function on arrays."""
+
+    @memoize(ignore=("verbose",))
+    @_counted
+    def scale(data, factor=2.0, verbose=None):
+        return data * factor
+
+    func = scale.__wrapped__
+    data = np.arange(5.0)
+    assert_allclose(scale(data), 2 * data)
+    assert func.calls == 1
+    assert_allclose(scale(data, verbose=True), 2 * data)
+    assert_allclose(scale(data, factor=2.0), 2 * data)
+    assert func.calls == 1
+    assert_allclose(scale(data, 3.0), 3 * data)
+    assert_allclose(scale(data + 1), 2 * (data + 1))
+    assert func.calls == 3
+    assert len(scale.get_cache()) == 3
+    scale.clear()
+    assert len(scale.get_cache()) == 0
+    scale(data)
+    assert func.calls == 4
+    clear_cache()
+    scale(data)
+    assert func.calls == 5
+
+    with pytest.raises(ValueError, match="are not arguments"):
+        memoize(ignore=("n_jobs",))(lambda data: data)
+    with pytest.raises(ValueError, match="of paths are not arguments"):
+        memoize(paths=("fname",))(lambda data: data)
+    with pytest.raises(ValueError, match="must be positive"):
+        memoize(max_size=-1)
+
+
+def test_memoize_paths(tmp_path):
+    """Test that the files passed as strings are hashed from their content."""
+
+    def read(fname):
+        read.calls += 1
+        return np.loadtxt(fname)
+
+    read.calls = 0
+    fname = tmp_path / "data.txt"
+    np.savetxt(fname, [1.0, 2.0])
+    stale = memoize(read)
+    fresh = memoize(paths=("fname",))(read)
+    for func in (stale, fresh):
+        assert_allclose(func(str(fname)), [1.0, 2.0])
+        assert_allclose(func(str(fname)), [1.0, 2.0])
+    assert read.calls == 2
+    np.savetxt(fname, [3.0, 4.0, 5.0])
+    assert_allclose(stale(str(fname)), [1.0, 2.0])  # hashed from the string only
+    assert_allclose(fresh(str(fname)), [3.0, 4.0, 5.0])
+    assert_allclose(fresh(fname), [3.0, 4.0, 5.0])
+    assert read.calls == 3
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        pytest.param(lambda raw: raw.copy().crop(0, 3), id="raw"),
+        pytest.param(
+            lambda raw: mne.make_fixed_length_epochs(
+                raw, 1.0, verbose=False
+            ).load_data(),
+            id="epochs",
+        ),
+        pytest.param(
+            lambda raw: mne.make_fixed_length_epochs(raw, 1.0, verbose=False).average(),
+            id="evoked",
+        ),
+        pytest.param(lambda raw: raw.annotations, id="annotations"),
+        pytest.param(lambda raw: raw.get_data(), id="array"),
+        pytest.param(lambda raw: {"ch_names": raw.ch_names}, id="pickle"),
+    ],
+)
+def test_memoize_formats(raw, result):
+    """Test the round-trip of the results through their file format."""
+
+    @memoize
+    @_counted
+    def compute(raw):
+        return result(raw)
+
+    expected = compute(raw)
+    cached = compute(raw)
+    assert compute.__wrapped__.calls == 1
+    for kind in (mne.io.BaseRaw, mne.BaseEpochs, mne.Evoked, mne.Annotations, dict):
+        assert isinstance(cached, kind) == isinstance(expected, kind)
+    if isinstance(expected, (mne.io.BaseRaw, mne.BaseEpochs, mne.Evoked)):
+        assert cached.ch_names == expected.ch_names
+        assert_allclose(cached.get_data(), expected.get_data(), rtol=1e-6)
+    elif isinstance(expected, mne.Annotations):
+        assert_allclose(cached.onset, expected.onset)
+        assert list(cached.description) == list(expected.description)
+    elif isinstance(expected, np.ndarray):
+        assert_allclose(cached, expected)
+    else:
+        assert cached == expected
+
+
+def test_memoize_xarray():
+    """Test the round-trip of xarray objects through a zipped zarr store."""
+    xr = pytest.importorskip("xarray")
+    pytest.importorskip("zarr")
+
+    @memoize
+    def compute(name):
+        return xr.DataArray(
+            np.arange(6.0).reshape(2, 3),
+            dims=("channel", "freq"),
+            coords={"freq": [1.0, 2.0, 3.0]},
+            name=name,
+        )
+
+    for name in (None, "psd"):
+        expected = compute(name)
+        cached = compute(name)
+        xr.testing.assert_identical(cached, expected)
+    dataset = compute.__wrapped__("psd").to_dataset()
+    xr.testing.assert_identical(memoize(lambda: dataset)(), dataset)
+
+
+def test_memoize_invalidation(raw, monkeypatch):
+    """Test the invalidation of the results on a version bump or a corrupted entry."""
+
+    def compute(raw):
+        compute.calls += 1
+        return raw.get_data()
+
+    compute.calls = 0
+    memoize(compute)(raw)
+    memoize(compute)(raw)
+    assert compute.calls == 1
+    monkeypatch.setattr(memo, "__version__", "99.0")
+    memoized = memoize(compute)
+    memoized(raw)
+    assert compute.calls == 2
+    for fname in memoized.get_cache().directory.glob("*.npy"):
+        fname.write_bytes(b"corrupted")
+    with pytest.warns(RuntimeWarning, match="corrupted cache entry"):
+        assert_allclose(memoized(raw), raw.get_data())
+    assert compute.calls == 3
+    assert_allclose(memoized(raw), raw.get_data())
+    assert compute.calls == 3
+
+
+def test_memoize_eviction():
+    """Test the eviction of the least recently used results."""
+
+    @memoize(max_size=2500)
+    def compute(value):
+        return np.full(100, value, dtype=np.float64)  # 928 bytes per entry
+
+    for value in range(4):
+        compute(value)
+    assert len(compute.get_cache()) == 2
+    assert compute.get_cache().size <= 2500
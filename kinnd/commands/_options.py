@@ -0,0 +1,104 @@
+"""Options shared by the processing commands.
+
+The commands only import the library when they run, so that ``kinnd --help`` and the
+parsing of the options do not pay for importing MNE and the optional dependencies.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import click
+
+if TYPE_CHECKING:
+    from typing import Callable, Optional
+
+
+def _split_subjects(
+    ctx: click.Context, param: click.Parameter, value: tuple[str, ...]
+) -> Optional[list[str]]:
+    """Split comma-separated subjects, and strip the 'sub-' prefix."""
+    subjects = [
+        subject.strip().removeprefix("sub-")
+        for item in value
+        for subject in item.split(",")
+        if subject.strip()
+    ]
+    return subjects if len(subjects) != 0 else None
+
+
+subjects = click.option(
+    "-s",
+    "--subjects",
+    multiple=True,
+    callback=_split_subjects,
+    help="Subject to process, e.g. 2001. Repeat the option or separate the subjects "
+    "with commas to process several subjects. Defaults to every subject.",
+)
+task = click.option(
+    "--task",
+    type=click.Choice(["phonemes", "semantics", "resting"]),
+    default=None,
+    help="Experimental task to process. Defaults to every task.",
+)
+session = click.option(
+    "--session",
+    type=click.IntRange(1, 2),
+    default=None,
+    help="Session (visit) to process. Defaults to every session.",
+)
+sfreq = click.option(
+    "--sfreq",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Sampling frequency, in Hz, the recordings are decimated to before they are "
+    "processed, e.g. 250. Defaults to the sampling frequency of each recording.",
+)
+listen_fpath = click.option(
+    "--listen-fpath",
+    type=click.Path(file_okay=False, path_type=str),
+    default=None,
+    help="Path to a local copy of the LISTEN project directory. Defaults to the "
+    "directory on the lab server.",
+)
+jobs = click.option(
+    "-j",
+    "--jobs",
+    "n_jobs",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of worker processes. -1 uses every core.",
+)
+overwrite = click.option(
+    "--overwrite",
+    is_flag=True,
+    help="Recompute the outputs which already exist.",
+)
+dry_run = click.option(
+    "--dry-run",
+    is_flag=True,
+    help="List what would be processed, without processing it.",
+)
+verbose = click.option(
+    "--verbose",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+    default="INFO",
+    show_default=True,
+    help="Verbosity of the logger.",
+)
+
+
+def processing_options(f: Callable) -> Callable:
+    """Add the options shared by the processing commands."""
+    for option in (verbose, dry_run, overwrite, jobs, listen_fpath, subjects):
+        f = option(f)
+    return f
+
+
+def echo_todo(todo: list[str], dry_run: bool) -> None:
+    """Print the recordings or subjects processed, or which would be processed."""
+    header = "Would process" if dry_run else "Processed"
+    click.echo(f"{header} {len(todo)} item(s).")
+    for item in todo:
+        click.echo(f"  {item}")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import click
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+
+@click.command(name="bench")
+@click.option(
+    "-d",
+    "--directory",
+    "directories",
+    type=click.Path(exists=True, file_okay=False, path_type=str),
+    multiple=True,
+    help="Directory whose read throughput and latency are measured, e.g. the lab "
+    "share or a local cache. Repeat the option to measure several directories.",
+)
+@click.option(
+    "--compute/--no-compute",
+    default=True,
+    show_default=True,
+    help="Measure the matrix products and FFTs.",
+)
+@click.option(
+    "--write",
+    is_flag=True,
+    help="Also measure the write throughput with a temporary file.",
+)
+@click.option(
+    "--max-mb",
+    type=click.IntRange(min=1),
+    default=256,
+    show_default=True,
+    help="Maximum number of MB read (and written) per directory and benchmark.",
+)
+@click.option(
+    "--repeats",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="Number of repeats of each compute benchmark.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=str),
+    default=None,
+    help="JSON file to write the report to. Defaults to the standard output.",
+)
+def run(
+    directories: tuple[str, ...],
+    compute: bool,
+    write: bool,
+    max_mb: int,
+    repeats: int,
+    output: Optional[str],
+) -> None:
+    """Measure the BLAS, FFT and storage throughput of this machine."""
+    import json
+
+    from ..utils.bench import bench
+
+    report = bench(
+        list(directories),
+        compute=compute,
+        n_repeats=repeats,
+        max_bytes=max_mb * 2**20,
+        write=write,
+    )
+    text = json.dumps(report, indent=2)
+    if output is None:
+        click.echo(text)
+    else:
+        with open(output, "w", encoding="utf-8") as fid:
+            fid.write(text + "\n")
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import click
+
+from . import _options
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+
+@click.command(name="bidsify")
+@_options.task
+@_options.session
+@click.option(
+    "--max-memory",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum virtual address space of each worker process, in MB, which is "
+    "larger than its resident memory. A recording which needs more is skipped. Only "
+    "supported on Unix.",
+)
+@_options.processing_options
+def run(
+    subjects: Optional[list[str]],
+    listen_fpath: Optional[str],
+    n_jobs: int,
+    overwrite: bool,
+    dry_run: bool,
+    verbose: str,
+    task: Optional[str],
+    session: Optional[int],
+    max_memory: Optional[int],
+) -> None:
+    """Convert the LISTEN recordings to BIDS."""
+    from ..studies.listen.bids import bidsify_listen
+    from ..utils.logs import set_log_level
+
+    set_log_level(verbose.upper())
+    todo = bidsify_listen(
+        subjects,
+        task=task,
+        session=session,
+        listen_fpath=listen_fpath,
+        n_jobs=n_jobs,
+        max_memory=None if max_memory is None else max_memory * 2**20,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+    _options.echo_todo(todo, dry_run)
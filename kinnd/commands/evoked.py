@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import click
+
+from . import _options
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+
+@click.command(name="evoked")
+@click.option(
+    "--task",
+    type=click.Choice(["phonemes", "semantics"]),
+    default="phonemes",
+    show_default=True,
+    help="Experimental task.",
+)
+@click.option(
+    "--session",
+    type=click.IntRange(1, 2),
+    default=1,
+    show_default=True,
+    help="Session (visit).",
+)
+@click.option(
+    "--derivative",
+    type=click.Choice(["pylossless", "mne-bids-pipeline"]),
+    default="pylossless",
+    show_default=True,
+    help="Derivative to compute the evoked responses from.",
+)
+@click.option(
+    "-o",
+    "--output",
+    "fname",
+    type=click.Path(dir_okay=True, path_type=str),
+    default=None,
+    help="Path to the .zarr store. Defaults to "
+    "data/derivatives/xarray/<task>_evoked_<derivative>.zarr.",
+)
+@_options.processing_options
+def run(
+    subjects: Optional[list[str]],
+    listen_fpath: Optional[str],
+    n_jobs: int,
+    overwrite: bool,
+    dry_run: bool,
+    verbose: str,
+    task: str,
+    session: int,
+    derivative: str,
+    fname: Optional[str],
+) -> None:
+    """Build or update the LISTEN cohort evoked dataset."""
+    from ..studies.listen.evoked import build_evoked_dataset
+    from ..utils.logs import set_log_level
+
+    set_log_level(verbose.upper())
+    out = build_evoked_dataset(
+        fname,
+        subjects,
+        task=task,
+        session=session,
+        derivative=derivative,
+        listen_fpath=listen_fpath,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+    if dry_run:
+        _options.echo_todo(out, dry_run)
+    else:
+        click.echo(f"Evoked dataset written to {out}.")
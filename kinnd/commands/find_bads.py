@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import click
+
+from . import _options
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+
+@click.command(name="find-bads")
+@_options.task
+@_options.session
+@_options.sfreq
+@_options.processing_options
+def run(
+    subjects: Optional[list[str]],
+    listen_fpath: Optional[str],
+    n_jobs: int,
+    overwrite: bool,
+    dry_run: bool,
+    verbose: str,
+    task: Optional[str],
+    session: Optional[int],
+    sfreq: Optional[float],
+) -> None:
+    """Find the bad channels of the LISTEN BIDS recordings with PyPREP."""
+    from ..studies.listen.pipeline import find_bads_listen
+    from ..utils.logs import set_log_level
+
+    set_log_level(verbose.upper())
+    todo = find_bads_listen(
+        subjects,
+        task=task,
+        session=session,
+        listen_fpath=listen_fpath,
+        sfreq=sfreq,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+    _options.echo_todo(todo, dry_run)
@@ -2,13 +2,25 @@ from __future__ import annotations
 
 import click
 
+from .bench import run as bench
+from .bidsify import run as bidsify
+from .clean import run as clean
+from .evoked import run as evoked
+from .find_bads import run as find_bads
 from .sys_info import run as sys_info
 
 
-@click.group()
-def run() -> None:  # noqa: D401
+@click.group(invoke_without_command=True)
+@click.pass_context
+def run(ctx: click.Context) -> None:  # noqa: D401
     """Main package entry-point."""
-
+    if ctx.invoked_subcommand is None:
+        click.echo(ctx.get_help())
 
 
 run.add_command(sys_info)
+run.add_command(bench)
+run.add_command(bidsify)
+run.add_command(clean)
+run.add_command(find_bads)
+run.add_command(evoked)
@@ -0,0 +1,21 @@
+import json
+
+from click.testing import CliRunner
+
+from ..bench import run
+
+
+def test_bench(tmp_path):
+    """Test the benchmark entry-point."""
+    (tmp_path / "data.bin").write_bytes(b"0" * 2**16)
+    output = tmp_path / "report.json"
+    args = ["--no-compute", "-d", str(tmp_path), "--max-mb", "1", "-o", str(output)]
+    result = CliRunner().invoke(run, args)
+    assert result.exit_code == 0, result.output
+    with open(output, encoding="utf-8") as fid:
+        report = json.load(fid)
+    assert "compute" not in report
+    assert report["storage"][0]["directory"] == str(tmp_path)
+    result = CliRunner().invoke(run, ["--no-compute"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)["storage"] == []
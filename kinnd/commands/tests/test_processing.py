@@ -0,0 +1,116 @@
+import pytest
+from click.testing import CliRunner
+
+from ..bidsify import run as bidsify
+from ..clean import run as clean
+from ..evoked import run as evoked
+from ..find_bads import run as find_bads
+from ..main import run
+
+
+@pytest.fixture
+def listen_fpath(tmp_path):
+    """Create a LISTEN project directory with a list of recordings."""
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "eeg_list.csv").write_text(
+        "sourcefile,subject,session,task,bidsfile\n"
+        "/share/2001_phonemes.mff,2001,01,phonemes,\n"
+        "/share/2001_semantics.mff,2001,01,semantics,\n"
+        "/share/2002_phonemes.mff,2002,01,phonemes,\n"
+        "/share/2002_phonemes_2_.mff,2002,02,phonemes,\n"
+        "/share/2003_unknown.mff,2003,01,,\n"
+    )
+    # a recording already converted to BIDS
+    eeg = data / "bids" / "sub-2001" / "ses-01" / "eeg"
+    eeg.mkdir(parents=True)
+    (eeg / "sub-2001_ses-01_task-phonemes_eeg.edf").touch()
+    return tmp_path
+
+
+@pytest.mark.parametrize("command", ["bidsify", "clean", "find-bads", "evoked"])
+def test_help(command):
+    """Test the help of the processing commands."""
+    result = CliRunner().invoke(run, [command, "--help"])
+    assert result.exit_code == 0
+    for option in ("--jobs", "--subjects", "--dry-run", "--overwrite"):
+        assert option in result.output
+
+
+def test_bidsify_dry_run(listen_fpath):
+    """Test listing the recordings to convert to BIDS."""
+    runner = CliRunner()
+    args = ["--dry-run", "--listen-fpath", str(listen_fpath)]
+    result = runner.invoke(bidsify, args)
+    assert result.exit_code == 0, result.output
+    assert "Would process 3 item(s)." in result.output
+    assert "sub-2001_ses-01_task-phonemes" not in result.output
+    assert "sub-2001_ses-01_task-semantics" in result.output
+    assert "sub-2003" not in result.output
+
+    result = runner.invoke(bidsify, [*args, "--overwrite", "--task", "phonemes"])
+    assert result.exit_code == 0, result.output
+    assert "Would process 3 item(s)." in result.output
+    assert "sub-2001_ses-01_task-phonemes" in result.output
+
+    result = runner.invoke(
+        bidsify,
+        [
+            *args,
+            "-s",
+            "sub-2002",
+            "--session",
+            "2",
+            "--jobs",
+            "2",
+            "--max-memory",
+            "512",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Would process 1 item(s)." in result.output
+    assert "sub-2002_ses-02_task-phonemes" in result.output
+
+
+@pytest.mark.parametrize("command", [clean, find_bads])
+def test_pipeline_dry_run(listen_fpath, command):
+    """Test listing the recordings to clean or to find the bad channels of."""
+    args = ["--dry-run", "--listen-fpath", str(listen_fpath)]
+    result = CliRunner().invoke(command, [*args, "--subjects", "2001,2002"])
+    assert result.exit_code == 0, result.output
+    assert "Would process 4 item(s)." in result.output
+    result = CliRunner().invoke(command, [*args, "-s", "2001", "--task", "semantics"])
+    assert result.exit_code == 0, result.output
+    assert "Would process 1 item(s)." in result.output
+    assert "sub-2001_ses-01_task-semantics" in result.output
+    result = CliRunner().invoke(command, [*args, "--sfreq", "250"])
+    assert result.exit_code == 0, result.output
+    assert "Would process 4 item(s)." in result.output
+
+
+def test_evoked_dry_run(listen_fpath):
+    """Test listing the subjects to add to the evoked dataset."""
+    for subject in ("2001", "2002"):
+        ses = listen_fpath / "data" / "derivatives" / "pylossless" / f"sub-{subject}"
+        (ses / "ses-01").mkdir(parents=True)
+    args = ["--dry-run", "--listen-fpath", str(listen_fpath)]
+    result = CliRunner().invoke(evoked, args)
+    assert result.exit_code == 0, result.output
+    assert "Would process 2 item(s)." in result.output
+    result = CliRunner().invoke(evoked, [*args, "--subjects", "2002"])
+    assert result.exit_code == 0, result.output
+    assert "Would process 1 item(s)." in result.output
+    assert "sub-2002" in result.output
+
+
+def test_invalid_options(listen_fpath):
+    """Test that invalid options are rejected before any processing."""
+    runner = CliRunner()
+    result = runner.invoke(bidsify, ["--task", "unknown"])
+    assert result.exit_code == 2
+    result = runner.invoke(clean, ["--session", "3"])
+    assert result.exit_code == 2
+    result = runner.invoke(clean, ["--sfreq", "0"])
+    assert result.exit_code == 2
+    result = runner.invoke(evoked, ["--task", "resting"])
+    assert result.exit_code == 2
@@ -1,12 +1,9 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import pytest
 
 from .utils.logs import logger
 
-if TYPE_CHECKING:
-    import pytest
-
 
 def pytest_configure(config: pytest.Config) -> None:
     """Configure pytest options."""
@@ -19,3 +16,9 @@ def pytest_configure(config: pytest.Config) -> None:
             config.addinivalue_line("filterwarnings", warning_line)
     # setup logging
     logger.propagate = True
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path_factory, monkeypatch):
+    """Isolate the kinnd cache directory of the tests from the user's cache."""
+    monkeypatch.setenv("KINND_CACHE_DIR", str(tmp_path_factory.getbasetemp() / "cache"))
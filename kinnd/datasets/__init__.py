@@ -0,0 +1,17 @@
+"""Synthetic datasets, to develop and test without the lab share."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["synthetic"],
+    submod_attrs={
+        "synthetic": [
+            "make_listen_dataset",
+            "make_semantics_dataset",
+            "write_cleaned_listen",
+            "write_eeglab_semantics",
+            "write_mff_listen",
+        ],
+    },
+)
@@ -0,0 +1,823 @@
+"""Synthetic recordings of the Listen and Semantics studies.
+
+The recordings on the lab share can not leave it, which makes the development, the
+tests and the load tests of the readers depend on a mounted share. The functions of
+this module write recordings with the layout of the real ones, i.e. EGI MFF bundles
+of the HydroCel GSN 129 net with their ECI and DIN event tracks for the Listen study,
+and EEGLAB epochs for the Semantics study, on any machine. The signals are noise, an
+alpha rhythm and line noise, and carry no physiological meaning.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import os
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+from xml.etree import ElementTree
+
+import numpy as np
+from mffpy import Writer
+from mffpy.bin_writer import BinWriter
+
+from ..utils._checks import check_type, check_value, ensure_int, ensure_path
+from ..utils.logs import logger
+from ..utils.parallel import parallel_imap
+
+if TYPE_CHECKING:
+    from typing import Any, Optional, Union
+
+
+TASKS = ("phonemes", "semantics", "resting")
+_EVENT_NS = "http://www.egi.com/event_mff"
+_MONTAGE = "HydroCel GSN 128 1.0"
+_N_CHANNELS = 129
+_TIMEZONE = "US/Pacific"
+# naive, in US/Pacific time
+_MEAS_DATE = datetime.datetime(2023, 5, 1, 10, 0, 0)
+_BLOCK_DURATION = 10  # seconds, the duration of the blocks written by Net Station
+# codes and labels of the CELL definitions, and codes of the stimuli and of their DIN,
+# for each task
+_CELLS = {
+    "phonemes": ("Standard", "Deviant"),
+    "semantics": ("match", "mismatch"),
+    "resting": (),
+}
+_STIMULI = {
+    "phonemes": (("stm+", "DIN8", 0.0),),
+    "semantics": (("img+", "DIN6", 0.0), ("snd+", "DIN8", 1.0)),
+    "resting": (("rest", None, 0.0),),
+}
+_TRIAL_DURATION = {"phonemes": 0.6, "semantics": 3.0, "resting": 30.0}
+_DIN_DELAY = (0.010, 0.020)  # seconds, range of the delay of the DIN on the stimuli
+# annotations of the frequent and rare conditions of the cleaned derivatives, as
+# written by read_raw_listen, and the proportion of rare trials
+_CLEANED = {
+    "phonemes": ("tone_Standard", "tone_Deviant"),
+    "semantics": ("image_match", "image_mismatch"),
+}
+_RARE = 0.2
+_CLEANED_BADS = ["E125", "E126", "E127", "E128"]
+_DEFECTS = ("eci", "cells", "din", "gaps")
+
+
+def write_mff_listen(
+    fname: Union[str, Path],
+    *,
+    task: str = "phonemes",
+    duration: float = 60.0,
+    sfreq: int = 1000,
+    meas_date: Optional[datetime.datetime] = None,
+    eci: bool = True,
+    cells: bool = True,
+    din: bool = True,
+    gaps: Optional[list[tuple[float, float]]] = None,
+    seed: Optional[int] = None,
+    overwrite: bool = False,
+) -> Path:
+    """Write a synthetic Listen recording to an EGI MFF bundle.
+
+    Parameters
+    ----------
+    fname : path-like
+        The path to the ``.mff`` bundle, e.g. ``LISTEN_2001_phonemes_20230501.mff``.
+    task : str
+        The experimental task, one of ``"phonemes"``, ``"semantics"`` or
+        ``"resting"``, which sets the stimuli in the event tracks.
+    duration : float
+        The duration of the recorded signal in seconds.
+    sfreq : int
+        The sampling frequency in Hz.
+    meas_date : datetime | None
+        The start of the recording. A naive datetime is in US/Pacific time. If None,
+        defaults to the 1st of May 2023 at 10 AM.
+    eci : bool
+        If False, the ECI event track with the stimuli is not written, as in the
+        recordings whose connection to the stimulus computer failed.
+    cells : bool
+        If False, the CELL definitions of the conditions are missing from the ECI
+        event track, as in a few phonemes recordings.
+    din : bool
+        If False, the DIN event track of the StimTracker is not written.
+    gaps : list of tuple | None
+        The acquisition gaps, as ``(onset, duration)`` in seconds, with the onset on
+        the time axis of the recorded signal. The signal is paused during a gap while
+        the stimuli continue, thus the stimuli after a gap are shifted with respect to
+        the samples, as in the real recordings.
+    seed : int | None
+        The seed of the random generator.
+    overwrite : bool
+        If True, overwrite an existing bundle.
+
+    Returns
+    -------
+    fname : Path
+        The path to the ``.mff`` bundle.
+    """
+    fname = ensure_path(fname, must_exist=False)
+    if fname.suffix != ".mff":
+        raise ValueError(f"The MFF bundle must end with '.mff', got '{fname.name}'.")
+    check_value(task, TASKS, "task")
+    check_type(duration, ("numeric",), "duration")
+    sfreq = ensure_int(sfreq, "sfreq")
+    if duration <= 0 or sfreq <= 0:
+        raise ValueError("Arguments 'duration' and 'sfreq' must be strictly positive.")
+    meas_date = _check_meas_date(meas_date)
+    for value, name in ((eci, "eci"), (cells, "cells"), (din, "din")):
+        check_type(value, (bool,), name)
+    gaps = _check_gaps(gaps, duration)
+    check_type(seed, ("int-like", None), "seed")
+    check_type(overwrite, (bool,), "overwrite")
+    if fname.exists() and not overwrite:
+        raise FileExistsError(
+            f"The MFF bundle {fname} already exists. Set 'overwrite=True' to "
+            "overwrite it."
+        )
+    rng = np.random.default_rng(seed)
+
+    fname.parent.mkdir(parents=True, exist_ok=True)
+    writer = Writer(str(fname), overwrite=True)
+    writer.addxml("fileInfo", recordTime=meas_date)
+    binary = _StreamingBinWriter(fname.with_name(f".{fname.name}.bin"), sfreq)
+    try:
+        _write_signal(binary, duration, sfreq, gaps, rng)
+        writer.addbin(binary)
+        # replace the info1.xml written by addbin with the montage of the net
+        writer.addxml(
+            "dataInfo",
+            filename="info1.xml",
+            fileDataType="EEG",
+            dataTypeProps={"sensorLayoutName": _MONTAGE, "montageName": _MONTAGE},
+        )
+        writer.write()
+    finally:
+        binary.close()
+    wall_duration = duration + sum(gap for _, gap in gaps)
+    eci_events, din_events = _make_events(task, wall_duration, meas_date, rng)
+    if eci:
+        if not cells:
+            eci_events = [event for event in eci_events if event["code"] != "CELL"]
+        _write_event_track(
+            fname / "Events_ECI TCP-IP 55513.xml", eci_events, "ECI TCP-IP 55513"
+        )
+    if din and len(din_events) != 0:
+        _write_event_track(fname / "Events_DIN_1.xml", din_events, "DIN_1")
+    logger.debug("Wrote the synthetic %s recording %s.", task, fname)
+    return fname
+
+
+def write_eeglab_semantics(
+    fname: Union[str, Path],
+    *,
+    n_epochs: int = 100,
+    sfreq: float = 250.0,
+    tmin: float = -0.2,
+    tmax: float = 0.8,
+    n_bads: int = 3,
+    seed: Optional[int] = None,
+    overwrite: bool = False,
+) -> Path:
+    """Write synthetic Semantics epochs to an EEGLAB set file.
+
+    Parameters
+    ----------
+    fname : path-like
+        The path to the ``.set`` file. The stem must end with ``SnMa`` (match) or
+        ``SnMi`` (mismatch), e.g. ``1s17SnMa.set``, as for the real files.
+    n_epochs : int
+        The number of epochs.
+    sfreq : float
+        The sampling frequency in Hz.
+    tmin : float
+        The start of the epochs in seconds.
+    tmax : float
+        The end of the epochs in seconds.
+    n_bads : int
+        The number of epochs marked with a ``BAD+`` event.
+    seed : int | None
+        The seed of the random generator.
+    overwrite : bool
+        If True, overwrite an existing file.
+
+    Returns
+    -------
+    fname : Path
+        The path to the ``.set`` file.
+    """
+    from mne.channels import make_standard_montage
+    from scipy.io import savemat
+
+    fname = ensure_path(fname, must_exist=False)
+    if fname.suffix != ".set":
+        raise ValueError(f"The EEGLAB file must end with '.set', got '{fname.name}'.")
+    if fname.stem.endswith("SnMa"):
+        code = "mat+"
+    elif fname.stem.endswith("SnMi"):
+        code = "mis+"
+    else:
+        raise ValueError(
+            "The stem of the EEGLAB file must end with 'SnMa' or 'SnMi', got "
+            f"'{fname.stem}'."
+        )
+    n_epochs = ensure_int(n_epochs, "n_epochs")
+    n_bads = ensure_int(n_bads, "n_bads")
+    for value, name in ((sfreq, "sfreq"), (tmin, "tmin"), (tmax, "tmax")):
+        check_type(value, ("numeric",), name)
+    if n_epochs <= 0 or sfreq <= 0:
+        raise ValueError("Arguments 'n_epochs' and 'sfreq' must be strictly positive.")
+    if not 0 <= n_bads <= n_epochs:
+        raise ValueError(
+            f"Argument 'n_bads' must be between 0 and 'n_epochs', got {n_bads}."
+        )
+    if tmax <= tmin:
+        raise ValueError("Argument 'tmax' must be greater than 'tmin'.")
+    check_type(seed, ("int-like", None), "seed")
+    check_type(overwrite, (bool,), "overwrite")
+    if fname.exists() and not overwrite:
+        raise FileExistsError(
+            f"The EEGLAB file {fname} already exists. Set 'overwrite=True' to "
+            "overwrite it."
+        )
+    rng = np.random.default_rng(seed)
+
+    montage = make_standard_montage("GSN-HydroCel-129")
+    positions = montage.get_positions()["ch_pos"]
+    chanlocs = np.zeros(
+        len(montage.ch_names),
+        dtype=[("labels", object), ("X", float), ("Y", float), ("Z", float)],
+    )
+    for k, ch_name in enumerate(montage.ch_names):
+        chanlocs[k] = (ch_name, *(positions[ch_name] * 1e3))  # mm
+    n_times = int(round((tmax - tmin) * sfreq)) + 1
+    bads = set(rng.choice(n_epochs, n_bads, replace=False).tolist())
+    types = ["BAD+" if k in bads else code for k in range(n_epochs)]
+    event = np.zeros(
+        n_epochs, dtype=[("type", object), ("latency", float), ("epoch", float)]
+    )
+    epoch = np.zeros(
+        n_epochs,
+        dtype=[("event", float), ("eventtype", object), ("eventlatency", float)],
+    )
+    for k, type_ in enumerate(types):
+        # EEGLAB latencies are 1-indexed samples of the concatenated epochs
+        event[k] = (type_, k * n_times - tmin * sfreq + 1, k + 1)
+        epoch[k] = (k + 1, type_, 0.0)
+    times = tmin + np.arange(n_times) / sfreq
+    data = _make_signal(times, len(montage.ch_names), rng, n_epochs=n_epochs)
+    eeg = dict(
+        setname=fname.stem,
+        nbchan=float(len(montage.ch_names)),
+        trials=float(n_epochs),
+        pnts=float(n_times),
+        srate=float(sfreq),
+        xmin=float(tmin),
+        xmax=float(times[-1]),
+        data=data,
+        chanlocs=chanlocs,
+        event=event,
+        epoch=epoch,
+        icawinv=np.array([]),
+        icasphere=np.array([]),
+        icaweights=np.array([]),
+        times=np.array([]),
+        ref="common",
+    )
+    fname.parent.mkdir(parents=True, exist_ok=True)
+    savemat(fname, {"EEG": eeg}, appendmat=False, oned_as="row")
+    logger.debug("Wrote the synthetic Semantics epochs %s.", fname)
+    return fname
+
+
+def write_cleaned_listen(
+    listen_fpath: Union[str, Path],
+    subject: str,
+    *,
+    task: str = "phonemes",
+    session: int = 1,
+    duration: float = 60.0,
+    sfreq: float = 250.0,
+    seed: Optional[int] = None,
+    overwrite: bool = False,
+) -> Path:
+    """Write a synthetic cleaned Listen recording to the PyLossless derivative.
+
+    The recording is written to ``data/derivatives/pylossless``, as by
+    :func:`~kinnd.studies.listen.clean_listen_file`, thus it is read by the builders
+    of the cohort datasets, e.g. :func:`~kinnd.studies.listen.build_evoked_dataset`,
+    without running the BIDS conversion and the cleaning.
+
+    Parameters
+    ----------
+    listen_fpath : path-like
+        The directory of the synthetic LISTEN project.
+    subject : str
+        The subject ID, e.g. ``"2001"``.
+    task : str
+        The experimental task, ``"phonemes"`` or ``"semantics"``.
+    session : int
+        The session (visit), 1 or 2.
+    duration : float
+        The duration of the recording in seconds.
+    sfreq : float
+        The sampling frequency in Hz.
+    seed : int | None
+        The seed of the random generator.
+    overwrite : bool
+        If True, overwrite an existing recording.
+
+    Returns
+    -------
+    fname : Path
+        The path to the FIF file.
+
+    Notes
+    -----
+    The signal is white noise on the 129 channels of the HydroCel GSN, of which the
+    last 4 are marked as bad. The trials are annotated every 50 ms after the end of
+    the previous one from the first second, about 1 in 5 in the rare condition.
+    """
+    from mne import Annotations, create_info
+    from mne.io import RawArray
+
+    from ..preprocessing.montage import get_standard_montage
+
+    listen_fpath = ensure_path(listen_fpath, must_exist=False)
+    check_type(subject, (str,), "subject")
+    check_value(task, tuple(_CLEANED), "task")
+    check_value(session, (1, 2), "session")
+    check_type(duration, ("numeric",), "duration")
+    check_type(sfreq, ("numeric",), "sfreq")
+    if duration <= 1 or sfreq <= 0:
+        raise ValueError(
+            "Argument 'duration' must be longer than 1 second, and argument 'sfreq' "
+            "must be strictly positive."
+        )
+    check_type(seed, ("int-like", None), "seed")
+    check_type(overwrite, (bool,), "overwrite")
+    session = str(session).zfill(2)
+    fname = (
+        listen_fpath
+        / "data"
+        / "derivatives"
+        / "pylossless"
+        / f"sub-{subject}"
+        / f"ses-{session}"
+        / f"sub-{subject}_ses-{session}_task-{task}_desc-cleaned_eeg.fif"
+    )
+    if fname.exists() and not overwrite:
+        raise FileExistsError(
+            f"The recording {fname} already exists. Set 'overwrite=True' to "
+            "overwrite it."
+        )
+    rng = np.random.default_rng(seed)
+
+    montage = get_standard_montage("GSN-HydroCel-129")
+    info = create_info(montage.ch_names, sfreq, "eeg")
+    info.set_montage(montage)
+    info["bads"] = list(_CLEANED_BADS)
+    data = 1e-5 * rng.standard_normal((len(montage.ch_names), int(duration * sfreq)))
+    raw = RawArray(data, info, verbose=False)
+    onsets = np.arange(1.0, duration - 1, _TRIAL_DURATION[task] + 0.05)
+    frequent, rare = _CLEANED[task]
+    descriptions = np.where(rng.random(onsets.size) < _RARE, rare, frequent)
+    raw.set_annotations(Annotations(onsets, 0.1, descriptions))
+    fname.parent.mkdir(parents=True, exist_ok=True)
+    raw.save(fname, overwrite=True, verbose=False)
+    logger.debug("Wrote the synthetic cleaned %s recording %s.", task, fname)
+    return fname
+
+
+def make_listen_dataset(
+    root: Union[str, Path],
+    subjects: Union[int, list[str]] = 10,
+    *,
+    tasks: Union[str, list[str], tuple[str, ...]] = TASKS,
+    sessions: Union[int, list[int], tuple[int, ...]] = (1,),
+    duration: float = 60.0,
+    sfreq: int = 1000,
+    defects: Optional[dict[str, dict[str, Any]]] = None,
+    seed: Optional[int] = None,
+    n_jobs: int = 1,
+    overwrite: bool = False,
+) -> Path:
+    """Write a synthetic copy of the LISTEN project directory.
+
+    The recordings are written to ``Participant Files/<subject>`` and listed in
+    ``data/eeg_list.csv``, as on the lab share, thus the directory can be given as
+    ``listen_fpath`` to the functions of :mod:`kinnd.studies.listen`, e.g.
+    :func:`~kinnd.studies.listen.bidsify_listen`.
+
+    Parameters
+    ----------
+    root : path-like
+        The directory in which the synthetic LISTEN project is written.
+    subjects : int | list of str
+        The subject IDs, e.g. ``["2001", "2002"]``, or the number of subjects,
+        numbered from 2001.
+    tasks : str | list of str
+        The experimental tasks recorded for each subject.
+    sessions : int | list of int
+        The sessions (visits) recorded for each subject, 1 or 2.
+    duration : float
+        The duration of each recording in seconds.
+    sfreq : int
+        The sampling frequency in Hz.
+    defects : dict | None
+        The defects of the recordings of some subjects, as a mapping from the subject
+        ID to the defect arguments of :func:`write_mff_listen`, i.e. ``eci``,
+        ``cells``, ``din`` and ``gaps``, e.g. ``{"2003": dict(eci=False)}``.
+    seed : int | None
+        The seed of the random generator, from which the seed of each recording is
+        drawn.
+    n_jobs : int
+        The number of recordings written in parallel.
+    overwrite : bool
+        If True, overwrite the existing recordings. Else, they are kept.
+
+    Returns
+    -------
+    root : Path
+        The directory of the synthetic LISTEN project.
+    """
+    root = ensure_path(root, must_exist=False)
+    subjects = _check_subjects(subjects, start=2001)
+    tasks = _check_list(tasks, (str,), "tasks")
+    for task in tasks:
+        check_value(task, TASKS, "task")
+    sessions = _check_list(sessions, ("int-like",), "sessions")
+    for session in sessions:
+        check_value(session, (1, 2), "session")
+    defects = dict() if defects is None else defects
+    check_type(defects, (dict,), "defects")
+    for subject, kwargs in defects.items():
+        if str(subject) not in subjects:
+            raise ValueError(f"The subject {subject} with defects is not generated.")
+        for key in kwargs:
+            check_value(key, _DEFECTS, "defects")
+    defects = {str(subject): kwargs for subject, kwargs in defects.items()}
+    check_type(seed, ("int-like", None), "seed")
+    check_type(overwrite, (bool,), "overwrite")
+
+    recordings = [
+        (subject, session, task)
+        for subject in subjects
+        for session in sessions
+        for task in tasks
+    ]
+    seeds = np.random.default_rng(seed).integers(2**31, size=len(recordings))
+    items = list()
+    for (subject, session, task), seed_ in zip(recordings, seeds):
+        fname = root / "Participant Files" / subject / _mff_name(subject, session, task)
+        if fname.exists() and not overwrite:
+            logger.debug("Skipping %s, it exists.", fname)
+            continue
+        kwargs = dict(defects.get(subject, dict()))
+        kwargs.update(task=task, meas_date=_session_date(session), seed=int(seed_))
+        items.append((fname, kwargs))
+    logger.info("Writing %i / %i synthetic recordings.", len(items), len(recordings))
+    for _ in parallel_imap(
+        partial(_write_mff_item, duration=duration, sfreq=sfreq), items, n_jobs=n_jobs
+    ):
+        pass
+
+    # list the recordings as scripts/generate_listen_eeg_list.py does
+    (root / "data").mkdir(parents=True, exist_ok=True)
+    with open(root / "data" / "eeg_list.csv", "w", newline="") as fid:
+        writer = csv.writer(fid)
+        writer.writerow(["sourcefile", "subject", "session", "task", "bidsfile"])
+        for subject, session, task in sorted(recordings):
+            session = str(session).zfill(2)
+            basename = f"sub-{subject}_ses-{session}_task-{task}"
+            writer.writerow(
+                [
+                    root
+                    / "Participant Files"
+                    / subject
+                    / _mff_name(subject, int(session), task),
+                    subject,
+                    session,
+                    task,
+                    root
+                    / "data"
+                    / "bids"
+                    / f"sub-{subject}"
+                    / f"ses-{session}"
+                    / "eeg"
+                    / f"{basename}_eeg.edf",
+                ]
+            )
+    return root
+
+
+def make_semantics_dataset(
+    directory: Union[str, Path],
+    subjects: Union[int, list[str]] = 10,
+    *,
+    n_epochs: int = 100,
+    sfreq: float = 250.0,
+    seed: Optional[int] = None,
+    n_jobs: int = 1,
+    overwrite: bool = False,
+) -> Path:
+    """Write a synthetic copy of the epoched Semantics data.
+
+    The match and mismatch epochs of each subject are written to
+    ``<subject>s17SnMa.set`` and ``<subject>s17SnMi.set``, as on the lab share, thus
+    the directory can be given to :func:`~kinnd.studies.semantics.get_semantics_fpaths`.
+
+    Parameters
+    ----------
+    directory : path-like
+        The directory in which the EEGLAB files are written.
+    subjects : int | list of str
+        The subject IDs, e.g. ``["1", "2"]``, or the number of subjects, numbered
+        from 1.
+    n_epochs : int
+        The number of epochs per condition.
+    sfreq : float
+        The sampling frequency in Hz.
+    seed : int | None
+        The seed of the random generator, from which the seed of each file is drawn.
+    n_jobs : int
+        The number of files written in parallel.
+    overwrite : bool
+        If True, overwrite the existing files. Else, they are kept.
+
+    Returns
+    -------
+    directory : Path
+        The directory of the EEGLAB files.
+    """
+    directory = ensure_path(directory, must_exist=False)
+    subjects = _check_subjects(subjects, start=1)
+    check_type(seed, ("int-like", None), "seed")
+    check_type(overwrite, (bool,), "overwrite")
+    fnames = [
+        directory / f"{subject}s17{condition}.set"
+        for subject in subjects
+        for condition in ("SnMa", "SnMi")
+    ]
+    seeds = np.random.default_rng(seed).integers(2**31, size=len(fnames))
+    items = [
+        (fname, int(seed_))
+        for fname, seed_ in zip(fnames, seeds)
+        if overwrite or not fname.exists()
+    ]
+    logger.info("Writing %i / %i synthetic EEGLAB files.", len(items), len(fnames))
+    for _ in parallel_imap(
+        partial(_write_eeglab_item, n_epochs=n_epochs, sfreq=sfreq),
+        items,
+        n_jobs=n_jobs,
+    ):
+        pass
+    return directory
+
+
+class _StreamingBinWriter(BinWriter):
+    """Stream the signal blocks of an MFF bundle to a temporary file.
+
+    :class:`mffpy.bin_writer.BinWriter` holds the signal in memory until the bundle
+    is written, i.e. 1.9 GB for an hour of 129 channels at 1 kHz. This writer
+    streams the blocks to a temporary file, moved into the bundle when it is written.
+    """
+
+    def __init__(self, fname: Path, sfreq: int):
+        super().__init__(sampling_rate=sfreq, data_type="EEG")
+        self.fname = fname
+        self.stream = open(fname, "w+b")  # noqa: SIM115
+
+    def write(self, filename: str, *args, **kwargs) -> None:
+        """Move the signal into the bundle."""
+        self.stream.close()
+        os.replace(self.fname, filename)
+
+    def close(self) -> None:
+        """Close and remove the temporary file, if it was not moved."""
+        self.stream.close()
+        self.fname.unlink(missing_ok=True)
+
+
+def _write_signal(binary, duration, sfreq, gaps, rng) -> None:
+    """Write the signal in blocks, with a break at each acquisition gap."""
+    n_times = int(round(duration * sfreq))
+    breaks = {int(round(onset * sfreq)): gap for onset, gap in gaps}
+    block = _BLOCK_DURATION * sfreq
+    start, wall_offset, offset_us = 0, 0.0, None
+    while start < n_times:
+        stop = min(start + block, n_times)
+        # blocks end at the next break, which starts a new block
+        stop = min([stop] + [onset for onset in breaks if start < onset < stop])
+        times = wall_offset + np.arange(start, stop) / sfreq
+        binary.add_block(_make_signal(times, _N_CHANNELS, rng), offset_us=offset_us)
+        offset_us = None
+        if stop in breaks:
+            offset_us = int(round(breaks[stop] * 1e6))
+            wall_offset += breaks[stop]
+        start = stop
+
+
+def _make_signal(
+    times: np.ndarray, n_channels: int, rng: np.random.Generator, n_epochs: int = 0
+) -> np.ndarray:
+    """Make a signal in µV: noise, an alpha rhythm and line noise.
+
+    The signal is of shape (n_channels, n_times), or (n_channels, n_times, n_epochs).
+    """
+    # the amplitude and phase of the rhythms are fixed per channel across blocks
+    channels = np.arange(n_channels)[:, np.newaxis]
+    alpha = (
+        5
+        * (1 + np.sin(channels / n_channels * np.pi))
+        * np.sin(2 * np.pi * 10 * times + channels)
+    )
+    line = 2 * np.sin(2 * np.pi * 60 * times)
+    shape = (
+        (n_channels, times.size)
+        if n_epochs == 0
+        else (n_channels, times.size, n_epochs)
+    )
+    signal = 10 * rng.standard_normal(shape, dtype=np.float32)
+    rhythms = (alpha + line).astype(np.float32)
+    signal += rhythms if n_epochs == 0 else rhythms[..., np.newaxis]
+    return signal
+
+
+def _make_events(
+    task: str,
+    duration: float,
+    meas_date: datetime.datetime,
+    rng: np.random.Generator,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Make the events of the ECI and DIN tracks over a recording."""
+    eci = [_event(meas_date, "SESS"), _event(meas_date, "bgin")]
+    eci += [
+        _event(meas_date, "CELL", label=label, cel=k)
+        for k, label in enumerate(_CELLS[task], start=1)
+    ]
+    din = list()
+    trial_duration = _TRIAL_DURATION[task]
+    n_trials = max(int((duration - 1) // (trial_duration * 1.1)), 0)
+    onsets = 1 + np.cumsum(
+        trial_duration + rng.uniform(0, 0.1 * trial_duration, n_trials)
+    )
+    onsets = onsets[onsets < duration - trial_duration]
+    # 20 % of deviants in the phonemes task, as many matches and mismatches in the
+    # semantics task
+    p = 0.2 if task == "phonemes" else 0.5
+    conditions = 1 + (rng.random(onsets.size) < p)
+    delays = rng.uniform(*_DIN_DELAY, size=(onsets.size, len(_STIMULI[task])))
+    for onset, cel, delay in zip(onsets, conditions, delays):
+        for (code, din_code, latency), delay_ in zip(_STIMULI[task], delay):
+            time = meas_date + datetime.timedelta(seconds=float(onset + latency))
+            if len(_CELLS[task]) == 0:
+                eci.append(_event(time, code, duration=100))
+            else:
+                eci.append(_event(time, code, duration=100, cel=int(cel)))
+            if din_code is not None:
+                time += datetime.timedelta(seconds=float(delay_))
+                din.append(_event(time, din_code, duration=1))
+        if task != "resting":
+            time = meas_date + datetime.timedelta(seconds=float(onset + trial_duration))
+            eci.append(_event(time, "TRSP"))
+    return eci, din
+
+
+def _event(
+    time: datetime.datetime,
+    code: str,
+    *,
+    duration: int = 0,
+    label: Optional[str] = None,
+    cel: Optional[int] = None,
+) -> dict[str, Any]:
+    """Make an event, with its duration in ms and its condition."""
+    keys = dict() if cel is None else {"cel#": cel}
+    return dict(
+        beginTime=time, duration=duration, code=code, label=label or code, keys=keys
+    )
+
+
+def _write_event_track(fname: Path, events: list[dict[str, Any]], name: str) -> None:
+    """Write an event track of an MFF bundle, with the keys of the events."""
+    ElementTree.register_namespace("", _EVENT_NS)
+    root = ElementTree.Element(f"{{{_EVENT_NS}}}eventTrack")
+    ElementTree.SubElement(root, f"{{{_EVENT_NS}}}name").text = name
+    ElementTree.SubElement(root, f"{{{_EVENT_NS}}}trackType").text = "EVNT"
+    for event in events:
+        element = ElementTree.SubElement(root, f"{{{_EVENT_NS}}}event")
+        ElementTree.SubElement(
+            element, f"{{{_EVENT_NS}}}beginTime"
+        ).text = _format_time(event["beginTime"])
+        for key in ("duration", "code", "label"):
+            ElementTree.SubElement(element, f"{{{_EVENT_NS}}}{key}").text = str(
+                event[key]
+            )
+        keys = ElementTree.SubElement(element, f"{{{_EVENT_NS}}}keys")
+        for code, value in event["keys"].items():
+            key = ElementTree.SubElement(keys, f"{{{_EVENT_NS}}}key")
+            ElementTree.SubElement(key, f"{{{_EVENT_NS}}}keyCode").text = code
+            data = ElementTree.SubElement(key, f"{{{_EVENT_NS}}}data", dataType="short")
+            data.text = str(value)
+    ElementTree.ElementTree(root).write(fname, encoding="UTF-8", xml_declaration=True)
+
+
+def _format_time(time: datetime.datetime) -> str:
+    """Format a time as in the MFF event tracks, e.g. 2023-05-01T10:00:00.0-07:00."""
+    time = time.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+    return f"{time[:-2]}:{time[-2:]}"
+
+
+def _mff_name(subject: str, session: int, task: str) -> str:
+    """Name a recording as on the lab share, with '_2_' for the second session."""
+    date = _session_date(session).strftime("%Y%m%d")
+    visit = "_2" if session == 2 else ""
+    return f"LISTEN_{subject}{visit}_{task}_{date}.mff"
+
+
+def _session_date(session: int) -> datetime.datetime:
+    """Start the second session a week after the first one."""
+    return _MEAS_DATE + datetime.timedelta(days=7 * (session - 1))
+
+
+def _write_mff_item(item, *, duration, sfreq) -> Path:
+    """Write a recording given as (fname, kwargs), in a worker process."""
+    fname, kwargs = item
+    return write_mff_listen(
+        fname, duration=duration, sfreq=sfreq, overwrite=True, **kwargs
+    )
+
+
+def _write_eeglab_item(item, *, n_epochs, sfreq) -> Path:
+    """Write an EEGLAB file given as (fname, seed), in a worker process."""
+    fname, seed = item
+    return write_eeglab_semantics(
+        fname, n_epochs=n_epochs, sfreq=sfreq, seed=seed, overwrite=True
+    )
+
+
+def _check_meas_date(meas_date: Optional[datetime.datetime]) -> datetime.datetime:
+    """Check the start of a recording, in US/Pacific time."""
+    import pytz
+
+    check_type(meas_date, (datetime.datetime, None), "meas_date")
+    timezone = pytz.timezone(_TIMEZONE)
+    meas_date = _MEAS_DATE if meas_date is None else meas_date
+    if meas_date.tzinfo is None:
+        return timezone.localize(meas_date)
+    return meas_date.astimezone(timezone)
+
+
+def _check_gaps(
+    gaps: Optional[list[tuple[float, float]]], duration: float
+) -> list[tuple[float, float]]:
+    """Check the acquisition gaps, as (onset, duration) within the recording."""
+    check_type(gaps, (list, tuple, None), "gaps")
+    if gaps is None:
+        return []
+    checked = list()
+    for gap in gaps:
+        check_type(gap, (list, tuple), "gap")
+        if len(gap) != 2:
+            raise ValueError(f"A gap must be an (onset, duration) pair, got {gap}.")
+        onset, gap_duration = gap
+        check_type(onset, ("numeric",), "onset")
+        check_type(gap_duration, ("numeric",), "duration")
+        if not 0 < onset < duration or gap_duration <= 0:
+            raise ValueError(
+                "The gaps must start within the recording and last a strictly positive "
+                f"duration, got {gap}."
+            )
+        checked.append((float(onset), float(gap_duration)))
+    return sorted(checked)
+
+
+def _check_subjects(subjects: Union[int, list[str]], *, start: int) -> list[str]:
+    """Check the subject IDs, or number them from start."""
+    check_type(subjects, ("int-like", list, tuple), "subjects")
+    if not isinstance(subjects, (list, tuple)):
+        n_subjects = ensure_int(subjects, "subjects")
+        if n_subjects <= 0:
+            raise ValueError(
+                f"The number of subjects must be strictly positive, got {n_subjects}."
+            )
+        return [str(start + k) for k in range(n_subjects)]
+    subjects = [str(subject).removeprefix("sub-") for subject in subjects]
+    if len(subjects) == 0 or len(set(subjects)) != len(subjects):
+        raise ValueError("Argument 'subjects' must be a non-empty list of unique IDs.")
+    return subjects
+
+
+def _check_list(items, types, name) -> list:
+    """Check a single item or a list of items."""
+    if isinstance(items, (list, tuple)):
+        for item in items:
+            check_type(item, types, name)
+        items = list(items)
+    else:
+        check_type(items, types, name)
+        items = [items]
+    if len(items) == 0:
+        raise ValueError(f"Argument '{name}' must not be empty.")
+    return items
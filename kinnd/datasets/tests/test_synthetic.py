@@ -0,0 +1,192 @@
+from pathlib import Path
+
+import mffpy
+import mne
+import numpy as np
+import pytest
+
+from ...studies.listen.bids import read_listen_recordings
+from ...studies.listen.io import read_raw_listen
+from ...studies.semantics.io import read_epochs_semantics
+from ...utils.paths import get_listen_fpaths, get_semantics_fpaths
+from ..synthetic import (
+    make_listen_dataset,
+    make_semantics_dataset,
+    write_cleaned_listen,
+    write_eeglab_semantics,
+    write_mff_listen,
+)
+
+
+@pytest.mark.parametrize(
+    ("task", "event_mapping", "descriptions"),
+    [
+        ("phonemes", {"stm+": "tone"}, {"tone_Standard", "tone_Deviant", "DIN8"}),
+        (
+            "semantics",
+            {"img+": "image", "snd+": "word"},
+            {
+                "image_match",
+                "image_mismatch",
+                "word_match",
+                "word_mismatch",
+                "DIN6",
+                "DIN8",
+            },
+        ),
+        ("resting", None, {"rest"}),
+    ],
+)
+def test_write_mff_listen(tmp_path, task, event_mapping, descriptions):
+    """Test that the synthetic MFF recordings are read by read_raw_listen."""
+    fname = write_mff_listen(
+        tmp_path / f"LISTEN_2001_{task}.mff",
+        task=task,
+        duration=65,
+        sfreq=250,
+        seed=0,
+    )
+    raw = read_raw_listen(fname, event_mapping=event_mapping)
+    assert len(raw.ch_names) == 129
+    assert raw.info["sfreq"] == 250
+    assert raw.n_times == 65 * 250
+    assert raw.get_montage() is not None
+    assert raw.info["meas_date"].hour == 17  # 10 AM in US/Pacific daylight time
+    assert set(raw.annotations.description) == descriptions
+    # the stimuli are within the recording, and the DIN follow them
+    assert 0 < raw.annotations.onset.min()
+    assert raw.annotations.onset.max() < 65
+    # the signals are in µV in the bundle
+    assert 1e-6 < np.std(raw.get_data()) < 1e-4
+
+    # the same seed gives the same recording
+    fname2 = write_mff_listen(
+        tmp_path / f"LISTEN_2002_{task}.mff", task=task, duration=65, sfreq=250, seed=0
+    )
+    raw2 = read_raw_listen(fname2, event_mapping=event_mapping)
+    np.testing.assert_array_equal(raw.get_data(), raw2.get_data())
+    with pytest.raises(FileExistsError, match="already exists"):
+        write_mff_listen(fname, task=task, duration=5)
+
+
+def test_write_mff_listen_defects(tmp_path):
+    """Test the defects of the synthetic MFF recordings."""
+    fname = write_mff_listen(tmp_path / "no_eci.mff", duration=10, eci=False)
+    assert not (fname / "Events_ECI TCP-IP 55513.xml").exists()
+    with pytest.raises(AssertionError):
+        read_raw_listen(fname)  # the ECI track is required
+    fname = write_mff_listen(tmp_path / "no_cells.mff", duration=10, cells=False)
+    with pytest.raises(KeyError):
+        read_raw_listen(fname, event_mapping={"stm+": "tone"})
+    raw = read_raw_listen(
+        fname,
+        event_mapping={"stm+": "tone"},
+        condition_mapping={1: "Standard", 2: "Deviant"},
+    )
+    assert "tone_Standard" in raw.annotations.description
+    fname = write_mff_listen(tmp_path / "no_din.mff", duration=10, din=False)
+    assert not (fname / "Events_DIN_1.xml").exists()
+
+    # an acquisition gap starts a new epoch in the bundle
+    fname = write_mff_listen(
+        tmp_path / "gaps.mff", duration=30, sfreq=100, gaps=[(12.5, 4)]
+    )
+    epochs = mffpy.Reader(str(fname)).epochs
+    assert len(epochs) == 2
+    assert epochs[0].t0 == 0
+    assert epochs[0].dt == pytest.approx(12.5)
+    assert epochs[1].t0 == pytest.approx(16.5)
+    assert epochs[1].dt == pytest.approx(17.5)
+    with pytest.raises(ValueError, match="within the recording"):
+        write_mff_listen(tmp_path / "invalid.mff", duration=10, gaps=[(12, 1)])
+
+
+def test_write_eeglab_semantics(tmp_path):
+    """Test that the synthetic EEGLAB files are read by read_epochs_semantics."""
+    for condition, seed in (("SnMa", 0), ("SnMi", 1)):
+        write_eeglab_semantics(
+            tmp_path / f"1s17{condition}.set", n_epochs=20, n_bads=2, seed=seed
+        )
+    fpaths = get_semantics_fpaths(tmp_path)
+    assert list(fpaths) == ["sub-01"]
+    epochs = read_epochs_semantics(fpaths, "sub-01", verbose="ERROR")
+    assert len(epochs) == 36
+    assert set(epochs.event_id) == {"match", "mismatch", "BAD+"}
+    assert len(epochs.ch_names) == 129
+    assert epochs.times[0] == pytest.approx(-0.2)
+    assert epochs.times[-1] == pytest.approx(0.8)
+    with pytest.raises(ValueError, match="must end with 'SnMa' or 'SnMi'"):
+        write_eeglab_semantics(tmp_path / "1s17.set")
+
+
+def test_write_cleaned_listen(tmp_path):
+    """Test the synthetic cleaned recordings of the LISTEN derivative."""
+    fname = write_cleaned_listen(tmp_path, "2001", duration=30, sfreq=100, seed=0)
+    assert fname == (
+        tmp_path
+        / "data"
+        / "derivatives"
+        / "pylossless"
+        / "sub-2001"
+        / "ses-01"
+        / "sub-2001_ses-01_task-phonemes_desc-cleaned_eeg.fif"
+    )
+    raw = mne.io.read_raw_fif(fname, verbose=False)
+    assert len(raw.ch_names) == 129
+    assert raw.info["sfreq"] == 100
+    assert raw.info["bads"] == ["E125", "E126", "E127", "E128"]
+    assert raw.get_montage() is not None
+    assert set(raw.annotations.description) == {"tone_Standard", "tone_Deviant"}
+    assert 1 <= raw.annotations.onset.min()
+    assert raw.annotations.onset.max() < 29
+    with pytest.raises(FileExistsError, match="already exists"):
+        write_cleaned_listen(tmp_path, "2001", duration=30)
+    fname = write_cleaned_listen(
+        tmp_path, "2001", task="semantics", duration=30, sfreq=100, seed=0
+    )
+    raw = mne.io.read_raw_fif(fname, verbose=False)
+    assert set(raw.annotations.description) <= {"image_match", "image_mismatch"}
+    with pytest.raises(ValueError, match="Invalid value"):
+        write_cleaned_listen(tmp_path, "2001", task="resting")
+
+
+def test_make_listen_dataset(tmp_path):
+    """Test the synthetic copy of the LISTEN project directory."""
+    root = make_listen_dataset(
+        tmp_path,
+        3,
+        tasks=["phonemes", "resting"],
+        sessions=[1, 2],
+        duration=5,
+        sfreq=100,
+        defects={"2002": dict(eci=False)},
+        seed=0,
+    )
+    recordings = read_listen_recordings(listen_fpath=root)
+    assert len(recordings) == 12
+    assert recordings[0][:3] == ("2001", "01", "phonemes")
+    assert all(Path(sourcefile).exists() for *_, sourcefile in recordings)
+    fpaths = get_listen_fpaths(root)
+    assert sorted(fpaths) == ["sub-2001", "sub-2002", "sub-2003"]
+    assert sorted(fpaths["sub-2001"]) == ["phonemes", "resting"]
+    assert not any(
+        (Path(sourcefile) / "Events_ECI TCP-IP 55513.xml").exists()
+        for subject, *_, sourcefile in recordings
+        if subject == "2002"
+    )
+    # existing recordings are kept
+    mtime = Path(recordings[0][3]).stat().st_mtime_ns
+    make_listen_dataset(tmp_path, 3, tasks=["phonemes"], duration=5, sfreq=100)
+    assert Path(recordings[0][3]).stat().st_mtime_ns == mtime
+    with pytest.raises(ValueError, match="with defects is not generated"):
+        make_listen_dataset(tmp_path, 1, defects={"2002": dict(eci=False)})
+    with pytest.raises(ValueError, match="Invalid value"):
+        make_listen_dataset(tmp_path, 1, defects={"2001": dict(task="x")})
+
+
+def test_make_semantics_dataset(tmp_path):
+    """Test the synthetic copy of the epoched Semantics data."""
+    directory = make_semantics_dataset(tmp_path, ["1", "12"], n_epochs=10, seed=0)
+    fpaths = get_semantics_fpaths(directory)
+    assert sorted(fpaths) == ["sub-01", "sub-12"]
+    assert sorted(fpaths["sub-12"]) == ["match", "mismatch"]
@@ -0,0 +1,19 @@
+"""Input/output of cohort derivatives."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["fif", "inventory", "store"],
+    submod_attrs={
+        "fif": ["get_data", "save_fif"],
+        "inventory": ["read_header", "read_inventory"],
+        "store": [
+            "get_encoding",
+            "open_dataset",
+            "open_store",
+            "save_dataset",
+            "update_store",
+        ],
+    },
+)
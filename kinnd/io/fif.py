@@ -0,0 +1,140 @@
+"""Single precision input/output of raw, epochs and evoked data.
+
+EEG signals carry far fewer significant digits than a single precision float, thus
+the derivatives are written in single precision, and the arrays computed from them
+by kinnd, e.g. the spectra, are kept in single precision. MNE objects hold their data
+in double precision, required by MNE to filter or average; the helpers below copy
+them chunk by chunk into single precision arrays, without a double precision copy of
+the whole data.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..utils._checks import check_type, check_value, ensure_path
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Optional, Union
+
+    from mne import Evoked
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+
+
+def save_fif(
+    inst: Union[BaseRaw, BaseEpochs, Evoked],
+    fname: Union[str, Path],
+    *,
+    precision: str = "single",
+    overwrite: bool = False,
+) -> Path:
+    """Save raw, epochs or evoked data to a FIF file.
+
+    Parameters
+    ----------
+    inst : mne.io.Raw | mne.Epochs | mne.Evoked
+        The data to save.
+    fname : str | pathlib.Path
+        The path to the FIF file, following the MNE naming conventions, e.g.
+        ``sub-2001_desc-cleaned_eeg.fif``.
+    precision : str
+        The precision of the samples, ``"single"`` or ``"double"``. Evoked data are
+        always written in single precision.
+    overwrite : bool
+        If True, overwrite an existing file.
+
+    Returns
+    -------
+    fname : pathlib.Path
+        The path to the FIF file.
+    """
+    from mne import Evoked
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+
+    check_type(inst, (BaseRaw, BaseEpochs, Evoked), "inst")
+    check_value(precision, ("single", "double"), "precision")
+    fname = ensure_path(fname, must_exist=False)
+    if isinstance(inst, Evoked):
+        if precision != "single":
+            raise ValueError("Evoked data can only be written in single precision.")
+        inst.save(fname, overwrite=overwrite)
+    else:
+        inst.save(fname, fmt=precision, overwrite=overwrite)
+    return fname
+
+
+def get_data(
+    inst: Union[BaseRaw, BaseEpochs, Evoked],
+    *,
+    picks: Optional[Union[str, list[str]]] = None,
+    dtype: str = "float32",
+    chunk_duration: float = 10.0,
+) -> np.ndarray:
+    """Get the samples of raw, epochs or evoked data in a given precision.
+
+    Parameters
+    ----------
+    inst : mne.io.Raw | mne.Epochs | mne.Evoked
+        The data. Raw data and epochs do not need to be preloaded: they are then read
+        chunk by chunk. The bad epochs are dropped in place.
+    picks : str | list of str | None
+        The channels to get, as accepted by :meth:`mne.io.Raw.get_data`.
+    dtype : str
+        The floating point type of the samples, ``"float32"`` or ``"float64"``.
+    chunk_duration : float
+        The duration of the chunks copied at once, in seconds. For epochs, chunks are
+        groups of epochs of approximately this total duration.
+
+    Returns
+    -------
+    data : array
+        The samples, of shape ``(n_channels, n_times)`` for raw and evoked data and
+        ``(n_epochs, n_channels, n_times)`` for epochs.
+    """
+    from mne import Evoked
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+
+    check_type(inst, (BaseRaw, BaseEpochs, Evoked), "inst")
+    check_value(dtype, ("float32", "float64"), "dtype")
+    check_type(chunk_duration, ("numeric",), "chunk_duration")
+    if chunk_duration <= 0:
+        raise ValueError("Argument 'chunk_duration' must be strictly positive.")
+    if isinstance(inst, Evoked):
+        return inst.get_data(picks=picks).astype(dtype, copy=False)
+    n_chunk = max(int(round(chunk_duration * inst.info["sfreq"])), 1)
+    if isinstance(inst, BaseRaw):
+        n_times = inst.n_times
+        chunks = (
+            dict(start=start, stop=min(start + n_chunk, n_times))
+            for start in range(0, n_times, n_chunk)
+        )
+        axis, length = 1, n_times
+    else:
+        inst.drop_bad()  # the number of epochs is only known once they are dropped
+        n_epochs = max(n_chunk // len(inst.times), 1)
+        length = len(inst)
+        chunks = (
+            dict(item=slice(start, start + n_epochs))
+            for start in range(0, length, n_epochs)
+        )
+        axis = 0
+    data, position = None, 0
+    for chunk in chunks:
+        block = inst.get_data(picks=picks, **chunk)
+        if data is None:
+            shape = list(block.shape)
+            shape[axis] = length
+            data = np.empty(shape, dtype=dtype)
+        index = [slice(None)] * data.ndim
+        index[axis] = slice(position, position + block.shape[axis])
+        data[tuple(index)] = block
+        position += block.shape[axis]
+    if data is None:  # no epoch
+        return inst.get_data(picks=picks).astype(dtype, copy=False)
+    return data
@@ -0,0 +1,298 @@
+"""Inventory of a cohort from the headers of its files.
+
+Screening subjects for inclusion only requires the measurement info, the events and
+the drop log of each file, never its samples. FIF files are opened without preloading,
+which only reads the tag directory and the header tags, and BIDS recordings are read
+from their ``events.tsv``, ``channels.tsv`` and ``eeg.json`` sidecars. The record of
+each file is cached with the size and modification time of the file.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from functools import partial
+from hashlib import sha1
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..utils._checks import check_type, ensure_path
+from ..utils._imports import import_optional_dependency
+from ..utils._lru import DiskLRU
+from ..utils.logs import logger, warn
+from ..utils.parallel import parallel_imap
+from ..utils.paths import get_cache_dir
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any, Optional, Union
+
+    from pandas import DataFrame
+
+
+# bump to invalidate the records cached by a previous version of the readers
+_CACHE_VERSION = "1"
+_MAX_DISK_SIZE = 16 * 2**20  # bytes
+# annotations which are not trials, e.g. segments marked by the pipelines
+_IGNORED = re.compile(r"^(bad|edge|boundary)", re.IGNORECASE)
+
+
+def read_header(
+    fname: Union[str, Path],
+    *,
+    conditions: Optional[Union[list[str], dict[str, str]]] = None,
+) -> dict[str, Any]:
+    """Read the inventory record of a file without loading its samples.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to an epochs FIF file (``*epo.fif``), a raw FIF file, or the
+        ``*_events.tsv`` file of a BIDS recording.
+    conditions : list of str | dict | None
+        The conditions to count. A list selects the event names, and a mapping renames
+        them, e.g. ``{"image_match": "match"}``. If None, every event name is counted,
+        except the annotations of bad segments and edges.
+
+    Returns
+    -------
+    record : dict
+        The record, with the keys ``fname``, ``kind`` (``"epochs"``, ``"raw"`` or
+        ``"bids"``), ``sfreq``, ``n_channels``, ``bads``, ``n_bads``, ``duration`` in
+        seconds, ``n_dropped`` (the epochs rejected, for epochs files) and ``n_trials``,
+        the mapping from condition to trial count.
+    """
+    fname = ensure_path(fname, must_exist=True)
+    check_type(conditions, (list, tuple, dict, None), "conditions")
+    name = fname.name
+    if name.endswith("_events.tsv"):
+        record = _read_bids(fname)
+    elif name.endswith(("epo.fif", "epo.fif.gz")):
+        record = _read_epochs(fname)
+    elif name.endswith((".fif", ".fif.gz")):
+        record = _read_raw(fname)
+    else:
+        raise ValueError(
+            f"Unsupported file {name}, expected a FIF file or a BIDS events.tsv file."
+        )
+    labels = record.pop("labels")
+    if conditions is None:
+        names = sorted(set(label for label in labels if not _IGNORED.match(label)))
+        conditions = dict(zip(names, names))
+    elif not isinstance(conditions, dict):
+        conditions = dict(zip(conditions, conditions))
+    counts = dict.fromkeys(conditions.values(), 0)
+    for label in labels:
+        if label in conditions:
+            counts[conditions[label]] += 1
+    record["n_trials"] = counts
+    record["fname"] = str(fname)
+    record["n_bads"] = len(record["bads"])
+    return record
+
+
+def read_inventory(
+    fnames: Union[Iterable[Union[str, Path]], dict[str, Union[str, Path]]],
+    *,
+    conditions: Optional[Union[list[str], dict[str, str]]] = None,
+    n_jobs: Optional[int] = 1,
+    cache: bool = True,
+) -> DataFrame:
+    """Read the inventory of a cohort from the headers of its files.
+
+    Parameters
+    ----------
+    fnames : list of path-like | dict
+        The files, see :func:`read_header`, or a mapping from subject to file. For a
+        list, the subject is read from the ``sub-`` entity of the file name.
+    conditions : list of str | dict | None
+        The conditions to count, see :func:`read_header`.
+    n_jobs : int | None
+        The number of files read in parallel.
+    cache : bool
+        If True, the records are cached in the ``inventory`` folder of the kinnd cache
+        directory (``KINND_CACHE_DIR``, defaults to ``~/.cache/kinnd``), and a file is
+        only read again if its size or modification time changed.
+
+    Returns
+    -------
+    inventory : pandas.DataFrame
+        One row per subject, indexed by ``subject``, with the columns ``n_<condition>``
+        for the number of trials of each condition, ``n_bads``, ``bads`` (comma
+        separated), ``duration`` in seconds, ``sfreq``, ``n_channels``, ``n_dropped``,
+        ``kind`` and ``fname``.
+    """
+    pd = import_optional_dependency("pandas")
+
+    check_type(fnames, (list, tuple, dict, "path-like"), "fnames")
+    check_type(cache, (bool,), "cache")
+    if not isinstance(fnames, dict):
+        fnames = [fnames] if isinstance(fnames, (str, Path)) else list(fnames)
+        fnames = {_get_subject(fname): fname for fname in fnames}
+    fnames = {
+        str(subject): ensure_path(fname, must_exist=True)
+        for subject, fname in fnames.items()
+    }
+    disk = DiskLRU(get_cache_dir() / "inventory", _MAX_DISK_SIZE) if cache else None
+    records, todo = dict(), list()
+    for subject, fname in fnames.items():
+        key = _hash(fname, conditions)
+        entry = None if disk is None else disk.get(key, ".json")
+        if entry is not None:
+            try:
+                with open(entry, encoding="utf-8") as fid:
+                    records[subject] = json.load(fid)
+                continue
+            except (OSError, ValueError):
+                warn(f"Discarding the corrupted cache entry {entry.name}.")
+        todo.append((subject, fname, key))
+    logger.info("%i / %i headers to read.", len(todo), len(fnames))
+    for (subject, _, key), record in parallel_imap(
+        partial(_read_item, conditions=conditions), todo, n_jobs=n_jobs
+    ):
+        records[subject] = record
+        if disk is not None:
+            disk.put(key, ".json", partial(_write_record, record=record))
+    return _to_dataframe(pd, [records[subject] for subject in fnames], list(fnames))
+
+
+def _read_item(item, *, conditions):
+    """Read the record of a (subject, fname, key) item."""
+    return read_header(item[1], conditions=conditions)
+
+
+def _write_record(fname: Path, *, record: dict[str, Any]) -> None:
+    """Write a record to a JSON file."""
+    with open(fname, "w", encoding="utf-8") as fid:
+        json.dump(record, fid)
+
+
+def _to_dataframe(pd, records, subjects):
+    """Convert the records to a data frame indexed by subject."""
+    conditions = list(
+        dict.fromkeys(
+            condition for record in records for condition in record["n_trials"]
+        )
+    )
+    columns = dict()
+    for condition in conditions:
+        columns[f"n_{condition}"] = [
+            record["n_trials"].get(condition, 0) for record in records
+        ]
+    columns["n_bads"] = [record["n_bads"] for record in records]
+    columns["bads"] = [",".join(record["bads"]) for record in records]
+    for key in ("duration", "sfreq", "n_channels", "n_dropped", "kind", "fname"):
+        columns[key] = [record[key] for record in records]
+    return pd.DataFrame(columns, index=pd.Index(subjects, name="subject"))
+
+
+def _get_subject(fname: Union[str, Path]) -> str:
+    """Get the subject of a file from the sub- entity of its name."""
+    match = re.search(r"sub-([A-Za-z0-9]+)", Path(fname).name)
+    if match is None:
+        raise ValueError(
+            f"The subject of {fname} could not be inferred from its name. Provide a "
+            "mapping from subject to file instead."
+        )
+    return f"sub-{match.group(1)}"
+
+
+def _hash(fname: Path, conditions) -> str:
+    """Hash a file, from its path, size and modification time, and the conditions."""
+    stat = fname.stat()
+    hasher = sha1(f"inventory-{_CACHE_VERSION}".encode())
+    for arg in (fname.resolve(), stat.st_size, stat.st_mtime_ns, conditions):
+        hasher.update(repr(arg).encode())
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def _read_epochs(fname: Path) -> dict[str, Any]:
+    """Read the header, the events and the drop log of an epochs FIF file."""
+    from mne import read_epochs
+    from mne.utils import use_log_level
+
+    with use_log_level(False):
+        epochs = read_epochs(fname, preload=False, proj=False)
+    codes = {code: name for name, code in epochs.event_id.items()}
+    labels = [codes.get(code, str(code)) for code in epochs.events[:, 2]]
+    n_dropped = sum(
+        len(reasons) != 0 and reasons != ("IGNORED",) for reasons in epochs.drop_log
+    )
+    duration = len(epochs) * (epochs.tmax - epochs.tmin + 1 / epochs.info["sfreq"])
+    return _record(epochs.info, "epochs", labels, duration, n_dropped)
+
+
+def _read_raw(fname: Path) -> dict[str, Any]:
+    """Read the header and the annotations of a raw FIF file."""
+    from mne.io import read_raw_fif
+    from mne.utils import use_log_level
+
+    with use_log_level(False):
+        raw = read_raw_fif(fname, preload=False)
+    labels = list(raw.annotations.description)
+    return _record(raw.info, "raw", labels, raw.n_times / raw.info["sfreq"], 0)
+
+
+def _record(info, kind, labels, duration, n_dropped) -> dict[str, Any]:
+    """Create the record of a FIF file."""
+    return dict(
+        kind=kind,
+        sfreq=float(info["sfreq"]),
+        n_channels=len(info["ch_names"]),
+        bads=list(info["bads"]),
+        duration=float(duration),
+        n_dropped=int(n_dropped),
+        labels=[str(label) for label in labels],
+    )
+
+
+def _read_bids(fname: Path) -> dict[str, Any]:
+    """Read the events and the sidecars of a BIDS recording."""
+    import csv
+
+    with open(fname, encoding="utf-8", newline="") as fid:
+        events = list(csv.DictReader(fid, delimiter="\t"))
+    if len(events) != 0 and "trial_type" not in events[0]:
+        raise ValueError(f"The events file {fname.name} has no 'trial_type' column.")
+    labels = [event["trial_type"] for event in events]
+    base = fname.name[: -len("_events.tsv")]
+    sidecar = _find_sidecar(fname.parent, base, "_eeg.json")
+    info = dict()
+    if sidecar is not None:
+        with open(sidecar, encoding="utf-8") as fid:
+            info = json.load(fid)
+    channels = _find_sidecar(fname.parent, base, "_channels.tsv")
+    ch_names, bads = list(), list()
+    if channels is not None:
+        with open(channels, encoding="utf-8", newline="") as fid:
+            for row in csv.DictReader(fid, delimiter="\t"):
+                ch_names.append(row["name"])
+                if row.get("status", "good").strip().lower() == "bad":
+                    bads.append(row["name"])
+    return dict(
+        kind="bids",
+        sfreq=float(info.get("SamplingFrequency", np.nan)),
+        n_channels=len(ch_names),
+        bads=bads,
+        duration=float(info.get("RecordingDuration", np.nan)),
+        n_dropped=0,
+        labels=labels,
+    )
+
+
+def _find_sidecar(directory: Path, base: str, suffix: str) -> Optional[Path]:
+    """Find the sidecar of a recording, ignoring the entities missing from its name.
+
+    In BIDS, the sidecars share the entities of the recording, e.g. the events of
+    ``sub-01_ses-01_task-x_run-01`` have the channels of the same name; some datasets
+    omit the ``run`` or ``acq`` entities of the sidecars.
+    """
+    entities = base.split("_")
+    for k in range(len(entities), 0, -1):
+        candidate = directory / f"{'_'.join(entities[:k])}{suffix}"
+        if candidate.exists():
+            return candidate
+    return None
@@ -0,0 +1,490 @@
+"""Subject-indexed zarr stores for cohort derivatives.
+
+A store holds one block per subject, stacked along a leading ``subject`` dimension,
+e.g. an evoked dataset of shape ``(subject, condition, channel, time)``. Each block
+is written to its own region of the store as soon as it is computed, and a
+per-subject ``fingerprint`` records the inputs it was computed from, so that later
+runs only recompute subjects that are new or changed.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..utils._checks import check_type, check_value, ensure_int, ensure_path
+from ..utils._imports import import_optional_dependency
+from ..utils.logs import logger, warn
+from ..utils.parallel import parallel_imap
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Callable, Optional, Union
+
+    import xarray as xr
+
+
+SUBJECT_DIM: str = "subject"
+_FINGERPRINT: str = "fingerprint"
+_UNKNOWN: str = "unknown"
+
+# Chunking policy, chosen for the 2 common queries on cohort derivatives: a channel
+# ROI across all subjects reads only the channel blocks that contain the ROI, and a
+# subject across all channels reads only the chunks of that subject. Dimensions not
+# listed are stored in a single chunk.
+CHUNKS: dict[str, int] = {SUBJECT_DIM: 1, "channel": 16}
+_ZARR_SUFFIXES: tuple[str, ...] = (".zarr",)
+_NETCDF_SUFFIXES: tuple[str, ...] = (".nc", ".netcdf", ".h5")
+
+
+def get_encoding(
+    ds: xr.Dataset,
+    *,
+    chunks: Optional[dict[str, int]] = None,
+    dtype: Optional[str] = "float32",
+    clevel: int = 5,
+    fmt: str = "zarr",
+) -> dict[str, dict]:
+    """Get the storage encoding of the data variables of a dataset.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The dataset to store.
+    chunks : dict | None
+        Mapping from dimension name to chunk size. Dimensions not listed are stored in
+        a single chunk. If ``None``, :data:`CHUNKS` is used.
+    dtype : str | None
+        The storage dtype of floating point variables. Use ``None`` to keep the dtype
+        of the variables.
+    clevel : int
+        The compression level, between 0 and 9.
+    fmt : str
+        The storage format, ``"zarr"`` or ``"netcdf"``.
+
+    Returns
+    -------
+    encoding : dict
+        The encoding, which can be passed to :meth:`xarray.Dataset.to_zarr` or
+        :meth:`xarray.Dataset.to_netcdf`.
+
+    Notes
+    -----
+    Zarr stores are compressed with Blosc/Zstd with bit-shuffling. NetCDF files are
+    compressed with zlib and byte-shuffling, which is supported by every netCDF
+    reader.
+    """
+    check_type(chunks, (dict, None), "chunks")
+    check_type(dtype, (str, None), "dtype")
+    check_value(fmt, ("zarr", "netcdf"), "fmt")
+    clevel = ensure_int(clevel, "clevel")
+    chunks = CHUNKS if chunks is None else chunks
+    encoding = dict()
+    for name, var in ds.data_vars.items():
+        if var.dtype.kind not in "biufc":
+            continue  # strings and objects keep the default encoding
+        shape = tuple(
+            max(min(chunks.get(dim, size), size), 1)
+            for dim, size in zip(var.dims, var.shape)
+        )
+        if fmt == "zarr":
+            encoding[name] = dict(chunks=shape, **_zarr_compressor(clevel))
+        else:
+            encoding[name] = dict(
+                chunksizes=shape, zlib=True, complevel=clevel, shuffle=True
+            )
+        if dtype is not None and var.dtype.kind == "f":
+            encoding[name]["dtype"] = dtype
+    return encoding
+
+
+def save_dataset(
+    ds: xr.Dataset,
+    fname: Union[str, Path],
+    *,
+    chunks: Optional[dict[str, int]] = None,
+    dtype: Optional[str] = "float32",
+    overwrite: bool = False,
+) -> Path:
+    """Save a derivative dataset with the kinnd chunking and compression policy.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        The dataset to save.
+    fname : str | Path
+        Path to the output file. The format is inferred from the extension: a zarr
+        store for ``.zarr`` and a netCDF-4 file for ``.nc``, ``.netcdf`` or ``.h5``.
+    chunks : dict | None
+        Mapping from dimension name to chunk size. If ``None``, :data:`CHUNKS` is used.
+    dtype : str | None
+        The storage dtype of floating point variables. Use ``None`` to keep the dtype
+        of the variables.
+    overwrite : bool
+        If True, overwrite an existing file.
+
+    Returns
+    -------
+    fname : Path
+        The path to the saved file.
+
+    See Also
+    --------
+    get_encoding
+    open_dataset
+    """
+    fname = ensure_path(fname, must_exist=False)
+    check_type(overwrite, (bool,), "overwrite")
+    if fname.exists() and not overwrite:
+        raise FileExistsError(
+            f"The file {fname} already exists. Use overwrite=True to overwrite it."
+        )
+    fmt = _get_format(fname)
+    encoding = get_encoding(ds, chunks=chunks, dtype=dtype, fmt=fmt)
+    fname.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "zarr":
+        ds.to_zarr(
+            fname, mode="w", consolidated=True, encoding=encoding, **_zarr_kwargs()
+        )
+    else:
+        ds.to_netcdf(fname, mode="w", encoding=encoding, engine=_netcdf_engine())
+    return fname
+
+
+def open_dataset(fname: Union[str, Path]) -> xr.Dataset:
+    """Open a derivative dataset lazily.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to a zarr store (``.zarr``) or to a netCDF file (``.nc``, ``.netcdf`` or
+        ``.h5``).
+
+    Returns
+    -------
+    ds : xarray.Dataset
+        The dataset. Only the chunks needed by a selection are read from disk when
+        the data is accessed, e.g. with ``ds.sel(channel=roi).load()``.
+    """
+    fname = ensure_path(fname, must_exist=True)
+    if _get_format(fname) == "zarr":
+        return open_store(fname)
+    xr = import_optional_dependency("xarray")
+    return xr.open_dataset(fname, chunks=None, engine=_netcdf_engine())
+
+
+def open_store(fname: Union[str, Path]) -> xr.Dataset:
+    """Open a subject-indexed zarr store lazily.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to the ``.zarr`` store.
+
+    Returns
+    -------
+    ds : xarray.Dataset
+        The dataset. Variables are loaded from disk only when accessed.
+    """
+    xr = import_optional_dependency("xarray")
+    fname = ensure_path(fname, must_exist=True)
+    return xr.open_zarr(fname, consolidated=True, chunks=None, **_zarr_kwargs())
+
+
+def read_fingerprints(fname: Union[str, Path]) -> dict[str, str]:
+    """Read the fingerprint of each subject stored in a zarr store.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to the ``.zarr`` store.
+
+    Returns
+    -------
+    fingerprints : dict
+        Mapping from subject to the fingerprint of the inputs its block was computed
+        from. Subjects with an allocated but never written block are omitted. An
+        empty dictionary is returned if the store does not exist.
+    """
+    fname = ensure_path(fname, must_exist=False)
+    if not fname.exists():
+        return dict()
+    ds = open_store(fname)
+    subjects = ds[SUBJECT_DIM].values
+    if _FINGERPRINT in ds:
+        values = ds[_FINGERPRINT].values
+    else:
+        values = np.full(subjects.size, "", dtype=object)
+    return {
+        str(subject): str(value)
+        for subject, value in zip(subjects, values)
+        if str(value) != ""
+    }
+
+
+def update_store(
+    fname: Union[str, Path],
+    func: Callable[[str], Optional[xr.Dataset]],
+    subjects: Iterable[str],
+    *,
+    fingerprints: Optional[Union[dict[str, str], Callable[[str], str]]] = None,
+    n_jobs: Optional[int] = 1,
+    overwrite: bool = False,
+    chunks: Optional[dict[str, int]] = None,
+    dtype: Optional[str] = "float32",
+    dry_run: bool = False,
+) -> list[str]:
+    """Compute the blocks of new or changed subjects and write them to a zarr store.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to the ``.zarr`` store. It is created if it does not exist.
+    func : callable
+        Function called as ``func(subject)`` which returns the block of a subject as
+        an :class:`xarray.Dataset` with a ``subject`` dimension of length 1, or
+        ``None`` to skip the subject. Every block must share the same non-subject
+        dimensions and coordinates. When ``n_jobs`` is greater than 1, ``func`` must
+        be picklable.
+    subjects : iterable of str
+        The subjects to include in the store.
+    fingerprints : dict | callable | None
+        The fingerprint of the inputs of each subject, as a mapping or as a function
+        called as ``fingerprints(subject)``. A subject already in the store is
+        recomputed if its fingerprint changed. If ``None``, subjects already in the
+        store are never recomputed (unless ``overwrite=True``).
+    n_jobs : int | None
+        The number of worker processes used to compute the blocks.
+    overwrite : bool
+        If True, recompute every subject, even if its fingerprint is unchanged.
+    chunks : dict | None
+        Mapping from dimension name to chunk size, used when the store is created. If
+        ``None``, :data:`CHUNKS` is used. The chunk size along ``subject`` must be 1.
+    dtype : str | None
+        The storage dtype of floating point variables, used when the store is created.
+        Use ``None`` to keep the dtype of the blocks.
+    dry_run : bool
+        If True, nothing is computed or written, and the subjects which would be
+        (re)computed are returned.
+
+    Returns
+    -------
+    written : list of str
+        The subjects whose block was written during this call.
+
+    Notes
+    -----
+    The blocks are written one at a time by the calling process as soon as a worker
+    returns them, so that at most a few blocks are held in memory. New subjects are
+    allocated in the store up-front, in the order of ``subjects``, and their region
+    is filled as their block arrives. A subject for which ``func`` returns ``None``
+    keeps an empty slot (filled with NaN and without fingerprint), and is retried on
+    the next call.
+    """
+    check_type(fname, ("path-like",), "fname")
+    check_type(overwrite, (bool,), "overwrite")
+    check_type(dry_run, (bool,), "dry_run")
+    if chunks is not None and chunks.get(SUBJECT_DIM, 1) != 1:
+        raise ValueError(
+            f"The chunk size along '{SUBJECT_DIM}' must be 1, so that each subject is "
+            "written to its own chunks."
+        )
+    fname = Path(fname)
+    subjects = [str(subject) for subject in subjects]
+    if len(set(subjects)) != len(subjects):
+        raise ValueError("The provided subjects contain duplicates.")
+    if isinstance(fingerprints, dict):
+        fingerprints = fingerprints.get
+    stored = read_fingerprints(fname)
+    current = {
+        subject: (
+            _UNKNOWN if fingerprints is None else str(fingerprints(subject) or _UNKNOWN)
+        )
+        for subject in subjects
+    }
+    todo = [
+        subject
+        for subject in subjects
+        if overwrite
+        or subject not in stored
+        or (fingerprints is not None and stored[subject] != current[subject])
+    ]
+    logger.info(
+        "%i / %i subjects to (re)compute in %s.", len(todo), len(subjects), fname.name
+    )
+    if dry_run or len(todo) == 0:
+        return todo
+
+    index = _read_index(fname)
+    coords = _read_coords(fname)
+    written = list()
+    for subject, block in parallel_imap(func, todo, n_jobs=n_jobs):
+        if block is None:
+            warn(f"Skipping subject {subject}, no data was returned.")
+            continue
+        _check_block(block, coords)
+        block = block.assign(
+            {_FINGERPRINT: (SUBJECT_DIM, np.array([current[subject]], dtype=object))}
+        )
+        if len(index) == 0:
+            # create the store from an empty copy of the first block, so that the
+            # subjects are stored in the requested order, not in completion order.
+            _create(fname, _empty_like(block, todo[0]), chunks=chunks, dtype=dtype)
+            index = [todo[0]]
+            coords = _read_coords(fname)
+        if subject not in index:
+            new = [sub for sub in todo if sub not in index]
+            _allocate(fname, new)
+            index.extend(new)
+        _write_region(fname, block, index.index(subject))
+        written.append(subject)
+        logger.info("Subject %s written to %s.", subject, fname.name)
+    return written
+
+
+def _zarr_kwargs() -> dict:
+    """Pin the zarr format to v2 which supports consolidated metadata and strings."""
+    zarr = import_optional_dependency("zarr")
+    if int(zarr.__version__.split(".")[0]) < 3:
+        return dict()
+    return dict(zarr_format=2)
+
+
+def _zarr_compressor(clevel: int) -> dict:
+    """Get the Blosc/Zstd compressor encoding for the installed zarr version."""
+    zarr = import_optional_dependency("zarr")
+    numcodecs = import_optional_dependency("numcodecs")
+    compressor = numcodecs.Blosc(
+        cname="zstd", clevel=clevel, shuffle=numcodecs.Blosc.BITSHUFFLE
+    )
+    if int(zarr.__version__.split(".")[0]) < 3:
+        return dict(compressor=compressor)
+    return dict(compressors=(compressor,))
+
+
+def _netcdf_engine() -> str:
+    """Get the installed netCDF-4 engine."""
+    engines = {"netcdf4": ("netCDF4",), "h5netcdf": ("h5netcdf", "h5py")}
+    for engine, modules in engines.items():
+        if all(
+            import_optional_dependency(module, raise_error=False) is not None
+            for module in modules
+        ):
+            return engine
+    raise ImportError(
+        "Missing optional dependency 'netCDF4' or 'h5netcdf'. Use pip or conda to "
+        "install one of them to read and write netCDF files."
+    )
+
+
+def _get_format(fname: Path) -> str:
+    """Get the storage format from the file extension."""
+    if fname.suffix.lower() in _ZARR_SUFFIXES:
+        return "zarr"
+    elif fname.suffix.lower() in _NETCDF_SUFFIXES:
+        return "netcdf"
+    raise ValueError(
+        f"Unsupported file extension '{fname.suffix}'. Supported extensions are "
+        f"{', '.join(_ZARR_SUFFIXES + _NETCDF_SUFFIXES)}."
+    )
+
+
+def _read_index(fname: Path) -> list[str]:
+    """Read the subjects allocated in a store, including empty slots."""
+    if not fname.exists():
+        return list()
+    return [str(subject) for subject in open_store(fname)[SUBJECT_DIM].values]
+
+
+def _read_coords(fname: Path) -> dict[str, np.ndarray]:
+    """Read the non-subject index coordinates of a store."""
+    if not fname.exists():
+        return dict()
+    ds = open_store(fname)
+    return {dim: ds[dim].values for dim in ds.indexes if dim != SUBJECT_DIM}
+
+
+def _check_block(block: xr.Dataset, coords: dict[str, np.ndarray]) -> None:
+    """Check that a block holds a single subject and matches the store layout."""
+    if block.sizes.get(SUBJECT_DIM, 0) != 1:
+        raise ValueError(
+            f"The blocks must have a '{SUBJECT_DIM}' dimension of length 1, got "
+            f"{dict(block.sizes)}."
+        )
+    for dim, values in coords.items():
+        if dim not in block.indexes or not np.array_equal(block[dim].values, values):
+            raise ValueError(
+                f"The coordinate '{dim}' of the block does not match the one of the "
+                "store. All blocks must share the same non-subject coordinates."
+            )
+
+
+def _empty_like(block: xr.Dataset, subject: str) -> xr.Dataset:
+    """Create a copy of a block for another subject, filled with empty values."""
+    xr = import_optional_dependency("xarray")
+    empty = block.assign_coords({SUBJECT_DIM: [subject]})
+    for name, var in empty.data_vars.items():
+        if SUBJECT_DIM not in var.dims:
+            continue
+        if var.dtype.kind in "fc":
+            fill_value = np.nan
+        elif var.dtype.kind in "OUST":
+            fill_value = ""
+        else:
+            fill_value = 0
+        empty[name] = xr.full_like(var, fill_value)
+    return empty
+
+
+def _create(
+    fname: Path,
+    block: xr.Dataset,
+    *,
+    chunks: Optional[dict[str, int]],
+    dtype: Optional[str],
+) -> None:
+    """Create a store from the block of the first subject."""
+    block = block.assign_coords({SUBJECT_DIM: block[SUBJECT_DIM].values.astype(object)})
+    encoding = get_encoding(block, chunks=chunks, dtype=dtype)
+    fname.parent.mkdir(parents=True, exist_ok=True)
+    block.to_zarr(
+        fname, mode="w", consolidated=True, encoding=encoding, **_zarr_kwargs()
+    )
+
+
+def _allocate(fname: Path, subjects: list[str]) -> None:
+    """Extend the subject dimension of a store with empty slots.
+
+    Only the array shapes stored in the metadata are changed, the new chunks are
+    never written and read back as the fill value of each array.
+    """
+    zarr = import_optional_dependency("zarr")
+    group = zarr.open_group(str(fname), mode="r+", **_zarr_kwargs())
+    for name, array in group.arrays():
+        dims = array.attrs["_ARRAY_DIMENSIONS"]
+        if SUBJECT_DIM not in dims:
+            continue
+        shape = list(array.shape)
+        n_subjects = shape[dims.index(SUBJECT_DIM)]
+        shape[dims.index(SUBJECT_DIM)] += len(subjects)
+        array.resize(tuple(shape))
+        # the handles returned by the group may be stale (consolidated metadata),
+        # thus the coordinate is written through the resized array.
+        if name == SUBJECT_DIM:
+            array[n_subjects:] = np.array(subjects, dtype=object)
+    zarr.consolidate_metadata(str(fname), **_zarr_kwargs())
+
+
+def _write_region(fname: Path, block: xr.Dataset, idx: int) -> None:
+    """Write the block of one subject to its region of the store."""
+    # the subject coordinate is written when the slot is allocated
+    block = block.drop_vars(
+        [
+            name
+            for name, var in block.variables.items()
+            if SUBJECT_DIM not in var.dims or name == SUBJECT_DIM
+        ]
+    )
+    block.to_zarr(fname, region={SUBJECT_DIM: slice(idx, idx + 1)}, **_zarr_kwargs())
@@ -0,0 +1,57 @@
+import mne
+import numpy as np
+import pytest
+
+from ..fif import get_data, save_fif
+
+
+@pytest.fixture(scope="module")
+def raw():
+    """Create a raw recording with a few events."""
+    rng = np.random.default_rng(0)
+    info = mne.create_info(4, 100.0, "eeg")
+    raw = mne.io.RawArray(1e-5 * rng.standard_normal((4, 3050)), info, verbose=False)
+    raw.set_annotations(mne.Annotations(np.arange(1, 29, 2.0), 0.1, "tone"))
+    return raw
+
+
+def test_save_fif(raw, tmp_path):
+    """Test saving FIF files in single and double precision."""
+    single = save_fif(raw, tmp_path / "single_raw.fif")
+    double = save_fif(raw, tmp_path / "double_raw.fif", precision="double")
+    assert double.stat().st_size > 1.9 * single.stat().st_size
+    data = mne.io.read_raw_fif(single, verbose=False).get_data()
+    np.testing.assert_allclose(data, raw.get_data(), rtol=1e-6)
+    with pytest.raises(FileExistsError):
+        save_fif(raw, single)
+    save_fif(raw, single, overwrite=True)
+    evoked = mne.Epochs(raw, tmin=0, tmax=0.5, baseline=None, verbose=False).average()
+    assert save_fif(evoked, tmp_path / "single-ave.fif").exists()
+    with pytest.raises(ValueError, match="single precision"):
+        save_fif(evoked, tmp_path / "double-ave.fif", precision="double")
+    with pytest.raises(ValueError, match="Invalid value"):
+        save_fif(raw, tmp_path / "half_raw.fif", precision="half")
+
+
+def test_get_data(raw, tmp_path):
+    """Test getting the samples in single precision, chunk by chunk."""
+    fname = save_fif(raw, tmp_path / "test_raw.fif", precision="double")
+    unloaded = mne.io.read_raw_fif(fname, verbose=False)
+    data = get_data(unloaded, chunk_duration=7.0)
+    assert data.dtype == np.float32
+    assert not unloaded.preload
+    np.testing.assert_allclose(data, raw.get_data(), rtol=1e-6)
+    data = get_data(unloaded, picks=["0", "2"], dtype="float64")
+    assert data.dtype == np.float64
+    np.testing.assert_array_equal(data, raw.get_data(picks=["0", "2"]))
+
+    epochs = mne.Epochs(
+        unloaded, tmin=0, tmax=0.5, baseline=None, preload=False, verbose=False
+    )
+    data = get_data(epochs, chunk_duration=2.0)
+    assert data.dtype == np.float32
+    np.testing.assert_allclose(data, epochs.get_data(), rtol=1e-6)
+    evoked = epochs.average()
+    np.testing.assert_allclose(get_data(evoked), evoked.get_data(), rtol=1e-6)
+    with pytest.raises(ValueError, match="strictly positive"):
+        get_data(raw, chunk_duration=0)
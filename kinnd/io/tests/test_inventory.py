@@ -0,0 +1,126 @@
+import json
+
+import mne
+import numpy as np
+import pytest
+
+from .. import inventory
+from ..inventory import read_header, read_inventory
+
+
+def _make_info():
+    """Create a measurement info with 4 EEG channels and a bad channel."""
+    info = mne.create_info(["Fz", "Cz", "Pz", "Oz"], 100.0, "eeg")
+    info["bads"] = ["Oz"]
+    return info
+
+
+@pytest.fixture
+def fnames(tmp_path):
+    """Write an epochs file, a raw file and a BIDS recording."""
+    rng = np.random.default_rng(0)
+    # epochs, with 2 epochs rejected
+    events = np.c_[np.arange(10) * 200, np.zeros(10, int), [1] * 6 + [2] * 4]
+    epochs = mne.EpochsArray(
+        rng.standard_normal((10, 4, 51)) * 1e-6,
+        _make_info(),
+        events,
+        tmin=-0.1,
+        event_id=dict(match=1, mismatch=2),
+        verbose=False,
+    )
+    epochs.drop([0, 7], reason="EMG", verbose=False)
+    fname_epo = tmp_path / "sub-01_task-x_epo.fif"
+    epochs.save(fname_epo, verbose=False)
+    # raw, with annotations
+    raw = mne.io.RawArray(
+        rng.standard_normal((4, 1000)) * 1e-6, _make_info(), verbose=False
+    )
+    raw.set_annotations(
+        mne.Annotations(
+            [1, 2, 3, 4, 5],
+            [0, 0, 0, 0, 1],
+            ["match", "match", "mismatch", "x", "BAD_"],
+        )
+    )
+    fname_raw = tmp_path / "sub-02_task-x_eeg.fif"
+    raw.save(fname_raw, verbose=False)
+    # BIDS, with the sidecars missing the run entity
+    bids = tmp_path / "sub-03" / "eeg"
+    bids.mkdir(parents=True)
+    fname_bids = bids / "sub-03_task-x_run-01_events.tsv"
+    fname_bids.write_text(
+        "onset\tduration\ttrial_type\n1.0\t0\tmatch\n2.0\t0\tmismatch\n3.0\t0\tmismatch\n",
+        encoding="utf-8",
+    )
+    (bids / "sub-03_task-x_channels.tsv").write_text(
+        "name\ttype\tstatus\nFz\tEEG\tgood\nCz\tEEG\tbad\n", encoding="utf-8"
+    )
+    with open(bids / "sub-03_task-x_eeg.json", "w", encoding="utf-8") as fid:
+        json.dump(dict(SamplingFrequency=500, RecordingDuration=12.5), fid)
+    return fname_epo, fname_raw, fname_bids
+
+
+def test_read_header(fnames):
+    """Test reading the record of epochs, raw and BIDS files."""
+    fname_epo, fname_raw, fname_bids = fnames
+    record = read_header(fname_epo)
+    assert record["kind"] == "epochs"
+    assert record["n_trials"] == dict(match=5, mismatch=3)
+    assert record["n_dropped"] == 2
+    assert record["bads"] == ["Oz"]
+    assert record["n_channels"] == 4
+    assert record["sfreq"] == 100.0
+    np.testing.assert_allclose(record["duration"], 8 * 0.51)
+
+    record = read_header(fname_raw)
+    assert record["kind"] == "raw"
+    assert record["n_trials"] == dict(match=2, mismatch=1, x=1)
+    assert record["duration"] == 10.0
+    record = read_header(fname_raw, conditions=dict(match="image/match"))
+    assert record["n_trials"] == {"image/match": 2}
+
+    record = read_header(fname_bids, conditions=["match", "mismatch", "other"])
+    assert record["kind"] == "bids"
+    assert record["n_trials"] == dict(match=1, mismatch=2, other=0)
+    assert record["bads"] == ["Cz"]
+    assert record["sfreq"] == 500.0
+    assert record["duration"] == 12.5
+
+    with pytest.raises(ValueError, match="Unsupported file"):
+        read_header(fname_bids.parent / "sub-03_task-x_eeg.json")
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_read_inventory(fnames, monkeypatch, n_jobs):
+    """Test reading and caching the inventory of a cohort."""
+    pytest.importorskip("pandas")
+    df = read_inventory(fnames, conditions=["match", "mismatch"], n_jobs=n_jobs)
+    assert df.index.tolist() == ["sub-01", "sub-02", "sub-03"]
+    assert df["n_match"].tolist() == [5, 2, 1]
+    assert df["n_mismatch"].tolist() == [3, 1, 2]
+    assert df["n_bads"].tolist() == [1, 1, 1]
+    assert df["bads"].tolist() == ["Oz", "Oz", "Cz"]
+    assert df["kind"].tolist() == ["epochs", "raw", "bids"]
+
+    # the second call reads the cache, until a file changes
+    def _fail(*args, **kwargs):
+        raise RuntimeError("The header should be read from the cache.")
+
+    monkeypatch.setattr(inventory, "read_header", _fail)
+    df2 = read_inventory(
+        dict(zip(["a", "b", "c"], fnames)), conditions=["match", "mismatch"]
+    )
+    assert df2.index.tolist() == ["a", "b", "c"]
+    assert df2.drop(columns="fname").equals(
+        df.drop(columns="fname").set_axis(["a", "b", "c"]).rename_axis("subject")
+    )
+    with pytest.raises(RuntimeError, match="from the cache"):
+        read_inventory(fnames[:1], conditions=["match", "mismatch"], cache=False)
+    with open(fnames[2], "a", encoding="utf-8") as fid:
+        fid.write("4.0\t0\tmatch\n")
+    with pytest.raises(RuntimeError, match="from the cache"):
+        read_inventory(fnames, conditions=["match", "mismatch"])
+
+    with pytest.raises(ValueError, match="could not be inferred"):
+        read_inventory([fnames[0].with_name("x_epo.fif")])
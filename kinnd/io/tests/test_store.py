@@ -0,0 +1,188 @@
+import numpy as np
+import pytest
+
+from ..store import (
+    _netcdf_engine,
+    get_encoding,
+    open_dataset,
+    open_store,
+    read_fingerprints,
+    save_dataset,
+    update_store,
+)
+
+xr = pytest.importorskip("xarray")
+pytest.importorskip("zarr")
+
+_CALLS = list()
+
+
+def _block(subject, value=None):
+    """Create the block of a subject filled with a value derived from its name."""
+    _CALLS.append(subject)
+    if subject == "sub-skip":
+        return None
+    value = float(subject.split("-")[-1]) if value is None else value
+    return xr.Dataset(
+        {
+            "evoked": (
+                ("subject", "condition", "channel", "time"),
+                np.full((1, 2, 3, 4), value),
+            ),
+            "bads": (("subject",), np.array(["E1,E2"], dtype=object)),
+        },
+        coords={
+            "subject": [subject],
+            "condition": ["standard", "deviant"],
+            "channel": ["E1", "E2", "E3"],
+            "time": np.arange(4) / 4,
+        },
+    )
+
+
+def test_update_store(tmp_path):
+    """Test building and updating a subject-indexed store."""
+    fname = tmp_path / "evoked.zarr"
+    subjects = ["sub-1", "sub-2", "sub-3"]
+    written = update_store(
+        fname, _block, subjects, fingerprints=dict.fromkeys(subjects, "a")
+    )
+    assert sorted(written) == subjects
+    ds = open_store(fname)
+    assert ds["subject"].values.tolist() == subjects
+    assert ds.sizes == {"subject": 3, "condition": 2, "channel": 3, "time": 4}
+    np.testing.assert_allclose(
+        ds["evoked"].mean(["condition", "channel", "time"]), [1, 2, 3]
+    )
+    assert read_fingerprints(fname) == dict.fromkeys(subjects, "a")
+
+    # nothing changed
+    _CALLS.clear()
+    assert (
+        update_store(fname, _block, subjects, fingerprints=dict.fromkeys(subjects, "a"))
+        == []
+    )
+    assert _CALLS == []
+
+    # one new subject, one changed subject
+    subjects.append("sub-4")
+    fingerprints = dict.fromkeys(subjects, "a")
+    fingerprints["sub-2"] = "b"
+    todo = update_store(
+        fname, _block, subjects, fingerprints=fingerprints, dry_run=True
+    )
+    assert todo == ["sub-2", "sub-4"]
+    assert _CALLS == []
+    written = update_store(fname, _block, subjects, fingerprints=fingerprints)
+    assert sorted(written) == ["sub-2", "sub-4"]
+    assert sorted(_CALLS) == ["sub-2", "sub-4"]
+    ds = open_store(fname)
+    assert ds["subject"].values.tolist() == subjects
+    np.testing.assert_allclose(
+        ds["evoked"].isel(condition=0, channel=0, time=0), [1, 2, 3, 4]
+    )
+    assert ds["bads"].values.tolist() == ["E1,E2"] * 4
+
+    # overwrite
+    _CALLS.clear()
+    update_store(fname, _block, subjects, overwrite=True)
+    assert sorted(_CALLS) == subjects
+
+
+def test_update_store_skipped_subject(tmp_path):
+    """Test that a skipped subject keeps an empty slot and is retried."""
+    fname = tmp_path / "evoked.zarr"
+    with pytest.warns(RuntimeWarning, match="Skipping subject sub-skip"):
+        written = update_store(fname, _block, ["sub-1", "sub-skip", "sub-2"])
+    assert written == ["sub-1", "sub-2"]
+    ds = open_store(fname)
+    assert ds["subject"].values.tolist() == ["sub-1", "sub-skip", "sub-2"]
+    assert np.isnan(ds["evoked"].sel(subject="sub-skip")).all()
+    assert sorted(read_fingerprints(fname)) == ["sub-1", "sub-2"]
+    _CALLS.clear()
+    with pytest.warns(RuntimeWarning, match="Skipping subject sub-skip"):
+        update_store(fname, _block, ["sub-1", "sub-skip", "sub-2"])
+    assert _CALLS == ["sub-skip"]
+
+
+def test_update_store_parallel(tmp_path):
+    """Test building a store with worker processes."""
+    fname = tmp_path / "evoked.zarr"
+    subjects = [f"sub-{k}" for k in range(1, 6)]
+    written = update_store(fname, _block, subjects, n_jobs=2)
+    assert sorted(written) == subjects
+    ds = open_store(fname)
+    assert ds["subject"].values.tolist() == subjects
+    np.testing.assert_allclose(
+        ds["evoked"].isel(condition=1, channel=2, time=3), range(1, 6)
+    )
+
+
+def test_update_store_invalid(tmp_path):
+    """Test invalid blocks and arguments."""
+    fname = tmp_path / "evoked.zarr"
+    with pytest.raises(ValueError, match="duplicates"):
+        update_store(fname, _block, ["sub-1", "sub-1"])
+    update_store(fname, _block, ["sub-1"])
+
+    def _bad_block(subject):
+        return _block(subject).assign_coords(channel=["E1", "E2", "E4"])
+
+    with pytest.raises(ValueError, match="coordinate 'channel'"):
+        update_store(fname, _bad_block, ["sub-2"])
+
+
+def test_update_store_encoding(tmp_path):
+    """Test the chunking, compression and dtype of a store."""
+    zarr = pytest.importorskip("zarr")
+    fname = tmp_path / "evoked.zarr"
+    update_store(fname, _block, ["sub-1", "sub-2"], chunks={"channel": 2})
+    ds = open_store(fname)
+    assert ds["evoked"].dtype == np.float32
+    assert ds["evoked"].encoding["chunks"] == (1, 2, 2, 4)
+    compressors = ds["evoked"].encoding.get("compressors") or (
+        ds["evoked"].encoding["compressor"],
+    )
+    assert compressors[0].cname == "zstd"
+    assert (fname / ".zmetadata").exists() or int(zarr.__version__[0]) >= 3
+    with pytest.raises(ValueError, match="must be 1"):
+        update_store(fname, _block, ["sub-3"], chunks={"subject": 2})
+
+
+@pytest.mark.parametrize("suffix", [".zarr", ".nc"])
+def test_save_open_dataset(tmp_path, suffix):
+    """Test saving and lazily opening a derivative dataset."""
+    if suffix == ".nc":
+        try:
+            _netcdf_engine()
+        except ImportError:
+            pytest.skip("netCDF-4 engine not available.")
+    ds = xr.concat([_block(f"sub-{k}") for k in range(1, 4)], dim="subject")
+    fname = save_dataset(ds, tmp_path / f"evoked{suffix}")
+    with pytest.raises(FileExistsError, match="already exists"):
+        save_dataset(ds, fname)
+    ds2 = open_dataset(fname)
+    assert ds2["evoked"].dtype == np.float32
+    # lazily loaded, the values are read from disk on access
+    assert not ds2["evoked"].variable._in_memory
+    roi = ds2["evoked"].sel(channel=["E1", "E2"]).mean("channel").values
+    np.testing.assert_allclose(roi[:, 0, 0], [1, 2, 3])
+    ds2.close()
+    save_dataset(ds, fname, dtype=None, overwrite=True)
+    ds2 = open_dataset(fname)
+    assert ds2["evoked"].dtype == np.float64
+    ds2.close()
+    with pytest.raises(ValueError, match="Unsupported file extension"):
+        save_dataset(ds, tmp_path / "evoked.txt")
+
+
+def test_get_encoding():
+    """Test the encoding policy."""
+    ds = xr.concat([_block(f"sub-{k}") for k in range(1, 4)], dim="subject")
+    encoding = get_encoding(ds)
+    assert set(encoding) == {"evoked"}  # strings keep the default encoding
+    assert encoding["evoked"]["chunks"] == (1, 2, 3, 4)
+    assert encoding["evoked"]["dtype"] == "float32"
+    encoding = get_encoding(ds, chunks={"channel": 1, "time": 2}, fmt="netcdf")
+    assert encoding["evoked"]["chunksizes"] == (3, 2, 1, 2)
+    assert encoding["evoked"]["zlib"]
@@ -0,0 +1,26 @@
+"""Preprocessing module."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["montage", "resample", "spatial"],
+    submod_attrs={
+        "montage": [
+            "clear_montage_cache",
+            "get_adjacency",
+            "get_cached_operator",
+            "get_csd_matrix",
+            "get_interpolation_matrix",
+            "get_standard_montage",
+        ],
+        "resample": ["decimate_raw"],
+        "spatial": [
+            "SpatialOperator",
+            "apply_spatial_operator",
+            "make_csd_matrix",
+            "make_interpolation_matrix",
+            "make_spatial_operator",
+        ],
+    },
+)
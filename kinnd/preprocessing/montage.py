@@ -0,0 +1,335 @@
+"""Cache of the operators derived from a montage.
+
+Spherical spline interpolation matrices, current source density matrices and channel
+adjacency only depend on the sensor positions and on a handful of parameters. In a
+cohort, every recording shares the same montage and only a few dozen distinct sets of
+bad channels recur, thus those operators are computed once, kept in memory and
+persisted to disk in the kinnd cache directory, with least-recently-used eviction.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha1
+from threading import Lock
+from typing import TYPE_CHECKING
+from zipfile import BadZipFile
+
+import numpy as np
+
+from ..utils._checks import check_type, check_value
+from ..utils._lru import DiskLRU
+from ..utils.logs import logger, warn
+from ..utils.paths import get_cache_dir
+from .spatial import make_csd_matrix, make_interpolation_matrix
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Any, Callable, Union
+
+    from mne import Info
+    from mne.channels import DigMontage
+    from scipy.sparse import csr_array
+
+
+# bump to invalidate the entries persisted by a previous version of the operators
+_CACHE_VERSION = "1"
+_MAX_DISK_SIZE = 256 * 2**20  # bytes
+_MAX_MEMORY_ENTRIES = 64
+_MEMORY: OrderedDict[str, Any] = OrderedDict()
+_LOCK = Lock()
+
+
+def get_standard_montage(kind: str) -> DigMontage:
+    """Get a standard montage, read once per process.
+
+    Parameters
+    ----------
+    kind : str
+        The name of the montage, see :func:`mne.channels.make_standard_montage`.
+
+    Returns
+    -------
+    montage : mne.channels.DigMontage
+        A copy of the montage, which can be modified freely.
+    """
+    check_type(kind, (str,), "kind")
+    return _read_standard_montage(kind).copy()
+
+
+@lru_cache(maxsize=8)
+def _read_standard_montage(kind: str) -> DigMontage:
+    """Read a standard montage; the result is shared and must not be modified."""
+    from mne.channels import make_standard_montage
+
+    return make_standard_montage(kind)
+
+
+def get_montage_cache() -> DiskLRU:
+    """Get the on-disk cache of the montage operators.
+
+    Returns
+    -------
+    cache : DiskLRU
+        The cache, stored in the ``montage`` folder of the kinnd cache directory, see
+        ``kinnd.utils.paths.get_cache_dir``.
+    """
+    return DiskLRU(get_cache_dir() / "montage", _MAX_DISK_SIZE)
+
+
+def clear_montage_cache(disk: bool = True) -> None:
+    """Clear the cache of the montage operators.
+
+    Parameters
+    ----------
+    disk : bool
+        If True, the entries persisted to disk are removed as well as the entries held
+        in memory.
+    """
+    check_type(disk, (bool,), "disk")
+    with _LOCK:
+        _MEMORY.clear()
+    if disk:
+        get_montage_cache().clear()
+
+
+def get_interpolation_matrix(
+    pos_from: np.ndarray,
+    pos_to: np.ndarray,
+    *,
+    alpha: float = 1e-5,
+    stiffness: int = 4,
+    n_legendre_terms: int = 50,
+) -> np.ndarray:
+    """Get a spherical spline interpolation matrix from the cache.
+
+    Parameters
+    ----------
+    pos_from : array of shape (n_from, 3)
+        The positions of the sensors to interpolate from, relative to the origin of
+        the fitted sphere.
+    pos_to : array of shape (n_to, 3)
+        The positions of the sensors to interpolate, relative to the origin of the
+        fitted sphere.
+    alpha : float
+        The regularization parameter.
+    stiffness : int
+        The stiffness of the spline, also referred to as ``m``.
+    n_legendre_terms : int
+        The number of terms of the Legendre series.
+
+    Returns
+    -------
+    interpolation : array of shape (n_to, n_from)
+        The read-only matrix mapping the signals at ``pos_from`` to the signals at
+        ``pos_to``, see :func:`~kinnd.preprocessing.make_interpolation_matrix`.
+    """
+    pos_from = np.asarray(pos_from, dtype=float)
+    pos_to = np.asarray(pos_to, dtype=float)
+    key = _hash("interpolation", pos_from, pos_to, alpha, stiffness, n_legendre_terms)
+    return _get(
+        key,
+        lambda: make_interpolation_matrix(
+            pos_from,
+            pos_to,
+            alpha=alpha,
+            stiffness=stiffness,
+            n_legendre_terms=n_legendre_terms,
+        ),
+    )
+
+
+def get_csd_matrix(
+    info: Info,
+    *,
+    sphere: Union[str, np.ndarray] = "auto",
+    lambda2: float = 1e-5,
+    stiffness: int = 4,
+    n_legendre_terms: int = 50,
+) -> np.ndarray:
+    """Get the current source density matrix of the EEG channels from the cache.
+
+    Parameters
+    ----------
+    info : mne.Info
+        The measurement information, with the montage set.
+    sphere : array of shape (4,) | ``"auto"``
+        The origin and radius of the sphere, in meters. If ``"auto"``, a sphere is
+        fitted to the digitization points.
+    lambda2 : float
+        The regularization parameter.
+    stiffness : int
+        The stiffness of the spline.
+    n_legendre_terms : int
+        The number of terms of the Legendre series.
+
+    Returns
+    -------
+    csd : array of shape (n_eeg, n_eeg)
+        The read-only matrix transforming the EEG channels, in the order of ``info``,
+        into current source densities. It is the same transformation as
+        :func:`mne.preprocessing.compute_current_source_density`.
+    """
+    from mne import pick_types
+
+    picks = pick_types(info, meg=False, eeg=True, exclude=())
+    if picks.size == 0:
+        raise ValueError("No EEG channels found.")
+    if isinstance(sphere, str):
+        check_value(sphere, ("auto",), "sphere")
+        sphere = _fit_sphere(info)
+    sphere = np.asarray(sphere, dtype=float)
+    if sphere.shape != (4,):
+        raise ValueError(
+            f"Argument 'sphere' must be 'auto' or an array of shape (4,), got shape "
+            f"{sphere.shape}."
+        )
+    pos = np.array([info["chs"][k]["loc"][:3] for k in picks]) - sphere[:3]
+    key = _hash("csd", pos, sphere[3], lambda2, stiffness, n_legendre_terms)
+    return _get(
+        key,
+        lambda: make_csd_matrix(
+            pos,
+            sphere[3],
+            lambda2=lambda2,
+            stiffness=stiffness,
+            n_legendre_terms=n_legendre_terms,
+        ),
+    )
+
+
+def get_adjacency(info: Info, ch_type: str = "eeg") -> tuple[csr_array, list[str]]:
+    """Get the channel adjacency from the cache.
+
+    Parameters
+    ----------
+    info : mne.Info
+        The measurement information, with the montage set.
+    ch_type : str
+        The channel type, see :func:`mne.channels.find_ch_adjacency`.
+
+    Returns
+    -------
+    adjacency : scipy.sparse.csr_array of shape (n_channels, n_channels)
+        The adjacency matrix.
+    ch_names : list of str
+        The names of the channels, in the order of ``adjacency``.
+    """
+    from mne import pick_types
+
+    check_type(ch_type, (str,), "ch_type")
+    picks = pick_types(info, meg=False, exclude=(), **{ch_type: True})
+    ch_names = [info["ch_names"][k] for k in picks]
+    pos = np.array([info["chs"][k]["loc"][:3] for k in picks])
+    key = _hash("adjacency", ch_type, "\n".join(ch_names), pos)
+    adjacency = _get(key, lambda: _find_adjacency(info, ch_type), sparse=True)
+    return adjacency.copy(), ch_names
+
+
+def get_cached_operator(
+    kind: str, compute: Callable[[], np.ndarray], *args: Any
+) -> np.ndarray:
+    """Get an operator derived from a montage from the cache.
+
+    Parameters
+    ----------
+    kind : str
+        The name of the operator, e.g. ``"topomap"``, which prefixes its cache key.
+    compute : callable
+        The function computing the operator on a cache miss, called without
+        arguments. It returns a dense array.
+    *args : array | str | float | int | tuple
+        The inputs the operator depends on, e.g. the sensor positions and the
+        parameters, hashed into its cache key.
+
+    Returns
+    -------
+    operator : array
+        The read-only operator, shared by every caller.
+    """
+    check_type(kind, (str,), "kind")
+    check_type(compute, ("callable",), "compute")
+    return _get(_hash(kind, *args), compute)
+
+
+def _find_adjacency(info: Info, ch_type: str) -> csr_array:
+    """Compute the channel adjacency with MNE."""
+    from mne.channels import find_ch_adjacency
+    from mne.utils import use_log_level
+
+    with use_log_level(False):
+        adjacency, _ = find_ch_adjacency(info, ch_type)
+    return adjacency.tocsr()
+
+
+def _fit_sphere(info: Info) -> np.ndarray:
+    """Fit a sphere to the digitization points, as in MNE's CSD."""
+    from mne.bem import fit_sphere_to_headshape
+
+    radius, origin_head, origin_device = fit_sphere_to_headshape(
+        info, units="m", verbose=False
+    )
+    return np.array([*(origin_head - origin_device), radius])
+
+
+def _hash(kind: str, *args: Any) -> str:
+    """Hash the inputs of an operator into a cache key."""
+    hasher = sha1(f"{kind}-{_CACHE_VERSION}".encode())
+    for arg in args:
+        if isinstance(arg, np.ndarray):
+            arg = np.ascontiguousarray(arg)
+            hasher.update(f"{arg.dtype.str}{arg.shape}".encode())
+            hasher.update(arg.tobytes())
+        else:
+            hasher.update(repr(arg).encode())
+        hasher.update(b"\x00")
+    return f"{kind}-{hasher.hexdigest()}"
+
+
+def _get(key: str, compute: Callable[[], Any], sparse: bool = False) -> Any:
+    """Get an operator from memory, then from disk, and compute it on a miss."""
+    with _LOCK:
+        if key in _MEMORY:
+            _MEMORY.move_to_end(key)
+            return _MEMORY[key]
+    cache = get_montage_cache()
+    value = None
+    fname = cache.get(key, ".npz")
+    if fname is not None:
+        try:
+            value = _load(fname, sparse)
+        except (OSError, ValueError, KeyError, BadZipFile):
+            warn(f"Discarding the corrupted cache entry {fname.name}.")
+            value = None
+    if value is None:
+        logger.debug("Computing %s.", key)
+        value = compute()
+        cache.put(key, ".npz", lambda fname: _save(fname, value, sparse))
+    if not sparse:
+        value.flags.writeable = False  # shared by every caller
+    with _LOCK:
+        _MEMORY[key] = value
+        while len(_MEMORY) > _MAX_MEMORY_ENTRIES:
+            _MEMORY.popitem(last=False)
+    return value
+
+
+def _save(fname: Path, value: Any, sparse: bool) -> None:
+    """Save an operator to a .npz file."""
+    if sparse:
+        from scipy.sparse import save_npz
+
+        save_npz(fname, value)
+    else:
+        np.savez(fname, value=value)
+
+
+def _load(fname: Path, sparse: bool) -> Any:
+    """Load an operator from a .npz file."""
+    if sparse:
+        from scipy.sparse import load_npz
+
+        return load_npz(fname).tocsr()
+    with np.load(fname, allow_pickle=False) as npz:
+        return npz["value"]
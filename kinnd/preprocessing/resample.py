@@ -0,0 +1,143 @@
+"""Anti-aliased decimation of raw recordings, chunk by chunk.
+
+The recordings are acquired at a rate far above the bandwidth of the analyses, e.g.
+1000 Hz for ERPs low-passed at 40 Hz, and every later step, from the cleaning to the
+epoching, scales with the number of samples. The polyphase resampling of
+:func:`scipy.signal.resample_poly` is applied to overlapping chunks read from the
+recording, so that a non-preloaded :class:`~mne.io.Raw` is decimated without loading
+it at the acquisition rate. The overlap covers the FIR filter, thus the chunks are
+identical to the resampling of the whole recording.
+"""
+
+from __future__ import annotations
+
+from fractions import Fraction
+from typing import TYPE_CHECKING
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from ..utils._checks import check_type
+from ..utils._docs import fill_doc
+from ..utils.logs import logger, verbose
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from mne.io import BaseRaw
+
+
+@fill_doc
+@verbose
+def decimate_raw(
+    raw: BaseRaw,
+    sfreq: float,
+    *,
+    events: Optional[np.ndarray] = None,
+    chunk_duration: float = 60.0,
+    verbose: Optional[Union[bool, str, int]] = None,
+) -> Union[BaseRaw, tuple[BaseRaw, np.ndarray]]:
+    """Decimate a raw recording with an anti-aliasing polyphase filter.
+
+    Parameters
+    ----------
+    raw : mne.io.Raw
+        The recording. It does not need to be preloaded: it is then read chunk by
+        chunk and only the decimated data are held in memory.
+    sfreq : float
+        The new sampling frequency, in Hz, lower than the sampling frequency of
+        ``raw``. The ratio between both is approximated by a fraction whose
+        denominator is at most 1000.
+    events : array of shape (n_events, 3) | None
+        Events of ``raw`` to resample along the data, e.g. from
+        :func:`mne.find_events`.
+    chunk_duration : float
+        The duration of the chunks resampled at once, in seconds.
+    %(verbose)s
+
+    Returns
+    -------
+    raw : mne.io.Raw
+        The decimated recording, preloaded, with the annotations of ``raw``. Its
+        low-pass frequency is at most the new Nyquist frequency.
+    events : array of shape (n_events, 3)
+        The events at the new sampling frequency. Only returned if ``events`` is
+        provided.
+
+    Notes
+    -----
+    The stimulation channels are not filtered, but decimated by picking the nearest
+    sample, which can miss pulses shorter than the new sampling period. Provide the
+    events instead.
+
+    The annotations are defined in seconds and are left unchanged.
+    """
+    from mne import pick_types
+    from mne.io import BaseRaw, RawArray
+
+    check_type(raw, (BaseRaw,), "raw")
+    check_type(sfreq, ("numeric",), "sfreq")
+    check_type(events, (np.ndarray, None), "events")
+    check_type(chunk_duration, ("numeric",), "chunk_duration")
+    if chunk_duration <= 0:
+        raise ValueError("Argument 'chunk_duration' must be strictly positive.")
+    ratio = Fraction(sfreq / raw.info["sfreq"]).limit_denominator(1000)
+    if not 0 < ratio < 1:
+        raise ValueError(
+            f"Argument 'sfreq' must be strictly positive and lower than the sampling "
+            f"frequency of the recording, {raw.info['sfreq']} Hz, got {sfreq} Hz."
+        )
+    up, down = ratio.numerator, ratio.denominator
+    sfreq = raw.info["sfreq"] * up / down
+    n_times = raw.n_times
+    n_times_out = -(-n_times * up // down)
+    # input chunks and their overlap are multiples of 'down', so that the output
+    # samples of each chunk fall on the output samples of the whole recording
+    half_len = 10 * max(up, down) // up + 1
+    n_overlap = -(-half_len // down) * down + down
+    n_chunk = max(int(chunk_duration * raw.info["sfreq"]) // down, 1) * down
+    stim = pick_types(raw.info, meg=False, stim=True)
+    logger.info(
+        "Decimating from %.1f Hz to %.1f Hz (up: %i, down: %i).",
+        raw.info["sfreq"],
+        sfreq,
+        up,
+        down,
+    )
+
+    data = np.empty((len(raw.ch_names), n_times_out))
+    for start in range(0, n_times, n_chunk):
+        first = max(start - n_overlap, 0)
+        last = min(start + n_chunk + n_overlap, n_times)
+        block = raw.get_data(start=first, stop=last)
+        out = slice(
+            start * up // down, min((start + n_chunk) * up // down, n_times_out)
+        )
+        offset = (start - first) * up // down
+        data[:, out] = resample_poly(block, up, down, axis=-1)[
+            :, offset : offset + out.stop - out.start
+        ]
+        if len(stim) != 0:
+            nearest = np.minimum(
+                np.round(np.arange(out.start, out.stop) * down / up).astype(int),
+                n_times - 1,
+            )
+            data[stim, out] = block[stim][:, nearest - first]
+
+    info = raw.info.copy()
+    with info._unlock():
+        info["sfreq"] = sfreq
+        info["lowpass"] = min(info["lowpass"], sfreq / 2)
+    first_samp = int(round(raw.first_samp * up / down))
+    out = RawArray(data, info, first_samp=first_samp, verbose=False)
+    annotations = raw.annotations.copy()
+    if annotations.orig_time is None:  # set relative to the first sample
+        annotations.onset -= out.first_time
+    # the last annotation can end up to a sample past the decimated data
+    out.set_annotations(annotations, emit_warning=False)
+    if events is None:
+        return out
+    events = events.copy()
+    samples = np.round((events[:, 0] - raw.first_samp) * up / down).astype(int)
+    events[:, 0] = np.clip(samples, 0, n_times_out - 1) + first_samp
+    return out, events
@@ -0,0 +1,412 @@
+"""Linear spatial operators applied in channel space.
+
+Interpolation of bad channels with spherical splines, average re-referencing and
+channel selection are all linear in channel space. Instead of applying them one after
+the other, each step being a full pass and a copy over the data, they are composed into
+a single ``(n_channels_out, n_channels_in)`` matrix which is applied once, chunk by
+chunk.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy.polynomial.legendre import legval
+from scipy.linalg import pinv
+
+from ..utils._checks import check_type, check_value
+from ..utils._docs import fill_doc
+from ..utils.logs import logger, verbose
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from mne import Evoked, Info
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw
+
+
+class SpatialOperator:
+    """A linear operator in channel space.
+
+    Parameters
+    ----------
+    matrix : array of shape (n_channels_out, n_channels_in)
+        The operator.
+    ch_names : list of str
+        The names of the input channels, in the order of the columns of ``matrix``.
+    ch_names_out : list of str
+        The names of the output channels, in the order of the rows of ``matrix``.
+    bads : list of str
+        The channels still marked as bad in the output.
+    reference : str | None
+        The reference applied by the operator, ``"average"`` or ``None``.
+
+    Notes
+    -----
+    Use :func:`make_spatial_operator` to create an operator from a measurement info,
+    and :func:`apply_spatial_operator` to apply it to data.
+    """
+
+    def __init__(self, matrix, ch_names, ch_names_out, bads, reference):
+        self.matrix = matrix
+        self.ch_names = list(ch_names)
+        self.ch_names_out = list(ch_names_out)
+        self.bads = list(bads)
+        self.reference = reference
+
+    def __repr__(self) -> str:  # noqa: D105
+        return (
+            f"<SpatialOperator | {len(self.ch_names)} → {len(self.ch_names_out)} "
+            f"channels, reference: {self.reference}>"
+        )
+
+
+def make_interpolation_matrix(
+    pos_from: np.ndarray,
+    pos_to: np.ndarray,
+    alpha: float = 1e-5,
+    stiffness: int = 4,
+    n_legendre_terms: int = 50,
+) -> np.ndarray:
+    """Compute a spherical spline interpolation matrix.
+
+    Parameters
+    ----------
+    pos_from : array of shape (n_from, 3)
+        The positions of the sensors to interpolate from, relative to the origin of
+        the fitted sphere.
+    pos_to : array of shape (n_to, 3)
+        The positions of the sensors to interpolate, relative to the origin of the
+        fitted sphere.
+    alpha : float
+        The regularization parameter.
+    stiffness : int
+        The stiffness of the spline, also referred to as ``m``.
+    n_legendre_terms : int
+        The number of terms of the Legendre series.
+
+    Returns
+    -------
+    interpolation : array of shape (n_to, n_from)
+        The matrix mapping the signals at ``pos_from`` to the signals at ``pos_to``.
+
+    Notes
+    -----
+    This is the same interpolation as :meth:`mne.io.Raw.interpolate_bads` for EEG
+    channels, based on :footcite:t:`perrin_1989`.
+
+    References
+    ----------
+    .. footbibliography::
+    """
+    pos_from = pos_from / np.linalg.norm(pos_from, axis=1, keepdims=True)
+    pos_to = pos_to / np.linalg.norm(pos_to, axis=1, keepdims=True)
+    n_from = pos_from.shape[0]
+    factors = [0] + [
+        (2 * n + 1) / (n**stiffness * (n + 1) ** stiffness * 4 * np.pi)
+        for n in range(1, n_legendre_terms + 1)
+    ]
+    G_from = legval(pos_from @ pos_from.T, factors)
+    G_to_from = legval(pos_to @ pos_from.T, factors)
+    G_from.flat[:: n_from + 1] += alpha
+    C = np.block(
+        [[G_from, np.ones((n_from, 1))], [np.ones((1, n_from)), np.zeros((1, 1))]]
+    )
+    C_inv = pinv(C)
+    return np.hstack([G_to_from, np.ones((len(pos_to), 1))]) @ C_inv[:, :-1]
+
+
+def make_csd_matrix(
+    pos: np.ndarray,
+    radius: float,
+    lambda2: float = 1e-5,
+    stiffness: int = 4,
+    n_legendre_terms: int = 50,
+) -> np.ndarray:
+    """Compute a current source density matrix with spherical splines.
+
+    Parameters
+    ----------
+    pos : array of shape (n_channels, 3)
+        The positions of the sensors, relative to the origin of the fitted sphere.
+    radius : float
+        The radius of the fitted sphere, in meters.
+    lambda2 : float
+        The regularization parameter.
+    stiffness : int
+        The stiffness of the spline, also referred to as ``m``.
+    n_legendre_terms : int
+        The number of terms of the Legendre series.
+
+    Returns
+    -------
+    csd : array of shape (n_channels, n_channels)
+        The matrix mapping the potentials to the current source densities.
+
+    Notes
+    -----
+    This is the same transformation as
+    :func:`mne.preprocessing.compute_current_source_density`, expressed as a single
+    matrix.
+    """
+    if radius <= 0:
+        raise ValueError(f"The sphere radius must be strictly positive, got {radius}.")
+    pos = pos / np.linalg.norm(pos, axis=1, keepdims=True)
+    n_channels = pos.shape[0]
+    cosang = np.clip(pos @ pos.T, -1, 1)
+    n = np.arange(1, n_legendre_terms + 1)
+    factors_g = (2 * n + 1) / (n**stiffness * (n + 1) ** stiffness * 4 * np.pi)
+    factors_h = (2 * n + 1) / (
+        n ** (stiffness - 1) * (n + 1) ** (stiffness - 1) * 4 * np.pi
+    )
+    G = legval(cosang, np.r_[0, factors_g])
+    H = legval(cosang, np.r_[0, factors_h])
+    G.flat[:: n_channels + 1] += lambda2
+    G_inv = np.linalg.inv(G)
+    total = G_inv.sum(axis=0)
+    # the spline coefficients are constrained to sum to 0, and the data are centered
+    coefficients = G_inv - np.outer(total, total) / total.sum()
+    centering = np.eye(n_channels) - 1.0 / n_channels
+    return H @ coefficients @ centering / radius**2
+
+
+@fill_doc
+@verbose
+def make_spatial_operator(
+    info: Info,
+    *,
+    interpolate: bool = True,
+    reset_bads: bool = True,
+    reference: Optional[str] = "average",
+    exclude: Union[list[str], tuple[str, ...]] = (),
+    origin: Union[str, np.ndarray] = "auto",
+    verbose: Optional[Union[bool, str, int]] = None,
+) -> SpatialOperator:
+    """Compose interpolation, re-referencing and channel selection in one operator.
+
+    The operator is equivalent to::
+
+        inst.interpolate_bads(reset_bads=reset_bads)
+        inst.set_eeg_reference("average")
+        inst.drop_channels(exclude)
+
+    Operators are cached per montage, bad channels and parameters, so recomputing the
+    operator of a recording whose bad channels were already seen is free. The
+    interpolation matrices are also persisted to disk, see
+    :func:`~kinnd.preprocessing.montage.get_interpolation_matrix`.
+
+    Parameters
+    ----------
+    info : mne.Info
+        The measurement information, with the montage set and the bad channels in
+        ``info["bads"]``.
+    interpolate : bool
+        If True, interpolate the bad EEG channels with spherical splines.
+    reset_bads : bool
+        If True, the interpolated channels are not marked as bad anymore, and they
+        are included in the average reference. Only used if ``interpolate=True``.
+    reference : ``"average"`` | None
+        The reference to apply to the EEG channels. As in
+        :meth:`mne.io.Raw.set_eeg_reference`, bad channels are neither included in
+        the reference nor re-referenced. If None, no reference is applied.
+    exclude : list of str
+        The channels to drop after referencing, e.g. the channels of the net skirt.
+    origin : array of shape (3,) | ``"auto"``
+        The origin of the sphere used for interpolation, in meters. If ``"auto"``, a
+        sphere is fitted to the digitization points.
+    %(verbose)s
+
+    Returns
+    -------
+    operator : SpatialOperator
+        The composed operator.
+    """
+    from mne import pick_types
+
+    check_type(interpolate, (bool,), "interpolate")
+    check_type(reset_bads, (bool,), "reset_bads")
+    check_value(reference, ("average", None), "reference")
+    check_type(exclude, (list, tuple), "exclude")
+    missing = sorted(set(exclude) - set(info["ch_names"]))
+    if len(missing) != 0:
+        raise ValueError(f"The channels {missing} to exclude are not in the info.")
+    picks_eeg = pick_types(info, meg=False, eeg=True, exclude=())
+    bads = [
+        ch
+        for ch in info["bads"]
+        if ch in info["ch_names"] and info["ch_names"].index(ch) in picks_eeg
+    ]
+    interpolate = interpolate and len(bads) != 0
+    if interpolate:
+        if isinstance(origin, str):
+            check_value(origin, ("auto",), "origin")
+            origin = _fit_origin(info)
+        pos = np.array([info["chs"][k]["loc"][:3] for k in picks_eeg])
+        pos = pos - np.asarray(origin, dtype=float)
+    else:
+        pos = np.zeros((0, 3))
+    matrix = _compute_operator(
+        tuple(info["ch_names"]),
+        tuple(int(k) for k in picks_eeg),
+        pos.tobytes(),
+        tuple(sorted(bads)),
+        interpolate,
+        reset_bads,
+        reference,
+        tuple(exclude),
+    )
+    ch_names_out = [ch for ch in info["ch_names"] if ch not in exclude]
+    bads_out = [
+        ch
+        for ch in info["bads"]
+        if ch not in exclude and not (interpolate and reset_bads and ch in bads)
+    ]
+    logger.info(
+        "Spatial operator: %i bad channels interpolated, %s reference, %i channels "
+        "dropped.",
+        len(bads) if interpolate else 0,
+        reference,
+        len(exclude),
+    )
+    return SpatialOperator(matrix, info["ch_names"], ch_names_out, bads_out, reference)
+
+
+@lru_cache(maxsize=64)
+def _compute_operator(
+    ch_names: tuple[str, ...],
+    picks_eeg: tuple[int, ...],
+    pos: bytes,
+    bads: tuple[str, ...],
+    interpolate: bool,
+    reset_bads: bool,
+    reference: Optional[str],
+    exclude: tuple[str, ...],
+) -> np.ndarray:
+    """Compute the operator matrix; the arguments are hashable for caching."""
+    from .montage import get_interpolation_matrix
+
+    n_channels = len(ch_names)
+    eeg_names = [ch_names[k] for k in picks_eeg]
+    is_bad = np.array([ch in bads for ch in eeg_names], dtype=bool)
+    picks_eeg = np.array(picks_eeg, dtype=int)
+    operator = np.eye(n_channels)
+    if interpolate:
+        pos = np.frombuffer(pos, dtype=float).reshape(-1, 3)
+        interpolation = get_interpolation_matrix(pos[~is_bad], pos[is_bad])
+        rows = picks_eeg[is_bad]
+        operator[rows] = 0.0
+        operator[np.ix_(rows, picks_eeg[~is_bad])] = interpolation
+        if reset_bads:
+            is_bad[:] = False
+    if reference == "average":
+        ref = picks_eeg[~is_bad]
+        reference_matrix = np.eye(n_channels)
+        reference_matrix[np.ix_(ref, ref)] -= 1.0 / ref.size
+        operator = reference_matrix @ operator
+    keep = [k for k, ch in enumerate(ch_names) if ch not in exclude]
+    operator = np.ascontiguousarray(operator[keep])
+    operator.flags.writeable = False  # shared by every caller of the cache
+    return operator
+
+
+def _fit_origin(info: Info) -> np.ndarray:
+    """Fit a sphere to the digitization points and return its origin in meters."""
+    from mne.bem import fit_sphere_to_headshape
+
+    return np.asarray(fit_sphere_to_headshape(info, units="m", verbose=False)[1])
+
+
+@fill_doc
+@verbose
+def apply_spatial_operator(
+    inst: Union[BaseRaw, BaseEpochs, Evoked],
+    operator: Optional[SpatialOperator] = None,
+    *,
+    chunk_duration: float = 10.0,
+    copy: bool = True,
+    verbose: Optional[Union[bool, str, int]] = None,
+    **kwargs,
+) -> Union[BaseRaw, BaseEpochs, Evoked]:
+    """Interpolate, re-reference and drop channels in a single pass over the data.
+
+    Parameters
+    ----------
+    inst : mne.io.Raw | mne.Epochs | mne.Evoked
+        The data. A :class:`~mne.io.Raw` does not need to be preloaded: it is then
+        read chunk by chunk and only the output is held in memory. Epochs are loaded
+        if needed.
+    operator : SpatialOperator | None
+        The operator to apply. If None, it is created from ``inst.info`` with
+        :func:`make_spatial_operator` and the keyword arguments ``kwargs``.
+    chunk_duration : float
+        The duration of the chunks on which the operator is applied, in seconds. For
+        epochs, chunks are groups of epochs of approximately this total duration.
+    copy : bool
+        If True, operate on a copy of ``inst``. Ignored for a non-preloaded
+        :class:`~mne.io.Raw`, for which a new object is always returned.
+    %(verbose)s
+    **kwargs
+        Keyword arguments passed to :func:`make_spatial_operator`, e.g.
+        ``exclude=skirt_channels``.
+
+    Returns
+    -------
+    inst : mne.io.Raw | mne.Epochs | mne.Evoked
+        The transformed data.
+    """
+    from mne import Evoked, pick_info
+    from mne._fiff.constants import FIFF
+    from mne.epochs import BaseEpochs
+    from mne.io import BaseRaw, RawArray
+
+    check_type(inst, (BaseRaw, BaseEpochs, Evoked), "inst")
+    check_type(operator, (SpatialOperator, None), "operator")
+    check_type(chunk_duration, ("numeric",), "chunk_duration")
+    if chunk_duration <= 0:
+        raise ValueError("Argument 'chunk_duration' must be strictly positive.")
+    if operator is None:
+        operator = make_spatial_operator(inst.info, **kwargs)
+    elif len(kwargs) != 0:
+        raise ValueError(
+            "Keyword arguments for make_spatial_operator can not be provided along an "
+            "existing operator."
+        )
+    if operator.ch_names != inst.ch_names:
+        raise ValueError("The channels of the operator do not match the data.")
+    matrix = operator.matrix
+    keep = [inst.ch_names.index(ch) for ch in operator.ch_names_out]
+    n_chunk = max(int(round(chunk_duration * inst.info["sfreq"])), 1)
+
+    if isinstance(inst, BaseRaw) and not inst.preload:
+        n_times = inst.n_times
+        data = np.empty((len(keep), n_times))
+        for start in range(0, n_times, n_chunk):
+            stop = min(start + n_chunk, n_times)
+            data[:, start:stop] = matrix @ inst.get_data(start=start, stop=stop)
+        info = pick_info(inst.info, keep)
+        out = RawArray(data, info, first_samp=inst.first_samp, verbose=False)
+        out.set_annotations(inst.annotations)
+    else:
+        out = inst.copy() if copy else inst
+        if isinstance(out, BaseEpochs):
+            out.load_data()
+            n_epochs = max(n_chunk // len(out.times), 1)
+            for start in range(0, len(out), n_epochs):
+                chunk = out._data[start : start + n_epochs]
+                chunk[:, keep] = np.matmul(matrix, chunk)
+        elif isinstance(out, BaseRaw):
+            for start in range(0, out.n_times, n_chunk):
+                chunk = out._data[:, start : start + n_chunk]
+                chunk[keep] = matrix @ chunk
+        else:
+            out.data[keep] = matrix @ out.data
+        if len(keep) != len(out.ch_names):
+            out.pick(operator.ch_names_out)
+    with out.info._unlock():
+        out.info["bads"] = list(operator.bads)
+        if operator.reference is not None:
+            out.info["custom_ref_applied"] = FIFF.FIFFV_MNE_CUSTOM_REF_ON
+    return out
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from mne import create_info
+from mne.channels import find_ch_adjacency, make_standard_montage
+from mne.io import RawArray
+from mne.preprocessing import compute_current_source_density
+
+from .. import montage as montage_module
+from ..montage import (
+    clear_montage_cache,
+    get_adjacency,
+    get_cached_operator,
+    get_csd_matrix,
+    get_interpolation_matrix,
+    get_montage_cache,
+    get_standard_montage,
+)
+from ..spatial import make_interpolation_matrix
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Use an empty cache."""
+    monkeypatch.setenv("KINND_CACHE_DIR", str(tmp_path))
+    clear_montage_cache(disk=False)
+    yield tmp_path / "montage"
+    clear_montage_cache(disk=False)
+
+
+@pytest.fixture(scope="module")
+def raw():
+    """Create a 129 channels EGI recording."""
+    montage = make_standard_montage("GSN-HydroCel-129")
+    info = create_info(montage.ch_names, 250.0, "eeg")
+    info.set_montage(montage)
+    rng = np.random.default_rng(0)
+    return RawArray(rng.standard_normal((129, 500)) * 1e-6, info, verbose=False)
+
+
+def test_standard_montage():
+    """Test that the standard montages are read once and copied."""
+    montage = get_standard_montage("GSN-HydroCel-129")
+    montage.rename_channels({"E1": "foo"})
+    assert get_standard_montage("GSN-HydroCel-129").ch_names[0] == "E1"
+
+
+def test_interpolation_matrix(cache_dir):
+    """Test caching the interpolation matrices in memory and on disk."""
+    rng = np.random.default_rng(0)
+    pos = rng.standard_normal((20, 3))
+    expected = make_interpolation_matrix(pos[2:], pos[:2])
+    interpolation = get_interpolation_matrix(pos[2:], pos[:2])
+    np.testing.assert_allclose(interpolation, expected)
+    assert not interpolation.flags.writeable
+    assert len(list(cache_dir.glob("interpolation-*.npz"))) == 1
+    assert get_interpolation_matrix(pos[2:], pos[:2]) is interpolation
+    # a different bad set is a different entry
+    get_interpolation_matrix(pos[3:], pos[:3])
+    assert len(get_montage_cache()) == 2
+
+    # reloaded from disk, e.g. by another process
+    clear_montage_cache(disk=False)
+    reloaded = get_interpolation_matrix(pos[2:], pos[:2])
+    assert reloaded is not interpolation
+    np.testing.assert_array_equal(reloaded, interpolation)
+
+    # corrupted entry
+    clear_montage_cache(disk=False)
+    for fname in cache_dir.glob("interpolation-*.npz"):
+        fname.write_bytes(b"corrupted")
+    with pytest.warns(RuntimeWarning, match="corrupted cache entry"):
+        reloaded = get_interpolation_matrix(pos[2:], pos[:2])
+    np.testing.assert_allclose(reloaded, expected)
+
+    clear_montage_cache()
+    assert len(get_montage_cache()) == 0
+
+
+def test_csd_matrix(raw, cache_dir):
+    """Test the current source density matrix against MNE."""
+    expected = compute_current_source_density(raw, verbose=False).get_data()
+    csd = get_csd_matrix(raw.info)
+    np.testing.assert_allclose(csd @ raw.get_data(), expected, rtol=1e-6, atol=1e-12)
+    assert get_csd_matrix(raw.info) is csd
+    with pytest.raises(ValueError, match="array of shape"):
+        get_csd_matrix(raw.info, sphere=[0, 0, 0])
+
+
+def test_adjacency(raw, cache_dir, monkeypatch):
+    """Test caching the channel adjacency."""
+    expected, ch_names_expected = find_ch_adjacency(raw.info, "eeg")
+    adjacency, ch_names = get_adjacency(raw.info)
+    assert ch_names == ch_names_expected
+    assert (adjacency != expected).nnz == 0
+
+    # reloaded from disk without recomputing
+    clear_montage_cache(disk=False)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("Recomputed")
+
+    monkeypatch.setattr(montage_module, "_find_adjacency", _fail)
+    adjacency, _ = get_adjacency(raw.info)
+    assert (adjacency != expected).nnz == 0
+
+
+def test_cached_operator(cache_dir):
+    """Test caching an operator computed outside of the module."""
+    calls = list()
+
+    def compute():
+        calls.append(None)
+        return np.eye(3)
+
+    pos = np.zeros((3, 2))
+    operator = get_cached_operator("test", compute, pos, 64, "cubic")
+    np.testing.assert_array_equal(operator, np.eye(3))
+    assert not operator.flags.writeable
+    assert get_cached_operator("test", compute, pos, 64, "cubic") is operator
+    clear_montage_cache(disk=False)
+    np.testing.assert_array_equal(
+        get_cached_operator("test", compute, pos, 64, "cubic"), np.eye(3)
+    )
+    assert len(calls) == 1
+    get_cached_operator("test", compute, pos, 32, "cubic")
+    assert len(calls) == 2
+    with pytest.raises(TypeError, match="must be an instance of"):
+        get_cached_operator("test", np.eye(3), pos)
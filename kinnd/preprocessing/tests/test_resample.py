@@ -0,0 +1,58 @@
+import mne
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from ..resample import decimate_raw
+
+
+@pytest.fixture(scope="module")
+def raw_fname(tmp_path_factory):
+    """Write a recording with a stimulation channel and annotations."""
+    rng = np.random.default_rng(0)
+    info = mne.create_info(["E1", "E2", "E3", "STI"], 1000.0, ["eeg"] * 3 + ["stim"])
+    data = rng.standard_normal((4, 12345))
+    data[3] = 0
+    data[3, 2000:2010] = 1
+    data[3, 8000:8010] = 2
+    raw = mne.io.RawArray(data, info, first_samp=1003, verbose=False)
+    raw.set_annotations(mne.Annotations([2.0, 8.0], 0.5, "tone"))
+    fname = tmp_path_factory.mktemp("resample") / "test_raw.fif"
+    raw.save(fname, fmt="double", verbose=False)
+    return fname
+
+
+@pytest.mark.parametrize(("sfreq", "up", "down"), [(250.0, 1, 4), (400.0, 2, 5)])
+def test_decimate_raw(raw_fname, sfreq, up, down):
+    """Test decimating a non-preloaded recording chunk by chunk."""
+    raw = mne.io.read_raw_fif(raw_fname, verbose=False)
+    events = mne.find_events(raw, verbose=False)
+    out, out_events = decimate_raw(raw, sfreq, events=events, chunk_duration=1.3)
+    assert not raw.preload
+    assert out.info["sfreq"] == sfreq
+    assert out.info["lowpass"] == sfreq / 2
+    # the chunks match the resampling of the whole recording
+    expected = resample_poly(raw.get_data(picks="eeg"), up, down, axis=-1)
+    np.testing.assert_allclose(out.get_data(picks="eeg"), expected, atol=1e-12)
+    # the events, the stimulation channel and the annotations stay aligned
+    np.testing.assert_array_equal(out_events[:, 2], events[:, 2])
+    np.testing.assert_allclose(
+        (out_events[:, 0] - out.first_samp) / sfreq,
+        (events[:, 0] - raw.first_samp) / raw.info["sfreq"],
+    )
+    np.testing.assert_array_equal(mne.find_events(out, verbose=False), out_events)
+    np.testing.assert_allclose(out.annotations.onset, raw.annotations.onset)
+    assert out.first_time == pytest.approx(raw.first_time, abs=1 / sfreq)
+
+
+def test_decimate_raw_invalid(raw_fname):
+    """Test invalid arguments."""
+    raw = mne.io.read_raw_fif(raw_fname, verbose=False)
+    with pytest.raises(ValueError, match="lower than the sampling frequency"):
+        decimate_raw(raw, 1000.0)
+    with pytest.raises(ValueError, match="lower than the sampling frequency"):
+        decimate_raw(raw, 0)
+    with pytest.raises(ValueError, match="strictly positive"):
+        decimate_raw(raw, 250.0, chunk_duration=0)
+    with pytest.raises(TypeError, match="must be an instance of"):
+        decimate_raw(raw.get_data(), 250.0)
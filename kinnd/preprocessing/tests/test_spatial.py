@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from mne import EpochsArray, create_info
+from mne.channels import make_standard_montage
+from mne.io import RawArray, read_raw_fif
+
+from ..spatial import (
+    SpatialOperator,
+    apply_spatial_operator,
+    make_spatial_operator,
+)
+
+SKIRT = ["E8", "E14", "E17", "E21", "E25"]
+
+
+@pytest.fixture(scope="module")
+def raw():
+    """Create a 129 channels EGI recording with a few bad channels."""
+    montage = make_standard_montage("GSN-HydroCel-129")
+    info = create_info(montage.ch_names + ["STI"], 250.0, ["eeg"] * 129 + ["stim"])
+    info.set_montage(montage)
+    rng = np.random.default_rng(0)
+    raw = RawArray(rng.standard_normal((130, 2500)) * 1e-6, info, verbose=False)
+    raw.info["bads"] = ["E10", "E50", "E100"]
+    return raw
+
+
+def _reference(inst, exclude=SKIRT, reset_bads=True):
+    """Apply interpolation, re-referencing and channel drops with MNE."""
+    inst = inst.copy().interpolate_bads(reset_bads=reset_bads, verbose=False)
+    inst.set_eeg_reference("average", verbose=False)
+    return inst.drop_channels(exclude)
+
+
+def test_spatial_operator_raw(raw, tmp_path):
+    """Test the fused operator on preloaded and lazy raw recordings."""
+    expected = _reference(raw)
+    out = apply_spatial_operator(raw, exclude=SKIRT, chunk_duration=3.0)
+    assert out.ch_names == expected.ch_names
+    assert out.info["bads"] == []
+    assert out.info["custom_ref_applied"]
+    np.testing.assert_allclose(out.get_data(), expected.get_data(), atol=1e-15)
+    assert raw.info["bads"] == ["E10", "E50", "E100"]  # copy
+
+    # lazy raw
+    fname = tmp_path / "test_raw.fif"
+    raw.save(fname, verbose=False)
+    raw_lazy = read_raw_fif(fname, preload=False, verbose=False)
+    out = apply_spatial_operator(raw_lazy, exclude=SKIRT, chunk_duration=1.1)
+    assert not raw_lazy.preload
+    expected = _reference(raw_lazy.copy().load_data())  # saved in single precision
+    assert out.ch_names == expected.ch_names
+    assert out.first_samp == raw_lazy.first_samp
+    np.testing.assert_allclose(out.get_data(), expected.get_data(), atol=1e-15)
+
+    # without resetting the bads
+    expected = _reference(raw, exclude=[], reset_bads=False)
+    out = apply_spatial_operator(raw, reset_bads=False)
+    assert out.info["bads"] == raw.info["bads"]
+    np.testing.assert_allclose(out.get_data(), expected.get_data(), atol=1e-15)
+
+
+def test_spatial_operator_epochs_evoked(raw):
+    """Test the fused operator on epochs and evoked data."""
+    rng = np.random.default_rng(1)
+    epochs = EpochsArray(
+        rng.standard_normal((7, 130, 50)) * 1e-6, raw.info, verbose=False
+    )
+    operator = make_spatial_operator(epochs.info, exclude=SKIRT)
+    assert isinstance(operator, SpatialOperator)
+    assert "130 → 125" in repr(operator)
+    out = apply_spatial_operator(epochs, operator, chunk_duration=0.5)
+    expected = _reference(epochs)
+    np.testing.assert_allclose(out.get_data(), expected.get_data(), atol=1e-15)
+
+    evoked = epochs.average(picks="all")
+    out = apply_spatial_operator(evoked, operator, copy=False)
+    assert out is evoked
+    np.testing.assert_allclose(out.data, expected.average(picks="all").data, atol=1e-15)
+
+
+def test_spatial_operator_cache(raw):
+    """Test that operators are cached per bad channels."""
+    operator1 = make_spatial_operator(raw.info, exclude=SKIRT)
+    info = raw.info.copy()
+    info["bads"] = info["bads"][::-1]
+    operator2 = make_spatial_operator(info, exclude=SKIRT)
+    assert operator1.matrix is operator2.matrix
+    assert not operator1.matrix.flags.writeable
+    info["bads"] = ["E10"]
+    operator3 = make_spatial_operator(info, exclude=SKIRT)
+    assert operator3.matrix is not operator1.matrix
+
+
+def test_spatial_operator_invalid(raw):
+    """Test invalid arguments."""
+    with pytest.raises(ValueError, match="to exclude are not in the info"):
+        make_spatial_operator(raw.info, exclude=["foo"])
+    with pytest.raises(ValueError, match="Invalid value for the 'reference'"):
+        make_spatial_operator(raw.info, reference="REST")
+    operator = make_spatial_operator(raw.info)
+    with pytest.raises(ValueError, match="can not be provided along"):
+        apply_spatial_operator(raw, operator, exclude=SKIRT)
+    with pytest.raises(ValueError, match="do not match the data"):
+        apply_spatial_operator(raw.copy().drop_channels(["E1"]), operator)
+    with pytest.raises(ValueError, match="strictly positive"):
+        apply_spatial_operator(raw, operator, chunk_duration=0)
@@ -0,0 +1,9 @@
+"""Quality-control reports."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["report"],
+    submod_attrs={"report": ["make_index", "make_report", "update_reports"]},
+)
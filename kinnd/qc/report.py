@@ -0,0 +1,467 @@
+"""Static HTML quality-control reports.
+
+A report is a single HTML file per subject, with its figures embedded as PNG images,
+and an index page summarizes the cohort. The figures are drawn on
+:class:`matplotlib.figure.Figure` objects rendered by the Agg canvas, without
+``pyplot``, thus reports can be generated headless in worker processes. The summary of
+each report is cached with the fingerprint of its inputs, so that unchanged subjects
+are skipped on the next run.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+from functools import partial
+from html import escape
+from io import BytesIO
+from pathlib import Path
+from tempfile import mkstemp
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..utils._checks import check_type, ensure_int, ensure_path
+from ..utils.logs import logger, warn
+from ..utils.parallel import parallel_imap
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any, Callable, Optional, Union
+
+    from matplotlib.figure import Figure
+    from mne import BaseEpochs
+
+
+# bump to regenerate the reports written by a previous version of the figures
+_QC_VERSION = "1"
+_SUMMARIES = "qc.json"
+_INDEX = "index.html"
+_STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+h1 { font-size: 1.6em; } h2 { font-size: 1.2em; margin-top: 2em; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 0.3em 0.8em; text-align: right; }
+th { background: #f0f0f0; } td:first-child { text-align: left; }
+tr.flagged td { background: #fde8e8; }
+img { max-width: 100%; }
+"""
+
+
+def make_report(
+    epochs: BaseEpochs,
+    fname: Union[str, Path],
+    *,
+    subject: str,
+    bads: Optional[list[str]] = None,
+    n_expected: int = 60,
+    max_bads: float = 0.1,
+    times: Optional[Iterable[float]] = None,
+    fmax: float = 50.0,
+) -> dict[str, Any]:
+    """Write the QC report of a subject.
+
+    The report contains the bad channels, the number of trials per condition, the
+    power spectral density, the evoked responses and their topographies.
+
+    Parameters
+    ----------
+    epochs : mne.Epochs
+        The epochs of the subject, with the montage set. The conditions are the keys
+        of ``epochs.event_id``.
+    fname : str | Path
+        Path to the ``.html`` report.
+    subject : str
+        The subject, e.g. ``"sub-2001"``.
+    bads : list of str | None
+        The channels marked as bad, e.g. before their interpolation. If None,
+        ``epochs.info["bads"]`` is used.
+    n_expected : int
+        The expected number of trials per condition.
+    max_bads : float
+        The fraction of bad channels above which the subject is flagged.
+    times : list of float | None
+        The latencies of the topographies, in seconds. If None, 5 latencies evenly
+        spread after the stimulus onset are used.
+    fmax : float
+        The maximum frequency of the power spectral density, in Hz.
+
+    Returns
+    -------
+    summary : dict
+        The summary of the report, displayed on the cohort index page: the subject,
+        the report file name, the number of channels, the bad channels, the number of
+        trials per condition and the reasons why the subject is flagged.
+    """
+    from ..spectral import psd_array
+    from ..viz import TopomapRenderer
+
+    fname = ensure_path(fname, must_exist=False)
+    check_type(subject, (str,), "subject")
+    n_expected = ensure_int(n_expected, "n_expected")
+    check_type(max_bads, ("numeric",), "max_bads")
+    bads = list(epochs.info["bads"] if bads is None else bads)
+    conditions = list(epochs.event_id)
+    n_trials = {condition: len(epochs[condition]) for condition in conditions}
+    if times is None:
+        times = np.linspace(0, epochs.tmax, 6)[1:].round(3)
+    times = np.atleast_1d(np.asarray(times, dtype=float))
+    flags = list()
+    if len(bads) > max_bads * len(epochs.ch_names):
+        flags.append(f"{len(bads)} bad channels")
+    flags.extend(
+        f"{n} {condition} trials" for condition, n in n_trials.items() if n < n_expected
+    )
+
+    renderer = TopomapRenderer(epochs.info)
+    data = epochs.get_data(picks=renderer.ch_names)
+    sections = [
+        ("Bad channels", _plot_bads(renderer, data, bads)),
+        ("Trials", _plot_trials(n_trials, n_expected)),
+    ]
+    if len(epochs) != 0:
+        psd, freqs = psd_array(
+            data, epochs.info["sfreq"], fmax=fmax, n_fft=int(epochs.info["sfreq"])
+        )
+        sections.append(("Power spectral density", _plot_psd(psd.mean(axis=0), freqs)))
+        evokeds = {
+            condition: epochs[condition].average(picks=renderer.ch_names)
+            for condition in conditions
+            if n_trials[condition] != 0
+        }
+        sections.append(("Evoked responses", _plot_butterfly(evokeds)))
+        sections.append(("Topographies", _plot_topomaps(renderer, evokeds, times)))
+
+    summary = dict(
+        subject=subject,
+        report=fname.name,
+        n_channels=len(epochs.ch_names),
+        bads=bads,
+        n_trials=n_trials,
+        n_expected=n_expected,
+        flags=flags,
+    )
+    body = [f"<h1>{escape(subject)}</h1>", _summary_table(summary)]
+    for title, fig in sections:
+        body.append(f"<h2>{escape(title)}</h2>\n{_fig_to_html(fig)}")
+    _write_html(fname, f"QC - {subject}", "\n".join(body))
+    return summary
+
+
+def make_index(
+    summaries: Iterable[dict[str, Any]],
+    fname: Union[str, Path],
+    *,
+    title: str = "QC",
+) -> Path:
+    """Write the cohort index page of the QC reports.
+
+    Parameters
+    ----------
+    summaries : list of dict
+        The summaries returned by :func:`make_report`.
+    fname : str | Path
+        Path to the ``.html`` index page, in the directory of the reports.
+    title : str
+        The title of the page.
+
+    Returns
+    -------
+    fname : Path
+        The path to the index page.
+    """
+    fname = ensure_path(fname, must_exist=False)
+    check_type(title, (str,), "title")
+    summaries = sorted(summaries, key=lambda summary: summary["subject"])
+    conditions = list(
+        dict.fromkeys(
+            condition for summary in summaries for condition in summary["n_trials"]
+        )
+    )
+    n_flagged = sum(len(summary["flags"]) != 0 for summary in summaries)
+    header = "".join(
+        f"<th>{escape(name)}</th>"
+        for name in ("Subject", "Bad channels", *conditions, "Flags")
+    )
+    rows = list()
+    for summary in summaries:
+        cells = [
+            f'<a href="{escape(summary["report"])}">{escape(summary["subject"])}</a>',
+            str(len(summary["bads"])),
+            *(str(summary["n_trials"].get(condition, "")) for condition in conditions),
+            escape(", ".join(summary["flags"])),
+        ]
+        tr = '<tr class="flagged">' if summary["flags"] else "<tr>"
+        rows.append(tr + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    body = [
+        f"<h1>{escape(title)}</h1>",
+        f"<p>{len(summaries)} subjects, {n_flagged} flagged.</p>",
+    ]
+    if len(summaries) != 0:
+        body.append(_fig_to_html(_plot_cohort(summaries, conditions)))
+    body.append(f"<table>\n<tr>{header}</tr>\n" + "\n".join(rows) + "\n</table>")
+    _write_html(fname, title, "\n".join(body))
+    return fname
+
+
+def update_reports(
+    directory: Union[str, Path],
+    func: Callable[[str, Path], Optional[dict[str, Any]]],
+    subjects: Iterable[str],
+    *,
+    fingerprints: Optional[Union[dict[str, str], Callable[[str], str]]] = None,
+    n_jobs: Optional[int] = 1,
+    overwrite: bool = False,
+    title: str = "QC",
+) -> Path:
+    """Write the QC reports of new or changed subjects and the cohort index page.
+
+    Parameters
+    ----------
+    directory : str | Path
+        The directory of the reports. It is created if it does not exist.
+    func : callable
+        Function called as ``func(subject, fname)`` which writes the report of a
+        subject to ``fname``, e.g. with :func:`make_report`, and returns its summary,
+        or ``None`` to skip the subject. When ``n_jobs`` is greater than 1, ``func``
+        must be picklable.
+    subjects : iterable of str
+        The subjects to include in the index page, e.g. ``["sub-2001"]``.
+    fingerprints : dict | callable | None
+        The fingerprint of the inputs of each subject, as a mapping or as a function
+        called as ``fingerprints(subject)``. The report of a subject is regenerated if
+        its fingerprint changed. If ``None``, existing reports are never regenerated
+        (unless ``overwrite=True``).
+    n_jobs : int | None
+        The number of worker processes rendering the reports.
+    overwrite : bool
+        If True, regenerate every report, even if its fingerprint is unchanged.
+    title : str
+        The title of the index page.
+
+    Returns
+    -------
+    fname : Path
+        The path to the index page.
+    """
+    directory = ensure_path(directory, must_exist=False)
+    check_type(overwrite, (bool,), "overwrite")
+    subjects = [str(subject) for subject in subjects]
+    if len(set(subjects)) != len(subjects):
+        raise ValueError("The provided subjects contain duplicates.")
+    if isinstance(fingerprints, dict):
+        fingerprints = fingerprints.get
+    directory.mkdir(parents=True, exist_ok=True)
+    cache = _read_summaries(directory)
+    current = {
+        subject: f"{'' if fingerprints is None else fingerprints(subject)}-"
+        f"{_QC_VERSION}"
+        for subject in subjects
+    }
+    todo = [
+        subject
+        for subject in subjects
+        if overwrite
+        or subject not in cache
+        or not (directory / cache[subject]["summary"]["report"]).exists()
+        or (
+            fingerprints is not None
+            and cache[subject]["fingerprint"] != current[subject]
+        )
+    ]
+    logger.info("%i / %i QC reports to (re)generate.", len(todo), len(subjects))
+    items = [(subject, directory / f"{subject}.html") for subject in todo]
+    for (subject, _), summary in parallel_imap(
+        partial(_write_report, func=func), items, n_jobs=n_jobs
+    ):
+        if summary is None:
+            warn(f"Skipping subject {subject}, no report was written.")
+            cache.pop(subject, None)
+            continue
+        cache[subject] = dict(fingerprint=current[subject], summary=summary)
+        # written after each report, so that an interrupted run keeps its progress
+        _write_summaries(directory, cache)
+        logger.info("QC report of subject %s written.", subject)
+    _write_summaries(directory, cache)
+    return make_index(
+        [cache[subject]["summary"] for subject in subjects if subject in cache],
+        directory / _INDEX,
+        title=title,
+    )
+
+
+def _write_report(item: tuple[str, Path], *, func) -> Optional[dict[str, Any]]:
+    """Write the report of a (subject, fname) item."""
+    subject, fname = item
+    return func(subject, fname)
+
+
+def _read_summaries(directory: Path) -> dict[str, dict]:
+    """Read the cached summaries of the reports."""
+    fname = directory / _SUMMARIES
+    if not fname.exists():
+        return dict()
+    try:
+        with open(fname, encoding="utf-8") as fid:
+            return json.load(fid)
+    except (OSError, ValueError):
+        warn(f"Discarding the corrupted QC cache {fname}.")
+        return dict()
+
+
+def _write_summaries(directory: Path, cache: dict[str, dict]) -> None:
+    """Write the cached summaries of the reports atomically."""
+    fd, tmp = mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as fid:
+        json.dump(cache, fid, indent=1, sort_keys=True)
+    os.replace(tmp, directory / _SUMMARIES)
+
+
+def _write_html(fname: Path, title: str, body: str) -> None:
+    """Write a standalone HTML page."""
+    with open(fname, "w", encoding="utf-8") as fid:
+        fid.write(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8'>\n"
+            f"<title>{escape(title)}</title>\n<style>{_STYLE}</style>\n</head>\n"
+            f"<body>\n{body}\n</body>\n</html>\n"
+        )
+
+
+def _fig_to_html(fig: Figure) -> str:
+    """Render a figure with Agg and embed it as a PNG image."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f'<img src="data:image/png;base64,{data}">'
+
+
+def _summary_table(summary: dict[str, Any]) -> str:
+    """Format the summary of a subject as a table."""
+    rows = [
+        ("Channels", summary["n_channels"]),
+        ("Bad channels", ", ".join(summary["bads"]) or "none"),
+        *(
+            (f"Trials {condition}", f"{n} / {summary['n_expected']}")
+            for condition, n in summary["n_trials"].items()
+        ),
+        ("Flags", ", ".join(summary["flags"]) or "none"),
+    ]
+    cells = "\n".join(
+        f"<tr><td>{escape(name)}</td><td>{escape(str(value))}</td></tr>"
+        for name, value in rows
+    )
+    return f"<table>\n{cells}\n</table>"
+
+
+def _plot_bads(renderer, data, bads):
+    """Plot the z-scored log standard deviation of the channels and the bads."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4, 4), layout="constrained")
+    ax = fig.subplots()
+    if data.shape[0] != 0:
+        std = np.log10(data.std(axis=(0, 2)) + np.finfo(float).tiny)
+        zscore = (std - std.mean()) / max(std.std(), np.finfo(float).eps)
+    else:
+        zscore = np.zeros(data.shape[1])
+    renderer.plot(zscore, ax=ax, colorbar=True, vlim=(-3, 3))
+    ax.set_title("Channel variability (z-score)")
+    picks = [k for k, ch in enumerate(renderer.ch_names) if ch in bads]
+    if len(picks) != 0:
+        ax.plot(*renderer.pos[picks].T, "kx", markersize=6, label="bad")
+        ax.legend(loc="lower right", fontsize="small")
+    return fig
+
+
+def _plot_trials(n_trials, n_expected):
+    """Plot the number of trials per condition against the expected number."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4, 3), layout="constrained")
+    ax = fig.subplots()
+    counts = list(n_trials.values())
+    colors = ["tab:red" if n < n_expected else "tab:blue" for n in counts]
+    ax.bar(range(len(counts)), counts, color=colors)
+    ax.set_xticks(range(len(counts)), list(n_trials))
+    ax.axhline(n_expected, color="k", linestyle="--", label="expected")
+    ax.set_ylabel("Trials")
+    ax.legend(loc="lower right", fontsize="small")
+    return fig
+
+
+def _plot_psd(psd, freqs):
+    """Plot the power spectral density of every channel and their median."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 3), layout="constrained")
+    ax = fig.subplots()
+    db = 10 * np.log10(psd * 1e12 + np.finfo(float).tiny)  # V²/Hz to dB(µV²/Hz)
+    ax.plot(freqs, db.T, color="tab:blue", alpha=0.2, linewidth=0.5)
+    ax.plot(freqs, np.median(db, axis=0), color="k", linewidth=1.5, label="median")
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("PSD (dB µV²/Hz)")
+    ax.legend(loc="upper right", fontsize="small")
+    return fig
+
+
+def _plot_butterfly(evokeds):
+    """Plot the evoked response of every channel, one axes per condition."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(4 * max(len(evokeds), 1), 3), layout="constrained")
+    axes = np.atleast_1d(fig.subplots(1, max(len(evokeds), 1), sharey=True))
+    for ax, (condition, evoked) in zip(axes, evokeds.items()):
+        ax.plot(evoked.times, evoked.data.T * 1e6, color="k", linewidth=0.3)
+        ax.axvline(0, color="tab:red", linewidth=0.5)
+        ax.set_title(f"{condition} (N={evoked.nave})")
+        ax.set_xlabel("Time (s)")
+    axes[0].set_ylabel("Amplitude (µV)")
+    return fig
+
+
+def _plot_topomaps(renderer, evokeds, times):
+    """Plot the topographies at a few latencies, one row per condition."""
+    from matplotlib.figure import Figure
+
+    n_rows, n_cols = max(len(evokeds), 1), len(times)
+    fig = Figure(figsize=(1.8 * n_cols + 1, 1.8 * n_rows), layout="constrained")
+    axes = np.atleast_2d(fig.subplots(n_rows, n_cols, squeeze=False))
+    if len(evokeds) == 0:
+        return fig
+    data, titles = list(), list()
+    for condition, evoked in evokeds.items():
+        idx = evoked.time_as_index(times, use_rounding=True)
+        data.append(evoked.data[:, idx] * 1e6)
+        titles.extend(f"{condition}\n{time:.3f} s" for time in evoked.times[idx])
+    renderer.plot_grid(np.hstack(data), titles=titles, axes=axes.ravel())
+    for ax in axes.ravel():
+        ax.title.set_fontsize("small")
+    return fig
+
+
+def _plot_cohort(summaries, conditions):
+    """Plot the distributions of the bad channels and trials across the cohort."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 3), layout="constrained")
+    ax_bads, ax_trials = fig.subplots(1, 2)
+    rng = np.random.default_rng(0)  # jitter of the points
+    n_bads = [len(summary["bads"]) for summary in summaries]
+    ax_bads.hist(n_bads, bins=np.arange(max(n_bads) + 2) - 0.5, color="tab:blue")
+    ax_bads.set_xlabel("Bad channels")
+    ax_bads.set_ylabel("Subjects")
+    for k, condition in enumerate(conditions):
+        counts = [
+            summary["n_trials"][condition]
+            for summary in summaries
+            if condition in summary["n_trials"]
+        ]
+        ax_trials.plot(k + rng.uniform(-0.15, 0.15, len(counts)), counts, "o", ms=3)
+    n_expected = max(summary["n_expected"] for summary in summaries)
+    ax_trials.axhline(n_expected, color="k", linestyle="--", label="expected")
+    ax_trials.set_xticks(range(len(conditions)), conditions)
+    ax_trials.set_xlim(-0.5, len(conditions) - 0.5)
+    ax_trials.set_ylabel("Trials")
+    ax_trials.legend(loc="lower right", fontsize="small")
+    return fig
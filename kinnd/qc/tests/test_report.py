@@ -0,0 +1,105 @@
+import json
+
+import mne
+import numpy as np
+import pytest
+
+from ..report import make_index, make_report, update_reports
+
+
+def _make_epochs(n_match=60, n_mismatch=52, seed=0):
+    """Create epochs of 2 conditions with the GSN-HydroCel-129 montage."""
+    montage = mne.channels.make_standard_montage("GSN-HydroCel-129")
+    info = mne.create_info(montage.ch_names, 250.0, "eeg")
+    info.set_montage(montage)
+    info["bads"] = ["E1", "E2"]
+    n_epochs = n_match + n_mismatch
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((n_epochs, 129, 276)) * 1e-6
+    events = np.c_[
+        np.arange(n_epochs) * 300,
+        np.zeros(n_epochs, int),
+        [1] * n_match + [2] * n_mismatch,
+    ]
+    return mne.EpochsArray(
+        data, info, events, tmin=-0.1, event_id=dict(match=1, mismatch=2), verbose=False
+    )
+
+
+def _write(subject, fname):
+    """Write a placeholder report of a subject, skipping sub-03."""
+    if subject == "sub-03":
+        return None
+    fname.write_text(subject, encoding="utf-8")
+    return dict(
+        subject=subject,
+        report=fname.name,
+        n_channels=129,
+        bads=["E1"],
+        n_trials=dict(match=60, mismatch=58),
+        n_expected=60,
+        flags=["58 mismatch trials"],
+    )
+
+
+def test_make_report(tmp_path):
+    """Test writing the report of a subject."""
+    epochs = _make_epochs()
+    summary = make_report(epochs, tmp_path / "sub-01.html", subject="sub-01")
+    assert summary["bads"] == ["E1", "E2"]
+    assert summary["n_trials"] == dict(match=60, mismatch=52)
+    assert summary["flags"] == ["52 mismatch trials"]
+    assert summary["report"] == "sub-01.html"
+    html = (tmp_path / "sub-01.html").read_text(encoding="utf-8")
+    assert html.count("data:image/png;base64,") == 5
+    assert "52 / 60" in html
+    summary = make_report(
+        epochs, tmp_path / "sub-02.html", subject="sub-02", n_expected=50, max_bads=0
+    )
+    assert summary["flags"] == ["2 bad channels"]
+
+    fname = make_index([summary], tmp_path / "index.html", title="cohort")
+    html = fname.read_text(encoding="utf-8")
+    assert '<a href="sub-02.html">sub-02</a>' in html
+    assert 'class="flagged"' in html
+    assert "1 subjects, 1 flagged" in html
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_update_reports(tmp_path, n_jobs):
+    """Test that only new or changed subjects are regenerated."""
+    subjects = ["sub-01", "sub-02", "sub-03"]
+    fingerprints = dict.fromkeys(subjects, "a")
+    with pytest.warns(RuntimeWarning, match="sub-03"):
+        fname = update_reports(
+            tmp_path, _write, subjects, fingerprints=fingerprints, n_jobs=n_jobs
+        )
+    assert fname == tmp_path / "index.html"
+    assert sorted(p.name for p in tmp_path.glob("sub-*.html")) == [
+        "sub-01.html",
+        "sub-02.html",
+    ]
+    with open(tmp_path / "qc.json") as fid:
+        cache = json.load(fid)
+    assert sorted(cache) == ["sub-01", "sub-02"]
+    assert "sub-03" not in fname.read_text(encoding="utf-8")
+
+    # unchanged subjects are skipped, a changed subject is regenerated
+    written = list()
+
+    def _func(subject, fname):
+        written.append(subject)
+        return _write(subject, fname)
+
+    fingerprints["sub-02"] = "b"
+    with pytest.warns(RuntimeWarning, match="sub-03"):
+        update_reports(tmp_path, _func, subjects, fingerprints=fingerprints)
+    assert written == ["sub-02", "sub-03"]
+    (tmp_path / "sub-01.html").unlink()
+    update_reports(tmp_path, _func, subjects[:2], fingerprints=fingerprints)
+    assert written[2:] == ["sub-01"]
+    update_reports(tmp_path, _func, subjects[:2], overwrite=True)
+    assert written[3:] == ["sub-01", "sub-02"]
+
+    with pytest.raises(ValueError, match="duplicates"):
+        update_reports(tmp_path, _func, ["sub-01", "sub-01"])
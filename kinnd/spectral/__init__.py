@@ -0,0 +1,9 @@
+"""Spectral analysis module."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["psd"],
+    submod_attrs={"psd": ["FREQ_BANDS", "band_power", "psd_array"]},
+)
@@ -0,0 +1,280 @@
+"""Batched power spectral density estimation.
+
+The spectra of every epoch and channel are computed from a single stacked array: the
+segments, or the tapered copies, of all the signals in a batch go through one
+real-valued FFT call, and the windows and DPSS tapers are computed once per length and
+reused across calls.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+
+from ..utils._checks import check_type, check_value, ensure_int
+from ..utils._imports import import_optional_dependency
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from xarray import DataArray, Dataset
+
+
+# Frequency bands, in Hz, following the bins used in the lab notebooks.
+FREQ_BANDS: dict[str, tuple[float, float]] = {
+    "delta": (1.0, 3.0),
+    "theta": (3.0, 7.0),
+    "alpha": (7.0, 13.0),
+    "beta": (13.0, 30.0),
+    "gamma": (30.0, 45.0),
+}
+# Maximum size of the complex spectra held in memory for a batch of signals.
+_MAX_BATCH_BYTES: int = 100 * 2**20
+
+
+def psd_array(
+    data: np.ndarray,
+    sfreq: float,
+    *,
+    method: str = "welch",
+    fmin: float = 0.0,
+    fmax: float = np.inf,
+    n_fft: int = 256,
+    n_overlap: int = 0,
+    n_per_seg: Optional[int] = None,
+    window: str = "hamming",
+    bandwidth: Optional[float] = None,
+    low_bias: bool = True,
+    normalization: str = "length",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Compute the power spectral density of a stack of signals.
+
+    Parameters
+    ----------
+    data : array of shape (..., n_times)
+        The signals, e.g. the epochs of all the conditions of a subject stacked into a
+        ``(n_epochs, n_channels, n_times)`` array. Single precision signals yield
+        single precision spectra, e.g. from :func:`kinnd.io.get_data`, and the other
+        signals are converted to double precision.
+    sfreq : float
+        The sampling frequency, in Hz.
+    method : ``"welch"`` | ``"multitaper"``
+        The estimation method.
+    fmin, fmax : float
+        The frequency range to return, in Hz.
+    n_fft : int
+        The length of the FFT of each segment. Only used with ``"welch"``. It is
+        clipped to the number of samples.
+    n_overlap : int
+        The number of samples of overlap between segments. Only used with ``"welch"``.
+    n_per_seg : int | None
+        The length of the segments, at most ``n_fft``. If None, ``n_fft`` is used.
+        Only used with ``"welch"``.
+    window : str
+        The window applied to each segment, see :func:`scipy.signal.get_window`. Only
+        used with ``"welch"``.
+    bandwidth : float | None
+        The full bandwidth of the DPSS tapers, in Hz. If None, the half-bandwidth is
+        set to 4 frequency bins. Only used with ``"multitaper"``.
+    low_bias : bool
+        If True, only use the tapers with more than 90% spectral concentration. Only
+        used with ``"multitaper"``.
+    normalization : ``"length"`` | ``"full"``
+        The normalization of the multitaper spectra. Only used with ``"multitaper"``.
+
+    Returns
+    -------
+    psd : array of shape (..., n_freqs)
+        The power spectral density.
+    freqs : array of shape (n_freqs,)
+        The frequencies, in Hz.
+
+    Notes
+    -----
+    The estimates are equal to :func:`mne.time_frequency.psd_array_welch` and to
+    :func:`mne.time_frequency.psd_array_multitaper` with ``adaptive=False``, which
+    are the estimates of :meth:`mne.Epochs.compute_psd`.
+    """
+    check_value(method, ("welch", "multitaper"), "method")
+    check_type(sfreq, ("numeric",), "sfreq")
+    data = np.asarray(data)
+    data = data.astype(np.float32 if data.dtype == np.float32 else float, copy=False)
+    shape, n_times = data.shape[:-1], data.shape[-1]
+    data = data.reshape(-1, n_times)
+    if method == "welch":
+        psd, freqs = _psd_welch(data, float(sfreq), n_fft, n_overlap, n_per_seg, window)
+    else:
+        check_value(normalization, ("length", "full"), "normalization")
+        psd, freqs = _psd_multitaper(data, float(sfreq), bandwidth, low_bias)
+        if normalization == "full":
+            psd /= sfreq
+    mask = (freqs >= fmin) & (freqs <= fmax)
+    if not mask.any():
+        raise ValueError(f"No frequencies found between fmin={fmin} and fmax={fmax}.")
+    return psd[:, mask].reshape(*shape, -1), freqs[mask]
+
+
+def _psd_welch(
+    data: np.ndarray,
+    sfreq: float,
+    n_fft: int,
+    n_overlap: int,
+    n_per_seg: Optional[int],
+    window: str,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Welch's estimate, with every segment of a batch in a single FFT."""
+    n_times = data.shape[-1]
+    n_fft = min(ensure_int(n_fft, "n_fft"), n_times)
+    n_per_seg = n_fft if n_per_seg is None else ensure_int(n_per_seg, "n_per_seg")
+    if n_per_seg > n_fft:
+        raise ValueError(
+            f"Argument 'n_per_seg' ({n_per_seg}) must be at most 'n_fft' ({n_fft})."
+        )
+    n_overlap = min(ensure_int(n_overlap, "n_overlap"), n_per_seg - 1)
+    step = n_per_seg - n_overlap
+    n_segments = 1 + (n_times - n_per_seg) // step
+    win = _get_window(window, n_per_seg).astype(data.dtype, copy=False)
+    freqs = rfftfreq(n_fft, 1.0 / sfreq)
+    # one-sided density, the DC and Nyquist bins are not doubled
+    scale = np.full(freqs.size, 2.0 / (sfreq * np.sum(win**2)))
+    scale[0] /= 2
+    if n_fft % 2 == 0:
+        scale[-1] /= 2
+    scale = scale.astype(data.dtype)
+    psd = np.empty((data.shape[0], freqs.size), dtype=data.dtype)
+    n_batch = _batch_size(n_segments * freqs.size)
+    for start in range(0, data.shape[0], n_batch):
+        segments = np.lib.stride_tricks.sliding_window_view(
+            data[start : start + n_batch], n_per_seg, axis=-1
+        )[:, : step * n_segments : step]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        spectra = rfft(segments * win, n=n_fft, axis=-1)
+        power = spectra.real**2 + spectra.imag**2
+        psd[start : start + n_batch] = power.mean(axis=1) * scale
+    return psd, freqs
+
+
+def _psd_multitaper(
+    data: np.ndarray,
+    sfreq: float,
+    bandwidth: Optional[float],
+    low_bias: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Multitaper estimate, with every tapered signal of a batch in a single FFT."""
+    n_times = data.shape[-1]
+    half_nbw = 4.0 if bandwidth is None else float(bandwidth) * n_times / (2 * sfreq)
+    if half_nbw < 0.5:
+        raise ValueError(
+            f"The bandwidth {bandwidth} yields a normalized half-bandwidth of "
+            f"{half_nbw} < 0.5, use a value of at least {sfreq / n_times}."
+        )
+    tapers, eigvals = _get_tapers(n_times, half_nbw, bool(low_bias))
+    tapers = tapers.astype(data.dtype, copy=False)
+    weights = (eigvals / eigvals.sum()).astype(data.dtype)
+    freqs = rfftfreq(n_times, 1.0 / sfreq)
+    # one-sided spectrum, the DC and Nyquist bins are not doubled
+    scale = np.full(freqs.size, 2.0)
+    scale[0] /= 2
+    if n_times % 2 == 0:
+        scale[-1] /= 2
+    scale = scale.astype(data.dtype)
+    psd = np.empty((data.shape[0], freqs.size), dtype=data.dtype)
+    n_batch = _batch_size(len(tapers) * freqs.size)
+    for start in range(0, data.shape[0], n_batch):
+        x = data[start : start + n_batch]
+        x = x - x.mean(axis=-1, keepdims=True)
+        spectra = rfft(x[:, np.newaxis, :] * tapers, axis=-1)
+        power = spectra.real**2 + spectra.imag**2
+        psd[start : start + n_batch] = np.einsum("k,nkf->nf", weights, power) * scale
+    return psd, freqs
+
+
+def _batch_size(n_values: int) -> int:
+    """Get the number of signals whose n_values complex spectra fit in a batch."""
+    return max(_MAX_BATCH_BYTES // (16 * max(n_values, 1)), 1)
+
+
+@lru_cache(maxsize=16)
+def _get_window(window: str, n_per_seg: int) -> np.ndarray:
+    """Get a periodic window, shared by every call with the same length."""
+    from scipy.signal import get_window
+
+    win = get_window(window, n_per_seg)
+    win.flags.writeable = False
+    return win
+
+
+@lru_cache(maxsize=16)
+def _get_tapers(
+    n_times: int, half_nbw: float, low_bias: bool
+) -> tuple[np.ndarray, np.ndarray]:
+    """Get the DPSS tapers, shared by every call with the same length."""
+    from mne.time_frequency import dpss_windows
+
+    tapers, eigvals = dpss_windows(
+        n_times, half_nbw, int(2 * half_nbw), sym=False, low_bias=low_bias
+    )
+    tapers.flags.writeable = False
+    eigvals.flags.writeable = False
+    return tapers, eigvals
+
+
+def band_power(
+    ds: Union[Dataset, DataArray],
+    band: Union[str, tuple[float, float]],
+    *,
+    var_name: str = "psd",
+    relative: bool = False,
+    log: bool = False,
+) -> DataArray:
+    """Compute the power in a frequency band from stored spectra.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset | xarray.DataArray
+        The spectra, with a ``freq`` dimension, e.g. a cohort store opened with
+        :func:`kinnd.io.open_dataset`. Only the frequencies of the band are read.
+    band : str | tuple of float
+        The name of a band in :data:`FREQ_BANDS`, or the ``(fmin, fmax)`` edges of the
+        band in Hz, both included.
+    var_name : str
+        The name of the variable holding the spectra, if ``ds`` is a dataset.
+    relative : bool
+        If True, the band power is divided by the power over all the frequencies.
+    log : bool
+        If True, return ``log10`` of the band power.
+
+    Returns
+    -------
+    power : xarray.DataArray
+        The average power density in the band, without the ``freq`` dimension, e.g.
+        of shape ``(subject, condition, channel)`` for an alpha topography per subject.
+    """
+    xr = import_optional_dependency("xarray")
+
+    check_type(ds, (xr.Dataset, xr.DataArray), "ds")
+    check_type(band, (str, tuple), "band")
+    check_type(relative, (bool,), "relative")
+    check_type(log, (bool,), "log")
+    if isinstance(band, str):
+        check_value(band, FREQ_BANDS, "band")
+        fmin, fmax = FREQ_BANDS[band]
+    else:
+        if len(band) != 2 or band[1] < band[0]:
+            raise ValueError(f"The band must be a (fmin, fmax) tuple, got {band}.")
+        fmin, fmax = band
+    psd = ds[var_name] if isinstance(ds, xr.Dataset) else ds
+    if "freq" not in psd.dims:
+        raise ValueError("The spectra must have a 'freq' dimension.")
+    power = psd.sel(freq=slice(fmin, fmax))
+    if power.sizes["freq"] == 0:
+        raise ValueError(f"No frequencies found between {fmin} and {fmax} Hz.")
+    power = power.mean("freq")
+    if relative:
+        power = power / psd.mean("freq")
+    if log:
+        power = np.log10(power)
+    return power.assign_attrs(band=(fmin, fmax))
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from mne.time_frequency import psd_array_multitaper, psd_array_welch
+
+from ..psd import FREQ_BANDS, band_power, psd_array
+
+
+@pytest.fixture(scope="module")
+def data():
+    """Create a stack of epochs."""
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((6, 4, 551))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(),
+        dict(n_fft=128, n_overlap=64),
+        dict(n_fft=256, n_per_seg=200, n_overlap=50, window="hann"),
+        dict(n_fft=512, n_per_seg=300),
+    ],
+)
+def test_psd_welch(data, kwargs):
+    """Test the batched Welch estimate against MNE."""
+    psd, freqs = psd_array(data, 250.0, fmin=1, fmax=50, **kwargs)
+    expected, freqs_expected = psd_array_welch(
+        data, 250.0, fmin=1, fmax=50, verbose=False, **kwargs
+    )
+    np.testing.assert_allclose(freqs, freqs_expected)
+    np.testing.assert_allclose(psd, expected, rtol=1e-10)
+    assert psd.shape == (6, 4, freqs.size)
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(bandwidth=4.0, normalization="full")])
+def test_psd_multitaper(data, kwargs):
+    """Test the batched multitaper estimate against MNE."""
+    psd, freqs = psd_array(data, 250.0, method="multitaper", fmax=50, **kwargs)
+    expected, freqs_expected = psd_array_multitaper(
+        data, 250.0, fmax=50, verbose=False, **kwargs
+    )
+    np.testing.assert_allclose(freqs, freqs_expected)
+    np.testing.assert_allclose(psd, expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize("method", ["welch", "multitaper"])
+def test_psd_single_precision(data, method):
+    """Test that single precision signals yield single precision spectra."""
+    psd, freqs = psd_array(data.astype(np.float32), 250.0, method=method, fmax=50)
+    expected, _ = psd_array(data, 250.0, method=method, fmax=50)
+    assert psd.dtype == np.float32
+    assert freqs.dtype == np.float64
+    np.testing.assert_allclose(psd, expected, rtol=1e-4)
+    # integer signals are converted to double precision
+    psd, _ = psd_array(np.round(data * 100).astype(int), 250.0, method=method)
+    assert psd.dtype == np.float64
+
+
+def test_psd_invalid(data):
+    """Test invalid arguments."""
+    # n_fft is clipped to the number of samples, as in Epochs.compute_psd
+    psd, _ = psd_array(data, 250.0, n_fft=2048)
+    np.testing.assert_allclose(psd, psd_array(data, 250.0, n_fft=551)[0])
+    with pytest.raises(ValueError, match="No frequencies"):
+        psd_array(data, 250.0, fmin=200)
+    with pytest.raises(ValueError, match="at most 'n_fft'"):
+        psd_array(data, 250.0, n_fft=128, n_per_seg=256)
+    with pytest.raises(ValueError, match="Invalid value"):
+        psd_array(data, 250.0, method="foo")
+
+
+def test_band_power():
+    """Test band power queries on stored spectra."""
+    xr = pytest.importorskip("xarray")
+    freqs = np.arange(1.0, 51.0)
+    rng = np.random.default_rng(0)
+    psd = xr.DataArray(
+        rng.random((3, 2, 5, freqs.size)),
+        coords={
+            "subject": ["sub-1", "sub-2", "sub-3"],
+            "condition": ["match", "mismatch"],
+            "channel": [f"E{k}" for k in range(1, 6)],
+            "freq": freqs,
+        },
+        dims=("subject", "condition", "channel", "freq"),
+    )
+    ds = xr.Dataset({"psd": psd})
+    alpha = band_power(ds, "alpha")
+    assert alpha.dims == ("subject", "condition", "channel")
+    fmin, fmax = FREQ_BANDS["alpha"]
+    mask = (freqs >= fmin) & (freqs <= fmax)
+    np.testing.assert_allclose(alpha, psd.values[..., mask].mean(axis=-1))
+    assert alpha.attrs["band"] == (fmin, fmax)
+    relative = band_power(psd, (7, 11), relative=True, log=True)
+    expected = psd.values[..., 6:11].mean(axis=-1) / psd.values.mean(axis=-1)
+    np.testing.assert_allclose(relative, np.log10(expected))
+    with pytest.raises(ValueError, match="No frequencies"):
+        band_power(ds, (60.0, 70.0))
+    with pytest.raises(ValueError, match="Invalid value"):
+        band_power(ds, "mu")
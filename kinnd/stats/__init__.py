@@ -0,0 +1,13 @@
+"""Statistics module."""
+
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["aggregate", "bootstrap", "cluster"],
+    submod_attrs={
+        "aggregate": ["RunningStats", "grand_average"],
+        "bootstrap": ["bootstrap_ci"],
+        "cluster": ["get_montage_adjacency", "permutation_cluster_test"],
+    },
+)
@@ -0,0 +1,452 @@
+"""Streaming aggregation of subject-level derivatives into cohort statistics.
+
+The statistics are updated one subject at a time, thus a grand average over the whole
+cohort only ever holds a single subject in memory, in addition to the accumulators.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..io.store import SUBJECT_DIM
+from ..utils._checks import check_type
+from ..utils._imports import import_optional_dependency
+from ..utils.logs import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Optional, Union
+
+    from xarray import Dataset
+
+
+class RunningStats:
+    """Running weighted mean, variance and quantiles of a stream of arrays.
+
+    The mean and variance are updated with the weighted variant of Welford's algorithm
+    :footcite:p:`west_1979`, and the quantiles are estimated with the P² algorithm
+    :footcite:p:`jain_1985`, element-wise. Non-finite values are treated as missing.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The shape of the arrays.
+    quantiles : list of float
+        The quantiles to estimate, between 0 and 1.
+
+    References
+    ----------
+    .. footbibliography::
+    """
+
+    def __init__(self, shape: tuple[int, ...], quantiles: Iterable[float] = ()):
+        self._shape = tuple(shape)
+        self._count = np.zeros(self._shape, dtype=np.int64)
+        self._weight = np.zeros(self._shape)
+        self._mean = np.zeros(self._shape)
+        self._m2 = np.zeros(self._shape)
+        self._quantiles = [_P2Quantile(self._shape, q) for q in quantiles]
+
+    def __repr__(self) -> str:  # noqa: D105
+        return f"<RunningStats | shape {self._shape}, {self._count.max()} updates>"
+
+    def update(self, data: np.ndarray, weight: Optional[np.ndarray] = None) -> None:
+        """Add an observation.
+
+        Parameters
+        ----------
+        data : array
+            The observation, of the shape of the accumulator.
+        weight : float | array | None
+            The weight of the observation, broadcastable to the shape of the
+            accumulator, e.g. the number of trials averaged. If None, each observation
+            has a weight of 1. The quantiles are not weighted.
+        """
+        data = np.asarray(data, dtype=float)
+        if data.shape != self._shape:
+            raise ValueError(
+                f"The data shape {data.shape} does not match the accumulator shape "
+                f"{self._shape}."
+            )
+        valid = np.isfinite(data)
+        weight = np.broadcast_to(1.0 if weight is None else weight, self._shape)
+        if np.any(weight < 0):
+            raise ValueError("The weights must be positive.")
+        weight = np.where(valid, weight, 0.0)
+        data = np.where(valid, data, 0.0)
+        self._count += valid & (weight > 0)
+        self._weight += weight
+        delta = data - self._mean
+        ratio = np.divide(
+            weight, self._weight, out=np.zeros(self._shape), where=self._weight > 0
+        )
+        self._mean += ratio * delta
+        self._m2 += weight * delta * (data - self._mean)
+        for quantile in self._quantiles:
+            quantile.update(data, valid)
+
+    @property
+    def count(self) -> np.ndarray:
+        """The number of observations, element-wise."""
+        return self._count.copy()
+
+    @property
+    def mean(self) -> np.ndarray:
+        """The weighted mean, element-wise. NaN where there is no observation."""
+        return np.where(self._weight > 0, self._mean, np.nan)
+
+    def var(self, ddof: int = 1) -> np.ndarray:
+        """Compute the variance, element-wise.
+
+        Parameters
+        ----------
+        ddof : int
+            The delta degrees of freedom. The weights are treated as frequency
+            weights, i.e. the sum of squares is divided by ``sum(weights) - ddof``.
+
+        Returns
+        -------
+        var : array
+            The variance, NaN where there are not enough observations.
+        """
+        denominator = self._weight - ddof
+        return np.divide(
+            self._m2,
+            denominator,
+            out=np.full(self._shape, np.nan),
+            where=denominator > 0,
+        )
+
+    def sem(self, ddof: int = 1) -> np.ndarray:
+        """Compute the standard error of the mean, element-wise.
+
+        Parameters
+        ----------
+        ddof : int
+            The delta degrees of freedom of the variance.
+
+        Returns
+        -------
+        sem : array
+            The standard error of the mean, i.e. ``sqrt(var / count)``.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.var(ddof) / self._count)
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Get the estimate of a quantile, element-wise.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, one of those given at initialization.
+
+        Returns
+        -------
+        quantile : array
+            The estimate of the quantile. It is exact for less than 5 observations.
+        """
+        for estimator in self._quantiles:
+            if estimator.p == q:
+                return estimator.result()
+        raise ValueError(f"The quantile {q} is not estimated.")
+
+
+class _P2Quantile:
+    """Element-wise P² estimator of a single quantile."""
+
+    def __init__(self, shape: tuple[int, ...], p: float):
+        if not 0 < p < 1:
+            raise ValueError(f"The quantiles must be between 0 and 1, got {p}.")
+        self.p = p
+        self._count = np.zeros(shape, dtype=np.int64)
+        self._heights = np.full((5, *shape), np.nan)
+        self._positions = np.broadcast_to(
+            np.arange(1.0, 6.0).reshape((5,) + (1,) * len(shape)), (5, *shape)
+        ).copy()
+        self._desired = np.broadcast_to(
+            np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]).reshape(
+                (5,) + (1,) * len(shape)
+            ),
+            (5, *shape),
+        ).copy()
+        self._increments = np.array([0, p / 2, p, (1 + p) / 2, 1]).reshape(
+            (5,) + (1,) * len(shape)
+        )
+
+    def update(self, data: np.ndarray, valid: np.ndarray) -> None:
+        """Add an observation where valid is True."""
+        q, n = self._heights, self._positions
+        # initialization: the 5 first observations are stored
+        init = valid & (self._count < 5)
+        if init.any():
+            index = np.minimum(self._count, 4)[np.newaxis]
+            stored = np.take_along_axis(q, index, axis=0)[0]
+            np.put_along_axis(q, index, np.where(init, data, stored)[np.newaxis], 0)
+            full = init & (self._count == 4)
+            if full.any():
+                q[:, full] = np.sort(q[:, full], axis=0)
+        steady = valid & (self._count >= 5)
+        self._count += valid
+        if not steady.any():
+            return
+        x = data[steady]
+        qs, ns, ds = q[:, steady], n[:, steady], self._desired[:, steady]
+        qs[0] = np.minimum(qs[0], x)
+        qs[4] = np.maximum(qs[4], x)
+        k = (qs[1:4] <= x).sum(axis=0)
+        ns += np.arange(5)[:, np.newaxis] > k
+        ds += self._increments.reshape(5, 1)
+        for i in (1, 2, 3):
+            d = ds[i] - ns[i]
+            adjust = ((d >= 1) & (ns[i + 1] - ns[i] > 1)) | (
+                (d <= -1) & (ns[i - 1] - ns[i] < -1)
+            )
+            if not adjust.any():
+                continue
+            d = np.sign(d[adjust])
+            qi, qm, qp = qs[i, adjust], qs[i - 1, adjust], qs[i + 1, adjust]
+            ni, nm, np_ = ns[i, adjust], ns[i - 1, adjust], ns[i + 1, adjust]
+            parabolic = qi + d / (np_ - nm) * (
+                (ni - nm + d) * (qp - qi) / (np_ - ni)
+                + (np_ - ni - d) * (qi - qm) / (ni - nm)
+            )
+            neighbour = np.where(d > 0, qp, qm)
+            linear = qi + d * (neighbour - qi) / (np.where(d > 0, np_, nm) - ni)
+            qs[i, adjust] = np.where(
+                (qm < parabolic) & (parabolic < qp), parabolic, linear
+            )
+            ns[i, adjust] = ni + d
+        q[:, steady], n[:, steady], self._desired[:, steady] = qs, ns, ds
+
+    def result(self) -> np.ndarray:
+        """Return the estimate of the quantile."""
+        out = self._heights[2].copy()
+        partial = self._count < 5
+        if partial.any():
+            out[partial] = _nanquantile(self._heights[:, partial], self.p)
+        return out
+
+
+def _nanquantile(data: np.ndarray, p: float) -> np.ndarray:
+    """Compute a quantile along the first axis, NaN for all-NaN slices."""
+    out = np.full(data.shape[1:], np.nan)
+    has_data = np.isfinite(data).any(axis=0)
+    out[has_data] = np.nanquantile(data[:, has_data], p, axis=0)
+    return out
+
+
+def grand_average(
+    subjects: Union[Dataset, Iterable[Dataset]],
+    *,
+    var_name: str = "evoked",
+    rois: Optional[dict[str, list[str]]] = None,
+    quantiles: Iterable[float] = (0.5,),
+) -> Dataset:
+    """Compute the grand average over subjects, streaming one subject at a time.
+
+    Parameters
+    ----------
+    subjects : xarray.Dataset | iterable of xarray.Dataset
+        The subject-level data. Either a dataset with a ``subject`` dimension, e.g. a
+        store opened with :func:`kinnd.io.open_dataset`, which is then read one
+        subject at a time, or an iterable (e.g. a generator) of datasets holding a
+        single subject each, e.g. computed by
+        :func:`kinnd.studies.listen.compute_evoked_listen`.
+    var_name : str
+        The name of the variable to aggregate. Its dimensions, besides ``subject``,
+        typically are ``(condition, channel, time)``. If the datasets have a variable
+        ``n_trials`` whose dimensions are a subset of those of ``var_name``, the
+        trial-count-weighted average is computed as well.
+    rois : dict of list of str | None
+        Regions of interest, mapping a name to a list of channels. If provided, the
+        statistics of the ROI time courses, i.e. the average over the ROI channels of
+        each subject, are computed as well.
+    quantiles : list of float
+        The quantiles to estimate, between 0 and 1, e.g. ``(0.5,)`` for the median.
+
+    Returns
+    -------
+    ds : xarray.Dataset
+        The grand average, with the variables:
+
+        * ``mean``, the average across subjects.
+        * ``weighted_mean``, the average across subjects weighted by the number of
+          trials, if ``n_trials`` is available.
+        * ``std`` and ``sem``, the standard deviation and the standard error of the
+          mean across subjects.
+        * ``quantiles``, the estimated quantiles across subjects, with an additional
+          ``quantile`` dimension.
+        * ``n_subjects``, the number of subjects with finite data.
+        * ``n_trials``, the total number of trials, if available.
+
+        With ``rois``, the same statistics are available on a ``roi`` dimension instead
+        of ``channel``, prefixed with ``roi_``.
+
+    Notes
+    -----
+    Missing data, e.g. a subject without trials in a condition, should be NaN; it is
+    then excluded from the statistics of the affected elements. The quantiles are
+    estimated with the P² algorithm, which is exact for less than 5 subjects and
+    approximate above.
+    """
+    xr = import_optional_dependency("xarray")
+
+    check_type(var_name, (str,), "var_name")
+    check_type(rois, (dict, None), "rois")
+    quantiles = [float(q) for q in quantiles]
+    if isinstance(subjects, xr.Dataset):
+        subjects = _iter_subjects(subjects)
+    state = None
+    n_subjects = 0
+    for block in subjects:
+        check_type(block, (xr.Dataset,), "subject")
+        data = block[var_name]
+        if data.sizes.get(SUBJECT_DIM, 1) != 1:
+            raise ValueError(
+                "Each dataset must hold a single subject, got "
+                f"{data.sizes[SUBJECT_DIM]} subjects."
+            )
+        data = (
+            data.squeeze(SUBJECT_DIM, drop=True) if SUBJECT_DIM in data.dims else data
+        )
+        n_trials = _get_n_trials(block, data)
+        if state is None:
+            state = _GrandAverageState(data, n_trials, rois, quantiles)
+        state.update(data, n_trials)
+        n_subjects += 1
+    if state is None:
+        raise ValueError("No subject to average.")
+    logger.info("Grand average computed over %i subjects.", n_subjects)
+    return state.to_dataset()
+
+
+def _iter_subjects(ds: Dataset) -> Iterable[Dataset]:
+    """Iterate over the subjects of a dataset, loading one subject at a time."""
+    for k in range(ds.sizes[SUBJECT_DIM]):
+        yield ds.isel({SUBJECT_DIM: [k]}).load()
+
+
+def _get_n_trials(block: Dataset, data):
+    """Get the trial counts of a subject, if they apply to the data."""
+    if "n_trials" not in block:
+        return None
+    n_trials = block["n_trials"]
+    if SUBJECT_DIM in n_trials.dims:
+        n_trials = n_trials.squeeze(SUBJECT_DIM, drop=True)
+    if not set(n_trials.dims).issubset(data.dims):
+        return None
+    return n_trials
+
+
+def _broadcast(n_trials, data) -> np.ndarray:
+    """Broadcast the trial counts against the data."""
+    dims = [dim for dim in data.dims if dim in n_trials.dims]
+    values = n_trials.transpose(*dims).values
+    shape = [data.sizes[dim] if dim in n_trials.dims else 1 for dim in data.dims]
+    return np.broadcast_to(values.reshape(shape), data.shape)
+
+
+class _GrandAverageState:
+    """Accumulators of the grand average at the channel and ROI levels."""
+
+    def __init__(self, data, n_trials, rois, quantiles):
+        self.template = data
+        self.quantiles = quantiles
+        self.weighted = n_trials is not None
+        self.rois = rois
+        self.stats = RunningStats(data.shape, quantiles)
+        self.weighted_stats = RunningStats(data.shape) if self.weighted else None
+        self.n_trials = (
+            None
+            if n_trials is None
+            else n_trials.copy(data=np.zeros(n_trials.shape, dtype=int))
+        )
+        if rois is not None:
+            if "channel" not in data.dims:
+                raise ValueError("ROIs require a 'channel' dimension.")
+            missing = {ch for chs in rois.values() for ch in chs} - set(
+                data["channel"].values.tolist()
+            )
+            if len(missing) != 0:
+                raise ValueError(f"The ROI channels {sorted(missing)} are missing.")
+            roi_template = self._roi(data)
+            self.roi_template = roi_template
+            self.roi_stats = RunningStats(roi_template.shape, quantiles)
+            self.roi_weighted_stats = (
+                RunningStats(roi_template.shape) if self.weighted else None
+            )
+
+    def _roi(self, data):
+        """Average the channels of each ROI."""
+        xr = import_optional_dependency("xarray")
+
+        return (
+            xr.concat(
+                [data.sel(channel=chs).mean("channel") for chs in self.rois.values()],
+                dim="roi",
+            )
+            .assign_coords(roi=list(self.rois))
+            .transpose(*[dim if dim != "channel" else "roi" for dim in data.dims])
+        )
+
+    def update(self, data, n_trials):
+        """Add a subject."""
+        if data.dims != self.template.dims or any(
+            not np.array_equal(data[dim].values, self.template[dim].values)
+            for dim in data.dims
+            if dim in data.coords
+        ):
+            raise ValueError("The coordinates of the subjects do not match.")
+        if self.weighted != (n_trials is not None):
+            raise ValueError("The trial counts are missing for some subjects.")
+        self.stats.update(data.values)
+        if self.weighted:
+            self.weighted_stats.update(data.values, _broadcast(n_trials, data))
+            self.n_trials += n_trials.values
+        if self.rois is not None:
+            roi = self._roi(data)
+            self.roi_stats.update(roi.values)
+            if self.weighted:
+                self.roi_weighted_stats.update(roi.values, _broadcast(n_trials, roi))
+
+    def to_dataset(self):
+        """Export the statistics to a dataset."""
+        xr = import_optional_dependency("xarray")
+
+        ds = self._export(self.template, self.stats, self.weighted_stats)
+        if self.weighted:
+            ds["n_trials"] = self.n_trials
+        if self.rois is not None:
+            roi = self._export(
+                self.roi_template, self.roi_stats, self.roi_weighted_stats
+            )
+            ds = xr.merge(
+                [ds, roi.rename({name: f"roi_{name}" for name in roi.data_vars})]
+            )
+        return ds
+
+    def _export(self, template, stats, weighted_stats):
+        """Export a set of statistics to a dataset."""
+        xr = import_optional_dependency("xarray")
+
+        def _wrap(data):
+            return xr.DataArray(data, coords=template.coords, dims=template.dims)
+
+        ds = xr.Dataset(
+            {
+                "mean": _wrap(stats.mean),
+                "std": _wrap(np.sqrt(stats.var())),
+                "sem": _wrap(stats.sem()),
+                "n_subjects": _wrap(stats.count),
+            }
+        )
+        if weighted_stats is not None:
+            ds["weighted_mean"] = _wrap(weighted_stats.mean)
+        if len(self.quantiles) != 0:
+            ds["quantiles"] = xr.concat(
+                [_wrap(stats.quantile(q)) for q in self.quantiles], dim="quantile"
+            ).assign_coords(quantile=self.quantiles)
+        return ds
@@ -0,0 +1,184 @@
+"""Vectorized bootstrap confidence intervals of the mean across subjects.
+
+A bootstrap resample of the mean is a weighted average of the subjects, the weights
+being the number of times each subject is drawn. A batch of resamples is thus a single
+``(n_resamples, n_subjects) @ (n_subjects, n_values)`` matrix product, instead of a
+Python loop over resamples and a copy of the data per resample.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..io.store import SUBJECT_DIM
+from ..utils._checks import check_type, check_value, ensure_int
+from ..utils._imports import import_optional_dependency
+from ..utils.parallel import check_n_jobs, parallel_imap
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from xarray import DataArray
+
+
+# Maximum size of the bootstrap distribution of a chunk of columns held in memory.
+_MAX_CHUNK_BYTES: int = 200 * 2**20
+
+
+def bootstrap_ci(
+    data: Union[np.ndarray, DataArray],
+    *,
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    method: str = "percentile",
+    batch_size: int = 500,
+    seed: Optional[int] = None,
+    n_jobs: Optional[int] = 1,
+) -> Union[np.ndarray, DataArray]:
+    """Compute bootstrap confidence intervals of the mean across subjects.
+
+    Parameters
+    ----------
+    data : array of shape (n_subjects, ...) | xarray.DataArray
+        The subject-level data, e.g. ROI time courses of shape
+        ``(n_subjects, n_times)`` or evoked responses of shape
+        ``(n_subjects, n_channels, n_times)``. A :class:`~xarray.DataArray` must have a
+        ``subject`` dimension. Non-finite values are not supported.
+    n_boot : int
+        The number of bootstrap resamples.
+    ci : float
+        The confidence level, between 0 and 1.
+    method : ``"percentile"`` | ``"bca"``
+        The interval: the percentiles of the bootstrap distribution, or the
+        bias-corrected and accelerated percentiles :footcite:p:`efron_1987`.
+    batch_size : int
+        The number of resamples drawn at once.
+    seed : int | None
+        The seed of the random generator. For a given seed and ``batch_size``, the
+        resamples do not depend on ``n_jobs``.
+    n_jobs : int | None
+        The number of worker processes, each handling a chunk of the columns.
+
+    Returns
+    -------
+    ci : array of shape (2, ...) | xarray.DataArray
+        The lower and upper bounds of the confidence interval. For a
+        :class:`~xarray.DataArray`, the subject dimension is replaced by a ``ci``
+        dimension with the coordinates ``["lower", "upper"]``.
+
+    References
+    ----------
+    .. footbibliography::
+    """
+    xr = import_optional_dependency("xarray", raise_error=False)
+
+    check_value(method, ("percentile", "bca"), "method")
+    check_type(ci, ("numeric",), "ci")
+    if not 0 < ci < 1:
+        raise ValueError(f"Argument 'ci' must be between 0 and 1, got {ci}.")
+    n_boot = ensure_int(n_boot, "n_boot")
+    batch_size = ensure_int(batch_size, "batch_size")
+    if n_boot < 1 or batch_size < 1:
+        raise ValueError("Arguments 'n_boot' and 'batch_size' must be positive.")
+    check_type(seed, ("int-like", None), "seed")
+    n_jobs = check_n_jobs(n_jobs)
+
+    dataarray = None
+    if xr is not None and isinstance(data, xr.DataArray):
+        if SUBJECT_DIM not in data.dims:
+            raise ValueError("The DataArray must have a 'subject' dimension.")
+        dataarray = data.transpose(SUBJECT_DIM, ...)
+        data = dataarray.values
+    data = np.asarray(data, dtype=float)
+    if data.ndim < 1 or data.shape[0] < 2:
+        raise ValueError("At least 2 subjects are required.")
+    if not np.isfinite(data).all():
+        raise ValueError("The data must be finite.")
+    shape = data.shape[1:]
+    flat = data.reshape(data.shape[0], -1)
+
+    # one child seed per batch of resamples, so that the resamples do not depend on
+    # the chunking of the columns across workers
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_boot // batch_size))
+    n_columns = max(_MAX_CHUNK_BYTES // (8 * n_boot), 1)
+    if n_jobs > 1:
+        n_columns = min(n_columns, -(-flat.shape[1] // n_jobs))
+    chunks = [
+        slice(start, start + n_columns) for start in range(0, flat.shape[1], n_columns)
+    ]
+    func = partial(
+        _bootstrap_chunk,
+        n_boot=n_boot,
+        ci=ci,
+        method=method,
+        batch_size=batch_size,
+        seeds=seeds,
+    )
+    out = np.empty((2, flat.shape[1]))
+    for chunk, bounds in parallel_imap(
+        func, [(chunk, flat[:, chunk]) for chunk in chunks], n_jobs=n_jobs
+    ):
+        out[:, chunk[0]] = bounds
+    out = out.reshape(2, *shape)
+    if dataarray is None:
+        return out
+    template = dataarray.isel({SUBJECT_DIM: 0}, drop=True)
+    return xr.DataArray(
+        out,
+        coords={"ci": ["lower", "upper"], **template.coords},
+        dims=("ci", *template.dims),
+        attrs={"confidence_level": ci, "method": method, "n_boot": n_boot},
+    )
+
+
+def _bootstrap_chunk(item, *, n_boot, ci, method, batch_size, seeds):
+    """Compute the confidence interval of a chunk of columns."""
+    _, data = item
+    n_subjects = data.shape[0]
+    boot = np.empty((n_boot, data.shape[1]))
+    for k, seed in enumerate(seeds):
+        size = min(batch_size, n_boot - k * batch_size)
+        rng = np.random.default_rng(seed)
+        counts = rng.multinomial(n_subjects, np.full(n_subjects, 1 / n_subjects), size)
+        start = k * batch_size
+        boot[start : start + size] = counts @ data
+    boot /= n_subjects
+    alpha = (1 - ci) / 2
+    if method == "percentile":
+        return np.quantile(boot, [alpha, 1 - alpha], axis=0)
+    return _bca(data, boot, alpha)
+
+
+def _bca(data: np.ndarray, boot: np.ndarray, alpha: float) -> np.ndarray:
+    """Compute the bias-corrected and accelerated interval of the mean."""
+    from scipy.special import ndtr, ndtri
+
+    n_subjects, n_boot = data.shape[0], boot.shape[0]
+    theta = data.mean(axis=0)
+    # bias correction, from the fraction of resamples below the estimate
+    z0 = ndtri(np.clip((boot < theta).mean(axis=0), 1 / n_boot, 1 - 1 / n_boot))
+    # acceleration, from the jackknife means
+    jackknife = (data.sum(axis=0) - data) / (n_subjects - 1)
+    d = jackknife.mean(axis=0) - jackknife
+    denominator = 6 * np.sum(d**2, axis=0) ** 1.5
+    a = np.divide(
+        np.sum(d**3, axis=0),
+        denominator,
+        out=np.zeros_like(theta),
+        where=denominator > 0,
+    )
+    boot = np.sort(boot, axis=0)
+    bounds = np.empty((2, data.shape[1]))
+    for k, z_alpha in enumerate(ndtri([alpha, 1 - alpha])):
+        level = ndtr(z0 + (z0 + z_alpha) / (1 - a * (z0 + z_alpha)))
+        # linear interpolation between order statistics, as np.quantile
+        position = np.clip(level * (n_boot - 1), 0, n_boot - 1)
+        low = np.floor(position).astype(int)
+        high = np.minimum(low + 1, n_boot - 1)
+        frac = position - low
+        columns = np.arange(data.shape[1])
+        bounds[k] = (1 - frac) * boot[low, columns] + frac * boot[high, columns]
+    return bounds
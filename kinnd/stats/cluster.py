@@ -0,0 +1,280 @@
+"""Cluster-based permutation test of paired contrasts.
+
+The test follows :footcite:t:`maris_2007`. For a paired contrast, each permutation
+flips the sign of the difference of a random subset of subjects. Since the sum of
+squares of the differences does not depend on the signs, the t-statistics of a whole
+batch of sign flips only require the ``(n_permutations, n_subjects) @
+(n_subjects, n_values)`` matrix product of the signs and the differences.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..io.store import SUBJECT_DIM
+from ..utils._checks import check_type, check_value, ensure_int
+from ..utils._imports import import_optional_dependency
+from ..utils.logs import logger
+from ..utils.parallel import check_n_jobs, parallel_imap
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from scipy.sparse import csr_array
+    from xarray import DataArray
+
+
+def permutation_cluster_test(
+    X: Union[np.ndarray, DataArray],
+    adjacency: Union[csr_array, str, None] = "GSN-HydroCel-129",
+    *,
+    threshold: Optional[float] = None,
+    n_permutations: int = 1024,
+    tail: int = 0,
+    batch_size: int = 256,
+    seed: Optional[int] = None,
+    n_jobs: Optional[int] = 1,
+) -> tuple:
+    """Run a cluster-based permutation test of a paired contrast.
+
+    Parameters
+    ----------
+    X : array of shape (n_subjects, n_channels, ...) | xarray.DataArray
+        The paired differences between the 2 conditions, e.g. mismatch - match, of
+        shape ``(n_subjects, n_channels, n_times)`` or
+        ``(n_subjects, n_channels, n_freqs)``. A :class:`~xarray.DataArray` must have
+        the dimensions ``subject`` and ``channel``.
+    adjacency : scipy.sparse matrix | str | None
+        The adjacency between channels, of shape ``(n_channels, n_channels)``. A string
+        is the name of a standard montage whose adjacency is read from the cache of
+        montage operators, see :func:`kinnd.preprocessing.get_adjacency`; it requires
+        a :class:`~xarray.DataArray` to know the channel names. If None, channels are
+        not adjacent to each other. Along the other dimensions, neighbouring samples
+        are adjacent.
+    threshold : float | None
+        The cluster-forming threshold on the t-statistic. If None, the threshold
+        corresponding to a p-value of 0.05 is used, two-sided if ``tail=0``.
+    n_permutations : int
+        The number of sign-flip permutations.
+    tail : ``-1`` | ``0`` | ``1``
+        The direction of the test: ``1`` for positive clusters, ``-1`` for negative
+        clusters, ``0`` for both.
+    batch_size : int
+        The number of permutations computed at once.
+    seed : int | None
+        The seed of the random generator. For a given seed and ``batch_size``, the
+        permutations do not depend on ``n_jobs``.
+    n_jobs : int | None
+        The number of worker processes across which the permutations are spread.
+
+    Returns
+    -------
+    t_obs : array of shape (n_channels, ...) | xarray.DataArray
+        The observed t-statistics.
+    clusters : list of array of bool
+        The mask of each observed cluster, of the shape of ``t_obs``.
+    p_values : array of shape (n_clusters,)
+        The p-value of each cluster.
+    h0 : array of shape (n_permutations,)
+        The maximum absolute cluster mass of each permutation.
+
+    References
+    ----------
+    .. footbibliography::
+    """
+    from scipy.stats import t as t_dist
+
+    xr = import_optional_dependency("xarray", raise_error=False)
+
+    check_value(tail, (-1, 0, 1), "tail")
+    n_permutations = ensure_int(n_permutations, "n_permutations")
+    batch_size = ensure_int(batch_size, "batch_size")
+    if n_permutations < 1 or batch_size < 1:
+        raise ValueError(
+            "Arguments 'n_permutations' and 'batch_size' must be positive."
+        )
+    check_type(seed, ("int-like", None), "seed")
+    n_jobs = check_n_jobs(n_jobs)
+
+    template = None
+    if xr is not None and isinstance(X, xr.DataArray):
+        if SUBJECT_DIM not in X.dims or "channel" not in X.dims:
+            raise ValueError(
+                "The DataArray must have the dimensions 'subject' and 'channel'."
+            )
+        X = X.transpose(SUBJECT_DIM, "channel", ...)
+        template = X.isel({SUBJECT_DIM: 0}, drop=True)
+        ch_names = X["channel"].values.tolist()
+        X = X.values
+    else:
+        ch_names = None
+    X = np.asarray(X, dtype=float)
+    if X.ndim < 2:
+        raise ValueError("X must be of shape (n_subjects, n_channels, ...).")
+    if X.shape[0] < 2:
+        raise ValueError("At least 2 subjects are required.")
+    if not np.isfinite(X).all():
+        raise ValueError("X must be finite.")
+    n_subjects, shape = X.shape[0], X.shape[1:]
+    if isinstance(adjacency, str):
+        if ch_names is None:
+            raise ValueError(
+                "The adjacency of a standard montage requires a DataArray with the "
+                "channel names."
+            )
+        adjacency = get_montage_adjacency(adjacency, ch_names)
+    graph = _make_graph(adjacency, shape)
+    if threshold is None:
+        threshold = t_dist.ppf(1 - 0.05 / (2 if tail == 0 else 1), n_subjects - 1)
+    check_type(threshold, ("numeric",), "threshold")
+    threshold = abs(threshold)
+
+    flat = X.reshape(n_subjects, -1)
+    sum_squares = np.sum(flat**2, axis=0)
+    t_obs = _t_stat(flat.mean(axis=0)[np.newaxis], sum_squares, n_subjects)[0]
+    masks, masses = _find_clusters(t_obs, graph, threshold, tail)
+
+    # spread the batches of permutations across the workers, one child seed per batch
+    n_batches = -(-n_permutations // batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+    sizes = [min(batch_size, n_permutations - k * batch_size) for k in range(n_batches)]
+    batches = list(zip(range(n_batches), seeds, sizes))
+    groups = [batches[k::n_jobs] for k in range(min(n_jobs, n_batches))]
+    func = partial(
+        _permute,
+        flat=flat,
+        sum_squares=sum_squares,
+        graph=graph,
+        threshold=threshold,
+        tail=tail,
+    )
+    h0 = np.empty(n_permutations)
+    for group, h0_group in parallel_imap(
+        func, [tuple(group) for group in groups], n_jobs=n_jobs
+    ):
+        for (k, _, size), h0_batch in zip(group, h0_group):
+            h0[k * batch_size : k * batch_size + size] = h0_batch
+    p_values = np.array(
+        [(np.sum(h0 >= abs(mass)) + 1) / (n_permutations + 1) for mass in masses]
+    )
+    logger.info(
+        "Cluster permutation test: %i clusters, %i significant at p < 0.05.",
+        len(masks),
+        np.sum(p_values < 0.05),
+    )
+    clusters = [mask.reshape(shape) for mask in masks]
+    t_obs = t_obs.reshape(shape)
+    if template is not None:
+        t_obs = template.copy(data=t_obs)
+    return t_obs, clusters, p_values, h0
+
+
+def get_montage_adjacency(kind: str, ch_names: list[str]) -> csr_array:
+    """Get the channel adjacency of a standard montage.
+
+    Parameters
+    ----------
+    kind : str
+        The name of the montage, e.g. ``"GSN-HydroCel-129"``.
+    ch_names : list of str
+        The channels, in the order of the data. They must be in the montage.
+
+    Returns
+    -------
+    adjacency : scipy.sparse.csr_array of shape (n_channels, n_channels)
+        The adjacency, read from the cache of montage operators.
+    """
+    from mne import create_info
+
+    from ..preprocessing.montage import get_adjacency, get_standard_montage
+
+    montage = get_standard_montage(kind)
+    missing = sorted(set(ch_names) - set(montage.ch_names))
+    if len(missing) != 0:
+        raise ValueError(f"The channels {missing} are not in the montage {kind}.")
+    info = create_info(montage.ch_names, 1000.0, "eeg")
+    info.set_montage(montage)
+    adjacency, names = get_adjacency(info, "eeg")
+    picks = [names.index(ch) for ch in ch_names]
+    return adjacency[picks][:, picks].tocsr()
+
+
+def _make_graph(adjacency, shape: tuple[int, ...]):
+    """Build the adjacency between the channel x sample nodes."""
+    from scipy.sparse import csr_array, diags_array, eye_array, kron
+
+    n_channels, rest = shape[0], shape[1:]
+    if adjacency is None:
+        adjacency = csr_array((n_channels, n_channels))
+    if adjacency.shape != (n_channels, n_channels):
+        raise ValueError(
+            f"The adjacency shape {adjacency.shape} does not match the number of "
+            f"channels {n_channels}."
+        )
+    graph = csr_array(adjacency, dtype=bool).astype(np.int8)
+    graph.setdiag(0)
+    # neighbouring samples along each of the other dimensions are adjacent
+    for n in rest:
+        lattice = diags_array([np.ones(n - 1), np.ones(n - 1)], offsets=[-1, 1])
+        graph = kron(graph, eye_array(n)) + kron(eye_array(graph.shape[0]), lattice)
+    return csr_array(graph, dtype=bool)
+
+
+def _t_stat(means: np.ndarray, sum_squares: np.ndarray, n: int) -> np.ndarray:
+    """Compute one-sample t-statistics from the means and the sum of squares."""
+    var = (sum_squares - n * means**2) / (n - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = means / np.sqrt(np.maximum(var, 0) / n)
+    return np.nan_to_num(t, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _find_clusters(t, graph, threshold, tail):
+    """Find the supra-threshold clusters and their mass."""
+    from scipy.sparse.csgraph import connected_components
+
+    masks, masses = [], []
+    for sign in (1, -1) if tail == 0 else (tail,):
+        above = sign * t > threshold
+        if not above.any():
+            continue
+        idx = np.flatnonzero(above)
+        n_components, labels = connected_components(graph[idx][:, idx], directed=False)
+        mass = np.bincount(labels, weights=t[idx], minlength=n_components)
+        for k in range(n_components):
+            mask = np.zeros(t.size, dtype=bool)
+            mask[idx[labels == k]] = True
+            masks.append(mask)
+            masses.append(mass[k])
+    return masks, masses
+
+
+def _max_cluster_mass(t, graph, threshold, tail):
+    """Compute the maximum absolute cluster mass."""
+    from scipy.sparse.csgraph import connected_components
+
+    out = 0.0
+    for sign in (1, -1) if tail == 0 else (tail,):
+        above = sign * t > threshold
+        if not above.any():
+            continue
+        idx = np.flatnonzero(above)
+        _, labels = connected_components(graph[idx][:, idx], directed=False)
+        out = max(out, np.abs(np.bincount(labels, weights=t[idx])).max())
+    return out
+
+
+def _permute(batches, *, flat, sum_squares, graph, threshold, tail):
+    """Compute the null distribution of the maximum cluster mass for some batches."""
+    n_subjects = flat.shape[0]
+    out = []
+    for _, seed, size in batches:
+        rng = np.random.default_rng(seed)
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(size, n_subjects))
+        t = _t_stat(signs @ flat / n_subjects, sum_squares, n_subjects)
+        out.append(
+            np.array([_max_cluster_mass(row, graph, threshold, tail) for row in t])
+        )
+    return out
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from ..aggregate import RunningStats, grand_average
+
+xr = pytest.importorskip("xarray")
+
+CONDITIONS = ["standard", "deviant"]
+CHANNELS = ["E1", "E2", "E3", "Cz"]
+
+
+def _make_subject(rng, subject, n_times=20):
+    """Create the evoked block of a subject."""
+    return xr.Dataset(
+        {
+            "evoked": (
+                ("subject", "condition", "channel", "time"),
+                rng.standard_normal((1, 2, len(CHANNELS), n_times)),
+            ),
+            "n_trials": (("subject", "condition"), rng.integers(10, 100, (1, 2))),
+        },
+        coords={
+            "subject": [subject],
+            "condition": CONDITIONS,
+            "channel": CHANNELS,
+            "time": np.linspace(0, 1, n_times),
+        },
+    )
+
+
+def test_running_stats():
+    """Test the running statistics against numpy."""
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((500, 3, 4))
+    weights = rng.integers(1, 50, (500, 3, 1))
+    stats = RunningStats((3, 4), quantiles=(0.1, 0.5))
+    weighted = RunningStats((3, 4))
+    for x, w in zip(data, weights):
+        stats.update(x)
+        weighted.update(x, w)
+    np.testing.assert_array_equal(stats.count, 500)
+    np.testing.assert_allclose(stats.mean, data.mean(axis=0))
+    np.testing.assert_allclose(stats.var(), data.var(axis=0, ddof=1))
+    np.testing.assert_allclose(stats.sem(), data.std(axis=0, ddof=1) / np.sqrt(500))
+    np.testing.assert_allclose(
+        weighted.mean,
+        np.average(data, axis=0, weights=np.broadcast_to(weights, data.shape)),
+    )
+    # the P² estimates are approximate
+    for q in (0.1, 0.5):
+        np.testing.assert_allclose(
+            stats.quantile(q), np.quantile(data, q, axis=0), atol=0.15
+        )
+    with pytest.raises(ValueError, match="is not estimated"):
+        stats.quantile(0.9)
+    with pytest.raises(ValueError, match="does not match"):
+        stats.update(np.zeros(3))
+
+
+def test_running_stats_missing():
+    """Test the running statistics with missing values and few observations."""
+    data = np.array([[1.0, np.nan], [2.0, np.nan], [4.0, 3.0]])
+    stats = RunningStats((2,), quantiles=(0.5,))
+    for x in data:
+        stats.update(x)
+    np.testing.assert_array_equal(stats.count, [3, 1])
+    np.testing.assert_allclose(stats.mean, np.nanmean(data, axis=0))
+    np.testing.assert_allclose(stats.quantile(0.5), [2.0, 3.0])
+    np.testing.assert_allclose(stats.var(), [np.var(data[:, 0], ddof=1), np.nan])
+    assert np.isnan(RunningStats((2,)).mean).all()
+
+
+def test_grand_average():
+    """Test the grand average streamed from a generator and from a dataset."""
+    rng = np.random.default_rng(0)
+    blocks = [_make_subject(rng, f"sub-{k}") for k in range(12)]
+    rois = {"central": ["Cz", "E1"], "E2": ["E2"]}
+    ds = grand_average((block for block in blocks), rois=rois, quantiles=(0.5,))
+    cohort = xr.concat(blocks, dim="subject")
+    evoked = cohort["evoked"]
+    np.testing.assert_allclose(ds["mean"], evoked.mean("subject"))
+    np.testing.assert_allclose(ds["std"], evoked.std("subject", ddof=1))
+    np.testing.assert_allclose(ds["sem"], evoked.std("subject", ddof=1) / np.sqrt(12))
+    weighted = evoked.weighted(cohort["n_trials"]).mean("subject")
+    np.testing.assert_allclose(ds["weighted_mean"], weighted)
+    np.testing.assert_array_equal(ds["n_trials"], cohort["n_trials"].sum("subject"))
+    np.testing.assert_array_equal(ds["n_subjects"], 12)
+    assert ds["quantiles"].dims == ("quantile", "condition", "channel", "time")
+    # ROIs
+    assert list(ds["roi"].values) == ["central", "E2"]
+    central = evoked.sel(channel=["Cz", "E1"]).mean("channel")
+    np.testing.assert_allclose(
+        ds["roi_mean"].sel(roi="central"), central.mean("subject")
+    )
+    np.testing.assert_allclose(
+        ds["roi_weighted_mean"].sel(roi="central"),
+        central.weighted(cohort["n_trials"]).mean("subject"),
+    )
+    np.testing.assert_allclose(
+        ds["roi_mean"].sel(roi="E2"), ds["mean"].sel(channel="E2")
+    )
+
+    # from a dataset with a subject dimension
+    ds2 = grand_average(cohort, rois=rois)
+    xr.testing.assert_allclose(ds, ds2)
+
+
+def test_grand_average_invalid():
+    """Test invalid inputs of the grand average."""
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError, match="No subject"):
+        grand_average([])
+    blocks = [_make_subject(rng, "sub-1"), _make_subject(rng, "sub-2", n_times=10)]
+    with pytest.raises(ValueError, match="do not match"):
+        grand_average(blocks)
+    with pytest.raises(ValueError, match="single subject"):
+        grand_average([xr.concat(blocks[:1] * 2, dim="subject")])
+    with pytest.raises(ValueError, match="are missing"):
+        grand_average(blocks[:1], rois={"roi": ["Fz"]})
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from scipy.stats import bootstrap
+
+from ..bootstrap import bootstrap_ci
+
+
+@pytest.fixture(scope="module")
+def data():
+    """Create subject-level time courses."""
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((40, 3, 25)) + np.linspace(0, 2, 25)
+
+
+@pytest.mark.parametrize("method", ["percentile", "bca"])
+def test_bootstrap_ci(data, method):
+    """Test the bootstrap confidence intervals against scipy."""
+    ci = bootstrap_ci(data, n_boot=2000, method=method, seed=0)
+    assert ci.shape == (2, 3, 25)
+    assert np.all(ci[0] < data.mean(axis=0))
+    assert np.all(data.mean(axis=0) < ci[1])
+    res = bootstrap(
+        (data[:, 0, :3],),
+        np.mean,
+        n_resamples=2000,
+        method="BCa" if method == "bca" else "percentile",
+        random_state=0,
+        axis=0,
+    )
+    expected = np.array([res.confidence_interval.low, res.confidence_interval.high])
+    # different random draws, thus only approximately equal
+    np.testing.assert_allclose(ci[:, 0, :3], expected, atol=0.05)
+
+
+def test_bootstrap_ci_deterministic(data):
+    """Test that the resamples only depend on the seed."""
+    ci = bootstrap_ci(data, n_boot=300, seed=42, method="bca")
+    ci2 = bootstrap_ci(data, n_boot=300, seed=42, method="bca", n_jobs=2)
+    np.testing.assert_allclose(ci, ci2, rtol=1e-12)
+    ci3 = bootstrap_ci(data, n_boot=300, seed=43, method="bca")
+    assert not np.array_equal(ci, ci3)
+
+
+def test_bootstrap_ci_dataarray(data):
+    """Test bootstrap confidence intervals on a DataArray."""
+    xr = pytest.importorskip("xarray")
+    da = xr.DataArray(
+        data,
+        coords={
+            "subject": [f"sub-{k}" for k in range(40)],
+            "channel": ["E1", "E2", "E3"],
+            "time": np.linspace(0, 1, 25),
+        },
+        dims=("subject", "channel", "time"),
+    ).transpose("channel", "subject", "time")
+    ci = bootstrap_ci(da, n_boot=200, seed=0)
+    assert ci.dims == ("ci", "channel", "time")
+    assert list(ci["ci"].values) == ["lower", "upper"]
+    np.testing.assert_allclose(ci.values, bootstrap_ci(data, n_boot=200, seed=0))
+
+
+def test_bootstrap_ci_invalid(data):
+    """Test invalid arguments."""
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        bootstrap_ci(data, ci=95)
+    with pytest.raises(ValueError, match="At least 2 subjects"):
+        bootstrap_ci(data[:1])
+    with pytest.raises(ValueError, match="must be finite"):
+        bootstrap_ci(np.full((3, 2), np.nan))
+    with pytest.raises(ValueError, match="Invalid value"):
+        bootstrap_ci(data, method="basic")
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from mne import create_info
+from mne.channels import find_ch_adjacency, make_standard_montage
+from mne.stats import permutation_cluster_1samp_test
+
+from ..cluster import get_montage_adjacency, permutation_cluster_test
+
+
+@pytest.fixture(scope="module")
+def adjacency():
+    """Get the adjacency of the GSN-HydroCel-129 montage."""
+    montage = make_standard_montage("GSN-HydroCel-129")
+    return get_montage_adjacency("GSN-HydroCel-129", montage.ch_names)
+
+
+@pytest.fixture(scope="module")
+def X():
+    """Create paired differences with an effect on a few channels and samples."""
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((20, 129, 30))
+    X[:, 4:12, 10:20] += 1.5
+    return X
+
+
+def test_get_montage_adjacency(adjacency):
+    """Test the cached adjacency against MNE."""
+    montage = make_standard_montage("GSN-HydroCel-129")
+    info = create_info(montage.ch_names, 1000.0, "eeg")
+    info.set_montage(montage)
+    expected, _ = find_ch_adjacency(info, "eeg")
+    assert (adjacency != expected).nnz == 0
+    sub = get_montage_adjacency("GSN-HydroCel-129", ["E3", "E1", "E2"])
+    np.testing.assert_array_equal(
+        sub.toarray(), expected[[2, 0, 1]][:, [2, 0, 1]].toarray()
+    )
+    with pytest.raises(ValueError, match="not in the montage"):
+        get_montage_adjacency("GSN-HydroCel-129", ["Fz"])
+
+
+def test_permutation_cluster_test(X, adjacency):
+    """Test the cluster permutation test against MNE."""
+    t_obs, clusters, p_values, h0 = permutation_cluster_test(
+        X, adjacency, n_permutations=200, seed=0
+    )
+    t_mne, clusters_mne, p_mne, _ = permutation_cluster_1samp_test(
+        X.transpose(0, 2, 1),
+        adjacency=adjacency,
+        n_permutations=200,
+        out_type="mask",
+        seed=0,
+        verbose=False,
+    )
+    np.testing.assert_allclose(t_obs, t_mne.T)
+    assert len(clusters) == len(clusters_mne)
+    assert {c.tobytes() for c in clusters} == {
+        c.T.copy().tobytes() for c in clusters_mne
+    }
+    assert h0.shape == (200,)
+    # the effect is found and significant
+    best = np.argmin(p_values)
+    assert p_values[best] < 0.01
+    assert clusters[best][4:12, 10:20].all()
+    assert np.min(p_mne) < 0.01
+
+
+def test_permutation_cluster_test_deterministic(X, adjacency):
+    """Test that the permutations do not depend on the number of workers."""
+    out = permutation_cluster_test(
+        X, adjacency, n_permutations=60, batch_size=16, seed=1
+    )
+    out2 = permutation_cluster_test(
+        X, adjacency, n_permutations=60, batch_size=16, seed=1, n_jobs=2
+    )
+    np.testing.assert_allclose(out[3], out2[3])
+    np.testing.assert_allclose(out[2], out2[2])
+
+
+def test_permutation_cluster_test_dataarray(X):
+    """Test the cluster permutation test on a DataArray, over channel x frequency."""
+    xr = pytest.importorskip("xarray")
+    montage = make_standard_montage("GSN-HydroCel-129")
+    da = xr.DataArray(
+        X,
+        coords={
+            "subject": [f"sub-{k}" for k in range(20)],
+            "channel": montage.ch_names,
+            "freq": np.arange(1.0, 31.0),
+        },
+        dims=("subject", "channel", "freq"),
+    )
+    t_obs, clusters, p_values, _ = permutation_cluster_test(
+        da, n_permutations=50, seed=0, tail=1
+    )
+    assert t_obs.dims == ("channel", "freq")
+    assert all(c.shape == (129, 30) for c in clusters)
+    assert all(t_obs.values[c].min() > 0 for c in clusters)
+    with pytest.raises(ValueError, match="requires a DataArray"):
+        permutation_cluster_test(X)
+    with pytest.raises(ValueError, match="does not match"):
+        permutation_cluster_test(X[:, :10], np.eye(129))
+
+
+def test_permutation_cluster_test_no_adjacency():
+    """Test clusters along time only."""
+    X = np.zeros((10, 2, 5))
+    X[:, 0, 1:3] = 1.0
+    X[:, 1, 1:3] = 1.0
+    X += np.random.default_rng(0).standard_normal(X.shape) * 0.1
+    _, clusters, _, _ = permutation_cluster_test(X, None, n_permutations=10, seed=0)
+    assert len(clusters) == 2
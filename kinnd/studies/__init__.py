@@ -1 +1,3 @@
-from . import semantics, listen
\ No newline at end of file
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, submodules=["listen", "semantics"])
@@ -1 +1,33 @@
-from . import io
\ No newline at end of file
+from ...utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=[
+        "bids",
+        "evoked",
+        "inventory",
+        "io",
+        "pipeline",
+        "qc",
+        "spectral",
+        "sweep",
+    ],
+    submod_attrs={
+        "bids": ["bidsify_listen", "bidsify_listen_file", "read_listen_recordings"],
+        "evoked": ["build_evoked_dataset", "compute_evoked_listen"],
+        "inventory": ["read_inventory_listen"],
+        "io": ["DIN_MAPPING", "align_din_onsets"],
+        "pipeline": [
+            "clean_listen",
+            "clean_listen_file",
+            "find_bads_listen",
+            "find_bads_listen_file",
+            "get_pylossless_config",
+            "reject_listen",
+            "reject_listen_file",
+        ],
+        "qc": ["build_qc_reports", "make_qc_listen"],
+        "spectral": ["build_psd_dataset", "compute_psd_listen"],
+        "sweep": ["sweep_listen"],
+    },
+)
@@ -0,0 +1,380 @@
+import csv
+import os
+import shutil
+from functools import partial
+from pathlib import Path
+
+from kinnd.utils._imports import import_optional_dependency
+from kinnd.utils.logs import logger, warn
+from kinnd.utils.parallel import parallel_imap
+
+from .io import _validate_type
+
+# Mapping from the event descriptions of the LISTEN recordings to the event codes
+# written to the BIDS dataset.
+EVENT_IDS = {
+    "BAD_ACQ_SKIP": 0,
+    # Semantics
+    "image_match": 1,
+    "image_mismatch": 2,
+    "word_match": 3,
+    "word_mismatch": 4,
+    "net": 5, # user defined?
+    # Phonemes
+    "tone_Standard": 10,
+    "tone_Deviant": 11,
+    # Resting
+    "rest": 20,
+    "Devt": 21,
+    # Stimtracker events
+    "DIN6": 56,
+    "DIN8": 58,
+    # EGI stuff
+    "bgin": 60,
+    "CELL": 61,
+    "SESS": 62,
+    "TRSP": 63,
+    # Misc Experiment
+    "isi+": 64,
+    "IEND": 65,
+}
+TASKS = ("phonemes", "semantics", "resting")
+
+
+def get_listen_bids_root(listen_fpath=None):
+    """Return the root of the BIDS dataset of the LISTEN study.
+
+    Parameters
+    ----------
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to ``data/bids``.
+    """
+    from kinnd.utils.paths import get_listen_path
+
+    _validate_type("listen_fpath", listen_fpath, (str, Path, None))
+    if not listen_fpath:
+        listen_fpath = get_listen_path()
+    return (Path(listen_fpath) / "data" / "bids").expanduser()
+
+
+def read_listen_recordings(
+    subjects=None, *, task=None, session=None, listen_fpath=None
+    ):
+    """Read the list of recordings of the LISTEN study.
+
+    The recordings are listed in ``data/eeg_list.csv``, written by
+    ``scripts/generate_listen_eeg_list.py``. Recordings whose task could not be
+    determined are ignored.
+
+    Parameters
+    ----------
+    subjects : list of str | None
+        The subject IDs to select, for example ``["2001", "2002"]``. If ``None``,
+        every subject is selected.
+    task : str | None
+        The experimental task to select. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is selected.
+    session : int | str | None
+        The session (visit) to select, 1 or 2. If ``None``, every session is
+        selected.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+
+    Returns
+    -------
+    recordings : list of tuple
+        The ``(subject, session, task, sourcefile)`` of each recording, with the
+        subject as a string, e.g. ``"2001"``, and the session as a zero-padded
+        string, e.g. ``"01"``.
+    """
+    pd = import_optional_dependency("pandas")
+
+    _validate_type("task", task, (str, None))
+    _validate_type("session", session, (int, str, None))
+    if task is not None and task not in TASKS:
+        raise ValueError(f"task must be one of {list(TASKS)}, got {task}.")
+    fname = get_listen_bids_root(listen_fpath).parent / "eeg_list.csv"
+    if not fname.exists():
+        raise FileNotFoundError(f"The list of recordings {fname} does not exist.")
+    df = pd.read_csv(fname, header=0, dtype={"subject": str, "session": str})
+    subjects = None if subjects is None else [str(subject) for subject in subjects]
+    session = None if session is None else str(session).zfill(2)
+    recordings = list()
+    for tup in df.itertuples():
+        if subjects is not None and tup.subject not in subjects:
+            continue
+        if session is not None and str(tup.session).zfill(2) != session:
+            continue
+        if pd.isnull(tup.task):
+            logger.debug("Ignoring %s, its task is unknown.", tup.sourcefile)
+            continue
+        if task is not None and tup.task != task:
+            continue
+        recordings.append(
+            (tup.subject, str(tup.session).zfill(2), tup.task, tup.sourcefile)
+            )
+    return recordings
+
+
+def bidsify_listen_file(
+    subject,
+    session,
+    task,
+    sourcefile,
+    *,
+    listen_fpath=None,
+    bids_root=None,
+    overwrite=False,
+    ):
+    """Convert a single recording of the LISTEN study to BIDS.
+
+    The onsets of the stimuli are aligned to their DIN event, see
+    :func:`~kinnd.studies.listen.align_din_onsets`, and the statistics of the delays
+    are logged.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    task : str
+        The experimental task. Must be one of "phonemes", "semantics" or "resting".
+    sourcefile : str | pathlib.Path
+        Path to the ``.mff`` recording.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    bids_root : str | pathlib.Path | None
+        The root of the BIDS dataset written to. If ``None``, the BIDS dataset of the
+        LISTEN study, in ``data/bids``.
+    overwrite : bool
+        If True, overwrite an existing BIDS recording.
+
+    Returns
+    -------
+    bids_path : mne_bids.BIDSPath
+        The path to the BIDS recording.
+    """
+    mne_bids = import_optional_dependency("mne_bids")
+    from .io import DIN_MAPPING, read_raw_listen
+
+    if task == "semantics":
+        event_mapping = {"img+": "image", "snd+": "word"}
+    elif task == "phonemes":
+        event_mapping = {"stm+": "tone"}
+    else:
+        event_mapping = None
+    if task == "phonemes" and str(subject) in ("2055", "2058", "2068"):
+        # Special case where the condition labels are missing from the file
+        condition_mapping = {1: "Standard", 2: "Deviant"}
+    else:
+        condition_mapping = None
+    raw = read_raw_listen(
+        sourcefile,
+        event_mapping=event_mapping,
+        condition_mapping=condition_mapping,
+        din_mapping=DIN_MAPPING.get(task),
+        )
+    bids_path = mne_bids.BIDSPath(
+        subject=str(subject),
+        session=str(session).zfill(2),
+        task=task,
+        suffix="eeg",
+        datatype="eeg",
+        root=get_listen_bids_root(listen_fpath) if bids_root is None else bids_root,
+        )
+    mne_bids.write_raw_bids(
+        raw=raw,
+        bids_path=bids_path,
+        overwrite=overwrite,
+        event_id=EVENT_IDS,
+        allow_preload=True,
+        format="EDF",
+        )
+    return bids_path
+
+
+def bidsify_listen(
+    subjects=None,
+    *,
+    task=None,
+    session=None,
+    listen_fpath=None,
+    n_jobs=1,
+    max_memory=None,
+    overwrite=False,
+    dry_run=False,
+    ):
+    """Convert the recordings of the LISTEN study to BIDS.
+
+    Each recording is converted by a worker process to its own BIDS dataset in
+    ``data/bids_staging``, then moved into the BIDS dataset by the main process, with
+    the EDF file last. Thus, an interrupted conversion never leaves a partial EDF file
+    in the BIDS dataset, and is redone on the next run. The files shared by the
+    recordings, i.e. ``participants.tsv`` and the ``scans.tsv`` of each session, are
+    only written by the main process, which merges the rows of each recording.
+
+    Parameters
+    ----------
+    subjects : list of str | None
+        The subject IDs to convert, for example ``["2001", "2002"]``. If ``None``,
+        every subject listed in ``data/eeg_list.csv`` is converted.
+    task : str | None
+        The experimental task to convert. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is converted.
+    session : int | str | None
+        The session (visit) to convert, 1 or 2. If ``None``, every session is
+        converted.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_jobs : int
+        The number of recordings converted in parallel.
+    max_memory : int | None
+        The maximum address space of each worker process, in bytes, which is larger
+        than its resident memory. A recording which needs more fails with a
+        :class:`MemoryError` and is skipped, instead of exhausting the memory of the
+        machine. Only supported on Unix.
+    overwrite : bool
+        If True, convert the recordings already in the BIDS dataset again.
+    dry_run : bool
+        If True, only return the recordings which would be converted.
+
+    Returns
+    -------
+    basenames : list of str
+        The BIDS basenames of the recordings converted, e.g.
+        ``"sub-2001_ses-01_task-phonemes"``.
+    """
+    recordings = read_listen_recordings(
+        subjects, task=task, session=session, listen_fpath=listen_fpath
+        )
+    broot = get_listen_bids_root(listen_fpath)
+    todo = list()
+    for recording in recordings:
+        if not overwrite and _get_bids_fname(broot, *recording[:3]).exists():
+            logger.debug("Skipping %s, it already exists.", _basename(*recording[:3]))
+            continue
+        todo.append(recording)
+    logger.info("%i / %i recordings to convert to BIDS.", len(todo), len(recordings))
+    if dry_run:
+        return [_basename(*recording[:3]) for recording in todo]
+    staging = broot.parent / "bids_staging"
+    done = list()
+    for recording, staging_root in parallel_imap(
+        partial(_bidsify_item, staging=staging, listen_fpath=listen_fpath),
+        todo,
+        n_jobs=n_jobs,
+        max_memory=max_memory,
+        ):
+        if staging_root is None:
+            continue
+        try:
+            _commit_bids_recording(staging_root, broot, *recording[:3])
+        finally:
+            shutil.rmtree(staging_root, ignore_errors=True)
+        done.append(_basename(*recording[:3]))
+        logger.info("%s converted to BIDS.", done[-1])
+    if staging.exists() and not any(staging.iterdir()):
+        staging.rmdir()
+    return done
+
+
+def _bidsify_item(recording, *, staging, listen_fpath):
+    """Convert a recording to its staging BIDS dataset, and warn on error."""
+    staging_root = staging / _basename(*recording[:3])
+    # left over by an interrupted conversion
+    shutil.rmtree(staging_root, ignore_errors=True)
+    try:
+        bidsify_listen_file(
+            *recording, listen_fpath=listen_fpath, bids_root=staging_root
+            )
+    except Exception as error:
+        shutil.rmtree(staging_root, ignore_errors=True)
+        warn(f"Failed to convert {_basename(*recording[:3])} to BIDS: {error}")
+        return None
+    return staging_root
+
+
+def _commit_bids_recording(staging_root, broot, subject, session, task):
+    """Move a recording from its staging BIDS dataset into the BIDS dataset.
+
+    The files of the ``eeg`` directory are moved with :func:`os.replace`, which is
+    atomic within a file system, and the EDF file is moved last. The
+    ``participants.tsv`` and ``scans.tsv`` files are merged into those of the BIDS
+    dataset, and the other files, e.g. ``dataset_description.json``, are copied if
+    they are missing.
+    """
+    staging_root, broot = Path(staging_root), Path(broot)
+    edf = _get_bids_fname(staging_root, subject, session, task)
+    if not edf.exists():
+        raise FileNotFoundError(f"The staging recording {edf} does not exist.")
+    for fname in sorted(staging_root.rglob("*")):
+        if fname.is_dir() or fname == edf:
+            continue
+        target = broot / fname.relative_to(staging_root)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if fname.parent.name == "eeg":
+            os.replace(fname, target)
+        elif fname.name == "participants.tsv":
+            # keep the participant information edited in the BIDS dataset
+            _merge_tsv(fname, target, "participant_id", replace=False)
+        elif fname.name.endswith("_scans.tsv"):
+            _merge_tsv(fname, target, "filename", replace=True)
+        elif not target.exists():
+            shutil.copyfile(fname, target)
+    os.replace(edf, _get_bids_fname(broot, subject, session, task))
+
+
+def _merge_tsv(source, target, key, *, replace):
+    """Merge the rows of a TSV file into another one, on the values of a column.
+
+    The rows of the source replace those of the target with the same key if
+    ``replace`` is True, and are ignored otherwise. The target is replaced atomically.
+    """
+    rows, columns = _read_tsv(target) if Path(target).exists() else ([], [])
+    new_rows, new_columns = _read_tsv(source)
+    keys = {row[key] for row in new_rows}
+    existing = {row[key] for row in rows}
+    if replace:
+        rows = [row for row in rows if row[key] not in keys] + new_rows
+    else:
+        rows += [row for row in new_rows if row[key] not in existing]
+    columns += [column for column in new_columns if column not in columns]
+    tmp = Path(target).with_name(f".{Path(target).name}.tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as fid:
+        writer = csv.DictWriter(
+            fid, columns, restval="n/a", delimiter="\t", lineterminator="\n"
+            )
+        writer.writeheader()
+        writer.writerows(sorted(rows, key=lambda row: row[key]))
+    os.replace(tmp, target)
+
+
+def _read_tsv(fname):
+    """Read the rows and the columns of a TSV file."""
+    with open(fname, newline="", encoding="utf-8") as fid:
+        reader = csv.DictReader(fid, delimiter="\t")
+        return list(reader), list(reader.fieldnames or [])
+
+
+def _basename(subject, session, task):
+    """Return the BIDS basename of a recording."""
+    return f"sub-{subject}_ses-{str(session).zfill(2)}_task-{task}"
+
+
+def _get_bids_fname(broot, subject, session, task):
+    """Return the path to the EDF file of a recording in the BIDS dataset."""
+    session = str(session).zfill(2)
+    return (
+        Path(broot) / f"sub-{subject}" / f"ses-{session}" / "eeg"
+        / f"{_basename(subject, session, task)}_eeg.edf"
+    )
@@ -0,0 +1,256 @@
+from functools import partial
+from pathlib import Path
+
+import mne
+import numpy as np
+
+from kinnd.io.store import SUBJECT_DIM, update_store
+from kinnd.preprocessing.spatial import apply_spatial_operator
+from kinnd.utils._imports import import_optional_dependency
+from kinnd.utils.resources import get_mne_n_jobs
+
+from .io import (
+    get_listen_derivative_root,
+    get_processed_listen_fname,
+    read_processed_listen,
+)
+
+# Mapping from the annotation descriptions written by read_raw_listen to the
+# condition labels stored in the evoked datasets.
+CONDITIONS = {
+    "phonemes": {"tone_Standard": "tone/standard", "tone_Deviant": "tone/deviant"},
+    "semantics": {"image_match": "image/match", "image_mismatch": "image/mismatch"},
+}
+
+
+def compute_evoked_listen(
+    subject,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    ):
+    """Compute the evoked responses of a single subject from the LISTEN study.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to compute the evoked responses from. Must be one of
+        "pylossless" or "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+
+    Returns
+    -------
+    ds : xarray.Dataset | None
+        The evoked block of the subject, with the variables ``evoked`` of shape
+        ``(subject, condition, channel, time)``, ``n_trials`` of shape
+        ``(subject, condition)``, and ``bads`` and ``filename`` of shape
+        ``(subject,)``. ``None`` is returned if the derivative file does not exist.
+    """
+    xr = import_optional_dependency("xarray")
+    out = _read_epochs_listen(
+        subject,
+        task=task,
+        session=session,
+        derivative=derivative,
+        listen_fpath=listen_fpath,
+    )
+    if out is None:
+        return None
+    epochs, bads, fname = out
+    conditions = CONDITIONS[task]
+
+    data = np.stack(
+        [epochs[condition].average().data for condition in conditions.values()]
+        )
+    ds = xr.Dataset(
+        {
+            "evoked": (
+                (SUBJECT_DIM, "condition", "channel", "time"), data[np.newaxis]
+            ),
+            "n_trials": (
+                (SUBJECT_DIM, "condition"),
+                [[len(epochs[condition]) for condition in conditions.values()]],
+            ),
+            "bads": ((SUBJECT_DIM,), np.array([",".join(bads)], dtype=object)),
+            "filename": (
+                (SUBJECT_DIM,),
+                np.array([Path(fname).name], dtype=object),
+            ),
+        },
+        coords={
+            SUBJECT_DIM: [f"sub-{subject}"],
+            "condition": list(conditions.values()),
+            "channel": epochs.ch_names,
+            "time": epochs.times,
+        },
+        attrs={
+            "task": task,
+            "sfreq": epochs.info["sfreq"],
+            "filter": f"{epochs.info['highpass']}-{epochs.info['lowpass']} Hz",
+            "reference": "average",
+            "baseline": list(epochs.baseline),
+            "derivative": derivative,
+        },
+    )
+    return ds
+
+
+def build_evoked_dataset(
+    fname=None,
+    subjects=None,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    n_jobs=1,
+    overwrite=False,
+    dry_run=False,
+    ):
+    """Build or update the cohort evoked dataset of the LISTEN study.
+
+    The subjects are processed in a pool of worker processes, and the evoked block
+    of each subject is written to a zarr store of shape
+    ``(subject, condition, channel, time)`` as soon as it is ready. A subject
+    already in the store is only recomputed if its derivative file changed since it
+    was written, thus adding a participant does not recompute the whole cohort.
+
+    Parameters
+    ----------
+    fname : str | pathlib.Path | None
+        Path to the ``.zarr`` store. If ``None``, the store is written to
+        ``data/derivatives/xarray/<task>_evoked_<derivative>.zarr``.
+    subjects : list of str | None
+        The subject IDs to include, for example ``["2001", "2002"]``. If ``None``,
+        every subject found in the derivative directory is included.
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to compute the evoked responses from. Must be one of
+        "pylossless" or "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_jobs : int
+        The number of subjects processed in parallel.
+    overwrite : bool
+        If True, recompute every subject, even those which did not change.
+    dry_run : bool
+        If True, nothing is computed and the subjects which would be (re)computed are
+        returned instead of the path to the store.
+
+    Returns
+    -------
+    fname : pathlib.Path | list of str
+        The path to the ``.zarr`` store, or the subjects which would be (re)computed,
+        e.g. ``["sub-2001"]``, if ``dry_run=True``.
+    """
+    droot = get_listen_derivative_root(derivative, listen_fpath)
+    if fname is None:
+        fname = droot.parent / "xarray" / f"{task}_evoked_{derivative}.zarr"
+    if subjects is None:
+        subjects = sorted(
+            sub.name.split("sub-")[-1] for sub in droot.glob("sub-*") if sub.is_dir()
+            )
+    subjects = [str(subject) for subject in subjects]
+    kwargs = dict(
+        task=task, session=session, derivative=derivative, listen_fpath=listen_fpath
+        )
+    fingerprints = {
+        f"sub-{subject}": _fingerprint(
+            get_processed_listen_fname(subject, **kwargs)
+            )
+        for subject in subjects
+    }
+    todo = update_store(
+        fname,
+        partial(_compute_evoked_block, **kwargs),
+        [f"sub-{subject}" for subject in subjects],
+        fingerprints=fingerprints,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+    return todo if dry_run else Path(fname)
+
+
+def _read_epochs_listen(subject, *, task, session, derivative, listen_fpath):
+    """Read the processed data of a subject and epoch it around the conditions.
+
+    Returns the epochs, the channels marked as bad before interpolation and the
+    derivative filename, or None if the derivative file does not exist.
+    """
+    if task not in CONDITIONS:
+        raise ValueError(f"task must be one of {list(CONDITIONS)}, got {task}.")
+    conditions = CONDITIONS[task]
+    try:
+        inst = read_processed_listen(
+            subject,
+            task=task,
+            session=session,
+            derivative=derivative,
+            listen_fpath=listen_fpath,
+            read_raw_kwargs=dict(preload=True),
+        )
+    except FileNotFoundError:
+        return None
+
+    fname = _get_inst_filename(inst)
+    bads = inst.info["bads"].copy() # save for later
+    if derivative == "pylossless":
+        inst = apply_spatial_operator(inst, copy=False).filter(
+            1, 40, n_jobs=get_mne_n_jobs()
+            )
+        inst.annotations.rename(
+            {key: value for key, value in conditions.items()
+             if key in inst.annotations.description}
+            )
+        epochs = mne.Epochs(
+            inst,
+            event_id=list(conditions.values()),
+            tmin=-.1,
+            tmax=1,
+            preload=True,
+            )
+    else:
+        epochs = apply_spatial_operator(inst, reference=None, copy=False)
+    return epochs, bads, fname
+
+
+def _compute_evoked_block(subject, **kwargs):
+    """Compute the evoked block of a subject, given as 'sub-XXXX'."""
+    return compute_evoked_listen(subject.split("sub-")[-1], **kwargs)
+
+
+def _fingerprint(fname):
+    """Fingerprint an input file from its size and modification time."""
+    if not fname.exists():
+        return ""
+    stat = fname.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def _get_inst_filename(inst):
+    from mne.io import BaseRaw
+    from mne import BaseEpochs
+
+    if isinstance(inst, BaseRaw):
+        return inst.filenames[0]
+    elif isinstance(inst, BaseEpochs):
+        return inst.filename
+    else:
+        raise ValueError(
+            f"inst must be an MNE Raw or Epochs instance. got {type(inst)}"
+            )
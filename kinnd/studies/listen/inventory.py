@@ -0,0 +1,68 @@
+from kinnd.io.inventory import read_inventory
+
+from .evoked import CONDITIONS
+from .io import get_listen_derivative_root, get_processed_listen_fname
+
+
+def read_inventory_listen(
+    subjects=None,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    n_jobs=1,
+    ):
+    """Read the trial and bad channel counts of the LISTEN study from the file headers.
+
+    Only the measurement info, the annotations or events and the drop log of the
+    derivative files are read, never their samples, and the result of each file is
+    cached until the file changes.
+
+    Parameters
+    ----------
+    subjects : list of str | None
+        The subject IDs to include, for example ``["2001", "2002"]``. If ``None``,
+        every subject found in the derivative directory is included.
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to read. Must be one of "pylossless" or "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_jobs : int
+        The number of files read in parallel.
+
+    Returns
+    -------
+    inventory : pandas.DataFrame
+        One row per subject with a derivative file, see
+        :func:`kinnd.io.read_inventory`. The conditions are the labels of the evoked
+        datasets, e.g. ``n_image/match``.
+    """
+    if task not in CONDITIONS:
+        raise ValueError(f"task must be one of {list(CONDITIONS)}, got {task}.")
+    droot = get_listen_derivative_root(derivative, listen_fpath)
+    if subjects is None:
+        subjects = sorted(
+            sub.name.split("sub-")[-1] for sub in droot.glob("sub-*") if sub.is_dir()
+            )
+    fnames = dict()
+    for subject in subjects:
+        fname = get_processed_listen_fname(
+            str(subject),
+            task=task,
+            session=session,
+            derivative=derivative,
+            listen_fpath=listen_fpath,
+        )
+        if fname.exists():
+            fnames[f"sub-{subject}"] = fname
+    # the annotations of the raw files and the events of the epochs files are named
+    # either after the annotations or after the conditions
+    conditions = dict(CONDITIONS[task])
+    conditions.update({value: value for value in CONDITIONS[task].values()})
+    return read_inventory(fnames, conditions=conditions, n_jobs=n_jobs)
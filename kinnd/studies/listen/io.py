@@ -1,10 +1,20 @@
-import pytz
 import datetime
 
-import mne
-
 from pathlib import Path
 
+import numpy as np
+
+from kinnd.utils.logs import logger
+
+# Mapping from the code of each stimulus to the code of the DIN event sent by the
+# StimTracker at its actual onset, for each task.
+DIN_MAPPING = {
+    "phonemes": {"stm+": "DIN8"},
+    "semantics": {"img+": "DIN6", "snd+": "DIN8"},
+}
+# Codes of the events which are not written to the annotations.
+SKIPPED_CODES = ("bgin", "TRSP", "SESS", "CELL", "Isi+")
+
 
 def get_cel_map(events_eci):
     """Return a dictionary mapping from CEL codes to human readable conditions.
@@ -25,7 +35,9 @@ def get_cel_map(events_eci):
     return cel_map
 
 
-def read_raw_listen(filename, event_mapping=None, condition_mapping=None):
+def read_raw_listen(
+    filename, event_mapping=None, condition_mapping=None, din_mapping=None, tmax=0.05
+    ):
     """Read an MFF file from the Listen study into MNE-Python.
 
     Parameters
@@ -44,6 +56,14 @@ def read_raw_listen(filename, event_mapping=None, condition_mapping=None):
         provide a mapping here. For example, for the semantics task, you would pass
         ``{"1": "match", "2": "mismatch"}``. For the phonemes task, you would pass
         ``{"1": "Standard", "2": "Deviant"}``.
+    din_mapping : dict | None
+        A mapping from the event codes of the stimuli to the code of their DIN event,
+        e.g. ``DIN_MAPPING["semantics"]``. If provided, the onsets of the stimuli are
+        aligned to their DIN event with :func:`align_din_onsets`. If ``None``, the
+        onsets logged by the stimulus computer are used.
+    tmax : float
+        The maximum delay, in seconds, between a stimulus and its DIN event. Only
+        used with ``din_mapping``.
 
     Returns
     -------
@@ -57,6 +77,10 @@ def read_raw_listen(filename, event_mapping=None, condition_mapping=None):
     ``kinnd.io.read_raw_bids`` for that purpose.
     """
     import mffpy
+    import mne
+    import pytz
+
+    from kinnd.preprocessing.montage import get_standard_montage
 
     filename = Path(filename)
 
@@ -76,7 +100,7 @@ def read_raw_listen(filename, event_mapping=None, condition_mapping=None):
         info = mffpy.XML.from_file(fp)
     montage_map = {"HydroCel GSN 128 1.0": "GSN-HydroCel-129",}
     mon = info.generalInformation["montageName"]
-    montage = mne.channels.make_standard_montage(montage_map[mon])
+    montage = get_standard_montage(montage_map[mon])
 
     # samples
     eeg, _ = mff_reader.get_physical_samples()["EEG"]
@@ -107,31 +131,117 @@ def read_raw_listen(filename, event_mapping=None, condition_mapping=None):
         event_eci = categories_dict[event_eci[0]]
         condition_mapping = get_cel_map(event_eci)
 
-    onsets = []
-    durations = []
-    descriptions = []
-    for events in categories_dict.values():
-        for event in events:
-            onset = event["beginTime"].replace(tzinfo=pytz.timezone("US/Pacific"))
-            onset = onset.astimezone(pytz.utc).replace(tzinfo=datetime.timezone.utc)
-            ts = (onset - raw.info["meas_date"]).total_seconds()
-            duration = event["duration"] / 1000
-            if event["code"] in ["bgin", "TRSP", "SESS", "CELL", "Isi+"]:
-                # Skip these events to keep the annotations clean
-                # Isi+ is weird because the onset is outside the recording. Corrupted?
-                continue
-            elif event_mapping is not None and event["code"] in event_mapping:
-                condition = condition_mapping[int(event["keys"]["cel#"])]
-                description = f"{event_mapping[event['code']]}_{condition}"
-            else:
-                description = event["code"]
-            onsets.append(ts)
-            durations.append(duration)
-            descriptions.append(description)
+    # columnar event table, with the onsets relative to the start of the recording
+    events = [event for events in categories_dict.values() for event in events]
+    codes = np.array([event["code"] for event in events], dtype=object)
+    keep = ~np.isin(codes, SKIPPED_CODES)
+    # Isi+ is skipped because its onset is outside the recording. Corrupted?
+    events = [event for event, kept in zip(events, keep) if kept]
+    codes = codes[keep]
+    # the start and the events are localized to the same time zone, thus their
+    # difference is the difference of the local times
+    start = np.datetime64(mff_reader.startdatetime.replace(tzinfo=None), "us")
+    onsets = (
+        np.array(
+            [event["beginTime"].replace(tzinfo=None) for event in events],
+            dtype="datetime64[us]",
+        )
+        - start
+    ) / np.timedelta64(1, "s")
+    durations = np.array([event["duration"] / 1000 for event in events])
+    descriptions = [
+        f"{event_mapping[event['code']]}_"
+        f"{condition_mapping[int(event['keys']['cel#'])]}"
+        if event_mapping is not None and event["code"] in event_mapping
+        else event["code"]
+        for event in events
+    ]
+    if din_mapping is not None:
+        onsets, latencies = align_din_onsets(onsets, codes, din_mapping, tmax=tmax)
+        _log_din_latencies(latencies, filename.name, tmax)
     raw.set_annotations(mne.Annotations(onsets, durations, descriptions))
     return raw
 
 
+def align_din_onsets(onsets, codes, din_mapping, *, tmax=0.05):
+    """Align the onsets of the stimuli to the onsets of their DIN events.
+
+    The onset of each stimulus, logged by the stimulus computer, is replaced by the
+    onset of the first following DIN event sent by the StimTracker, within ``tmax``.
+    The DIN events are matched to all the stimuli of a code at once, with
+    :func:`numpy.searchsorted`.
+
+    Parameters
+    ----------
+    onsets : array of shape (n_events,)
+        The onsets of the events, in seconds.
+    codes : array of shape (n_events,)
+        The codes of the events, e.g. ``"stm+"`` or ``"DIN8"``.
+    din_mapping : dict
+        A mapping from the codes of the stimuli to the code of their DIN event, e.g.
+        ``{"img+": "DIN6", "snd+": "DIN8"}``, see ``DIN_MAPPING``.
+    tmax : float
+        The maximum delay, in seconds, between a stimulus and its DIN event.
+
+    Returns
+    -------
+    onsets : array of shape (n_events,)
+        The onsets, with those of the stimuli aligned to their DIN event.
+    latencies : array of shape (n_stimuli,)
+        The delay between each stimulus and its DIN event, in seconds, in the order
+        of the stimuli in ``onsets``, or NaN if no DIN event follows the stimulus
+        within ``tmax``. Those stimuli keep their logged onset.
+    """
+    _validate_type("din_mapping", din_mapping, dict)
+    _validate_type("tmax", tmax, (int, float))
+    if tmax < 0:
+        raise ValueError(f"tmax must be positive, got {tmax}.")
+    onsets = np.array(onsets, dtype=float)
+    codes = np.asarray(codes)
+    if onsets.shape != codes.shape:
+        raise ValueError("onsets and codes must have the same shape.")
+    stimuli = np.flatnonzero(np.isin(codes, list(din_mapping)))
+    latencies = np.full(stimuli.size, np.nan)
+    for code, din in din_mapping.items():
+        is_code = codes[stimuli] == code
+        dins = np.sort(onsets[codes == din])
+        times = onsets[stimuli[is_code]]
+        idx = np.searchsorted(dins, times, side="left")
+        found = idx < dins.size
+        delays = np.full(times.size, np.nan)
+        delays[found] = dins[idx[found]] - times[found]
+        delays[delays > tmax] = np.nan
+        latencies[is_code] = delays
+    aligned = ~np.isnan(latencies)
+    onsets[stimuli[aligned]] += latencies[aligned]
+    return onsets, latencies
+
+
+def _log_din_latencies(latencies, name, tmax):
+    """Log the statistics of the delays between the stimuli and their DIN events."""
+    aligned = latencies[~np.isnan(latencies)] * 1000
+    if aligned.size != 0:
+        logger.info(
+            "%s: %i / %i stimuli aligned to their DIN event, with a delay of "
+            "%.1f ms (median), %.1f to %.1f ms.",
+            name,
+            aligned.size,
+            latencies.size,
+            np.median(aligned),
+            aligned.min(),
+            aligned.max(),
+        )
+    if aligned.size != latencies.size:
+        logger.warning(
+            "%s: %i / %i stimuli without a DIN event within %.0f ms keep their "
+            "logged onset.",
+            name,
+            latencies.size - aligned.size,
+            latencies.size,
+            tmax * 1000,
+        )
+
+
 def read_processed_listen(
     subject,
     *,
@@ -163,41 +273,24 @@ def read_processed_listen(
         a dictionary of keyword arguments that can be passed to ``mne.io.read_raw``.
         For example, ``dict(preload=True)`` or ``"{"preload": True}"``
     """
-    from kinnd.utils.paths import get_listen_path
-
-    # Sanity Checks
-    _validate_type("subject", subject, str)
-    _validate_type("task", task, str)
-    _validate_type("session", session, (int, str))
-    _validate_type("listen_fpath", listen_fpath, (str, Path, None))
-    _validate_type("derivative", derivative, str)
-    if derivative not in ["pylossless", "mne-bids-pipeline"]:
-        raise ValueError("derivative must be 'pylossless' or 'mne-bids-pipeline'.")
-    # Sanitize
-    session = str(session).zfill(2)
-
-    if not listen_fpath:
-        droot = get_listen_path() / "data" / "derivatives" / derivative
-    else:
-        droot = (listen_fpath /
-                 "data" /
-                 "derivatives" /
-                 derivative).expanduser.resolve()
-    if not droot.exists():
-        raise FileNotFoundError(f"{droot} does not exist.")
-
-    sub_path = droot / f"sub-{subject}" / f"ses-{session}"
+    fname = get_processed_listen_fname(
+        subject,
+        task=task,
+        session=session,
+        derivative=derivative,
+        listen_fpath=listen_fpath,
+    )
+    import mne
+
+    read_raw_kwargs = dict() if read_raw_kwargs is None else read_raw_kwargs
     if derivative == "pylossless":
-        fname = sub_path / f"sub-{subject}_ses-{session}_task-{task}_desc-cleaned_eeg.fif"
         return mne.io.read_raw(fname, **read_raw_kwargs)
 
     elif derivative == "mne-bids-pipeline":
         from mne_icalabel import label_components
         import pandas as pd
 
-        base_name = f"sub-{subject}_ses-{session}_task-{task}"
-        fname = sub_path / "eeg" / f"{base_name}_proc-icafit_epo.fif"
-        fname_ica = sub_path / "eeg" / f"{base_name}_proc-icafit_ica.fif"
+        fname_ica = fname.with_name(fname.name.replace("_epo.fif", "_ica.fif"))
         epochs = mne.read_epochs(fname)
         ica = mne.preprocessing.read_ica(fname_ica)
 
@@ -211,6 +304,68 @@ def read_processed_listen(
         raise ValueError("derivative must be 'pylossless' or 'mne-bids-pipeline'")
 
 
+def get_listen_derivative_root(derivative="pylossless", listen_fpath=None):
+    """Return the root directory of a derivative of the LISTEN study.
+
+    Parameters
+    ----------
+    derivative : str
+        The derivative. Must be one of "pylossless" or "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to ``data/derivatives/<derivative>``.
+    """
+    from kinnd.utils.paths import get_listen_path
+
+    _validate_type("listen_fpath", listen_fpath, (str, Path, None))
+    _validate_type("derivative", derivative, str)
+    if derivative not in ["pylossless", "mne-bids-pipeline"]:
+        raise ValueError("derivative must be 'pylossless' or 'mne-bids-pipeline'.")
+    if not listen_fpath:
+        listen_fpath = get_listen_path()
+    return (Path(listen_fpath) / "data" / "derivatives" / derivative).expanduser()
+
+
+def get_processed_listen_fname(
+    subject,
+    *,
+    task,
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    ):
+    """Return the path to a processed (cleaned) derivative file from the LISTEN study.
+
+    The parameters are the same as for :func:`read_processed_listen`.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to the cleaned raw FIF file (``"pylossless"``) or to the epochs FIF
+        file (``"mne-bids-pipeline"``).
+    """
+    # Sanity Checks
+    _validate_type("subject", subject, str)
+    _validate_type("task", task, str)
+    _validate_type("session", session, (int, str))
+    droot = get_listen_derivative_root(derivative, listen_fpath)
+    if not droot.exists():
+        raise FileNotFoundError(f"{droot} does not exist.")
+    # Sanitize
+    session = str(session).zfill(2)
+
+    sub_path = droot / f"sub-{subject}" / f"ses-{session}"
+    base_name = f"sub-{subject}_ses-{session}_task-{task}"
+    if derivative == "pylossless":
+        return sub_path / f"{base_name}_desc-cleaned_eeg.fif"
+    return sub_path / "eeg" / f"{base_name}_proc-icafit_epo.fif"
+
+
 def _validate_type(parameter, argument, expected):
     """Validate that the user passed an argument that is a valid type for the parameter.
 
@@ -0,0 +1,827 @@
+import hashlib
+import json
+import os
+import shutil
+from functools import partial
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import numpy as np
+
+from kinnd.cache.memo import memoize
+from kinnd.io.fif import save_fif
+from kinnd.preprocessing.resample import decimate_raw
+from kinnd.utils._imports import import_optional_dependency
+from kinnd.utils.logs import logger, warn
+from kinnd.utils.parallel import parallel_imap
+
+from .bids import EVENT_IDS, _basename, get_listen_bids_root, read_listen_recordings
+from .io import _validate_type, get_listen_derivative_root
+
+# Channels of the HydroCel GSN 129 net which are marked as bad in every recording.
+EXTRA_BADS = ["E125", "E126", "E127", "E128"]
+# Channel flags of the PyLossless pipeline which are rejected in the cleaned data.
+CH_FLAGS_TO_REJECT = ["volt_std", "noisy", "uncorrelated", "bridged"]
+# Stages of the PyLossless pipeline after which a checkpoint is written, in order.
+CHECKPOINTS = ("filtered", "flags", "ica1", "ica2")
+# Rejection policy of the cleaned derivative, i.e. desc-cleaned.
+DEFAULT_POLICY = dict(ch_flags_to_reject=CH_FLAGS_TO_REJECT)
+
+
+def get_pylossless_config(listen_fpath=None):
+    """Return the PyLossless configuration file of the LISTEN study.
+
+    The configuration is written next to the BIDS dataset, in
+    ``data/listen_pylossless_config.yaml``, if it does not exist yet.
+
+    Parameters
+    ----------
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to the configuration file.
+    """
+    config_fpath = (
+        get_listen_bids_root(listen_fpath).parent / "listen_pylossless_config.yaml"
+    )
+    if config_fpath.exists():
+        return config_fpath
+    ll = import_optional_dependency("pylossless")
+
+    config = ll.config.Config()
+    config.load_default()
+    config["flag_channels_fixed_threshold"] = {"threshold": 0.00015}
+    config["flag_epochs_fixed_threshold"] = {"threshold": 0.00015}
+    config["filtering"]["notch_filter_args"]["freqs"] = [60]
+    outliers_kwargs = {"k": 6, "lower": 0.25, "upper": 0.75}
+    for step in (
+        "noisy_channels",
+        "noisy_epochs",
+        "uncorrelated_channels",
+        "uncorrelated_epochs",
+        ):
+        config[step]["outliers_kwargs"].update(outliers_kwargs)
+    config["ica"]["noisy_ic_epochs"]["outliers_kwargs"].update(outliers_kwargs)
+    config.save(config_fpath)
+    return config_fpath
+
+
+def clean_listen_file(
+    subject, session, task, *, listen_fpath=None, sfreq=None, overwrite=False
+    ):
+    """Clean a single BIDS recording of the LISTEN study with PyLossless.
+
+    The breaks are annotated, the PyLossless pipeline is run and the channels and
+    components it flags are rejected with :data:`DEFAULT_POLICY`. The cleaned raw
+    data are written to ``data/derivatives/pylossless``, with the state of the
+    pipeline: the raw data before the rejection (``desc-lossless``), the channel and
+    epoch flags, both ICA decompositions and the ICLabel table. Other rejection
+    policies are applied to the state with :func:`reject_listen`.
+
+    The state of the pipeline is checkpointed after the filtering, the flagging of
+    the channels and epochs, the first ICA and the second ICA, see
+    :data:`CHECKPOINTS`, to ``data/pylossless_checkpoints``. If the cleaning fails,
+    it resumes from the last valid checkpoint on the next run. A checkpoint is valid
+    if it was written completely, from the same BIDS recording and with the same
+    sampling frequency, configuration and version of PyLossless. The checkpoints are
+    removed once the cleaned derivative is written.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    task : str
+        The experimental task. Must be one of "phonemes", "semantics" or "resting".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    sfreq : float | None
+        The sampling frequency, in Hz, the recording is decimated to before the
+        pipeline, with :func:`kinnd.preprocessing.decimate_raw`, e.g. ``250``. If
+        ``None``, or if the recording is not sampled faster, it is cleaned at its
+        sampling frequency.
+    overwrite : bool
+        If True, overwrite existing derivative files.
+
+    Returns
+    -------
+    fname : pathlib.Path
+        The path to the cleaned raw FIF file.
+    """
+    ll = import_optional_dependency("pylossless")
+
+    config_fpath = get_pylossless_config(listen_fpath)
+    raw = _read_raw_bids(subject, session, task, listen_fpath=listen_fpath)
+    pipeline = ll.LosslessPipeline(config_fpath)
+    checkpoints = (
+        get_listen_bids_root(listen_fpath).parent
+        / "pylossless_checkpoints"
+        / _basename(subject, session, task)
+    )
+    _run_lossless(
+        pipeline,
+        raw,
+        checkpoints,
+        key=_get_checkpoint_key(raw, config_fpath, sfreq),
+        sfreq=sfreq,
+        )
+    fnames = _get_state_fnames(subject, session, task, listen_fpath=listen_fpath)
+    _write_lossless_state(pipeline, fnames, overwrite=overwrite)
+    # written last, marks the recording as cleaned
+    eeg_out = _apply_policy(
+        pipeline,
+        "cleaned",
+        _check_policies(dict(cleaned=DEFAULT_POLICY))["cleaned"],
+        fnames["raw"].parent / _basename(subject, session, task),
+        overwrite=overwrite,
+        )
+    shutil.rmtree(checkpoints, ignore_errors=True)
+    return eeg_out
+
+
+def reject_listen_file(
+    subject, session, task, policies, *, listen_fpath=None, overwrite=False
+    ):
+    """Apply rejection policies to the PyLossless state of a LISTEN recording.
+
+    The state written by :func:`clean_listen_file` is read, and each rejection policy
+    is applied to it, without running the pipeline again. The data cleaned by each
+    policy are written to ``data/derivatives/pylossless`` as
+    ``<basename>_desc-<policy>_eeg.fif``, with the parameters of the policy and the
+    version of PyLossless in the sidecar ``<basename>_desc-<policy>_eeg.json``.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    task : str
+        The experimental task. Must be one of "phonemes", "semantics" or "resting".
+    policies : dict
+        The rejection policies, as a mapping from the name of each policy, used as
+        the ``desc`` entity of its derivative and thus alphanumeric, to a
+        :class:`pylossless.RejectionPolicy` or to the keyword arguments of one, for
+        example ``{"keepbridged": dict(ch_flags_to_reject=["noisy"])}``.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    overwrite : bool
+        If True, apply the policies whose derivative is up to date again.
+
+    Returns
+    -------
+    fnames : dict
+        The path to the FIF file cleaned by each policy.
+    """
+    policies = _check_policies(policies)
+    dpath = _get_clean_fname(subject, session, task, listen_fpath=listen_fpath).parent
+    prefix = dpath / _basename(subject, session, task)
+    todo = {
+        name: policy
+        for name, policy in policies.items()
+        if overwrite or not _is_policy_applied(prefix, name, policy)
+        }
+    if len(todo) != 0:
+        pipeline = _read_lossless_state(
+            subject, session, task, listen_fpath=listen_fpath
+            )
+        for name, policy in todo.items():
+            _apply_policy(pipeline, name, policy, prefix, overwrite=True)
+    return {name: dpath / f"{prefix.name}_desc-{name}_eeg.fif" for name in policies}
+
+
+def reject_listen(
+    policies,
+    subjects=None,
+    *,
+    task=None,
+    session=None,
+    listen_fpath=None,
+    n_jobs=1,
+    overwrite=False,
+    dry_run=False,
+    ):
+    """Apply rejection policies to the PyLossless state of the LISTEN recordings.
+
+    The policies are applied to the recordings cleaned by :func:`clean_listen`, see
+    :func:`reject_listen_file`. A recording is skipped if the derivatives of every
+    policy were written with the same parameters and version of PyLossless.
+
+    Parameters
+    ----------
+    policies : dict
+        The rejection policies, as a mapping from the name of each policy, used as
+        the ``desc`` entity of its derivative and thus alphanumeric, to a
+        :class:`pylossless.RejectionPolicy` or to the keyword arguments of one.
+    subjects : list of str | None
+        The subject IDs to process, for example ``["2001", "2002"]``. If ``None``,
+        every subject listed in ``data/eeg_list.csv`` is processed.
+    task : str | None
+        The experimental task to process. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is processed.
+    session : int | str | None
+        The session (visit) to process, 1 or 2. If ``None``, every session is
+        processed.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_jobs : int
+        The number of recordings processed in parallel.
+    overwrite : bool
+        If True, apply the policies whose derivatives are up to date again.
+    dry_run : bool
+        If True, only return the recordings which would be processed.
+
+    Returns
+    -------
+    basenames : list of str
+        The BIDS basenames of the recordings processed, e.g.
+        ``"sub-2001_ses-01_task-phonemes"``.
+    """
+    policies = _check_policies(policies)
+    return _run(
+        partial(
+            reject_listen_file,
+            policies=policies,
+            listen_fpath=listen_fpath,
+            overwrite=overwrite,
+            ),
+        partial(_is_rejected, policies=policies, listen_fpath=listen_fpath),
+        "apply the rejection policies to",
+        subjects,
+        task=task,
+        session=session,
+        listen_fpath=listen_fpath,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+
+
+def find_bads_listen_file(
+    subject, session, task, *, listen_fpath=None, sfreq=None, n_iter=3
+    ):
+    """Find the bad channels of a single BIDS recording of the LISTEN study.
+
+    The channels are flagged by deviation, correlation and RANSAC with PyPREP, and the
+    flags are accumulated over ``n_iter`` iterations. The recording is written with
+    its bad channels to ``data/derivatives/mne-bids-pipeline``.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    task : str
+        The experimental task. Must be one of "phonemes", "semantics" or "resting".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    sfreq : float | None
+        The sampling frequency, in Hz, the recording is decimated to before the
+        detection, with :func:`kinnd.preprocessing.decimate_raw`, and written at. If
+        ``None``, or if the recording is not sampled faster, its sampling frequency is
+        kept.
+    n_iter : int
+        The number of iterations of the bad channel detection.
+
+    Returns
+    -------
+    bads : list of str
+        The bad channels.
+    """
+    mne_bids = import_optional_dependency("mne_bids")
+    pyprep = import_optional_dependency("pyprep")
+
+    raw = _decimate(
+        _read_raw_bids(subject, session, task, listen_fpath=listen_fpath), sfreq
+        )
+    bads = list()
+    for _ in range(n_iter):
+        nc = pyprep.NoisyChannels(raw=raw, random_state=42)
+        nc.find_bad_by_deviation()
+        nc.find_bad_by_correlation()
+        nc.find_bad_by_ransac()
+        bads = sorted(set(bads) | set(nc.get_bads()))
+        raw.info["bads"] = bads
+    mne_bids.write_raw_bids(
+        raw=raw,
+        bids_path=mne_bids.BIDSPath(
+            subject=str(subject),
+            session=str(session).zfill(2),
+            task=task,
+            suffix="eeg",
+            datatype="eeg",
+            root=get_listen_derivative_root("mne-bids-pipeline", listen_fpath),
+            ),
+        event_id=EVENT_IDS,
+        allow_preload=True,
+        format="EDF",
+        overwrite=True,
+        )
+    return bads
+
+
+def clean_listen(
+    subjects=None,
+    *,
+    task=None,
+    session=None,
+    listen_fpath=None,
+    sfreq=None,
+    n_jobs=1,
+    overwrite=False,
+    dry_run=False,
+    ):
+    """Clean the BIDS recordings of the LISTEN study with PyLossless.
+
+    Parameters
+    ----------
+    subjects : list of str | None
+        The subject IDs to clean, for example ``["2001", "2002"]``. If ``None``,
+        every subject listed in ``data/eeg_list.csv`` is cleaned.
+    task : str | None
+        The experimental task to clean. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is cleaned.
+    session : int | str | None
+        The session (visit) to clean, 1 or 2. If ``None``, every session is cleaned.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    sfreq : float | None
+        The sampling frequency, in Hz, the recordings are decimated to before the
+        pipeline, see :func:`clean_listen_file`. If ``None``, the recordings are
+        cleaned at their sampling frequency.
+    n_jobs : int
+        The number of recordings cleaned in parallel.
+    overwrite : bool
+        If True, clean the recordings which already have a cleaned derivative again.
+    dry_run : bool
+        If True, only return the recordings which would be cleaned.
+
+    Returns
+    -------
+    basenames : list of str
+        The BIDS basenames of the recordings cleaned, e.g.
+        ``"sub-2001_ses-01_task-phonemes"``.
+    """
+    return _run(
+        partial(
+            clean_listen_file,
+            listen_fpath=listen_fpath,
+            sfreq=sfreq,
+            overwrite=overwrite,
+            ),
+        partial(_exists, _get_clean_fname, listen_fpath=listen_fpath),
+        "clean",
+        subjects,
+        task=task,
+        session=session,
+        listen_fpath=listen_fpath,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+
+
+def find_bads_listen(
+    subjects=None,
+    *,
+    task=None,
+    session=None,
+    listen_fpath=None,
+    sfreq=None,
+    n_jobs=1,
+    overwrite=False,
+    dry_run=False,
+    ):
+    """Find the bad channels of the BIDS recordings of the LISTEN study with PyPREP.
+
+    Parameters
+    ----------
+    subjects : list of str | None
+        The subject IDs to process, for example ``["2001", "2002"]``. If ``None``,
+        every subject listed in ``data/eeg_list.csv`` is processed.
+    task : str | None
+        The experimental task to process. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is processed.
+    session : int | str | None
+        The session (visit) to process, 1 or 2. If ``None``, every session is
+        processed.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    sfreq : float | None
+        The sampling frequency, in Hz, the recordings are decimated to before the
+        detection, see :func:`find_bads_listen_file`. If ``None``, the recordings are
+        processed at their sampling frequency.
+    n_jobs : int
+        The number of recordings processed in parallel.
+    overwrite : bool
+        If True, process the recordings already in the derivative again.
+    dry_run : bool
+        If True, only return the recordings which would be processed.
+
+    Returns
+    -------
+    basenames : list of str
+        The BIDS basenames of the recordings processed, e.g.
+        ``"sub-2001_ses-01_task-phonemes"``.
+    """
+    return _run(
+        partial(find_bads_listen_file, listen_fpath=listen_fpath, sfreq=sfreq),
+        partial(_exists, _get_find_bads_fname, listen_fpath=listen_fpath),
+        "find the bad channels of",
+        subjects,
+        task=task,
+        session=session,
+        listen_fpath=listen_fpath,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        dry_run=dry_run,
+    )
+
+
+def _run(func, is_done, action, subjects, *, task, session, listen_fpath, n_jobs,
+         overwrite, dry_run):
+    """Apply a function to the recordings which are not done yet, in parallel."""
+    recordings = [
+        recording[:3] for recording in read_listen_recordings(
+            subjects, task=task, session=session, listen_fpath=listen_fpath
+            )
+    ]
+    todo = list()
+    for recording in recordings:
+        if not overwrite and is_done(*recording):
+            logger.debug("Skipping %s, its output exists.", _basename(*recording))
+            continue
+        todo.append(recording)
+    logger.info("%i / %i recordings to %s.", len(todo), len(recordings), action)
+    if dry_run:
+        return [_basename(*recording) for recording in todo]
+    done = list()
+    for recording, out in parallel_imap(
+        partial(_run_item, func=func, action=action), todo, n_jobs=n_jobs
+        ):
+        if out is None:
+            continue
+        done.append(_basename(*recording))
+        logger.info("Finished %s.", done[-1])
+    return done
+
+
+def _run_item(recording, *, func, action):
+    """Process a (subject, session, task) recording, and warn on error."""
+    try:
+        return func(*recording)
+    except Exception as error:
+        warn(f"Failed to {action} {_basename(*recording)}: {error}")
+        return None
+
+
+def _exists(get_fname, *recording, listen_fpath):
+    """Return whether the output of a recording exists."""
+    return get_fname(*recording, listen_fpath=listen_fpath).exists()
+
+
+def _run_lossless(pipeline, raw, checkpoints, *, key, sfreq=None):
+    """Run the PyLossless pipeline, resuming from the last valid checkpoint.
+
+    The steps are those of ``LosslessPipeline.run_with_raw``, split in the stages of
+    :data:`CHECKPOINTS`. The recording is only read, and decimated to ``sfreq``, if
+    there is no valid checkpoint.
+    """
+    stages = dict(
+        filtered=_run_filtered, flags=_run_flags, ica1=_run_ica1, ica2=_run_ica2
+        )
+    done = _load_checkpoint(pipeline, checkpoints, key=key)
+    if done is None:
+        pipeline.raw = _decimate(raw, sfreq)
+    else:
+        logger.info("Resuming the PyLossless pipeline after the '%s' stage.", done)
+    for stage in CHECKPOINTS[CHECKPOINTS.index(done) + 1 if done else 0:]:
+        stages[stage](pipeline)
+        _save_checkpoint(pipeline, checkpoints, stage, key=key)
+    return pipeline
+
+
+def _decimate(raw, sfreq):
+    """Load a recording, decimated to sfreq if it is sampled faster."""
+    if sfreq is None or raw.info["sfreq"] <= sfreq:
+        return raw.load_data()
+    return decimate_raw(raw, sfreq)
+
+
+def _run_filtered(pipeline):
+    """Flag the fixed threshold, noisy channels and epochs, and filter."""
+    _run_fixed(pipeline)
+    _run_noisy(pipeline)
+    pipeline.filter(message="Filtering")
+
+
+def _run_fixed(pipeline):
+    """Annotate the breaks and flag the channels and epochs by a fixed threshold."""
+    pipeline._check_sfreq()
+    pipeline.set_montage()
+    pipeline.run_staging_script()
+    pipeline.find_breaks(message="Looking for break periods between tasks")
+    pipeline.flag_epochs_fixed_threshold()
+    pipeline.flag_channels_fixed_threshold()
+
+
+def _run_noisy(pipeline):
+    """Flag the noisy channels and epochs."""
+    pipeline.flag_noisy_channels(message="Flagging Noisy Channels")
+    pipeline.flag_noisy_epochs(message="Flagging Noisy Time periods")
+
+
+def _run_flags(pipeline):
+    """Flag the uncorrelated, bridged and rank channels and the uncorrelated epochs."""
+    data_r_ch = pipeline.flag_uncorrelated_channels(
+        message="Flagging Channels by correlation"
+        )
+    pipeline.flag_bridged_channels(data_r_ch, message="Flagging Bridged channels")
+    pipeline.flag_rank_channel(data_r_ch, message="Flagging the rank channel")
+    pipeline.flag_uncorrelated_epochs(message="Flagging Uncorrelated epochs")
+
+
+def _run_ica1(pipeline):
+    """Run the initial ICA and flag the epochs with noisy components."""
+    pipeline.run_ica("run1", message="Running Initial ICA")
+    pipeline.flag_noisy_ics(message="Flagging time periods with noisy IC's.")
+
+
+def _run_ica2(pipeline):
+    """Run the final ICA and label its components with ICLabel."""
+    pipeline.run_ica("run2", message="Running Final ICA and ICLabel.")
+
+
+def _get_checkpoint_key(raw, config_fpath, sfreq=None):
+    """Return the recording, configuration and version a checkpoint depends on."""
+    source = Path(raw.filenames[0])
+    stat = source.stat()
+    return dict(
+        source=str(source),
+        size=stat.st_size,
+        mtime=stat.st_mtime_ns,
+        sfreq=sfreq,
+        config=hashlib.sha256(Path(config_fpath).read_bytes()).hexdigest(),
+        pylossless=version("pylossless"),
+    )
+
+
+def _save_checkpoint(pipeline, checkpoints, stage, *, key):
+    """Write the state of the pipeline after a stage, atomically.
+
+    The data only change up to the filtering, thus the raw data are only written by
+    the first stage, and the later stages only write the annotations and flags. The
+    raw data are written in double precision, so that a resumed run flags the
+    channels and fits the ICAs on the same data as an uninterrupted run.
+    """
+    target = checkpoints / stage
+    tmp = checkpoints / f".{stage}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    if stage == CHECKPOINTS[0]:
+        save_fif(pipeline.raw, tmp / "raw.fif", precision="double")
+    pipeline.raw.annotations.save(tmp / "checkpoint-annot.fif")
+    (tmp / "flags.json").write_text(json.dumps(_flags_to_json(pipeline)))
+    if stage == "ica1":
+        pipeline.ica1.save(tmp / "ica1-ica.fif")
+    elif stage == "ica2":
+        pipeline.ica2.save(tmp / "ica2-ica.fif")
+        pipeline.flags["ic"].save_tsv(tmp / "iclabels.tsv")
+    # written last, marks the checkpoint as complete
+    (tmp / "key.json").write_text(json.dumps(key))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    logger.debug("Checkpoint '%s' written to %s.", stage, target)
+
+
+def _load_checkpoint(pipeline, checkpoints, *, key):
+    """Restore the state of the pipeline from the last valid checkpoint.
+
+    Returns the stage restored, or None if there is no valid checkpoint, in which
+    case the checkpoints are removed.
+    """
+    from mne import read_annotations
+    from mne.io import read_raw_fif
+    from mne.preprocessing import read_ica
+
+    done = None
+    for stage in CHECKPOINTS:
+        try:
+            valid = json.loads((checkpoints / stage / "key.json").read_text()) == key
+        except (OSError, ValueError):
+            valid = False
+        if not valid:
+            break
+        done = stage
+    if done is None:
+        shutil.rmtree(checkpoints, ignore_errors=True)
+        return None
+    path = checkpoints / done
+    try:
+        pipeline.raw = read_raw_fif(
+            checkpoints / CHECKPOINTS[0] / "raw.fif", preload=True
+            )
+        pipeline.raw.set_annotations(
+            read_annotations(path / "checkpoint-annot.fif")
+            )
+        _flags_from_json(pipeline, json.loads((path / "flags.json").read_text()))
+        if CHECKPOINTS.index(done) >= CHECKPOINTS.index("ica1"):
+            pipeline.ica1 = read_ica(checkpoints / "ica1" / "ica1-ica.fif")
+        if done == "ica2":
+            pipeline.ica2 = read_ica(path / "ica2-ica.fif")
+            pipeline.flags["ic"].load_tsv(path / "iclabels.tsv")
+    except Exception as error:
+        warn(f"Failed to load the checkpoint {path}, starting over: {error}")
+        shutil.rmtree(checkpoints, ignore_errors=True)
+        return None
+    # the later checkpoints are stale
+    for stage in CHECKPOINTS[CHECKPOINTS.index(done) + 1:]:
+        shutil.rmtree(checkpoints / stage, ignore_errors=True)
+    return done
+
+
+def _flags_to_json(pipeline):
+    """Return the channel and epoch flags of a pipeline, serializable to JSON."""
+    return {
+        kind: {
+            flag: np.asarray(value).tolist()
+            for flag, value in pipeline.flags[kind].items()
+            }
+        for kind in ("ch", "epoch")
+        }
+
+
+def _flags_from_json(pipeline, flags):
+    """Restore the channel and epoch flags of a pipeline from _flags_to_json."""
+    for kind, values in flags.items():
+        pipeline.flags[kind].clear()
+        pipeline.flags[kind].update(
+            {flag: np.array(value) for flag, value in values.items()}
+            )
+
+
+def _get_state_fnames(subject, session, task, *, listen_fpath):
+    """Return the paths to the files of the PyLossless state of a recording."""
+    dpath = _get_clean_fname(subject, session, task, listen_fpath=listen_fpath).parent
+    basename = _basename(subject, session, task)
+    return dict(
+        raw=dpath / f"{basename}_desc-lossless_eeg.fif",
+        flags=dpath / f"{basename}_flags.json",
+        ica1=dpath / f"{basename}_desc-fastica_ica.fif",
+        ica2=dpath / f"{basename}_desc-infomax_ica.fif",
+        iclabels=dpath / f"{basename}_iclabels.csv",
+    )
+
+
+def _write_lossless_state(pipeline, fnames, *, overwrite):
+    """Write the PyLossless state of a recording to the files of _get_state_fnames."""
+    fnames["raw"].parent.mkdir(parents=True, exist_ok=True)
+    save_fif(pipeline.raw, fnames["raw"], overwrite=overwrite)
+    fnames["flags"].write_text(json.dumps(_flags_to_json(pipeline)))
+    pipeline.ica1.save(fnames["ica1"], overwrite=overwrite)
+    pipeline.ica2.save(fnames["ica2"], overwrite=overwrite)
+    pipeline.flags["ic"].to_csv(fnames["iclabels"])
+
+
+def _read_lossless_state(subject, session, task, *, listen_fpath):
+    """Read the PyLossless state of a recording written by clean_listen_file."""
+    import pandas as pd
+    from mne.io import read_raw_fif
+    from mne.preprocessing import read_ica
+
+    ll = import_optional_dependency("pylossless")
+
+    fnames = _get_state_fnames(subject, session, task, listen_fpath=listen_fpath)
+    pipeline = ll.LosslessPipeline(get_pylossless_config(listen_fpath))
+    pipeline.raw = read_raw_fif(fnames["raw"], preload=True)
+    _flags_from_json(pipeline, json.loads(fnames["flags"].read_text()))
+    pipeline.ica1 = read_ica(fnames["ica1"])
+    pipeline.ica2 = read_ica(fnames["ica2"])
+    pipeline.flags["ic"].load_tsv(
+        fnames["iclabels"], data_frame=pd.read_csv(fnames["iclabels"], index_col=0)
+        )
+    return pipeline
+
+
+def _check_policies(policies):
+    """Check the rejection policies, and return their keyword arguments."""
+    _validate_type("policies", policies, dict)
+    checked = dict()
+    for name, policy in policies.items():
+        _validate_type("policy name", name, str)
+        if not name.isalnum() or name == "lossless":
+            raise ValueError(
+                "The name of a policy must be alphanumeric and can not be "
+                f"'lossless', got '{name}'."
+                )
+        _validate_type(f"policy '{name}'", policy, dict)
+        # as written to the sidecar, e.g. with lists instead of tuples
+        policy = json.loads(json.dumps(dict(policy)))
+        policy.pop("config_fname", None)
+        checked[name] = policy
+    return checked
+
+
+def _apply_policy(pipeline, name, policy, prefix, *, overwrite):
+    """Apply a rejection policy to a pipeline, and write the cleaned data."""
+    ll = import_optional_dependency("pylossless")
+
+    # the components excluded by a policy are added to those of the previous ones
+    pipeline.ica2.exclude = []
+    cleaned_raw = ll.RejectionPolicy(**policy).apply(pipeline)
+    fname = prefix.parent / f"{prefix.name}_desc-{name}_eeg.fif"
+    save_fif(cleaned_raw, fname, overwrite=overwrite)
+    fname.with_suffix(".json").write_text(
+        json.dumps(dict(policy=policy, pylossless=_get_pylossless_version()), indent=4)
+        )
+    return fname
+
+
+def _is_policy_applied(prefix, name, policy):
+    """Return whether the derivative of a policy is up to date."""
+    sidecar = prefix.parent / f"{prefix.name}_desc-{name}_eeg.json"
+    if not sidecar.with_suffix(".fif").exists():
+        return False
+    try:
+        written = json.loads(sidecar.read_text())
+    except (OSError, ValueError):
+        return False
+    return written == dict(policy=policy, pylossless=_get_pylossless_version())
+
+
+def _get_pylossless_version():
+    """Return the version of PyLossless, or None if it is not installed."""
+    try:
+        return version("pylossless")
+    except PackageNotFoundError:
+        return None
+
+
+def _is_rejected(subject, session, task, *, policies, listen_fpath):
+    """Return whether a recording is not cleaned, or its policies are applied."""
+    dpath = _get_clean_fname(subject, session, task, listen_fpath=listen_fpath).parent
+    prefix = dpath / _basename(subject, session, task)
+    fnames = _get_state_fnames(subject, session, task, listen_fpath=listen_fpath)
+    if not all(fname.exists() for fname in fnames.values()):
+        return True
+    return all(
+        _is_policy_applied(prefix, name, policy) for name, policy in policies.items()
+        )
+
+
+def _read_raw_bids(subject, session, task, *, listen_fpath):
+    """Read a BIDS recording, with the extra bad channels and the breaks annotated."""
+    mne_bids = import_optional_dependency("mne_bids")
+
+    bids_path = mne_bids.BIDSPath(
+        subject=str(subject),
+        session=str(session).zfill(2),
+        task=task,
+        suffix="eeg",
+        datatype="eeg",
+        root=get_listen_bids_root(listen_fpath),
+        )
+    raw = mne_bids.read_raw_bids(bids_path)
+    raw.info["bads"] = sorted(set(raw.info["bads"]) | set(EXTRA_BADS))
+    raw.set_annotations(raw.annotations + _annotate_break(raw))
+    return raw
+
+
+@memoize
+def _annotate_break(raw):
+    """Annotate the breaks of a recording, memoized on its files and annotations."""
+    from mne.preprocessing import annotate_break
+
+    return annotate_break(raw)
+
+
+def _get_clean_fname(subject, session, task, *, listen_fpath):
+    """Return the path to the cleaned derivative of a recording."""
+    session = str(session).zfill(2)
+    droot = get_listen_derivative_root("pylossless", listen_fpath)
+    return (
+        droot / f"sub-{subject}" / f"ses-{session}"
+        / f"{_basename(subject, session, task)}_desc-cleaned_eeg.fif"
+    )
+
+
+def _get_find_bads_fname(subject, session, task, *, listen_fpath):
+    """Return the path to the recording written with its bad channels."""
+    session = str(session).zfill(2)
+    droot = get_listen_derivative_root("mne-bids-pipeline", listen_fpath)
+    return (
+        Path(droot) / f"sub-{subject}" / f"ses-{session}" / "eeg"
+        / f"{_basename(subject, session, task)}_eeg.edf"
+    )
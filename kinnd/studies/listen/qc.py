@@ -0,0 +1,140 @@
+from functools import partial
+
+from kinnd.qc import make_report, update_reports
+
+from .evoked import _fingerprint, _read_epochs_listen
+from .io import get_listen_derivative_root, get_processed_listen_fname
+
+# Number of trials per condition of the LISTEN paradigm.
+N_TRIALS = 60
+
+
+def make_qc_listen(
+    subject,
+    fname,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    n_expected=N_TRIALS,
+    ):
+    """Write the QC report of a single subject from the LISTEN study.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    fname : str | pathlib.Path
+        Path to the ``.html`` report.
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to report on. Must be one of "pylossless" or
+        "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_expected : int
+        The expected number of trials per condition.
+
+    Returns
+    -------
+    summary : dict | None
+        The summary of the report, see :func:`kinnd.qc.make_report`. ``None`` is
+        returned if the derivative file does not exist.
+    """
+    out = _read_epochs_listen(
+        subject,
+        task=task,
+        session=session,
+        derivative=derivative,
+        listen_fpath=listen_fpath,
+    )
+    if out is None:
+        return None
+    epochs, bads, _ = out
+    return make_report(
+        epochs, fname, subject=f"sub-{subject}", bads=bads, n_expected=n_expected
+        )
+
+
+def build_qc_reports(
+    directory=None,
+    subjects=None,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    n_expected=N_TRIALS,
+    n_jobs=1,
+    overwrite=False,
+    ):
+    """Build or update the QC reports of the LISTEN study.
+
+    A static HTML report is written per subject, rendered in a pool of worker
+    processes, together with a cohort index page. A report is only regenerated if
+    the derivative file of its subject changed since it was written.
+
+    Parameters
+    ----------
+    directory : str | pathlib.Path | None
+        The directory of the reports. If ``None``, the reports are written to
+        ``data/derivatives/qc/<task>_<derivative>``.
+    subjects : list of str | None
+        The subject IDs to include, for example ``["2001", "2002"]``. If ``None``,
+        every subject found in the derivative directory is included.
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to report on. Must be one of "pylossless" or
+        "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_expected : int
+        The expected number of trials per condition.
+    n_jobs : int
+        The number of reports rendered in parallel.
+    overwrite : bool
+        If True, regenerate every report, even those which did not change.
+
+    Returns
+    -------
+    fname : pathlib.Path
+        The path to the cohort index page.
+    """
+    droot = get_listen_derivative_root(derivative, listen_fpath)
+    if directory is None:
+        directory = droot.parent / "qc" / f"{task}_{derivative}"
+    if subjects is None:
+        subjects = sorted(
+            sub.name.split("sub-")[-1] for sub in droot.glob("sub-*") if sub.is_dir()
+            )
+    subjects = [str(subject) for subject in subjects]
+    kwargs = dict(
+        task=task, session=session, derivative=derivative, listen_fpath=listen_fpath
+        )
+    fingerprints = dict()
+    for subject in subjects:
+        fingerprint = _fingerprint(get_processed_listen_fname(subject, **kwargs))
+        fingerprints[f"sub-{subject}"] = f"{fingerprint}-{n_expected}"
+    return update_reports(
+        directory,
+        partial(_make_qc_block, n_expected=n_expected, **kwargs),
+        [f"sub-{subject}" for subject in subjects],
+        fingerprints=fingerprints,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+        title=f"LISTEN {task} QC ({derivative})",
+    )
+
+
+def _make_qc_block(subject, fname, **kwargs):
+    """Write the QC report of a subject, given as 'sub-XXXX'."""
+    return make_qc_listen(subject.split("sub-")[-1], fname, **kwargs)
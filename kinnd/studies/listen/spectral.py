@@ -0,0 +1,237 @@
+from functools import partial
+from hashlib import sha1
+import json
+from pathlib import Path
+
+import numpy as np
+
+from kinnd.io.fif import get_data
+from kinnd.io.store import SUBJECT_DIM, update_store
+from kinnd.spectral import psd_array
+from kinnd.utils._imports import import_optional_dependency
+
+from .evoked import CONDITIONS, _fingerprint, _read_epochs_listen
+from .io import get_listen_derivative_root, get_processed_listen_fname
+
+
+def compute_psd_listen(
+    subject,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    method="welch",
+    fmin=1.0,
+    fmax=50.0,
+    dtype="float32",
+    **psd_kwargs,
+    ):
+    """Compute the power spectral densities of a single subject from the LISTEN study.
+
+    The epochs of every condition are stacked and their spectra computed in a single
+    batched call to :func:`kinnd.spectral.psd_array`, then averaged per condition.
+
+    Parameters
+    ----------
+    subject : str
+        The subject ID, for example "2001".
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to compute the spectra from. Must be one of "pylossless" or
+        "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    method : str
+        The estimation method, ``"welch"`` or ``"multitaper"``.
+    fmin, fmax : float
+        The frequency range, in Hz.
+    dtype : str
+        The precision of the epochs the spectra are computed from, ``"float32"`` or
+        ``"float64"``. The spectral stores are written in single precision.
+    **psd_kwargs
+        Additional keyword arguments passed to :func:`kinnd.spectral.psd_array`, for
+        example ``n_fft``.
+
+    Returns
+    -------
+    ds : xarray.Dataset | None
+        The spectral block of the subject, with the variables ``psd`` of shape
+        ``(subject, condition, channel, freq)`` and ``n_trials`` of shape
+        ``(subject, condition)``. ``None`` is returned if the derivative file does
+        not exist.
+    """
+    xr = import_optional_dependency("xarray")
+    out = _read_epochs_listen(
+        subject,
+        task=task,
+        session=session,
+        derivative=derivative,
+        listen_fpath=listen_fpath,
+    )
+    if out is None:
+        return None
+    epochs, bads, fname = out
+    conditions = list(CONDITIONS[task].values())
+
+    # one batched call over the epochs of every condition
+    masks = [
+        epochs.events[:, 2] == epochs.event_id[condition] for condition in conditions
+    ]
+    psd, freqs = psd_array(
+        get_data(epochs, dtype=dtype),
+        epochs.info["sfreq"],
+        method=method,
+        fmin=fmin,
+        fmax=fmax,
+        **psd_kwargs,
+        )
+    data = np.stack(
+        [
+            psd[mask].mean(axis=0)
+            if mask.any()
+            else np.full(psd.shape[1:], np.nan, dtype=psd.dtype)
+            for mask in masks
+        ]
+        )
+    ds = xr.Dataset(
+        {
+            "psd": ((SUBJECT_DIM, "condition", "channel", "freq"), data[np.newaxis]),
+            "n_trials": (
+                (SUBJECT_DIM, "condition"),
+                [[int(mask.sum()) for mask in masks]],
+            ),
+            "bads": ((SUBJECT_DIM,), np.array([",".join(bads)], dtype=object)),
+            "filename": (
+                (SUBJECT_DIM,),
+                np.array([Path(fname).name], dtype=object),
+            ),
+        },
+        coords={
+            SUBJECT_DIM: [f"sub-{subject}"],
+            "condition": conditions,
+            "channel": epochs.ch_names,
+            "freq": freqs,
+        },
+        attrs={
+            "task": task,
+            "sfreq": epochs.info["sfreq"],
+            "derivative": derivative,
+            "params": _params_to_json(method, fmin, fmax, psd_kwargs),
+        },
+    )
+    return ds
+
+
+def build_psd_dataset(
+    fname=None,
+    subjects=None,
+    *,
+    task="phonemes",
+    session=1,
+    derivative="pylossless",
+    listen_fpath=None,
+    method="welch",
+    fmin=1.0,
+    fmax=50.0,
+    n_jobs=1,
+    overwrite=False,
+    **psd_kwargs,
+    ):
+    """Build or update the cohort spectral dataset of the LISTEN study.
+
+    The store is keyed by the spectral parameters: each set of parameters has its own
+    store, and within a store each subject is only recomputed if its derivative file
+    changed. Band-power queries, e.g. with :func:`kinnd.spectral.band_power`, then
+    read the stored spectra instead of recomputing them from the epochs.
+
+    Parameters
+    ----------
+    fname : str | pathlib.Path | None
+        Path to the ``.zarr`` store. If ``None``, the store is written to
+        ``data/derivatives/xarray/<task>_psd-<method>-<hash>_<derivative>.zarr``,
+        where ``<hash>`` identifies the spectral parameters.
+    subjects : list of str | None
+        The subject IDs to include, for example ``["2001", "2002"]``. If ``None``,
+        every subject found in the derivative directory is included.
+    task : str
+        The experimental task. Must be one of "phonemes" or "semantics".
+    session : int | str
+        The session (visit). Must be 1 or 2.
+    derivative : str
+        The derivative to compute the spectra from. Must be one of "pylossless" or
+        "mne-bids-pipeline".
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    method : str
+        The estimation method, ``"welch"`` or ``"multitaper"``.
+    fmin, fmax : float
+        The frequency range, in Hz.
+    n_jobs : int
+        The number of subjects processed in parallel.
+    overwrite : bool
+        If True, recompute every subject, even those which did not change.
+    **psd_kwargs
+        Additional keyword arguments passed to :func:`kinnd.spectral.psd_array`, for
+        example ``n_fft``.
+
+    Returns
+    -------
+    fname : pathlib.Path
+        The path to the ``.zarr`` store.
+    """
+    droot = get_listen_derivative_root(derivative, listen_fpath)
+    params = _params_to_json(method, fmin, fmax, psd_kwargs)
+    digest = sha1(params.encode()).hexdigest()[:8]
+    if fname is None:
+        fname = (
+            droot.parent / "xarray" / f"{task}_psd-{method}-{digest}_{derivative}.zarr"
+            )
+    if subjects is None:
+        subjects = sorted(
+            sub.name.split("sub-")[-1] for sub in droot.glob("sub-*") if sub.is_dir()
+            )
+    subjects = [str(subject) for subject in subjects]
+    kwargs = dict(
+        task=task, session=session, derivative=derivative, listen_fpath=listen_fpath
+        )
+    # the parameters are part of the fingerprint, so that a store written with other
+    # parameters is recomputed instead of mixing spectra
+    fingerprints = dict()
+    for subject in subjects:
+        fingerprint = _fingerprint(get_processed_listen_fname(subject, **kwargs))
+        if fingerprint:
+            fingerprint = f"{fingerprint}-{digest}"
+        fingerprints[f"sub-{subject}"] = fingerprint
+    update_store(
+        fname,
+        partial(
+            _compute_psd_block,
+            method=method,
+            fmin=fmin,
+            fmax=fmax,
+            **kwargs,
+            **psd_kwargs,
+            ),
+        [f"sub-{subject}" for subject in subjects],
+        fingerprints=fingerprints,
+        n_jobs=n_jobs,
+        overwrite=overwrite,
+    )
+    return Path(fname)
+
+
+def _compute_psd_block(subject, **kwargs):
+    """Compute the spectral block of a subject, given as 'sub-XXXX'."""
+    return compute_psd_listen(subject.split("sub-")[-1], **kwargs)
+
+
+def _params_to_json(method, fmin, fmax, psd_kwargs):
+    """Serialize the spectral parameters, in a stable order."""
+    params = dict(method=method, fmin=float(fmin), fmax=float(fmax), **psd_kwargs)
+    return json.dumps(params, sort_keys=True)
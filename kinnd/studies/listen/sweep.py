@@ -0,0 +1,323 @@
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from functools import partial
+
+import numpy as np
+
+from kinnd.io.fif import save_fif
+from kinnd.utils._imports import import_optional_dependency
+from kinnd.utils.logs import logger, warn
+from kinnd.utils.parallel import parallel_imap
+
+from .bids import _basename, get_listen_bids_root, read_listen_recordings
+from .io import _validate_type
+from .pipeline import (
+    _flags_from_json,
+    _flags_to_json,
+    _get_pylossless_version,
+    _read_raw_bids,
+    _run_fixed,
+    _run_flags,
+    _run_ica1,
+    _run_ica2,
+    _run_noisy,
+    get_pylossless_config,
+)
+
+# Stages of a sweep over the PyLossless pipeline, in order, with the sections of the
+# configuration they depend on. The sections which are not listed, e.g. "epoching"
+# or the fixed thresholds, belong to the first stage.
+SWEEP_STAGES = (
+    ("fixed", ()),
+    ("filtered", ("filtering",)),
+    ("noisy", ("noisy_channels", "noisy_epochs")),
+    (
+        "flags",
+        (
+            "nearest_neighbors",
+            "bridged_channels",
+            "uncorrelated_channels",
+            "uncorrelated_epochs",
+        ),
+    ),
+    ("ica", ("ica",)),
+)
+# ICLabel labels counted as artifacts in the summary, above the confidence threshold
+# of the default rejection policy of PyLossless.
+IC_ARTIFACTS = ("muscle", "ecg", "eog", "channel_noise", "line_noise")
+IC_THRESHOLD = 0.3
+
+
+def sweep_listen(
+    grid,
+    subjects=None,
+    *,
+    task=None,
+    session=None,
+    listen_fpath=None,
+    n_jobs=1,
+    ):
+    """Run the PyLossless pipeline on the LISTEN recordings over a grid of settings.
+
+    Each setting overrides the configuration returned by
+    :func:`~kinnd.studies.listen.get_pylossless_config`. The pipeline is split in the
+    stages of :data:`SWEEP_STAGES`, and the settings which share the configuration
+    of the first stages share their run: a setting only branches from the others at
+    the first stage whose configuration differs. For instance, a sweep over the
+    outlier criteria of the noisy channels annotates the breaks, flags the fixed
+    thresholds and filters each recording once. The stages of every branch are run
+    in parallel, one stage after the other.
+
+    Parameters
+    ----------
+    grid : dict | list of dict
+        The overrides of the configuration, as a mapping from a key, with the nested
+        sections separated by dots, e.g. ``"noisy_channels.outliers_kwargs.k"``, to
+        the list of its values, swept as a Cartesian product. Alternatively, a list of
+        mappings from a key to a single value, one per setting.
+    subjects : list of str | None
+        The subject IDs to process, for example ``["2001", "2002"]``. If ``None``,
+        every subject listed in ``data/eeg_list.csv`` is processed.
+    task : str | None
+        The experimental task to process. Must be one of "phonemes", "semantics" or
+        "resting". If ``None``, every task is processed.
+    session : int | str | None
+        The session (visit) to process, 1 or 2. If ``None``, every session is
+        processed.
+    listen_fpath : str | pathlib.Path | None
+        The path to a local copy of the LISTEN project directory. If ``None``, the
+        directory on the lab server is used.
+    n_jobs : int
+        The number of branches run in parallel.
+
+    Returns
+    -------
+    summary : pandas.DataFrame
+        One row per recording and setting, with the columns ``subject``,
+        ``session``, ``task``, ``setting`` (the index of the setting), one column per
+        key of the grid, ``channels`` (the flagged channels), ``n_channels``,
+        ``n_epochs`` (the number of flagged epochs) and ``n_ics`` (the number of
+        components labeled as artifacts by ICLabel, see :data:`IC_ARTIFACTS`). The
+        settings which failed are missing.
+
+    Notes
+    -----
+    The noisy channels and epochs are flagged on the unfiltered data, as in the
+    pipeline, thus the filtering is shared by the settings which only differ in the
+    later stages.
+
+    The state of the pipeline after each stage is written to
+    ``data/pylossless_sweep``, named after the recording and the configuration it
+    depends on, and is reused by the next sweeps. The directory can be removed to
+    free the disk space.
+    """
+    import pandas as pd
+
+    ll = import_optional_dependency("pylossless")
+
+    settings = _expand_grid(grid)
+    config = dict(ll.Config().read(get_pylossless_config(listen_fpath)))
+    recordings = [
+        recording[:3] for recording in read_listen_recordings(
+            subjects, task=task, session=session, listen_fpath=listen_fpath
+            )
+    ]
+    root = get_listen_bids_root(listen_fpath).parent / "pylossless_sweep"
+    # the nodes of each stage, shared between the settings, and the leaf nodes
+    levels = [dict() for _ in SWEEP_STAGES]
+    leaves = dict()
+    for recording in recordings:
+        for k, overrides in enumerate(settings):
+            setting_config = _apply_overrides(config, overrides)
+            parent = None
+            for level, (stage, _) in enumerate(SWEEP_STAGES):
+                node = _get_node(parent, recording, stage, setting_config)
+                levels[level].setdefault(
+                    node, (recording, node, parent, stage, setting_config)
+                    )
+                parent = node
+            leaves[recording, k] = parent
+
+    root.mkdir(parents=True, exist_ok=True)
+    for level, (stage, _) in enumerate(SWEEP_STAGES):
+        todo = [
+            job for node, job in levels[level].items()
+            if not (root / node).exists()
+            # the parent failed, and was already reported
+            and (job[2] is None or (root / job[2]).exists())
+        ]
+        logger.info(
+            "%i / %i branches to run at the '%s' stage.",
+            len(todo),
+            len(levels[level]),
+            stage,
+            )
+        for _ in parallel_imap(
+            partial(_run_node, root=root, listen_fpath=listen_fpath),
+            todo,
+            n_jobs=n_jobs,
+            ):
+            pass
+
+    rows = list()
+    for (recording, k), node in leaves.items():
+        if not (root / node).exists():
+            continue
+        flags = json.loads((root / node / "flags.json").read_text())
+        channels = sorted(set().union(*map(set, flags["ch"].values())))
+        epochs = set().union(*map(set, flags["epoch"].values()))
+        iclabels = pd.read_csv(root / node / "iclabels.tsv", sep="\t")
+        n_ics = np.sum(
+            iclabels["ic_type"].isin(IC_ARTIFACTS)
+            & (iclabels["confidence"] > IC_THRESHOLD)
+            )
+        rows.append(
+            dict(
+                subject=recording[0],
+                session=recording[1],
+                task=recording[2],
+                setting=k,
+                **settings[k],
+                channels=channels,
+                n_channels=len(channels),
+                n_epochs=len(epochs),
+                n_ics=int(n_ics),
+                )
+            )
+    return pd.DataFrame(rows)
+
+
+def _expand_grid(grid):
+    """Return the overrides of each setting of a grid."""
+    _validate_type("grid", grid, (dict, list))
+    if isinstance(grid, dict):
+        for key, values in grid.items():
+            _validate_type(f"grid['{key}']", values, (list, tuple))
+        settings = [
+            dict(zip(grid, values)) for values in itertools.product(*grid.values())
+        ]
+    else:
+        for overrides in grid:
+            _validate_type("setting", overrides, dict)
+        settings = [dict(overrides) for overrides in grid]
+    if len(settings) == 0:
+        raise ValueError("The grid must contain at least one setting.")
+    return settings
+
+
+def _apply_overrides(config, overrides):
+    """Return a copy of a configuration with the overrides of a setting."""
+    config = json.loads(json.dumps(config))
+    for key, value in overrides.items():
+        *sections, name = key.split(".")
+        section = config
+        for part in sections:
+            section = section.get(part) if isinstance(section, dict) else None
+        if not isinstance(section, dict) or (len(sections) == 0 and name not in config):
+            raise ValueError(f"Invalid key '{key}' of the PyLossless configuration.")
+        section[name] = value
+    return config
+
+
+def _get_stage_config(config, stage):
+    """Return the sections of a configuration a stage depends on."""
+    sections = dict(SWEEP_STAGES)[stage]
+    if stage == SWEEP_STAGES[0][0]:
+        others = {section for _, sections in SWEEP_STAGES for section in sections}
+        return {key: value for key, value in config.items() if key not in others}
+    return {section: config.get(section) for section in sections}
+
+
+def _get_node(parent, recording, stage, config):
+    """Return the name of a node, from its parent and the configuration of its stage."""
+    if parent is None:
+        parent = [list(recording), _get_pylossless_version()]
+    content = json.dumps(
+        [parent, stage, _get_stage_config(config, stage)], sort_keys=True, default=str
+        )
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    return f"{_basename(*recording)}_{digest}"
+
+
+def _run_node(job, *, root, listen_fpath):
+    """Run a stage of the pipeline from the state of its parent, and warn on error."""
+    from mne.io import read_raw_fif
+
+    recording, node, parent, stage, config = job
+    ll = import_optional_dependency("pylossless")
+
+    try:
+        pipeline = ll.LosslessPipeline(config=ll.Config(config))
+        if parent is None:
+            pipeline.raw = _read_raw_bids(
+                *recording, listen_fpath=listen_fpath
+                ).load_data()
+        else:
+            _load_node(pipeline, root, parent)
+        if stage == "fixed":
+            _run_fixed(pipeline)
+        elif stage == "filtered":
+            pipeline.filter(message="Filtering")
+        elif stage == "noisy":
+            # flagged on the unfiltered data, with the annotations of the parent
+            filtered = pipeline.raw
+            unfiltered = _find_ancestor(root, parent, ("fixed",))
+            pipeline.raw = read_raw_fif(root / unfiltered / "raw.fif", preload=True)
+            pipeline.raw.set_annotations(filtered.annotations)
+            _run_noisy(pipeline)
+            filtered.set_annotations(pipeline.raw.annotations)
+            pipeline.raw = filtered
+        elif stage == "flags":
+            _run_flags(pipeline)
+        else:
+            _run_ica1(pipeline)
+            _run_ica2(pipeline)
+        _save_node(pipeline, root, node, parent, stage)
+    except Exception as error:
+        warn(f"Failed to run the '{stage}' stage of {_basename(*recording)}: {error}")
+        return None
+    return node
+
+
+def _save_node(pipeline, root, node, parent, stage):
+    """Write the state of the pipeline after a stage, atomically."""
+    tmp = root / f".{node}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    # the data only change in these stages, and are written in double precision so
+    # that the next stages run on the data of the pipeline
+    if stage in ("fixed", "filtered"):
+        save_fif(pipeline.raw, tmp / "raw.fif", precision="double")
+    pipeline.raw.annotations.save(tmp / "state-annot.fif")
+    (tmp / "flags.json").write_text(json.dumps(_flags_to_json(pipeline)))
+    if stage == "ica":
+        pipeline.ica1.save(tmp / "ica1-ica.fif")
+        pipeline.ica2.save(tmp / "ica2-ica.fif")
+        pipeline.flags["ic"].save_tsv(tmp / "iclabels.tsv")
+    (tmp / "node.json").write_text(json.dumps(dict(stage=stage, parent=parent)))
+    shutil.rmtree(root / node, ignore_errors=True)
+    os.replace(tmp, root / node)
+
+
+def _load_node(pipeline, root, node):
+    """Restore the state of the pipeline after a node."""
+    from mne import read_annotations
+    from mne.io import read_raw_fif
+
+    data = _find_ancestor(root, node, ("fixed", "filtered"))
+    pipeline.raw = read_raw_fif(root / data / "raw.fif", preload=True)
+    pipeline.raw.set_annotations(read_annotations(root / node / "state-annot.fif"))
+    _flags_from_json(pipeline, json.loads((root / node / "flags.json").read_text()))
+
+
+def _find_ancestor(root, node, stages):
+    """Return the closest node of one of the stages, among a node and its parents."""
+    while node is not None:
+        info = json.loads((root / node / "node.json").read_text())
+        if info["stage"] in stages:
+            return node
+        node = info["parent"]
+    raise RuntimeError(f"The node of the stages {stages} is missing.")
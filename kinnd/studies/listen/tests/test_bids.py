@@ -0,0 +1,109 @@
+import pytest
+
+from ....datasets import make_listen_dataset
+from ..bids import (
+    _bidsify_item,
+    _commit_bids_recording,
+    _get_bids_fname,
+    bidsify_listen,
+    get_listen_bids_root,
+)
+
+
+def _write_staging(root, subject, task, age="n/a"):
+    """Write the files mne-bids writes for a recording to a staging dataset."""
+    eeg = root / f"sub-{subject}" / "ses-01" / "eeg"
+    eeg.mkdir(parents=True)
+    basename = f"sub-{subject}_ses-01_task-{task}"
+    for suffix in ("eeg.edf", "eeg.json", "channels.tsv", "events.tsv"):
+        (eeg / f"{basename}_{suffix}").write_text(task)
+    (eeg / f"sub-{subject}_ses-01_space-CapTrak_electrodes.tsv").write_text(task)
+    (root / "dataset_description.json").write_text(task)
+    (root / "participants.tsv").write_text(
+        f"participant_id\tage\tsex\nsub-{subject}\t{age}\tn/a\n"
+    )
+    (root / f"sub-{subject}" / "ses-01" / f"sub-{subject}_ses-01_scans.tsv").write_text(
+        f"filename\tacq_time\neeg/{basename}_eeg.edf\t2023-05-01T17:00:00\n"
+    )
+    return root
+
+
+def test_commit_bids_recording(tmp_path):
+    """Test moving recordings from their staging dataset into the BIDS dataset."""
+    broot = tmp_path / "bids"
+    for subject, task in (
+        ("2001", "phonemes"),
+        ("2002", "phonemes"),
+        ("2001", "resting"),
+    ):
+        staging = _write_staging(tmp_path / f"staging_{subject}_{task}", subject, task)
+        _commit_bids_recording(staging, broot, subject, "01", task)
+        assert _get_bids_fname(broot, subject, "01", task).exists()
+        assert not _get_bids_fname(staging, subject, "01", task).exists()
+    assert (broot / "dataset_description.json").read_text() == "phonemes"
+    participants = (broot / "participants.tsv").read_text().splitlines()
+    assert participants == [
+        "participant_id\tage\tsex",
+        "sub-2001\tn/a\tn/a",
+        "sub-2002\tn/a\tn/a",
+    ]
+    scans = (broot / "sub-2001" / "ses-01" / "sub-2001_ses-01_scans.tsv").read_text()
+    assert scans.splitlines()[1:] == [
+        "eeg/sub-2001_ses-01_task-phonemes_eeg.edf\t2023-05-01T17:00:00",
+        "eeg/sub-2001_ses-01_task-resting_eeg.edf\t2023-05-01T17:00:00",
+    ]
+
+    # the participant information edited in the BIDS dataset is kept, and the new
+    # columns are added
+    (broot / "participants.tsv").write_text(
+        "participant_id\tage\tsex\nsub-2001\t7\tF\nsub-2002\tn/a\tn/a\n"
+    )
+    staging = _write_staging(tmp_path / "staging_rerun", "2001", "phonemes", age="n/a")
+    (staging / "participants.tsv").write_text(
+        "participant_id\tage\tsex\thand\nsub-2001\tn/a\tn/a\tR\nsub-2003\t8\tM\tL\n"
+    )
+    _commit_bids_recording(staging, broot, "2001", "01", "phonemes")
+    participants = (broot / "participants.tsv").read_text().splitlines()
+    assert participants == [
+        "participant_id\tage\tsex\thand",
+        "sub-2001\t7\tF\tn/a",
+        "sub-2002\tn/a\tn/a\tn/a",
+        "sub-2003\t8\tM\tL",
+    ]
+    with pytest.raises(FileNotFoundError, match="does not exist"):
+        _commit_bids_recording(tmp_path / "missing", broot, "2001", "01", "semantics")
+
+
+def test_bidsify_item_failure(tmp_path):
+    """Test that a failed conversion leaves no staging dataset behind."""
+    staging = tmp_path / "bids_staging"
+    # left over by an interrupted conversion
+    (staging / "sub-2001_ses-01_task-phonemes" / "sub-2001").mkdir(parents=True)
+    recording = ("2001", "01", "phonemes", tmp_path / "missing.mff")
+    with pytest.warns(RuntimeWarning, match="Failed to convert"):
+        assert _bidsify_item(recording, staging=staging, listen_fpath=tmp_path) is None
+    assert not any(staging.iterdir())
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_bidsify_listen(tmp_path, n_jobs):
+    """Test converting a synthetic LISTEN dataset to BIDS."""
+    pytest.importorskip("mne_bids")
+    root = make_listen_dataset(
+        tmp_path, 2, tasks=["phonemes", "resting"], duration=20, sfreq=250, seed=0
+    )
+    done = bidsify_listen(listen_fpath=root, n_jobs=n_jobs)
+    assert len(done) == 4
+    broot = get_listen_bids_root(root)
+    for subject in ("2001", "2002"):
+        for task in ("phonemes", "resting"):
+            assert _get_bids_fname(broot, subject, "01", task).exists()
+    participants = (broot / "participants.tsv").read_text().splitlines()
+    assert [line.split("\t")[0] for line in participants[1:]] == [
+        "sub-2001",
+        "sub-2002",
+    ]
+    scans = broot / "sub-2001" / "ses-01" / "sub-2001_ses-01_scans.tsv"
+    assert len(scans.read_text().splitlines()) == 3
+    assert not (root / "data" / "bids_staging").exists()
+    assert bidsify_listen(listen_fpath=root, dry_run=True) == []
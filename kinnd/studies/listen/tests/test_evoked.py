@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from ....datasets.synthetic import write_cleaned_listen
+from ....io.store import open_store, read_fingerprints
+from .. import evoked
+from ..evoked import build_evoked_dataset, compute_evoked_listen
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("The subject should not be computed again.")
+
+
+def test_build_evoked_dataset(tmp_path, monkeypatch):
+    """Test building and updating the cohort evoked dataset incrementally."""
+    pytest.importorskip("xarray")
+    pytest.importorskip("zarr")
+    fnames = {
+        subject: write_cleaned_listen(tmp_path, subject, duration=30, seed=int(subject))
+        for subject in ("2001", "2002")
+    }
+    assert build_evoked_dataset(listen_fpath=tmp_path, dry_run=True) == [
+        "sub-2001",
+        "sub-2002",
+    ]
+    fname = build_evoked_dataset(listen_fpath=tmp_path)
+    xarray = tmp_path / "data" / "derivatives" / "xarray"
+    assert fname == xarray / "phonemes_evoked_pylossless.zarr"
+    ds = open_store(fname)
+    assert list(ds.subject.values) == ["sub-2001", "sub-2002"]
+    assert list(ds.condition.values) == ["tone/standard", "tone/deviant"]
+    assert ds.evoked.shape[:3] == (2, 2, 129)
+    assert not np.isnan(ds.evoked.values).any()
+    assert ds.n_trials.sum(dim="condition").values.tolist() == [44, 44]
+    assert ds.bads.values.tolist() == ["E125,E126,E127,E128"] * 2
+    block = compute_evoked_listen("2002", listen_fpath=tmp_path)
+    assert_allclose(
+        ds.evoked.sel(subject="sub-2002").values,
+        block.evoked.values[0],
+        rtol=1e-5,
+        atol=1e-12,
+    )
+    fingerprints = read_fingerprints(fname)
+
+    # an unchanged cohort writes nothing
+    assert build_evoked_dataset(listen_fpath=tmp_path, dry_run=True) == []
+    with monkeypatch.context() as m:
+        m.setattr(evoked, "compute_evoked_listen", _fail)
+        build_evoked_dataset(listen_fpath=tmp_path)
+    assert read_fingerprints(fname) == fingerprints
+    written = list()
+
+    def _compute(subject, **kwargs):
+        written.append(subject)
+        return compute_evoked_listen(subject, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(evoked, "compute_evoked_listen", _compute)
+        build_evoked_dataset(listen_fpath=tmp_path, overwrite=True)
+    assert written == ["2001", "2002"]
+    assert build_evoked_dataset(
+        listen_fpath=tmp_path, overwrite=True, dry_run=True
+    ) == ["sub-2001", "sub-2002"]
+
+    # a touched derivative is recomputed, and a new subject appended, in parallel
+    os.utime(fnames["2001"], ns=(0, 0))
+    write_cleaned_listen(tmp_path, "2003", duration=30, seed=2003)
+    assert build_evoked_dataset(listen_fpath=tmp_path, dry_run=True) == [
+        "sub-2001",
+        "sub-2003",
+    ]
+    build_evoked_dataset(listen_fpath=tmp_path, n_jobs=2)
+    updated = read_fingerprints(fname)
+    assert sorted(updated) == ["sub-2001", "sub-2002", "sub-2003"]
+    assert updated["sub-2001"] != fingerprints["sub-2001"]
+    assert updated["sub-2002"] == fingerprints["sub-2002"]
+    ds = open_store(fname)
+    assert list(ds.subject.values) == ["sub-2001", "sub-2002", "sub-2003"]
+    assert not np.isnan(ds.evoked.values).any()
+    block = compute_evoked_listen("2003", listen_fpath=tmp_path)
+    assert_allclose(
+        ds.evoked.sel(subject="sub-2003").values,
+        block.evoked.values[0],
+        rtol=1e-5,
+        atol=1e-12,
+    )
+
+    # a subject without derivative is skipped
+    assert compute_evoked_listen("2004", listen_fpath=tmp_path) is None
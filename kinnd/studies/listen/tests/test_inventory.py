@@ -0,0 +1,29 @@
+import mne
+import pytest
+
+from ....datasets.synthetic import write_cleaned_listen
+from ..inventory import read_inventory_listen
+
+
+def test_read_inventory_listen(tmp_path):
+    """Test the trial and bad channel counts of synthetic LISTEN derivatives."""
+    pytest.importorskip("pandas")
+    fnames = {
+        subject: write_cleaned_listen(tmp_path, subject, duration=30, seed=int(subject))
+        for subject in ("2001", "2002")
+    }
+    inventory = read_inventory_listen(listen_fpath=tmp_path)
+    assert list(inventory.index) == ["sub-2001", "sub-2002"]
+    for subject, fname in fnames.items():
+        description = list(mne.read_annotations(fname).description)
+        row = inventory.loc[f"sub-{subject}"]
+        assert row["n_tone/standard"] == description.count("tone_Standard")
+        assert row["n_tone/deviant"] == description.count("tone_Deviant")
+        assert row["n_bads"] == 4
+        assert row["bads"] == "E125,E126,E127,E128"
+        assert row["kind"] == "raw"
+    # a subject without derivative is left out
+    inventory = read_inventory_listen(["2001", "2003"], listen_fpath=tmp_path)
+    assert list(inventory.index) == ["sub-2001"]
+    with pytest.raises(ValueError, match="task must be one of"):
+        read_inventory_listen(task="resting", listen_fpath=tmp_path)
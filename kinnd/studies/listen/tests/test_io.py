@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from ....datasets import write_mff_listen
+from ....utils.logs import _use_log_level
+from ..io import DIN_MAPPING, align_din_onsets, read_raw_listen
+
+
+def test_align_din_onsets():
+    """Test aligning the stimuli to the first following DIN event."""
+    onsets = [1.0, 1.012, 2.0, 2.3, 3.0, 3.02, 3.5, 3.51, 4.0]
+    codes = ["img+", "DIN6", "img+", "DIN6", "snd+", "DIN8", "DIN6", "DIN8", "snd+"]
+    aligned, latencies = align_din_onsets(
+        onsets, codes, {"img+": "DIN6", "snd+": "DIN8"}
+    )
+    # the DIN of the second image is too late, and the last sound has no DIN
+    np.testing.assert_allclose(latencies, [0.012, np.nan, 0.02, np.nan])
+    np.testing.assert_allclose(
+        aligned, [1.012, 1.012, 2.0, 2.3, 3.02, 3.02, 3.5, 3.51, 4.0]
+    )
+    _, latencies = align_din_onsets(onsets, codes, {"img+": "DIN6"}, tmax=0.5)
+    np.testing.assert_allclose(latencies, [0.012, 0.3])
+    with pytest.raises(ValueError, match="same shape"):
+        align_din_onsets(onsets[:-1], codes, {"img+": "DIN6"})
+    with pytest.raises(ValueError, match="must be positive"):
+        align_din_onsets(onsets, codes, {"img+": "DIN6"}, tmax=-1)
+
+
+def test_read_raw_listen_din(tmp_path, caplog):
+    """Test reading a recording with the stimuli aligned to their DIN events."""
+    fname = write_mff_listen(
+        tmp_path / "LISTEN_2001_semantics.mff",
+        task="semantics",
+        duration=30,
+        sfreq=1000,
+        seed=0,
+    )
+    event_mapping = {"img+": "image", "snd+": "word"}
+    logged = read_raw_listen(fname, event_mapping=event_mapping).annotations
+    with _use_log_level("INFO"):
+        raw = read_raw_listen(
+            fname, event_mapping=event_mapping, din_mapping=DIN_MAPPING["semantics"]
+        )
+    assert "stimuli aligned to their DIN event" in caplog.text
+    # each stimulus starts with its DIN event, 10 to 20 ms after its logged onset
+    for prefix, din in (("image", "DIN6"), ("word", "DIN8")):
+        onsets = dict()
+        for key, annotations in (("logged", logged), ("aligned", raw.annotations)):
+            stimuli = [desc.startswith(prefix) for desc in annotations.description]
+            onsets[key] = annotations.onset[np.array(stimuli)]
+        dins = raw.annotations.description == din
+        np.testing.assert_allclose(onsets["aligned"], raw.annotations.onset[dins])
+        delays = onsets["aligned"] - onsets["logged"]
+        assert np.all((0.01 <= delays) & (delays <= 0.02))
+    # a recording without DIN events keeps the logged onsets
+    fname = write_mff_listen(
+        tmp_path / "LISTEN_2002_phonemes.mff", duration=10, din=False, seed=0
+    )
+    caplog.clear()
+    raw = read_raw_listen(
+        fname, event_mapping={"stm+": "tone"}, din_mapping=DIN_MAPPING["phonemes"]
+    )
+    assert "without a DIN event within 50 ms" in caplog.text
@@ -0,0 +1,187 @@
+import json
+
+import pytest
+
+from ....datasets import make_listen_dataset, write_mff_listen
+from ..io import read_raw_listen
+from ..pipeline import (
+    CHECKPOINTS,
+    DEFAULT_POLICY,
+    _decimate,
+    _get_state_fnames,
+    _run_lossless,
+    _write_lossless_state,
+    get_pylossless_config,
+    reject_listen,
+    reject_listen_file,
+)
+
+_KEY = dict(source="sub-2001_ses-01_task-resting_eeg.edf", config="0")
+
+# raised by PyLossless with recent versions of xarray and MNE, and by the ICA of
+# white noise
+pytestmark = [
+    pytest.mark.filterwarnings("ignore:FastICA did not converge"),
+    pytest.mark.filterwarnings("ignore::FutureWarning"),
+    pytest.mark.filterwarnings("ignore::DeprecationWarning"),
+]
+
+
+class _Crash(Exception):
+    pass
+
+
+@pytest.fixture(scope="module")
+def listen_fpath(tmp_path_factory):
+    """Write a PyLossless configuration with small ICA decompositions."""
+    ll = pytest.importorskip("pylossless")
+    pytest.importorskip("mne_bids")
+    pytest.importorskip("mne_icalabel")
+    listen_fpath = tmp_path_factory.mktemp("listen")
+    (listen_fpath / "data").mkdir()
+    config_fpath = get_pylossless_config(listen_fpath)
+    config = ll.config.Config().read(config_fpath)
+    for run in ("run1", "run2"):
+        config["ica"]["ica_args"][run]["n_components"] = 10
+    config.save(config_fpath)
+    return listen_fpath
+
+
+@pytest.fixture(scope="module")
+def raw(tmp_path_factory):
+    """Read a synthetic resting state recording."""
+    fname = write_mff_listen(
+        tmp_path_factory.mktemp("mff") / "LISTEN_2001_resting.mff",
+        task="resting",
+        duration=60,
+        sfreq=250,
+        seed=0,
+    )
+    return read_raw_listen(fname)
+
+
+@pytest.fixture(scope="module")
+def pipeline(tmp_path_factory, listen_fpath, raw):
+    """Run the PyLossless pipeline on the synthetic recording."""
+    import pylossless as ll
+
+    return _run_lossless(
+        ll.LosslessPipeline(get_pylossless_config(listen_fpath)),
+        raw.copy(),
+        tmp_path_factory.mktemp("checkpoints"),
+        key=_KEY,
+    )
+
+
+def test_run_lossless_resume(tmp_path, listen_fpath, raw, pipeline, monkeypatch):
+    """Test resuming the PyLossless pipeline from its checkpoints."""
+    import pylossless as ll
+    from mne.io import read_raw_fif
+
+    config_fpath = get_pylossless_config(listen_fpath)
+    run_ica = ll.LosslessPipeline.run_ica
+
+    def _crash_run2(self, run, **kwargs):
+        if run == "run2":
+            raise _Crash
+        return run_ica(self, run, **kwargs)
+
+    checkpoints = tmp_path / "checkpoints"
+    with monkeypatch.context() as m:
+        m.setattr(ll.LosslessPipeline, "run_ica", _crash_run2)
+        with pytest.raises(_Crash):
+            _run_lossless(
+                ll.LosslessPipeline(config_fpath), raw.copy(), checkpoints, key=_KEY
+            )
+    assert sorted(path.name for path in checkpoints.iterdir()) == sorted(
+        CHECKPOINTS[:3]
+    )
+    checkpoint = read_raw_fif(checkpoints / CHECKPOINTS[0] / "raw.fif", verbose=False)
+    assert checkpoint.orig_format == "double"
+
+    # the rerun resumes after the first ICA, without filtering again
+    def _fail(*args, **kwargs):
+        raise AssertionError("The stage should not run again.")
+
+    with monkeypatch.context() as m:
+        m.setattr(ll.LosslessPipeline, "filter", _fail)
+        m.setattr(ll.LosslessPipeline, "flag_uncorrelated_channels", _fail)
+        resumed = _run_lossless(
+            ll.LosslessPipeline(config_fpath), raw.copy(), checkpoints, key=_KEY
+        )
+    assert resumed.raw.info["highpass"] == pipeline.raw.info["highpass"]
+    assert list(resumed.raw.annotations.description) == list(
+        pipeline.raw.annotations.description
+    )
+    for kind in ("ch", "epoch"):
+        assert sorted(resumed.flags[kind]) == sorted(pipeline.flags[kind])
+    assert resumed.ica2.n_components_ == pipeline.ica2.n_components_
+    assert list(resumed.flags["ic"]["ic_type"]) == list(pipeline.flags["ic"]["ic_type"])
+    cleaned = ll.RejectionPolicy().apply(resumed)
+    assert cleaned.n_times == raw.n_times
+
+    # a checkpoint of another configuration is not valid
+    with monkeypatch.context() as m:
+        m.setattr(ll.LosslessPipeline, "run_ica", _crash_run2)
+        with pytest.raises(_Crash):
+            _run_lossless(
+                ll.LosslessPipeline(config_fpath),
+                raw.copy(),
+                checkpoints,
+                key=dict(_KEY, config="1"),
+            )
+    assert not (checkpoints / "ica2").exists()
+
+
+def test_reject_listen_file(listen_fpath, pipeline):
+    """Test applying rejection policies to the state of the pipeline."""
+    from mne.io import read_raw_fif
+
+    fnames = _get_state_fnames("2001", 1, "resting", listen_fpath=listen_fpath)
+    _write_lossless_state(pipeline, fnames, overwrite=True)
+    policies = dict(
+        cleaned=DEFAULT_POLICY,
+        keepbridged=dict(ch_flags_to_reject=["noisy"], ic_flags_to_reject=[]),
+    )
+    out = reject_listen_file("2001", 1, "resting", policies, listen_fpath=listen_fpath)
+    assert sorted(out) == ["cleaned", "keepbridged"]
+    assert out["keepbridged"].name == (
+        "sub-2001_ses-01_task-resting_desc-keepbridged_eeg.fif"
+    )
+    sidecar = json.loads(out["keepbridged"].with_suffix(".json").read_text())
+    assert sidecar["policy"]["ch_flags_to_reject"] == ["noisy"]
+    raws = {name: read_raw_fif(fname) for name, fname in out.items()}
+    assert set(raws["keepbridged"].info["bads"]) <= set(raws["cleaned"].info["bads"])
+
+    # the derivatives up to date are kept, the others are written again
+    mtimes = {name: fname.stat().st_mtime_ns for name, fname in out.items()}
+    policies["keepbridged"] = dict(ch_flags_to_reject=["bridged"])
+    reject_listen_file("2001", 1, "resting", policies, listen_fpath=listen_fpath)
+    assert out["cleaned"].stat().st_mtime_ns == mtimes["cleaned"]
+    assert out["keepbridged"].stat().st_mtime_ns != mtimes["keepbridged"]
+
+
+def test_decimate(raw):
+    """Test decimating the recordings before the pipeline."""
+    decimated = _decimate(raw.copy(), 125)
+    assert decimated.info["sfreq"] == 125
+    assert decimated.n_times == raw.n_times // 2
+    assert list(decimated.annotations.description) == list(raw.annotations.description)
+    # the recordings which are not sampled faster are kept
+    for sfreq in (None, 250, 500):
+        kept = _decimate(raw.copy(), sfreq)
+        assert kept.preload
+        assert kept.info["sfreq"] == 250
+
+
+def test_reject_listen_dry_run(tmp_path):
+    """Test that the recordings which are not cleaned are skipped."""
+    root = make_listen_dataset(tmp_path, 2, tasks=["resting"], duration=5, sfreq=100)
+    todo = reject_listen({"keepbridged": {}}, listen_fpath=root, dry_run=True)
+    assert todo == []
+    with pytest.raises(ValueError, match="must be alphanumeric"):
+        reject_listen({"keep-bridged": {}}, listen_fpath=root)
+    with pytest.raises(ValueError, match="must be alphanumeric"):
+        reject_listen({"lossless": {}}, listen_fpath=root)
+    with pytest.raises(ValueError, match="must be of type"):
+        reject_listen({"keepbridged": ["noisy"]}, listen_fpath=root)
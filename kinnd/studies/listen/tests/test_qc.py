@@ -0,0 +1,43 @@
+import json
+
+from ....datasets.synthetic import write_cleaned_listen
+from .. import qc
+from ..qc import build_qc_reports
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("The report should not be written again.")
+
+
+def test_build_qc_reports(tmp_path, monkeypatch):
+    """Test writing the QC reports and the cohort index of the LISTEN study."""
+    for subject in ("2001", "2002"):
+        write_cleaned_listen(tmp_path, subject, duration=30, seed=int(subject))
+    fname = build_qc_reports(listen_fpath=tmp_path)
+    directory = tmp_path / "data" / "derivatives" / "qc" / "phonemes_pylossless"
+    assert fname == directory / "index.html"
+    assert sorted(path.name for path in directory.glob("sub-*.html")) == [
+        "sub-2001.html",
+        "sub-2002.html",
+    ]
+    html = fname.read_text(encoding="utf-8")
+    assert '<a href="sub-2001.html">sub-2001</a>' in html
+    assert '<a href="sub-2002.html">sub-2002</a>' in html
+    with open(directory / "qc.json") as fid:
+        summaries = json.load(fid)
+    assert sorted(summaries) == ["sub-2001", "sub-2002"]
+
+    # unchanged subjects are skipped, a changed expectation writes them again
+    with monkeypatch.context() as m:
+        m.setattr(qc, "make_qc_listen", _fail)
+        assert build_qc_reports(listen_fpath=tmp_path) == fname
+    written = list()
+    make_qc_listen = qc.make_qc_listen
+
+    def _make_qc_listen(subject, *args, **kwargs):
+        written.append(subject)
+        return make_qc_listen(subject, *args, **kwargs)
+
+    monkeypatch.setattr(qc, "make_qc_listen", _make_qc_listen)
+    build_qc_reports(listen_fpath=tmp_path, subjects=["2002"], n_expected=40)
+    assert written == ["2002"]
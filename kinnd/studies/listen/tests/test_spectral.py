@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from ....datasets.synthetic import write_cleaned_listen
+from ....io import get_data
+from ....io.store import open_store, read_fingerprints
+from ....spectral import psd_array
+from .. import spectral
+from ..evoked import _read_epochs_listen
+from ..spectral import build_psd_dataset, compute_psd_listen
+
+
+def test_build_psd_dataset(tmp_path):
+    """Test building the cohort spectral store, keyed by the spectral parameters."""
+    pytest.importorskip("xarray")
+    pytest.importorskip("zarr")
+    write_cleaned_listen(tmp_path, "2001", duration=30, seed=0)
+    fname = build_psd_dataset(listen_fpath=tmp_path)
+    assert fname.parent == tmp_path / "data" / "derivatives" / "xarray"
+    assert fname.name.startswith("phonemes_psd-welch-")
+    ds = open_store(fname)
+    assert list(ds.condition.values) == ["tone/standard", "tone/deviant"]
+    assert ds.freq.values[0] >= 1.0
+    assert ds.freq.values[-1] <= 50.0
+
+    # the spectra of the epochs, averaged per condition
+    epochs, _, _ = _read_epochs_listen(
+        "2001",
+        task="phonemes",
+        session=1,
+        derivative="pylossless",
+        listen_fpath=tmp_path,
+    )
+    psd, freqs = psd_array(get_data(epochs), epochs.info["sfreq"], fmin=1.0, fmax=50.0)
+    assert_allclose(ds.freq.values, freqs)
+    for condition in ds.condition.values:
+        mask = epochs.events[:, 2] == epochs.event_id[condition]
+        assert ds.n_trials.sel(subject="sub-2001", condition=condition) == mask.sum()
+        assert_allclose(
+            ds.psd.sel(subject="sub-2001", condition=condition).values,
+            psd[mask].mean(axis=0),
+            rtol=1e-4,
+        )
+
+    # other parameters are written to their own store, with their own fingerprints
+    fname30 = build_psd_dataset(listen_fpath=tmp_path, fmax=30.0)
+    assert fname30 != fname
+    assert fname.exists()
+    assert open_store(fname30).freq.values[-1] <= 30.0
+    assert (
+        read_fingerprints(fname30)["sub-2001"] != read_fingerprints(fname)["sub-2001"]
+    )
+    assert build_psd_dataset(listen_fpath=tmp_path, fmax=30.0) == fname30
+
+
+def test_compute_psd_listen_empty_condition(tmp_path, monkeypatch):
+    """Test that a condition without epochs has a NaN spectrum."""
+    pytest.importorskip("xarray")
+    write_cleaned_listen(tmp_path, "2001", duration=30, seed=0)
+    kwargs = dict(task="phonemes", session=1, derivative="pylossless")
+    epochs, bads, fname = _read_epochs_listen("2001", listen_fpath=tmp_path, **kwargs)
+    deviant = epochs.events[:, 2] == epochs.event_id["tone/deviant"]
+    epochs.drop(np.flatnonzero(deviant), verbose=False)
+    monkeypatch.setattr(
+        spectral, "_read_epochs_listen", lambda *args, **kwargs: (epochs, bads, fname)
+    )
+    ds = compute_psd_listen("2001", listen_fpath=tmp_path)
+    assert ds.n_trials.values.tolist() == [[len(epochs), 0]]
+    assert not np.isnan(ds.psd.sel(condition="tone/standard")).any()
+    assert np.isnan(ds.psd.sel(condition="tone/deviant")).all()
+    assert ds.psd.dtype == np.float32
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from ....datasets import make_listen_dataset
+from ..bids import read_listen_recordings
+from ..io import read_raw_listen
+from ..sweep import (
+    SWEEP_STAGES,
+    _apply_overrides,
+    _expand_grid,
+    _get_node,
+    sweep_listen,
+)
+
+_CONFIG = dict(
+    epoching=dict(overlap=0),
+    filtering=dict(filter_args=dict(l_freq=1, h_freq=100)),
+    noisy_channels=dict(outliers_kwargs=dict(k=6, lower=0.25, upper=0.75)),
+    uncorrelated_channels=dict(outliers_kwargs=dict(k=6)),
+    ica=dict(ica_args=dict(run1=dict(method="fastica"))),
+)
+
+
+def test_expand_grid():
+    """Test the settings of a grid of overrides."""
+    settings = _expand_grid({"a": [1, 2], "b.c": [3, 4, 5]})
+    assert len(settings) == 6
+    assert settings[0] == {"a": 1, "b.c": 3}
+    assert _expand_grid([{"a": 1}, {"b.c": 2}]) == [{"a": 1}, {"b.c": 2}]
+    with pytest.raises(ValueError, match="at least one setting"):
+        _expand_grid([])
+    with pytest.raises(ValueError, match="must be of type"):
+        _expand_grid({"a": 1})
+
+
+def test_apply_overrides():
+    """Test overriding the PyLossless configuration."""
+    config = _apply_overrides(
+        _CONFIG,
+        {"noisy_channels.outliers_kwargs.k": 4, "ica.ica_args.run1.n_components": 15},
+    )
+    assert config["noisy_channels"]["outliers_kwargs"] == dict(
+        k=4, lower=0.25, upper=0.75
+    )
+    assert config["ica"]["ica_args"]["run1"]["n_components"] == 15
+    assert _CONFIG["noisy_channels"]["outliers_kwargs"]["k"] == 6
+    for key in ("noisy", "noisy_channel.outliers_kwargs.k", "epoching.overlap.x"):
+        with pytest.raises(ValueError, match="Invalid key"):
+            _apply_overrides(_CONFIG, {key: 1})
+
+
+@pytest.mark.parametrize(
+    ("key", "branch"),
+    [
+        ("epoching.overlap", "fixed"),
+        ("filtering.filter_args.l_freq", "filtered"),
+        ("noisy_channels.outliers_kwargs.k", "noisy"),
+        ("uncorrelated_channels.outliers_kwargs.k", "flags"),
+        ("ica.ica_args.run1.method", "ica"),
+    ],
+)
+def test_get_node(key, branch):
+    """Test that the settings share the stages before the one they differ in."""
+    recording = ("2001", "01", "resting")
+    chains = list()
+    for value in (2, 3):
+        config = _apply_overrides(_CONFIG, {key: value})
+        parent, chain = None, list()
+        for stage, _ in SWEEP_STAGES:
+            parent = _get_node(parent, recording, stage, config)
+            chain.append(parent)
+        chains.append(chain)
+    stages = [stage for stage, _ in SWEEP_STAGES]
+    shared = stages.index(branch)
+    assert chains[0][:shared] == chains[1][:shared]
+    assert all(a != b for a, b in zip(chains[0][shared:], chains[1][shared:]))
+    assert chains[0][0].startswith("sub-2001_ses-01_task-resting_")
+
+
+# raised by PyLossless with recent versions of xarray and MNE, and by the ICA of
+# white noise
+@pytest.mark.filterwarnings("ignore:FastICA did not converge")
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_sweep_listen(tmp_path, monkeypatch):
+    """Test sweeping the configuration of the PyLossless pipeline."""
+    ll = pytest.importorskip("pylossless")
+    pytest.importorskip("mne_bids")
+    pytest.importorskip("mne_icalabel")
+    from mne.io import read_raw_fif
+
+    from .. import sweep
+
+    root = make_listen_dataset(
+        tmp_path, 1, tasks=["resting"], duration=60, sfreq=250, seed=0
+    )
+    (sourcefile,) = [fname for *_, fname in read_listen_recordings(listen_fpath=root)]
+    monkeypatch.setattr(
+        sweep, "_read_raw_bids", lambda *args, **kwargs: read_raw_listen(sourcefile)
+    )
+    grid = {
+        "noisy_channels.outliers_kwargs.k": [3, 6],
+        "ica.ica_args.run1.n_components": [10],
+        "ica.ica_args.run2.n_components": [10],
+    }
+    summary = sweep_listen(grid, listen_fpath=root)
+    assert len(summary) == 2
+    assert list(summary["noisy_channels.outliers_kwargs.k"]) == [3, 6]
+    assert (summary["n_channels"] == summary["channels"].apply(len)).all()
+    assert summary["n_channels"][0] >= summary["n_channels"][1]
+    nodes = [
+        json.loads(path.read_text())["stage"]
+        for path in (root / "data" / "pylossless_sweep").glob("*/node.json")
+    ]
+    assert {stage: nodes.count(stage) for stage in set(nodes)} == dict(
+        fixed=1, filtered=1, noisy=2, flags=2, ica=2
+    )
+    for fname in (root / "data" / "pylossless_sweep").glob("*/raw.fif"):
+        assert read_raw_fif(fname, verbose=False).orig_format == "double"
+
+    # the next sweep reuses the shared stages
+    def _fail(*args, **kwargs):
+        raise AssertionError("The stage should not run again.")
+
+    monkeypatch.setattr(ll.LosslessPipeline, "filter", _fail)
+    grid["noisy_channels.outliers_kwargs.k"] = [6]
+    summary6 = sweep_listen(grid, listen_fpath=root)
+    assert summary6["n_channels"][0] == summary["n_channels"][1]
@@ -1 +1,7 @@
-from .io import get_semantics_fpaths, read_epochs_semantics
\ No newline at end of file
+from ...utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["io"],
+    submod_attrs={"io": ["get_semantics_fpaths", "read_epochs_semantics"]},
+)
@@ -1,3 +1,7 @@
 """Utilities module."""
 
-from . import config, logs, paths
+from ._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__, submodules=["bench", "config", "logs", "parallel", "paths", "resources"]
+)
@@ -17,6 +17,7 @@ if TYPE_CHECKING:
 _INSTALL_MAPPING: dict[str, str] = {
     "codespell_lib": "codespell",
     "cv2": "opencv-python",
+    "mne_bids": "mne-bids",
     "parallel": "pyparallel",
     "pytest_cov": "pytest-cov",
     "serial": "pyserial",
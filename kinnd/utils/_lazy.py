@@ -0,0 +1,74 @@
+"""Lazy loading of the submodules and attributes of a package.
+
+The packages of kinnd expose their submodules and public functions as attributes,
+but only import them on first access with a module-level ``__getattr__``
+(:pep:`562`). Thus, ``import kinnd`` does not import MNE, SciPy or xarray, which
+matters for the command-line interface and for the worker processes which import
+kinnd over and over.
+
+Set the environment variable ``KINND_EAGER_IMPORT`` to import everything at once,
+e.g. to surface import errors early.
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Optional
+
+
+def attach(
+    name: str,
+    submodules: Optional[list[str]] = None,
+    submod_attrs: Optional[dict[str, list[str]]] = None,
+) -> tuple[Callable[[str], Any], Callable[[], list[str]], list[str]]:
+    """Attach lazily loaded submodules and attributes to a package.
+
+    Parameters
+    ----------
+    name : str
+        The name of the package, i.e. ``__name__``.
+    submodules : list of str | None
+        The submodules exposed as attributes of the package.
+    submod_attrs : dict | None
+        Mapping from a submodule, relative to the package, e.g. ``"utils.logs"``, to
+        the attributes of this submodule exposed as attributes of the package.
+
+    Returns
+    -------
+    __getattr__ : callable
+        The module-level ``__getattr__`` of the package.
+    __dir__ : callable
+        The module-level ``__dir__`` of the package.
+    __all__ : list of str
+        The public attributes of the package.
+    """
+    submodules = set() if submodules is None else set(submodules)
+    submod_attrs = dict() if submod_attrs is None else submod_attrs
+    attr_to_module = {
+        attr: module for module, attrs in submod_attrs.items() for attr in attrs
+    }
+    __all__ = sorted(submodules | set(attr_to_module))
+
+    def __getattr__(attr: str) -> Any:
+        if attr in submodules:
+            return importlib.import_module(f"{name}.{attr}")
+        if attr in attr_to_module:
+            module = importlib.import_module(f"{name}.{attr_to_module[attr]}")
+            value = getattr(module, attr)
+            # cache the attribute, so that __getattr__ is not called again
+            setattr(sys.modules[name], attr, value)
+            return value
+        raise AttributeError(f"module '{name}' has no attribute '{attr}'")
+
+    def __dir__() -> list[str]:
+        return list(__all__)
+
+    if os.environ.get("KINND_EAGER_IMPORT", "") not in ("", "0"):
+        for attr in __all__:
+            __getattr__(attr)
+    return __getattr__, __dir__, __all__
@@ -0,0 +1,156 @@
+"""A directory of cached files with a size budget and LRU eviction."""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from tempfile import mkstemp
+from typing import TYPE_CHECKING
+
+from ._checks import check_type, ensure_int, ensure_path
+from .logs import logger
+
+if TYPE_CHECKING:
+    from typing import Callable, Optional, Union
+
+
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+class DiskLRU:
+    """A directory of cached files, evicted in least-recently-used order.
+
+    Each entry is a single file named after its key. Reading an entry refreshes its
+    modification time, which is used as the recency of the entry. When the total size
+    of the directory exceeds the budget, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    directory : path-like
+        The directory holding the entries. It is created if it does not exist.
+    max_size : int
+        The size budget, in bytes.
+
+    Notes
+    -----
+    Entries are written to a temporary file and moved in place with
+    :func:`os.replace`, thus several processes can share the same directory: a reader
+    sees either a complete entry or no entry.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_size: int):
+        self.directory = ensure_path(directory, must_exist=False)
+        self.max_size = ensure_int(max_size, "max_size")
+        if self.max_size < 0:
+            raise ValueError("Argument 'max_size' must be positive.")
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self) -> str:  # noqa: D105
+        return (
+            f"<DiskLRU | {len(self)} entries, {self.size / 2**20:.1f} / "
+            f"{self.max_size / 2**20:.1f} MB>"
+        )
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._entries())
+
+    def __contains__(self, key: str) -> bool:  # noqa: D105
+        return any(self.directory.glob(f"{_check_key(key)}.*"))
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """Return the path to an entry and mark it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, made of letters, digits, ``-`` and ``_``.
+        suffix : str
+            The file extension of the entry, e.g. ``".npz"``.
+
+        Returns
+        -------
+        fname : pathlib.Path | None
+            The path to the entry, or None if the entry is not cached.
+        """
+        fname = self.directory / f"{_check_key(key)}{suffix}"
+        try:
+            os.utime(fname)
+        except FileNotFoundError:
+            return None
+        return fname
+
+    def put(self, key: str, suffix: str, write: Callable[[Path], None]) -> Path:
+        """Add an entry, then evict entries until the budget is respected.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, made of letters, digits, ``-`` and ``_``.
+        suffix : str
+            The file extension of the entry, e.g. ``".npz"``.
+        write : callable
+            The function writing the entry, called as ``write(fname)``. ``fname`` is
+            a temporary file with the extension ``suffix``.
+
+        Returns
+        -------
+        fname : pathlib.Path
+            The path to the entry.
+        """
+        fname = self.directory / f"{_check_key(key)}{suffix}"
+        fd, tmp = mkstemp(suffix=suffix, prefix=".tmp-", dir=self.directory)
+        os.close(fd)
+        try:
+            write(Path(tmp))
+            os.replace(tmp, fname)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+        return fname
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the budget is respected."""
+        entries = []
+        for fname in self._entries():
+            try:
+                stat = fname.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, fname))
+        size = sum(entry[1] for entry in entries)
+        for _, fsize, fname in sorted(entries, key=lambda entry: entry[0]):
+            if size <= self.max_size:
+                break
+            logger.debug("Evicting %s from the cache.", fname.name)
+            fname.unlink(missing_ok=True)
+            size -= fsize
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        for fname in self._entries():
+            fname.unlink(missing_ok=True)
+
+    @property
+    def size(self) -> int:
+        """The total size of the entries, in bytes."""
+        return sum(fname.stat().st_size for fname in self._entries())
+
+    def _entries(self) -> list[Path]:
+        """List the entries, excluding the temporary files being written."""
+        return [
+            fname
+            for fname in self.directory.iterdir()
+            if fname.is_file() and not fname.name.startswith(".tmp-")
+        ]
+
+
+def _check_key(key: str) -> str:
+    """Check that a key can be used as a file name."""
+    check_type(key, (str,), "key")
+    if _KEY_PATTERN.match(key) is None:
+        raise ValueError(
+            f"The key must be made of letters, digits, '-' and '_', got '{key}'."
+        )
+    return key
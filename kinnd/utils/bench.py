@@ -0,0 +1,404 @@
+"""Probe of the machine, BLAS and storage throughput.
+
+When a cohort run is slow, the culprit is usually one of three: the number of cores
+and threads, the BLAS backend behind NumPy and SciPy, or the storage the recordings
+are read from, e.g. the lab share. :func:`bench` reports the thread pools and measures
+the matrix products and FFTs at the sizes of EEG recordings, and the throughput and
+latency of reads on the given directories, in a machine-readable report.
+"""
+
+from __future__ import annotations
+
+import os
+import platform
+import sys
+import time
+from importlib.metadata import version
+from pathlib import Path
+from tempfile import mkstemp
+from typing import TYPE_CHECKING
+
+import numpy as np
+import psutil
+
+from ._checks import check_type, ensure_int, ensure_path
+from ._imports import import_optional_dependency
+from .logs import logger
+
+if TYPE_CHECKING:
+    from typing import Any, Optional, Union
+
+
+# environment variables which set the size of the thread pools
+_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "MNE_N_JOBS",
+)
+# (m, k, n) of the matrix products: a spatial operator applied to 60 s of raw data
+# at 1 kHz, and the channel covariance of 10 min at 250 Hz.
+_GEMM_SHAPES = ((129, 129, 60_000), (129, 150_000, 129))
+# (n_signals, n_times) of the real FFTs: the Welch segments of a recording, and the
+# padded epochs of a session.
+_FFT_SHAPES = ((129 * 64, 1024), (129 * 120, 2048))
+_BLOCK_SIZE = 2**20  # bytes, sequential reads
+_RANDOM_BLOCK_SIZE = 2**16  # bytes, random reads
+_MAX_LISTED = 1024  # files listed per directory, to bound the walk of a large share
+_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+
+
+def bench(
+    directories: Optional[Union[str, Path, list[Union[str, Path]]]] = None,
+    *,
+    compute: bool = True,
+    n_repeats: int = 3,
+    n_files: int = 32,
+    max_bytes: int = 256 * 2**20,
+    write: bool = False,
+    seed: Optional[int] = None,
+) -> dict[str, Any]:
+    """Measure what limits the throughput of a run on this machine.
+
+    Parameters
+    ----------
+    directories : path-like | list of path-like | None
+        The directories whose read throughput and latency are measured, e.g. the
+        mount point of the lab share and a local cache. The first files found in the
+        directory and its subdirectories are read, in random order. If None, the
+        storage is not measured.
+    compute : bool
+        If True, measure the matrix products and FFTs.
+    n_repeats : int
+        The number of repeats of each compute benchmark; the fastest is reported.
+    n_files : int
+        The maximum number of files opened per directory to measure the latency.
+    max_bytes : int
+        The maximum number of bytes read per directory, for each of the sequential and
+        random read benchmarks.
+    write : bool
+        If True, also measure the sequential write throughput with a temporary file of
+        ``max_bytes`` bytes written to each directory, then removed. A directory
+        without files is measured on this temporary file.
+    seed : int | None
+        The seed of the random generator, used to pick the files and offsets.
+
+    Returns
+    -------
+    report : dict
+        A JSON-serializable report with the keys:
+
+        * ``platform``: the platform, the Python and package versions, the number of
+          cores and the memory.
+        * ``threads``: the BLAS and OpenMP libraries loaded, with their number of
+          threads and threading layer, the BLAS NumPy was built against, and the
+          environment variables which size the thread pools.
+        * ``compute``: for each ``gemm`` and ``fft`` size and dtype, the shape, the
+          best time in seconds and the throughput in GFLOP/s.
+        * ``storage``: for each directory, the sequential and random read throughput
+          in MB/s, the per-file latency (open and read of the first 4 kB) in ms, and
+          optionally the write throughput.
+
+    Notes
+    -----
+    The operating system caches the files it reads, and a second run on the same
+    files measures the memory instead of the storage. On Linux, the cache of each file
+    is dropped before reading it with :func:`os.posix_fadvise`, which is effective on
+    local disks but not guaranteed on network file systems.
+    """
+    check_type(compute, (bool,), "compute")
+    check_type(write, (bool,), "write")
+    check_type(seed, ("int-like", None), "seed")
+    n_repeats = ensure_int(n_repeats, "n_repeats")
+    n_files = ensure_int(n_files, "n_files")
+    max_bytes = ensure_int(max_bytes, "max_bytes")
+    if n_repeats < 1 or n_files < 1 or max_bytes < 1:
+        raise ValueError(
+            "Arguments 'n_repeats', 'n_files' and 'max_bytes' must be positive."
+        )
+    if directories is None:
+        directories = []
+    elif isinstance(directories, (str, Path)):
+        directories = [directories]
+    directories = [ensure_path(directory, must_exist=True) for directory in directories]
+    for directory in directories:
+        if not directory.is_dir():
+            raise ValueError(f"The path {directory} is not a directory.")
+
+    report = dict(platform=_platform_info(), threads=_threads_info())
+    if compute:
+        logger.info("Measuring the matrix products and FFTs.")
+        report["compute"] = dict(
+            gemm=[
+                _bench_gemm(shape, dtype, n_repeats)
+                for shape in _GEMM_SHAPES
+                for dtype in ("float64", "float32")
+            ],
+            fft=[
+                _bench_fft(shape, dtype, n_repeats)
+                for shape in _FFT_SHAPES
+                for dtype in ("float64", "float32")
+            ],
+        )
+    rng = np.random.default_rng(seed)
+    report["storage"] = list()
+    for directory in directories:
+        logger.info("Measuring the storage of %s.", directory)
+        report["storage"].append(
+            _bench_storage(directory, n_files, max_bytes, write, rng)
+        )
+    return report
+
+
+def _platform_info() -> dict[str, Any]:
+    """Get the platform, the versions, the cores and the memory."""
+    packages = dict()
+    for package in ("kinnd", "numpy", "scipy", "mne"):
+        try:
+            packages[package] = version(package)
+        except Exception:
+            packages[package] = None
+    return dict(
+        platform=platform.platform(),
+        python=sys.version.split()[0],
+        executable=sys.executable,
+        cpu=platform.processor() or platform.machine(),
+        physical_cores=psutil.cpu_count(False),
+        logical_cores=psutil.cpu_count(True),
+        usable_cores=len(_get_affinity()),
+        ram_gb=round(psutil.virtual_memory().total / 2**30, 1),
+        available_ram_gb=round(psutil.virtual_memory().available / 2**30, 1),
+        packages=packages,
+    )
+
+
+def _get_affinity() -> list[int]:
+    """Get the cores the process may run on."""
+    try:
+        return psutil.Process().cpu_affinity()
+    except (AttributeError, NotImplementedError):  # macOS
+        return list(range(psutil.cpu_count(True) or 1))
+
+
+def _threads_info() -> dict[str, Any]:
+    """Get the thread pools of the BLAS and OpenMP libraries."""
+    threadpoolctl = import_optional_dependency("threadpoolctl", raise_error=False)
+    # SciPy loads its own BLAS, and the FFT backend
+    import scipy.fft  # noqa: F401
+    import scipy.linalg  # noqa: F401
+
+    libraries = None
+    if threadpoolctl is not None:
+        libraries = [
+            {
+                key: info.get(key)
+                for key in (
+                    "user_api",
+                    "internal_api",
+                    "prefix",
+                    "version",
+                    "num_threads",
+                    "threading_layer",
+                    "architecture",
+                    "filepath",
+                )
+            }
+            for info in threadpoolctl.threadpool_info()
+        ]
+    try:
+        config = np.show_config(mode="dicts")["Build Dependencies"]
+        numpy_blas = {
+            key: config[key].get("name") for key in ("blas", "lapack") if key in config
+        }
+    except Exception:  # numpy < 1.25
+        numpy_blas = None
+    return dict(
+        libraries=libraries,
+        numpy_build=numpy_blas,
+        environment={
+            var: os.environ[var] for var in _THREAD_VARIABLES if var in os.environ
+        },
+    )
+
+
+def _best_time(func, n_repeats: int) -> float:
+    """Return the fastest of the timed calls, after a warm-up call."""
+    func()
+    times = list()
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _bench_gemm(shape: tuple[int, int, int], dtype: str, n_repeats: int) -> dict:
+    """Time the product of a (m, k) and a (k, n) matrices."""
+    m, k, n = shape
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((m, k)).astype(dtype)
+    b = rng.standard_normal((k, n)).astype(dtype)
+    out = np.empty((m, n), dtype=dtype)
+    seconds = _best_time(lambda: np.matmul(a, b, out=out), n_repeats)
+    return dict(
+        shape=[m, k, n],
+        dtype=dtype,
+        seconds=seconds,
+        gflops=2 * m * k * n / seconds / 1e9,
+    )
+
+
+def _bench_fft(shape: tuple[int, int], dtype: str, n_repeats: int) -> dict:
+    """Time the real FFT of a batch of signals along the last axis."""
+    from scipy.fft import rfft
+
+    n_signals, n_times = shape
+    x = np.random.default_rng(0).standard_normal(shape).astype(dtype)
+    seconds = _best_time(lambda: rfft(x, axis=-1), n_repeats)
+    return dict(
+        shape=[n_signals, n_times],
+        dtype=dtype,
+        seconds=seconds,
+        # conventional estimate of the operations of a real FFT
+        gflops=2.5 * n_signals * n_times * np.log2(n_times) / seconds / 1e9,
+    )
+
+
+def _bench_storage(
+    directory: Path, n_files: int, max_bytes: int, write: bool, rng
+) -> dict[str, Any]:
+    """Measure the read throughput and latency, and the write throughput."""
+    out = dict(directory=str(directory))
+    tmp = None
+    if write:
+        tmp, out["write_mbps"] = _bench_write(directory, max_bytes)
+    try:
+        files = _list_files(directory, rng)
+        if len(files) == 0 and tmp is not None:
+            files = [(tmp, tmp.stat().st_size)]
+        out["n_files"] = len(files)
+        if len(files) == 0:
+            logger.info("No file to read in %s.", directory)
+            return out
+        out["file_latency_ms"] = _bench_latency(files[:n_files])
+        out["sequential_read_mbps"] = _bench_sequential(files, max_bytes)
+        out["random_read_mbps"] = _bench_random(files, max_bytes, rng)
+    finally:
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+    return out
+
+
+def _list_files(directory: Path, rng) -> list[tuple[Path, int]]:
+    """List the first non-empty files of a directory, in random order."""
+    files = list()
+    for root, _, fnames in os.walk(directory):
+        if len(files) >= _MAX_LISTED:
+            break
+        for fname in fnames:
+            path = Path(root) / fname
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            if size != 0 and not fname.startswith("."):
+                files.append((path, size))
+    return [files[k] for k in rng.permutation(len(files))]
+
+
+def _drop_cache(fd: int) -> None:
+    """Drop the cached pages of a file, if supported."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def _bench_latency(files: list[tuple[Path, int]]) -> dict[str, float]:
+    """Measure the latency of opening a file and reading its first block."""
+    latencies = list()
+    for path, _ in files:
+        start = time.perf_counter()
+        fd = os.open(path, _OPEN_FLAGS)
+        try:
+            os.read(fd, 4096)
+        finally:
+            os.close(fd)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    return dict(
+        median=float(np.median(latencies)),
+        p95=float(np.percentile(latencies, 95)),
+        max=float(np.max(latencies)),
+    )
+
+
+def _bench_sequential(files: list[tuple[Path, int]], max_bytes: int) -> float:
+    """Measure the throughput of reading whole files in large blocks."""
+    n_bytes, seconds = 0, 0.0
+    for path, _ in files:
+        fd = os.open(path, _OPEN_FLAGS)
+        try:
+            _drop_cache(fd)
+            start = time.perf_counter()
+            while n_bytes < max_bytes:
+                block = os.read(fd, _BLOCK_SIZE)
+                if len(block) == 0:
+                    break
+                n_bytes += len(block)
+            seconds += time.perf_counter() - start
+        finally:
+            os.close(fd)
+        if n_bytes >= max_bytes:
+            break
+    return n_bytes / seconds / 1e6 if seconds > 0 else float("nan")
+
+
+def _bench_random(files: list[tuple[Path, int]], max_bytes: int, rng) -> float:
+    """Measure the throughput of reading blocks at random offsets."""
+    sizes = np.array([size for _, size in files], dtype=float)
+    n_reads = max(max_bytes // _RANDOM_BLOCK_SIZE, 1)
+    picks = rng.choice(len(files), size=n_reads, p=sizes / sizes.sum())
+    n_bytes, seconds = 0, 0.0
+    for k in np.unique(picks):
+        path, size = files[k]
+        offsets = rng.integers(
+            0, max(size - _RANDOM_BLOCK_SIZE, 0) + 1, np.sum(picks == k)
+        )
+        fd = os.open(path, _OPEN_FLAGS)
+        try:
+            _drop_cache(fd)
+            start = time.perf_counter()
+            for offset in offsets:
+                n_bytes += len(_pread(fd, _RANDOM_BLOCK_SIZE, int(offset)))
+            seconds += time.perf_counter() - start
+        finally:
+            os.close(fd)
+    return n_bytes / seconds / 1e6 if seconds > 0 else float("nan")
+
+
+def _pread(fd: int, n_bytes: int, offset: int) -> bytes:
+    """Read bytes at an offset of a file."""
+    if hasattr(os, "pread"):
+        return os.pread(fd, n_bytes, offset)
+    os.lseek(fd, offset, os.SEEK_SET)  # Windows
+    return os.read(fd, n_bytes)
+
+
+def _bench_write(directory: Path, n_bytes: int) -> tuple[Path, float]:
+    """Measure the throughput of writing a temporary file, flushed to the storage."""
+    fd, tmp = mkstemp(prefix=".kinnd-bench-", dir=directory)
+    block = np.random.default_rng(0).bytes(min(_BLOCK_SIZE, n_bytes))
+    try:
+        start = time.perf_counter()
+        written = 0
+        while written < n_bytes:
+            written += os.write(fd, block[: n_bytes - written])
+        os.fsync(fd)
+        seconds = time.perf_counter() - start
+    finally:
+        os.close(fd)
+    return Path(tmp), written / seconds / 1e6
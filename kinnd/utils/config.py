@@ -60,6 +60,7 @@ def sys_info(fid: Optional[IO] = None, developer: bool = False):
         keys = (
             "build",
             "doc",
+            "listen",
             "test",
             "stubs",
             "style",
@@ -0,0 +1,180 @@
+"""Utilities to run computations over many subjects in parallel."""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from ._checks import check_type, ensure_int
+from ._imports import import_optional_dependency
+from .logs import warn
+from .resources import get_layout, limit_threads, log_layout
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Any, Callable, Optional
+
+
+def check_n_jobs(n_jobs: Optional[int]) -> int:
+    """Check and sanitize the number of jobs.
+
+    Parameters
+    ----------
+    n_jobs : int | None
+        The number of jobs. ``None`` is equivalent to ``1``. Negative values are
+        interpreted as in joblib, i.e. ``-1`` uses all logical cores, ``-2`` all but
+        one, etc.
+
+    Returns
+    -------
+    n_jobs : int
+        The number of jobs, as a strictly positive integer.
+    """
+    check_type(n_jobs, ("int-like", None), "n_jobs")
+    if n_jobs is None:
+        return 1
+    n_jobs = ensure_int(n_jobs, "n_jobs")
+    n_cores = psutil.cpu_count(True) or 1
+    if n_jobs < 0:
+        n_jobs = max(n_cores + 1 + n_jobs, 1)
+    elif n_jobs == 0:
+        raise ValueError("Argument 'n_jobs' can not be 0.")
+    return n_jobs
+
+
+def parallel_imap(
+    func: Callable[..., Any],
+    items: Iterable[Any],
+    *,
+    n_jobs: Optional[int] = 1,
+    max_memory: Optional[int] = None,
+    n_threads: Optional[int] = None,
+    affinity: bool = False,
+) -> Iterator[tuple[Any, Any]]:
+    """Apply a function to each item and yield the results as they complete.
+
+    Parameters
+    ----------
+    func : callable
+        The function to apply. It is called as ``func(item)``. When ``n_jobs`` is
+        greater than 1, it must be picklable, i.e. defined at the top level of a
+        module.
+    items : iterable
+        The items to process, e.g. a list of subject IDs.
+    n_jobs : int | None
+        The number of worker processes. With ``1`` or ``None``, the items are
+        processed sequentially in the current process.
+    max_memory : int | None
+        The maximum address space of each worker process, in bytes. An allocation
+        beyond it raises a :class:`MemoryError` in the worker, instead of exhausting
+        the memory of the machine. If set, the items are processed in worker processes
+        even with ``n_jobs=1``. Only supported on Unix, see the notes.
+    n_threads : int | None
+        The number of threads of each worker process, in the BLAS and OpenMP thread
+        pools and for MNE, see :func:`~kinnd.utils.resources.get_mne_n_jobs`. If
+        None, the cores are split evenly between the workers, and a sequential run in
+        the current process is not limited.
+    affinity : bool
+        If True, each worker process is pinned to its own cores. Only supported on
+        Linux and Windows.
+
+    Yields
+    ------
+    item : object
+        The processed item.
+    result : object
+        The value returned by ``func(item)``.
+
+    Notes
+    -----
+    With several workers, the results are yielded in completion order, not in the
+    order of ``items``. Each result is handed back as soon as it is available, so
+    that the caller can write it to disk and release it.
+
+    The threads of the workers are limited, so that the workers do not oversubscribe
+    the cores, see :func:`~kinnd.utils.resources.get_layout`. The layout is logged.
+
+    ``max_memory`` caps the virtual address space of the workers (``RLIMIT_AS``), not
+    their resident memory. The address space includes the memory which is mapped but
+    not used, e.g. the shared libraries and the reserved thread stacks, thus it is
+    larger than the resident memory, by several GB with some BLAS libraries. A worker
+    whose starting address space exceeds ``max_memory`` warns, since any allocation
+    then fails.
+    """
+    n_jobs = check_n_jobs(n_jobs)
+    check_type(max_memory, ("int-like", None), "max_memory")
+    items = list(items)
+    if max_memory is not None:
+        max_memory = ensure_int(max_memory, "max_memory")
+        if max_memory <= 0:
+            raise ValueError(
+                f"Argument 'max_memory' must be strictly positive, got {max_memory}."
+            )
+        if resource is None:
+            raise RuntimeError("Argument 'max_memory' is only supported on Unix.")
+    elif n_jobs == 1 or len(items) <= 1:
+        with _sequential_limits(n_threads):
+            for item in items:
+                yield item, func(item)
+        return
+    if len(items) == 0:
+        return
+    layout = get_layout(min(n_jobs, len(items)), n_threads=n_threads, affinity=affinity)
+    log_layout(layout)
+    cpus = None
+    if layout["cpus"] is not None:
+        # each worker picks its own cores when it starts
+        cpus = multiprocessing.Queue()
+        for worker_cpus in layout["cpus"]:
+            cpus.put(worker_cpus)
+    with ProcessPoolExecutor(
+        max_workers=layout["n_jobs"],
+        initializer=_init_worker,
+        initargs=(layout["n_threads"], cpus, max_memory),
+    ) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures.pop(future)
+            yield item, future.result()
+
+
+def _init_worker(
+    n_threads: int, cpus: Optional[multiprocessing.Queue], max_memory: Optional[int]
+) -> None:
+    """Limit the threads, the cores and the memory of a worker process."""
+    limit_threads(n_threads, None if cpus is None else cpus.get())
+    if max_memory is not None:
+        _limit_memory(max_memory)
+
+
+def _sequential_limits(n_threads: Optional[int]):
+    """Limit the threads of the current process, if a number of threads is given."""
+    threadpoolctl = import_optional_dependency("threadpoolctl", raise_error=False)
+    if n_threads is None or threadpoolctl is None:
+        return nullcontext()
+    return threadpoolctl.threadpool_limits(limits=ensure_int(n_threads, "n_threads"))
+
+
+def _limit_memory(max_memory: int) -> None:
+    """Limit the address space of a worker process."""
+    vms = psutil.Process().memory_info().vms
+    if max_memory <= vms:
+        warn(
+            f"The maximum memory of {max_memory / 2**20:.0f} MB is below the address "
+            f"space of {vms / 2**20:.0f} MB of the worker process when it starts, "
+            "thus any allocation fails. The maximum memory caps the virtual address "
+            "space, not the resident memory."
+        )
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        max_memory = min(max_memory, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (max_memory, hard))
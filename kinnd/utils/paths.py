@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 import sys
 
@@ -42,6 +43,25 @@ def lab_server_path():
         raise OSError(f"Unknown operating system: {sys.platform}")
 
 
+def get_cache_dir():
+    """Return the directory where kinnd caches intermediate results.
+
+    The directory is read from the environment variable ``KINND_CACHE_DIR`` and
+    defaults to ``~/.cache/kinnd``. It is created if it does not exist.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to the cache directory.
+    """
+    cache_dir = os.environ.get("KINND_CACHE_DIR", None)
+    if cache_dir is None:
+        cache_dir = Path.home() / ".cache" / "kinnd"
+    cache_dir = Path(cache_dir).expanduser()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
 def semantics_path():
     """Return the path to the Semantics data on the lab server."""
     return lab_server_path() / "charlotte_semantics_data"
@@ -0,0 +1,184 @@
+"""Split the cores of the machine between worker processes and their threads.
+
+A worker process of :func:`~kinnd.utils.parallel.parallel_imap` which filters, fits
+an ICA or runs RANSAC starts a thread pool in the BLAS and OpenMP libraries, and MNE
+starts its own jobs. Left alone, each pool is sized to every core of the machine,
+thus ``n_jobs`` workers oversubscribe the cores ``n_jobs`` times over and run slower
+than a single process. The layout computed here gives each worker a budget of
+threads, applied with :mod:`threadpoolctl` and the environment variables read by the
+libraries, and optionally pins each worker to its own cores.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import psutil
+
+from ._checks import check_type, ensure_int
+from ._imports import import_optional_dependency
+from .logs import logger, warn
+
+if TYPE_CHECKING:
+    from typing import Any, Optional
+
+
+# environment variables which set the size of the thread pools, read by the
+# libraries when they are loaded
+_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+# the thread budget of the current worker process, read by get_mne_n_jobs
+_BUDGET_VARIABLE = "MNE_N_JOBS"
+# the thread limits of the current worker process, kept alive for its lifetime
+_LIMITS: list[Any] = []
+
+
+def get_layout(
+    n_jobs: int,
+    *,
+    n_threads: Optional[int] = None,
+    affinity: bool = False,
+) -> dict[str, Any]:
+    """Split the cores between worker processes and their threads.
+
+    Parameters
+    ----------
+    n_jobs : int
+        The number of worker processes, as a strictly positive integer.
+    n_threads : int | None
+        The number of threads of each worker. If None, the physical cores, or the
+        logical cores if they can not be counted, are split evenly between the
+        workers, with at least one thread each.
+    affinity : bool
+        If True, each worker is pinned to its own set of ``n_threads`` logical cores,
+        wrapping around when the workers need more cores than the machine has. Only
+        supported on Linux and Windows.
+
+    Returns
+    -------
+    layout : dict
+        The layout, with the keys ``n_cores`` (the cores split), ``n_jobs``,
+        ``n_threads`` and ``cpus`` (the logical cores of each worker, or None
+        without affinity).
+    """
+    n_jobs = ensure_int(n_jobs, "n_jobs")
+    check_type(n_threads, ("int-like", None), "n_threads")
+    check_type(affinity, (bool,), "affinity")
+    if n_jobs <= 0:
+        raise ValueError(f"Argument 'n_jobs' must be strictly positive, got {n_jobs}.")
+    cpus = _get_available_cpus()
+    n_cores = psutil.cpu_count(logical=False) or len(cpus)
+    n_cores = min(n_cores, len(cpus))
+    if n_threads is None:
+        n_threads = max(n_cores // n_jobs, 1)
+    else:
+        n_threads = ensure_int(n_threads, "n_threads")
+        if n_threads <= 0:
+            raise ValueError(
+                f"Argument 'n_threads' must be strictly positive, got {n_threads}."
+            )
+    if n_jobs * n_threads > len(cpus):
+        logger.warning(
+            "%i worker(s) with %i thread(s) each oversubscribe the %i logical cores.",
+            n_jobs,
+            n_threads,
+            len(cpus),
+        )
+    worker_cpus = None
+    if affinity:
+        if not hasattr(psutil.Process, "cpu_affinity"):
+            warn("The CPU affinity is not supported on this platform, and is ignored.")
+        else:
+            worker_cpus = [
+                sorted(
+                    {cpus[(k * n_threads + i) % len(cpus)] for i in range(n_threads)}
+                )
+                for k in range(n_jobs)
+            ]
+    return dict(n_cores=n_cores, n_jobs=n_jobs, n_threads=n_threads, cpus=worker_cpus)
+
+
+def log_layout(layout: dict[str, Any]) -> None:
+    """Log the layout of the worker processes and their threads.
+
+    Parameters
+    ----------
+    layout : dict
+        The layout returned by :func:`get_layout`.
+    """
+    logger.info(
+        "Running %i worker process(es) with %i thread(s) each on %i core(s)%s.",
+        layout["n_jobs"],
+        layout["n_threads"],
+        layout["n_cores"],
+        "" if layout["cpus"] is None else ", pinned to their own cores",
+    )
+
+
+def limit_threads(n_threads: int, cpus: Optional[list[int]] = None) -> None:
+    """Limit the threads of the current process, for the rest of its lifetime.
+
+    The thread pools of the BLAS and OpenMP libraries already loaded are limited with
+    :mod:`threadpoolctl`, if it is installed, and those of the libraries loaded later
+    by the environment variables they read. The budget is also exported for MNE, see
+    :func:`get_mne_n_jobs`.
+
+    Parameters
+    ----------
+    n_threads : int
+        The number of threads.
+    cpus : list of int | None
+        The logical cores the process is pinned to. If None, the affinity is left
+        unchanged.
+
+    Notes
+    -----
+    This function is meant for worker processes. To limit the threads of a block of
+    code, use :func:`threadpoolctl.threadpool_limits` as a context manager.
+    """
+    n_threads = ensure_int(n_threads, "n_threads")
+    for variable in _THREAD_VARIABLES:
+        os.environ[variable] = str(n_threads)
+    os.environ[_BUDGET_VARIABLE] = str(n_threads)
+    threadpoolctl = import_optional_dependency("threadpoolctl", raise_error=False)
+    if threadpoolctl is not None:
+        _LIMITS.append(threadpoolctl.threadpool_limits(limits=n_threads))
+    if cpus is not None:
+        psutil.Process().cpu_affinity(cpus)
+    logger.debug(
+        "Process %i limited to %i thread(s)%s.",
+        os.getpid(),
+        n_threads,
+        "" if cpus is None else f" on the cores {cpus}",
+    )
+
+
+def get_mne_n_jobs() -> int:
+    """Get the number of jobs to pass to MNE functions in the current process.
+
+    Returns
+    -------
+    n_jobs : int
+        The thread budget of the current worker process of
+        :func:`~kinnd.utils.parallel.parallel_imap`, exported as ``MNE_N_JOBS``, or 1
+        outside of a worker. MNE needs :mod:`joblib` to run jobs in parallel, thus it
+        is 1 if joblib is not installed.
+    """
+    if import_optional_dependency("joblib", raise_error=False) is None:
+        return 1
+    return max(int(os.environ.get(_BUDGET_VARIABLE, 1)), 1)
+
+
+def _get_available_cpus() -> list[int]:
+    """Get the logical cores available to the current process."""
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, NotImplementedError):  # e.g. macOS
+        return list(range(psutil.cpu_count(logical=True) or 1))
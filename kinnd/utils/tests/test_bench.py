@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from ..bench import bench
+
+
+def test_bench_compute():
+    """Test the report of the thread pools and of the compute benchmarks."""
+    report = bench(n_repeats=1)
+    json.dumps(report)
+    assert report["platform"]["logical_cores"] >= 1
+    assert "environment" in report["threads"]
+    assert len(report["compute"]["gemm"]) == 4
+    assert len(report["compute"]["fft"]) == 4
+    for result in report["compute"]["gemm"] + report["compute"]["fft"]:
+        assert result["seconds"] > 0
+        assert result["gflops"] > 0
+    assert report["storage"] == []
+
+
+def test_bench_storage(tmp_path):
+    """Test the storage benchmarks."""
+    rng = np.random.default_rng(0)
+    (tmp_path / "sub").mkdir()
+    for k in range(5):
+        (tmp_path / "sub" / f"file{k}.bin").write_bytes(rng.bytes(2**18))
+    (tmp_path / "empty.bin").touch()
+    report = bench(tmp_path, compute=False, n_files=3, max_bytes=2**19, seed=0)
+    assert "compute" not in report
+    (storage,) = report["storage"]
+    assert storage["directory"] == str(tmp_path)
+    assert storage["n_files"] == 5
+    assert "write_mbps" not in storage
+    assert storage["sequential_read_mbps"] > 0
+    assert storage["random_read_mbps"] > 0
+    assert 0 < storage["file_latency_ms"]["median"] <= storage["file_latency_ms"]["max"]
+
+    # an empty directory is measured on the temporary file
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    (storage,) = bench(empty, compute=False, write=True, max_bytes=2**19)["storage"]
+    assert storage["write_mbps"] > 0
+    assert storage["n_files"] == 1
+    assert list(empty.iterdir()) == []
+
+
+def test_bench_invalid(tmp_path):
+    """Test invalid arguments."""
+    with pytest.raises(ValueError, match="must be positive"):
+        bench(n_repeats=0)
+    fname = tmp_path / "file.txt"
+    fname.touch()
+    with pytest.raises(ValueError, match="not a directory"):
+        bench(fname, compute=False)
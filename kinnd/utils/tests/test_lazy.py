@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from importlib import import_module
+
+import pytest
+
+# Packages which expose their submodules and functions lazily.
+_PACKAGES = (
+    "kinnd",
+    "kinnd.cache",
+    "kinnd.datasets",
+    "kinnd.io",
+    "kinnd.preprocessing",
+    "kinnd.qc",
+    "kinnd.spectral",
+    "kinnd.stats",
+    "kinnd.studies",
+    "kinnd.studies.listen",
+    "kinnd.studies.semantics",
+    "kinnd.utils",
+    "kinnd.viz",
+)
+# Budget of the cumulative import time of kinnd, reported by python -X importtime.
+_BUDGET: float = 0.15  # seconds
+
+
+@pytest.mark.parametrize("name", _PACKAGES)
+def test_lazy_attributes(name):
+    """Test that every lazy attribute of a package can be resolved."""
+    package = import_module(name)
+    assert sorted(dir(package)) == sorted(package.__all__)
+    for attr in package.__all__:
+        assert getattr(package, attr) is not None
+    with pytest.raises(AttributeError, match="has no attribute"):
+        _ = package.invalid_attribute
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess:
+    """Run python code in a fresh interpreter."""
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_heavy_dependencies():
+    """Test that importing kinnd does not import its heavy dependencies."""
+    modules = ("matplotlib", "mne", "pandas", "pytz", "scipy", "xarray", "zarr")
+    code = (
+        "import sys; import kinnd; from kinnd.utils.paths import get_cache_dir; "
+        f"print(','.join(sorted(set({modules!r}) & set(sys.modules))))"
+    )
+    assert _run(code).stdout.strip() == ""
+
+
+def test_import_time():
+    """Test the import time budget of kinnd."""
+    stderr = _run("import kinnd", "-X", "importtime").stderr
+    # the lines are formatted as 'import time: self [us] | cumulative | name'
+    times = {
+        line.split("|")[2].strip(): int(line.split("|")[1])
+        for line in stderr.splitlines()
+        if line.startswith("import time:")
+        and line.count("|") == 2
+        and not line.split("|")[1].strip().startswith("cumulative")
+    }
+    assert times["kinnd"] / 1e6 < _BUDGET, f"import kinnd took {times['kinnd']} us"
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from .._lru import DiskLRU
+
+
+def _writer(content):
+    """Create a function writing content to a file."""
+
+    def write(fname):
+        fname.write_bytes(content)
+
+    return write
+
+
+def test_disk_lru(tmp_path):
+    """Test the on-disk LRU cache."""
+    cache = DiskLRU(tmp_path / "cache", max_size=250)
+    assert len(cache) == 0
+    assert cache.get("a", ".bin") is None
+    fname = cache.put("a", ".bin", _writer(b"a" * 100))
+    assert fname.read_bytes() == b"a" * 100
+    assert "a" in cache
+    cache.put("b", ".bin", _writer(b"b" * 100))
+    assert cache.size == 200
+    # mark 'a' as used after 'b'
+    os.utime(cache.directory / "b.bin", ns=(0, 0))
+    assert cache.get("a", ".bin") == fname
+    cache.put("c", ".bin", _writer(b"c" * 100))
+    assert "a" in cache
+    assert "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+    assert "DiskLRU | 2 entries" in repr(cache)
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_disk_lru_failed_write(tmp_path):
+    """Test that a failed write leaves no entry behind."""
+    cache = DiskLRU(tmp_path, max_size=1000)
+
+    def write(fname):
+        fname.write_bytes(b"partial")
+        raise RuntimeError("Crash")
+
+    with pytest.raises(RuntimeError, match="Crash"):
+        cache.put("a", ".bin", write)
+    assert "a" not in cache
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_lru_invalid(tmp_path):
+    """Test invalid arguments."""
+    with pytest.raises(ValueError, match="must be positive"):
+        DiskLRU(tmp_path, max_size=-1)
+    cache = DiskLRU(tmp_path, max_size=10)
+    with pytest.raises(ValueError, match="must be made of"):
+        cache.get("../a", ".bin")
+    with pytest.raises(TypeError, match="must be an instance of"):
+        cache.get(1, ".bin")
@@ -0,0 +1,68 @@
+import sys
+
+import numpy as np
+import psutil
+import pytest
+
+from .. import parallel
+from ..parallel import _limit_memory, check_n_jobs, parallel_imap
+
+
+def _square(x):
+    return x**2
+
+
+def _allocate(n_bytes):
+    return np.ones(n_bytes, dtype=np.uint8).sum()
+
+
+def test_check_n_jobs():
+    """Test checking the number of jobs."""
+    assert check_n_jobs(None) == 1
+    assert check_n_jobs(3) == 3
+    assert check_n_jobs(-1) >= 1
+    assert check_n_jobs(-1000) == 1
+    with pytest.raises(ValueError, match="can not be 0"):
+        check_n_jobs(0)
+    with pytest.raises(TypeError, match="must be an instance of"):
+        check_n_jobs(1.5)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_parallel_imap(n_jobs):
+    """Test applying a function to items in parallel."""
+    results = dict(parallel_imap(_square, range(5), n_jobs=n_jobs))
+    assert results == {k: k**2 for k in range(5)}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_parallel_imap_max_memory(n_jobs):
+    """Test limiting the memory of the worker processes."""
+    # the workers start with the address space of the current process
+    max_memory = psutil.Process().memory_info().vms + 2**30
+    small, large = 2**20, max_memory + 2**30
+    results = dict(
+        parallel_imap(
+            _allocate, [small, 2 * small], n_jobs=n_jobs, max_memory=max_memory
+        )
+    )
+    assert results == {small: small, 2 * small: 2 * small}
+    with pytest.raises(MemoryError):
+        dict(parallel_imap(_allocate, [large], n_jobs=n_jobs, max_memory=max_memory))
+    with pytest.raises(ValueError, match="strictly positive"):
+        dict(parallel_imap(_allocate, [small], max_memory=0))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix only")
+def test_limit_memory_below_start(monkeypatch):
+    """Test the warning on a maximum memory below the starting address space."""
+    limits = list()
+    monkeypatch.setattr(
+        parallel.resource, "setrlimit", lambda kind, limit: limits.append(limit)
+    )
+    with pytest.warns(RuntimeWarning, match="below the address space"):
+        _limit_memory(2**20)
+    vms = psutil.Process().memory_info().vms
+    _limit_memory(vms + 2**30)
+    assert [soft for soft, _ in limits] == [2**20, vms + 2**30]
@@ -0,0 +1,64 @@
+import os
+
+import psutil
+import pytest
+
+from ..parallel import parallel_imap
+from ..resources import _get_available_cpus, get_layout, get_mne_n_jobs
+
+
+def _get_limits(_):
+    threadpoolctl = pytest.importorskip("threadpoolctl")
+    threads = {pool["num_threads"] for pool in threadpoolctl.threadpool_info()}
+    return os.environ["OMP_NUM_THREADS"], os.environ["MNE_N_JOBS"], threads
+
+
+def _get_affinity(_):
+    return sorted(psutil.Process().cpu_affinity())
+
+
+def test_get_layout():
+    """Test splitting the cores between workers and threads."""
+    n_cpus = len(_get_available_cpus())
+    layout = get_layout(1)
+    assert layout["n_jobs"] == 1
+    assert layout["n_threads"] == layout["n_cores"] <= n_cpus
+    assert layout["cpus"] is None
+    layout = get_layout(2 * n_cpus)
+    assert layout["n_threads"] == 1
+    layout = get_layout(2, n_threads=3, affinity=True)
+    assert layout["n_threads"] == 3
+    assert len(layout["cpus"]) == 2
+    assert all(len(cpus) == min(3, n_cpus) for cpus in layout["cpus"])
+    with pytest.raises(ValueError, match="strictly positive"):
+        get_layout(0)
+    with pytest.raises(ValueError, match="strictly positive"):
+        get_layout(1, n_threads=0)
+
+
+def test_limit_threads():
+    """Test that the threads of the worker processes are limited."""
+    pytest.importorskip("threadpoolctl")
+    results = dict(parallel_imap(_get_limits, range(2), n_jobs=2, n_threads=1))
+    assert all(result == ("1", "1", {1}) for result in results.values())
+    # the current process is left unchanged
+    assert os.environ.get("MNE_N_JOBS") is None
+
+
+@pytest.mark.skipif(
+    not hasattr(psutil.Process, "cpu_affinity"), reason="affinity not supported"
+)
+def test_limit_threads_affinity():
+    """Test pinning the worker processes to their own cores."""
+    layout = get_layout(2, n_threads=1, affinity=True)
+    results = dict(
+        parallel_imap(_get_affinity, range(2), n_jobs=2, n_threads=1, affinity=True)
+    )
+    # both items may be processed by the same worker
+    assert all(cpus in layout["cpus"] for cpus in results.values())
+
+
+def test_get_mne_n_jobs(monkeypatch):
+    """Test the number of jobs passed to MNE."""
+    monkeypatch.delenv("MNE_N_JOBS", raising=False)
+    assert get_mne_n_jobs() == 1
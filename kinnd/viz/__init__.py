@@ -1 +1,10 @@
-from .topo import plot_topomap
\ No newline at end of file
+from ..utils._lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["timecourse", "topo"],
+    submod_attrs={
+        "timecourse": ["plot_timecourse_ci"],
+        "topo": ["TopomapRenderer", "plot_topomap"],
+    },
+)
@@ -0,0 +1,30 @@
+import matplotlib
+import numpy as np
+import pytest
+
+from ..timecourse import plot_timecourse_ci
+
+matplotlib.use("Agg")
+
+
+def test_plot_timecourse_ci():
+    """Test plotting a time course with its bootstrap confidence band."""
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((20, 50))
+    times = np.linspace(-0.1, 1, 50)
+    fig = plot_timecourse_ci(data, times, label="match", n_boot=100, seed=0)
+    ax = fig.axes[0]
+    assert len(ax.lines) == 1
+    assert len(ax.collections) == 1
+    np.testing.assert_allclose(ax.lines[0].get_ydata(), data.mean(axis=0))
+    fig2 = plot_timecourse_ci(data + 1, times, ax=ax, n_boot=100)
+    assert fig2 is fig
+    assert len(ax.lines) == 2
+    plt.close("all")
+
+    with pytest.raises(ValueError, match="time points are required"):
+        plot_timecourse_ci(data)
+    with pytest.raises(ValueError, match="do not match"):
+        plot_timecourse_ci(data, times[1:])
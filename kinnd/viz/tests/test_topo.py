@@ -0,0 +1,167 @@
+import inspect
+
+import matplotlib
+import mne
+import numpy as np
+import pytest
+
+from ..topo import TopomapRenderer, plot_topomap
+
+matplotlib.use("Agg")
+
+
+@pytest.fixture(scope="module")
+def info():
+    """Create a measurement info with the GSN-HydroCel-129 montage."""
+    montage = mne.channels.make_standard_montage("GSN-HydroCel-129")
+    info = mne.create_info(montage.ch_names, 1000.0, "eeg")
+    info.set_montage(montage)
+    return info
+
+
+def _mne_image(data, info, **kwargs):
+    """Get the image drawn by MNE."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    im, _ = mne.viz.plot_topomap(data, info, axes=ax, show=False, **kwargs)
+    image = im.get_array()
+    plt.close(fig)
+    return np.ma.filled(image.astype(float), np.nan), im.get_extent()
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(),
+        dict(image_interp="linear"),
+        dict(extrapolate="local"),
+        dict(extrapolate="box", border=1.0),
+    ],
+)
+def test_interpolate(info, kwargs):
+    """Test that the images match MNE."""
+    data = np.random.default_rng(0).standard_normal((129, 3))
+    renderer = TopomapRenderer(info, **kwargs)
+    images = renderer.interpolate(data)
+    assert images.shape == (3, 64, 64)
+    expected, extent = _mne_image(data[:, 1], info, contours=0, **kwargs)
+    inside = np.isfinite(images[1])
+    assert inside.sum() > 0.5 * inside.size
+    np.testing.assert_allclose(images[1][inside], expected[inside], atol=1e-6)
+    np.testing.assert_allclose(renderer.extent, extent)
+    assert renderer.interpolate(data[:, 1]).shape == (64, 64)
+
+
+def test_mne_private_api(info):
+    """Test the private MNE functions the renderer relies on.
+
+    They are not covered by the deprecation cycle of MNE, thus a change of their
+    signature is caught here rather than as a wrong image.
+    """
+    from mne.channels.layout import _find_topomap_coords
+    from mne.utils.check import _check_sphere
+    from mne.viz.topomap import (
+        _get_extra_points,
+        _GridData,
+        _make_head_outlines,
+        _setup_interp,
+    )
+
+    expected = {
+        _find_topomap_coords: ["info", "picks", "layout", "ignore_overlap"],
+        _check_sphere: ["sphere", "info"],
+        _get_extra_points: ["pos", "extrapolate", "origin", "radii"],
+        _make_head_outlines: ["sphere", "pos", "outlines", "clip_origin"],
+        _setup_interp: [
+            "pos",
+            "res",
+            "image_interp",
+            "extrapolate",
+            "outlines",
+            "border",
+        ],
+    }
+    for func, parameters in expected.items():
+        signature = list(inspect.signature(func).parameters)
+        assert signature[: len(parameters)] == parameters, func.__name__
+    assert "sphere" in inspect.signature(_find_topomap_coords).parameters
+    # the interpolator returned by _setup_interp
+    sphere = _check_sphere(None, info)
+    pos = _find_topomap_coords(info, picks=np.arange(129), sphere=sphere)
+    outlines = _make_head_outlines(sphere, pos, "head", (0, 0))
+    _, _, _, interp = _setup_interp(pos, 8, "cubic", "head", outlines, "mean")
+    assert isinstance(interp, _GridData)
+    for attribute in ("n_extra", "tri", "interp", "mask_pts"):
+        assert hasattr(interp, attribute), attribute
+    assert hasattr(interp.tri, "vertex_neighbor_vertices")
+
+
+def test_renderer_cache(info, monkeypatch):
+    """Test that the interpolation matrix is computed once."""
+    from .. import topo
+
+    TopomapRenderer(info, res=32)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("The matrix should be read from the cache.")
+
+    monkeypatch.setattr(topo, "_make_topomap_matrix", _fail)
+    renderer = TopomapRenderer(info, res=32)
+    assert renderer.interpolate(np.ones(129)).shape == (32, 32)
+    with pytest.raises(RuntimeError, match="from the cache"):
+        TopomapRenderer(mne.pick_info(info, np.arange(64)), res=32)
+
+
+def test_plot(info):
+    """Test plotting grids and animations."""
+    import matplotlib.pyplot as plt
+
+    xr = pytest.importorskip("xarray")
+    renderer = TopomapRenderer(mne.pick_info(info, np.arange(64)), res=32)
+    assert renderer.ch_names == info.ch_names[:64]
+    rng = np.random.default_rng(0)
+    fig = renderer.plot(rng.standard_normal(64), title="mismatch")
+    assert len(fig.axes) == 1
+    assert fig.axes[0].get_title() == "mismatch"
+
+    # the channels of a DataArray are reordered
+    da = xr.DataArray(
+        rng.standard_normal((3, 64)),
+        coords={"condition": ["a", "b", "c"], "channel": info.ch_names[:64][::-1]},
+        dims=("condition", "channel"),
+    )
+    fig = renderer.plot_grid(da)
+    assert [ax.get_title() for ax in fig.axes[:3]] == ["a", "b", "c"]
+    assert len(fig.axes) == 5  # 2 x 2 grid and the colorbar
+    image = fig.axes[0].images[0].get_array()
+    expected = renderer.interpolate(da.values[0][::-1])
+    np.testing.assert_allclose(np.ma.filled(image, np.nan), expected)
+    clim = [ax.images[0].get_clim() for ax in fig.axes[:3]]
+    assert len(set(clim)) == 1
+    plt.close("all")
+
+    anim = renderer.animate(rng.standard_normal((64, 10)), np.linspace(0, 0.1, 10))
+    im, text = anim._func(4)
+    assert text.get_text() == "0.044 s"
+    assert im.get_array().shape == (32, 32)
+    plt.close("all")
+
+    with pytest.raises(ValueError, match="must be of shape"):
+        renderer.interpolate(np.ones(129))
+    with pytest.raises(ValueError, match="single map"):
+        renderer.plot(np.ones((64, 2)))
+    with pytest.raises(ValueError, match="missing from the data"):
+        renderer.plot(da.isel(channel=slice(1, None)))
+    with pytest.raises(ValueError, match="number of titles"):
+        renderer.plot_grid(np.ones((64, 2)), titles=["a"])
+
+
+def test_plot_topomap(info):
+    """Test that plot_topomap returns the figure."""
+    import matplotlib.pyplot as plt
+
+    data = dict(zip(info.ch_names, np.random.default_rng(0).standard_normal(129)))
+    fig = plot_topomap(data, info, show=False)
+    assert isinstance(fig, plt.Figure)
+    plt.close("all")
@@ -0,0 +1,94 @@
+"""Plot ROI time courses with their bootstrap confidence bands."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..io.store import SUBJECT_DIM
+from ..stats.bootstrap import bootstrap_ci
+from ..utils._imports import import_optional_dependency
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+    from xarray import DataArray
+
+
+def plot_timecourse_ci(
+    data: Union[np.ndarray, DataArray],
+    times: Optional[np.ndarray] = None,
+    *,
+    ax: Optional[Axes] = None,
+    label: Optional[str] = None,
+    color=None,
+    alpha: float = 0.3,
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    method: str = "percentile",
+    seed: Optional[int] = None,
+    n_jobs: Optional[int] = 1,
+) -> Figure:
+    """Plot the mean time course across subjects and its bootstrap confidence band.
+
+    Parameters
+    ----------
+    data : array of shape (n_subjects, n_times) | xarray.DataArray
+        The subject-level time courses, e.g. the average over the channels of a ROI.
+        A :class:`~xarray.DataArray` must have the dimensions ``subject`` and ``time``.
+    times : array of shape (n_times,) | None
+        The time points. Required for an array, read from the ``time`` coordinate for a
+        :class:`~xarray.DataArray`.
+    ax : matplotlib.axes.Axes | None
+        The axes to draw on. If None, a new figure is created.
+    label : str | None
+        The label of the mean time course, for the legend.
+    color : color | None
+        The color of the line and of the band.
+    alpha : float
+        The transparency of the band.
+    n_boot, ci, method, seed, n_jobs
+        The bootstrap parameters, see :func:`kinnd.stats.bootstrap_ci`.
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+        The figure.
+    """
+    xr = import_optional_dependency("xarray", raise_error=False)
+
+    if xr is not None and isinstance(data, xr.DataArray):
+        if set(data.dims) != {SUBJECT_DIM, "time"}:
+            raise ValueError(
+                "The DataArray must have the dimensions 'subject' and 'time', got "
+                f"{data.dims}."
+            )
+        data = data.transpose(SUBJECT_DIM, "time")
+        times = data["time"].values if times is None else times
+        data = data.values
+    data = np.asarray(data, dtype=float)
+    if data.ndim != 2:
+        raise ValueError(
+            f"The data must be of shape (n_subjects, n_times), got {data.shape}."
+        )
+    if times is None:
+        raise ValueError("The time points are required for an array.")
+    times = np.asarray(times)
+    if times.shape != data.shape[1:]:
+        raise ValueError(
+            f"The time points {times.shape} do not match the data {data.shape}."
+        )
+    if ax is None:
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots(layout="constrained")
+    (line,) = ax.plot(times, data.mean(axis=0), label=label, color=color)
+    lower, upper = bootstrap_ci(
+        data, n_boot=n_boot, ci=ci, method=method, seed=seed, n_jobs=n_jobs
+    )
+    ax.fill_between(times, lower, upper, color=line.get_color(), alpha=alpha, lw=0)
+    ax.set_xlabel("Time (s)")
+    return ax.get_figure()
@@ -1,6 +1,33 @@
+"""Topographic maps.
+
+:func:`mne.viz.plot_topomap` rebuilds the triangulation, the interpolator and the head
+outline on every call. Those only depend on the sensor positions, thus
+:class:`TopomapRenderer` computes, once per montage and channel subset, the matrix
+mapping the channel values to the pixels of the image. Rendering a map is then a
+matrix product, and the maps of a grid or the frames of an animation are all computed
+in a single product and drawn by updating the image of an existing artist.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import mne
 import numpy as np
 
+from ..utils._checks import check_type, check_value, ensure_int
+from ..utils._imports import import_optional_dependency
+
+if TYPE_CHECKING:
+    from typing import Optional, Union
+
+    from matplotlib.animation import FuncAnimation
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+    from mne import Info
+    from xarray import DataArray
+
+
 def plot_topomap(data_dict, info, ch_type="eeg", **kwargs):
     """Plot a topomap of the data.
 
@@ -26,8 +53,12 @@ def plot_topomap(data_dict, info, ch_type="eeg", **kwargs):
 
     Returns
     -------
-    mne.viz.TopoArray
-        The plot object.
+    fig : matplotlib.figure.Figure
+        The figure.
+
+    See Also
+    --------
+    TopomapRenderer : To plot many topomaps of the same channels.
 
     Examples
     --------
@@ -46,6 +77,505 @@ def plot_topomap(data_dict, info, ch_type="eeg", **kwargs):
         raise ValueError(f"`data_dict` must be a dictionary. Got {type(data_dict)}")
 
     data = np.array(list(data_dict.values()))
-    fig = mne.viz.plot_topomap(data, info, ch_type=ch_type, **kwargs)
+    im, _ = mne.viz.plot_topomap(data, info, ch_type=ch_type, **kwargs)
+    return im.figure
+
+
+class TopomapRenderer:
+    """Render many topographic maps of the same channels.
+
+    Parameters
+    ----------
+    info : mne.Info
+        The measurement information, with the montage set. The maps are drawn for the
+        channels of type ``ch_type``, in the order of ``info``; pick the channel subset
+        beforehand with :func:`mne.pick_info`.
+    ch_type : str
+        The channel type.
+    res : int
+        The resolution of the images, in pixels along each side.
+    image_interp : ``"cubic"`` | ``"linear"``
+        The interpolation between the sensors.
+    extrapolate : ``"head"`` | ``"local"`` | ``"box"``
+        The extrapolation beyond the sensors, see :func:`mne.viz.plot_topomap`.
+    border : float | ``"mean"``
+        The value of the extrapolated points, see :func:`mne.viz.plot_topomap`.
+    sphere : float | array of shape (4,) | None
+        The sphere used to project the sensors, see :func:`mne.viz.plot_topomap`.
+    cmap : str | matplotlib.colors.Colormap
+        The colormap.
+
+    Notes
+    -----
+    The interpolation matrix is computed once per channel positions and parameters,
+    and cached with the montage operators (see :mod:`kinnd.preprocessing`). The images
+    match :func:`mne.viz.plot_topomap` with the same parameters, without contours,
+    which could not be updated in place.
+    """
+
+    def __init__(
+        self,
+        info: Info,
+        ch_type: str = "eeg",
+        *,
+        res: int = 64,
+        image_interp: str = "cubic",
+        extrapolate: str = "head",
+        border: Union[float, str] = "mean",
+        sphere=None,
+        cmap="RdBu_r",
+    ) -> None:
+        from mne import pick_info, pick_types
+        from mne.channels.layout import _find_topomap_coords
+        from mne.utils.check import _check_sphere
+        from mne.viz.topomap import _get_extra_points, _make_head_outlines
+
+        from ..preprocessing.montage import get_cached_operator
+
+        check_type(info, (mne.Info,), "info")
+        check_type(ch_type, (str,), "ch_type")
+        res = ensure_int(res, "res")
+        if res < 2:
+            raise ValueError(f"Argument 'res' must be at least 2, got {res}.")
+        check_value(image_interp, ("cubic", "linear"), "image_interp")
+        check_value(extrapolate, ("head", "local", "box"), "extrapolate")
+        check_type(border, ("numeric", str), "border")
+        if isinstance(border, str):
+            check_value(border, ("mean",), "border")
+        picks = pick_types(info, meg=False, exclude=(), **{ch_type: True})
+        if picks.size < 3:
+            raise ValueError(
+                f"At least 3 channels of type {ch_type} are required, got {picks.size}."
+            )
+        info = pick_info(info, picks)
+        self._ch_names = list(info["ch_names"])
+        self._sphere = _check_sphere(sphere, info)
+        self._pos = _find_topomap_coords(
+            info, picks=np.arange(len(self._ch_names)), sphere=self._sphere
+        )
+        self._outlines = _make_head_outlines(self._sphere, self._pos, "head", (0, 0))
+        self._res = res
+        self._cmap = cmap
+        params = (res, image_interp, extrapolate, border)
+        self._matrix = get_cached_operator(
+            "topomap",
+            lambda: _make_topomap_matrix(self._pos, self._outlines, *params),
+            self._pos,
+            self._sphere,
+            *params,
+        )
+        self._extent = _get_extent(self._outlines)
+        # the image is clipped to the head, or to the sensors for local extrapolation
+        self._clip = None
+        if extrapolate == "local":
+            _, self._clip, _ = _get_extra_points(
+                self._pos, "local", (0.0, 0.0), self._outlines["clip_radius"]
+            )
+
+    def __repr__(self) -> str:
+        """Return the representation of the renderer."""
+        return f"<TopomapRenderer | {len(self._ch_names)} channels, {self._res} px>"
+
+    @property
+    def ch_names(self) -> list[str]:
+        """The channels, in the order expected for the data.
+
+        :type: list of str
+        """
+        return list(self._ch_names)
+
+    @property
+    def pos(self) -> np.ndarray:
+        """The 2D positions of the channels on the images.
+
+        :type: array of shape (n_channels, 2)
+        """
+        return self._pos.copy()
+
+    @property
+    def extent(self) -> tuple[float, float, float, float]:
+        """The ``(xmin, xmax, ymin, ymax)`` extent of the images.
+
+        :type: tuple of float
+        """
+        return self._extent
+
+    def interpolate(self, data: Union[np.ndarray, DataArray]) -> np.ndarray:
+        """Interpolate the channel values onto the images.
+
+        Parameters
+        ----------
+        data : array of shape (n_channels,) or (n_channels, n_maps) | xarray.DataArray
+            The values of the channels, in the order of :attr:`ch_names`. A
+            :class:`~xarray.DataArray` must have a ``channel`` dimension and at most one
+            other dimension.
+
+        Returns
+        -------
+        images : array of shape (res, res) or (n_maps, res, res)
+            The images, with NaN outside of the head.
+        """
+        squeeze = np.ndim(data) == 1
+        data, _ = self._check_data(data)
+        data = np.vstack((data, np.ones((1, data.shape[1]))))  # constant border
+        images = (self._matrix @ data).T.reshape(-1, self._res, self._res)
+        return images[0] if squeeze else images
+
+    def plot(
+        self,
+        data: Union[np.ndarray, DataArray],
+        *,
+        ax: Optional[Axes] = None,
+        vlim: tuple[Optional[float], Optional[float]] = (None, None),
+        sensors: bool = True,
+        colorbar: bool = False,
+        title: Optional[str] = None,
+    ) -> Figure:
+        """Plot a single topographic map.
+
+        Parameters
+        ----------
+        data : array of shape (n_channels,) | xarray.DataArray
+            The values of the channels, in the order of :attr:`ch_names`.
+        ax : matplotlib.axes.Axes | None
+            The axes to draw on. If None, a new figure is created.
+        vlim : tuple of float | None
+            The limits of the colormap. If None, the limit is symmetric around 0 for
+            data of both signs, else the extremum of the data.
+        sensors : bool
+            If True, the sensors are drawn.
+        colorbar : bool
+            If True, a colorbar is added.
+        title : str | None
+            The title of the map.
+
+        Returns
+        -------
+        fig : matplotlib.figure.Figure
+            The figure.
+        """
+        data, _ = self._check_data(data)
+        if data.shape[1] != 1:
+            raise ValueError(
+                f"A single map is expected, got {data.shape[1]}. Use plot_grid() or "
+                "animate() to plot several maps."
+            )
+        fig = self.plot_grid(
+            data,
+            axes=None if ax is None else [ax],
+            vlim=vlim,
+            sensors=sensors,
+            colorbar=colorbar,
+            titles=None if title is None else [title],
+        )
+        return fig
+
+    def plot_grid(
+        self,
+        data: Union[np.ndarray, DataArray],
+        *,
+        titles: Optional[list[str]] = None,
+        ncols: Optional[int] = None,
+        axes: Optional[list[Axes]] = None,
+        vlim: tuple[Optional[float], Optional[float]] = (None, None),
+        sensors: bool = False,
+        colorbar: bool = True,
+    ) -> Figure:
+        """Plot a grid of topographic maps sharing a colormap.
+
+        Parameters
+        ----------
+        data : array of shape (n_channels, n_maps) | xarray.DataArray
+            The values of the channels, in the order of :attr:`ch_names`, e.g. one map
+            per condition, time window or subject. A :class:`~xarray.DataArray` must
+            have a ``channel`` dimension and at most one other dimension, whose
+            coordinates are used as the default titles.
+        titles : list of str | None
+            The title of each map.
+        ncols : int | None
+            The number of columns of the grid. If None, the grid is as square as
+            possible. Ignored if ``axes`` is provided.
+        axes : list of matplotlib.axes.Axes | None
+            The axes to draw on, one per map. If None, a new figure is created.
+        vlim : tuple of float | None
+            The limits of the colormap, shared by every map. If None, the limit is
+            symmetric around 0 for data of both signs, else the extremum of the data.
+        sensors : bool
+            If True, the sensors are drawn.
+        colorbar : bool
+            If True, a colorbar shared by every map is added.
+
+        Returns
+        -------
+        fig : matplotlib.figure.Figure
+            The figure.
+        """
+        data, labels = self._check_data(data)
+        n_maps = data.shape[1]
+        titles = labels if titles is None else list(titles)
+        if titles is not None and len(titles) != n_maps:
+            raise ValueError(
+                f"The number of titles ({len(titles)}) does not match the number of "
+                f"maps ({n_maps})."
+            )
+        if axes is None:
+            import matplotlib.pyplot as plt
+
+            ncols = int(np.ceil(np.sqrt(n_maps))) if ncols is None else ncols
+            ncols = min(ensure_int(ncols, "ncols"), n_maps)
+            nrows = -(-n_maps // ncols)
+            fig, axes = plt.subplots(
+                nrows, ncols, figsize=(2 * ncols, 2 * nrows), squeeze=False
+            )
+            axes = axes.ravel()
+            for ax in axes[n_maps:]:
+                ax.set_axis_off()
+        else:
+            axes = list(axes)
+            if len(axes) != n_maps:
+                raise ValueError(
+                    f"The number of axes ({len(axes)}) does not match the number of "
+                    f"maps ({n_maps})."
+                )
+            fig = axes[0].figure
+        images = self.interpolate(data).reshape(n_maps, self._res, self._res)
+        norm = self._make_norm(data, vlim)
+        for k, (ax, image) in enumerate(zip(axes, images)):
+            im = self._draw(ax, image, norm, sensors)
+            if titles is not None:
+                ax.set_title(str(titles[k]))
+        if colorbar:
+            fig.colorbar(im, ax=axes[:n_maps], shrink=0.6)
+        return fig
+
+    def animate(
+        self,
+        data: Union[np.ndarray, DataArray],
+        times: Optional[np.ndarray] = None,
+        *,
+        ax: Optional[Axes] = None,
+        vlim: tuple[Optional[float], Optional[float]] = (None, None),
+        sensors: bool = True,
+        colorbar: bool = True,
+        interval: float = 50,
+        blit: bool = True,
+    ) -> FuncAnimation:
+        """Animate a time series of topographic maps.
+
+        Every frame is interpolated at once, and each frame of the animation only
+        updates the image and the label of the same artists, redrawn with blitting.
+
+        Parameters
+        ----------
+        data : array of shape (n_channels, n_frames) | xarray.DataArray
+            The values of the channels, in the order of :attr:`ch_names`, e.g. an ERP.
+            A :class:`~xarray.DataArray` must have a ``channel`` dimension and at most
+            one other dimension, whose coordinates are used as the default ``times``.
+        times : array of shape (n_frames,) | None
+            The time of each frame, in seconds, displayed on the frames.
+        ax : matplotlib.axes.Axes | None
+            The axes to draw on. If None, a new figure is created.
+        vlim : tuple of float | None
+            The limits of the colormap, shared by every frame. If None, the limit is
+            symmetric around 0 for data of both signs, else the extremum of the data.
+        sensors : bool
+            If True, the sensors are drawn.
+        colorbar : bool
+            If True, a colorbar is added.
+        interval : float
+            The delay between frames, in milliseconds.
+        blit : bool
+            If True, only the image and the label are redrawn at each frame.
+
+        Returns
+        -------
+        anim : matplotlib.animation.FuncAnimation
+            The animation, which can be saved with
+            :meth:`~matplotlib.animation.Animation.save`.
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        data, labels = self._check_data(data)
+        times = labels if times is None else np.asarray(times)
+        if times is not None and len(times) != data.shape[1]:
+            raise ValueError(
+                f"The number of time points ({len(times)}) does not match the number "
+                f"of frames ({data.shape[1]})."
+            )
+        frames = self.interpolate(data).reshape(-1, self._res, self._res)
+        if ax is None:
+            fig, ax = plt.subplots(figsize=(4, 4), layout="constrained")
+        else:
+            fig = ax.figure
+        im = self._draw(ax, frames[0], self._make_norm(data, vlim), sensors)
+        text = ax.text(0.5, 1.0, "", transform=ax.transAxes, ha="center", va="top")
+        if colorbar:
+            fig.colorbar(im, ax=ax, shrink=0.6)
+
+        def _update(k):
+            im.set_data(frames[k])
+            if times is not None:
+                text.set_text(_format_time(times[k]))
+            return im, text
+
+        return FuncAnimation(
+            fig, _update, frames=len(frames), interval=interval, blit=blit
+        )
+
+    def _check_data(self, data) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """Check the data and get the labels of the maps from a DataArray."""
+        xr = import_optional_dependency("xarray", raise_error=False)
+
+        labels = None
+        if xr is not None and isinstance(data, xr.DataArray):
+            if "channel" not in data.dims or data.ndim > 2:
+                raise ValueError(
+                    "The DataArray must have a 'channel' dimension and at most one "
+                    f"other dimension, got {data.dims}."
+                )
+            missing = sorted(set(self._ch_names) - set(data["channel"].values))
+            if len(missing) != 0:
+                raise ValueError(f"The channels {missing} are missing from the data.")
+            data = data.sel(channel=self._ch_names).transpose("channel", ...)
+            if data.ndim == 2:
+                other = data.dims[1]
+                if other in data.coords:
+                    labels = data[other].values
+            data = data.values
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        if data.ndim != 2 or data.shape[0] != len(self._ch_names):
+            raise ValueError(
+                f"The data must be of shape ({len(self._ch_names)},) or "
+                f"({len(self._ch_names)}, n_maps), got {data.shape}."
+            )
+        return data, labels
+
+    def _make_norm(self, data, vlim):
+        """Make the colormap normalization shared by every map."""
+        from matplotlib.colors import Normalize
+
+        vmin, vmax = (None, None) if vlim is None else vlim
+        finite = data[np.isfinite(data)]
+        if finite.size == 0:
+            raise ValueError("The data must have finite values.")
+        if vmin is None or vmax is None:
+            # symmetric around 0 for data of both signs, as MNE
+            if finite.min() >= 0:
+                default = (0.0, finite.max())
+            else:
+                extremum = np.abs(finite).max()
+                default = (-extremum, extremum)
+            vmin = default[0] if vmin is None else vmin
+            vmax = default[1] if vmax is None else vmax
+        return Normalize(vmin=vmin, vmax=vmax)
+
+    def _draw(self, ax, image, norm, sensors):
+        """Draw an image, the head outline and the sensors on an axes."""
+        from matplotlib.patches import Ellipse, Polygon
+
+        im = ax.imshow(
+            image,
+            cmap=self._cmap,
+            norm=norm,
+            origin="lower",
+            aspect="equal",
+            extent=self._extent,
+            interpolation="bilinear",
+        )
+        if self._clip is None:
+            origin = self._outlines.get("clip_origin", (0.0, 0.0))
+            radius = self._outlines["clip_radius"]
+            patch = Ellipse(
+                origin, 2 * radius[0], 2 * radius[1], transform=ax.transData
+            )
+        else:
+            patch = Polygon(self._clip, closed=True, transform=ax.transData)
+        im.set_clip_path(patch)
+        for key in ("head", "nose", "ear_left", "ear_right"):
+            ax.plot(*self._outlines[key], color="k", linewidth=1)
+        if sensors:
+            ax.plot(*self._pos.T, "k.", markersize=2)
+        ax.set_xlim(self._extent[:2])
+        ax.set_ylim(self._extent[2:])
+        ax.set_axis_off()
+        return im
+
+
+def _make_topomap_matrix(
+    pos: np.ndarray,
+    outlines: dict,
+    res: int,
+    image_interp: str,
+    extrapolate: str,
+    border: Union[float, str],
+) -> np.ndarray:
+    """Compute the matrix mapping the channel values to the pixels of the image.
+
+    The grid, the extrapolated points and the interpolators are the ones of
+    :func:`mne.viz.plot_topomap`. The interpolation is linear in the values at the
+    sensors and at the extrapolated points, which are themselves a linear combination
+    of the values at the sensors; the matrix is thus obtained by interpolating the
+    identity. A constant border does not depend on the data and is the last column,
+    multiplied by one. The pixels outside of the head are NaN.
+    """
+    from matplotlib.path import Path
+    from mne.viz.topomap import _setup_interp
+    from scipy.ndimage import binary_dilation
+
+    _, Xi, Yi, interp = _setup_interp(
+        pos, res, image_interp, extrapolate, outlines, border
+    )
+    n_channels = pos.shape[0]
+    # values of the extrapolated points, as _GridData.set_values
+    extra = np.zeros((interp.n_extra, n_channels))
+    if isinstance(border, str):
+        indices, indptr = interp.tri.vertex_neighbor_vertices
+        used = np.zeros(interp.n_extra, dtype=bool)
+        for k in range(interp.n_extra):
+            neighbors = indptr[indices[n_channels + k] : indices[n_channels + k + 1]]
+            neighbors = neighbors[neighbors < n_channels]
+            if neighbors.size != 0:
+                used[k] = True
+                extra[k, neighbors] = 1 / neighbors.size
+        if not used.all() and used.any():
+            extra[~used] = extra[used].mean(axis=0)
+        offset = np.zeros(n_channels + interp.n_extra)
+    else:
+        offset = np.r_[np.zeros(n_channels), np.full(interp.n_extra, float(border))]
+    values = np.column_stack((np.vstack((np.eye(n_channels), extra)), offset))
+    matrix = interp.interp(interp.tri, values)(Xi, Yi).reshape(res * res, -1)
+    # mask the pixels outside of the head, as the clip path of MNE
+    points = np.column_stack((Xi.ravel(), Yi.ravel()))
+    if extrapolate == "local":
+        inside = Path(interp.mask_pts).contains_points(points)
+    else:
+        origin = np.asarray(outlines.get("clip_origin", (0.0, 0.0)))
+        radius = np.asarray(outlines["clip_radius"])
+        inside = np.sum(((points - origin) / radius) ** 2, axis=1) <= 1
+    # dilated by a pixel, so that the image covers the clip path drawn on the axes
+    inside = binary_dilation(inside.reshape(res, res), np.ones((3, 3), dtype=bool))
+    matrix[~inside.ravel()] = np.nan
+    return matrix
+
+
+def _get_extent(outlines: dict) -> tuple[float, float, float, float]:
+    """Get the extent of the image, as the grid of MNE."""
+    mask = np.c_[outlines["mask_pos"]]
+    origin = outlines.get("clip_origin", (0.0, 0.0))
+    radius = outlines["clip_radius"]
+    return (
+        float(min(mask[:, 0].min(), origin[0] - radius[0])),
+        float(max(mask[:, 0].max(), origin[0] + radius[0])),
+        float(min(mask[:, 1].min(), origin[1] - radius[1])),
+        float(max(mask[:, 1].max(), origin[1] + radius[1])),
+    )
 
 
+def _format_time(time) -> str:
+    """Format the label of a frame."""
+    if isinstance(time, (float, np.floating)):
+        return f"{time:.3f} s"
+    return str(time)